@@ -48,12 +48,74 @@ class Settings(BaseSettings):
 
     # Document Database Configuration (SQLite for full document storage)
     document_db_path: str = "./document_db.sqlite"
+    # Content column compression: "none" keeps plain TEXT, "zlib"/"zstd" store compressed BLOBs
+    # and dictionary-encode repeated metadata values (zstd needs the optional `zstandard` package)
+    document_db_compression: Literal["none", "zlib", "zstd"] = "none"
+    document_db_compression_level: int = 6
+
+    # Conversion Cache (converted markdown keyed by source hash + converter version)
+    conversion_cache_enabled: bool = True
+    conversion_cache_dir: str = "./conversion_cache"
 
     # Retrieval Configuration
     top_k_retrieval: int = 5
     top_k_reranker: int = 3  # Number of documents to return after reranking
     hybrid_alpha: float = 0.7  # Weight for semantic search (legacy, may be deprecated)
 
+    # Context Expansion (neighbor chunks / whole section from the SQLite chunks table)
+    context_expansion_mode: Literal["off", "neighbors", "section"] = "neighbors"
+    context_expansion_window: int = 1  # ±N neighboring chunks around each hit
+    context_expansion_max_chars: int = 4000  # Total character budget for expanded context
+    context_expansion_max_tokens: int = 0  # Optional token budget (0 = use character budget only)
+
+    # Answer Context Packing (deduplicated, best-first retrieval results within a token budget)
+    answer_context_max_tokens: int = 1500  # Budget for retrieved context in the answer prompt
+    answer_context_tokenizer: Literal["model", "approx"] = "approx"  # "model" = answer LLM's get_num_tokens (may load GPT-2 via transformers)
+    answer_context_duplicate_threshold: float = 0.8  # Shingle containment at which a chunk counts as a duplicate
+    context_compression_enabled: bool = False  # Keep only question-relevant sentences (one batched embedding call)
+    context_compression_max_tokens: int = 800  # Budget for kept sentences
+    context_compression_neighbors: int = 1  # Sentences kept either side of a selected one
+
+    # Score-Gated Document Grading (grader LLM only for scores between the low and high thresholds)
+    grade_gate_enabled: bool = True
+    # Bands written by scripts/calibrate_grade_gate.py (no file = every grade goes to the grader LLM).
+    # search_kb does not rerank, so the chat graph is gated on similarity; rerank bands apply only to
+    # results that carry rerank scores (/retrieve with rerank=true)
+    grade_thresholds_path: str = "./grade_thresholds.json"
+
+    # Fast-Path Routing (rule-based search_kb planning; LLM planner only when the rules are unsure)
+    fast_path_routing: bool = True
+    fast_path_max_words: int = 30  # Longer queries go to the LLM planner
+    fast_path_category_filter: bool = True  # Pass procedure_category when exactly one category is mentioned
+
+    # Query Spell Correction (deletion index over the KB vocabulary, built at ingest time)
+    spell_correction_enabled: bool = True
+    spell_vocabulary_path: str = "./spell_vocabulary.json"
+    spell_wordlist_path: str = "/usr/share/dict/words"  # General English words, never rewritten (missing = no correction)
+    query_clean_mode: Literal["local", "llm"] = "local"  # "llm" restores the QUERY_CLEAN_PROMPT call
+
+    # Query Expansion (abbreviation/synonym tables + KB co-occurrence graph built at ingest time)
+    query_expansion_mode: Literal["local", "llm", "off"] = "local"  # "llm" restores the REWRITE_PROMPT call
+    query_expansion_path: str = "./query_expansion.json"
+    query_expansion_variants: int = 2  # Extra embedding searches per search_kb call / hybrid retrieval (0 = none)
+    qna_xml_dir: str = "./KB/qna_xml"  # Curated Q&A pairs used when building the graph
+
+    # Semantic Answer Cache (reuse answers to near-identical questions; keyed by language, filters, KB version)
+    answer_cache_enabled: bool = True
+    answer_cache_path: str = "./answer_cache.sqlite"
+    answer_cache_similarity_threshold: float = 0.92  # Cosine similarity needed to reuse an answer
+    answer_cache_ttl_seconds: int = 604800  # 7 days (0 = no expiry)
+    answer_cache_max_entries: int = 5000
+    kb_version: str = ""  # Override the KB fingerprint used for invalidation ("" = derive from the document DB)
+
+    # Curated Q&A Answers (reviewed answers returned directly when a question matches a curated one)
+    curated_qna_enabled: bool = True
+    curated_qna_kb_dir: str = "./KB"  # Numbered KB folders holding clinician-reviewed *_qa.md files
+    curated_qna_include_xml: bool = False  # Also serve qna_xml_dir pairs (generated; only those marked reviewed="true")
+    curated_qna_index_path: str = "./curated_qna_index.bin"  # Question embedding cache ("" = re-embed on start)
+    curated_qna_similarity_threshold: float = 0.93  # Cosine similarity needed to return a curated answer
+    curated_qna_margin: float = 0.02  # Required lead over the closest question with a different answer
+
     # LangChain Agent Configuration
     agent_max_iterations: int = 5
     agent_verbose: bool = False
@@ -75,6 +137,39 @@ class Settings(BaseSettings):
     max_chunk_size: int = 1500  # Larger chunks for better context preservation
     chunk_overlap: int = 200  # More overlap to prevent context fragmentation
     min_relevance_score: float = 0.1  # Minimum similarity score for retrieval
+    ingest_workers: int = 0  # Process pool size for document conversion (0/1 = serial, -1 = all CPU cores)
+    ingest_file_timeout: int = 300  # Per-file conversion timeout in seconds for pool mode (0 = no limit)
+    ingest_batch_size: int = 64  # Chunks per embedding/upsert batch in streaming ingestion
+    ingest_queue_size: int = 8  # Max items buffered between streaming ingestion stages
+
+    # API Server (async request path; blocking work is offloaded to a thread pool)
+    api_thread_pool_size: int = 64  # Worker threads for sync graph nodes, tools, SQLite and embedding calls
+    api_workers: int = 1  # Worker processes for scripts/start_api.py (forked after preload, POSIX only)
+    api_preload: bool = True  # Load embedding model, BM25 index and reranker once, before forking workers
+    api_worker_torch_threads: int = 0  # torch threads per worker process (0 = torch default)
+
+    # Admission Control (API server: bounded concurrency and queue, fast 429/503 with Retry-After)
+    admission_control_enabled: bool = True
+    admission_max_concurrent: int = 16  # Queries running at once per worker process
+    admission_max_queue: int = 32  # Queries waiting for a slot; beyond this new queries get 429
+    admission_queue_timeout: float = 10.0  # Queue-time SLO in seconds; queries waiting longer get 503
+    admission_llm_concurrency: int = 8  # Concurrent chat model calls per process (0 = unlimited)
+    admission_reranker_concurrency: int = 1  # Concurrent reranker forward passes (0 = unlimited)
+    admission_embeddings_concurrency: int = 4  # Concurrent embedding calls (0 = unlimited)
+
+    # In-Flight Request Coalescing (identical concurrent queries share one pipeline run / stream)
+    request_coalescing_enabled: bool = True
+
+    # Batch Queries (/query/batch and RAGPipeline.generate_batch)
+    batch_max_queries: int = 200  # Queries accepted per batch request
+    batch_concurrency: int = 4  # Default queries of one batch running at once
+
+    # Answer Safety Check (tiered: local rules + linear model, LLM only for ambiguous answers)
+    safety_check_mode: Literal["tiered", "local", "llm"] = "tiered"
+    safety_classifier_path: str = "./models/safety_classifier.json"  # Built by scripts/train_safety_classifier.py
+    safety_local_safe_threshold: float = 0.15  # P(unsafe) at or below this passes without the LLM
+    safety_local_unsafe_threshold: float = 0.9  # P(unsafe) at or above this is blocked without the LLM
+    safety_verdict_log_path: str = "./logs/safety_verdicts.jsonl"  # Training data for the classifier ("" = off)
 
     # Embedding Model Options
     embedding_provider: Literal["openai",
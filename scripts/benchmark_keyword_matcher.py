@@ -0,0 +1,141 @@
+"""Microbenchmark: compiled KeywordMatcher vs per-keyword substring scans.
+
+Runs each keyword workload (document classification, procedure extraction,
+emergency detection, PICC filtering) both ways over the KB and a set of sample
+queries, checks the results agree, and reports timings.
+
+Usage:
+    python scripts/benchmark_keyword_matcher.py
+    python scripts/benchmark_keyword_matcher.py KB/md --repeat 20
+"""
+import sys
+import os
+import argparse
+import time
+from pathlib import Path
+
+# Add project root to path
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from loguru import logger
+
+from src.keyword_matcher import KeywordMatcher, AHOCORASICK_AVAILABLE
+from src.document_processor import PROCEDURE_CATEGORY_KEYWORDS
+from src.guardrails import EMERGENCY_KEYWORDS
+from src.query_grader import QueryGrader
+
+SAMPLE_QUERIES = [
+    "What should I do after PICC line insertion?",
+    "How long does a liver biopsy take for children?",
+    "My child has chest pain after the procedure",
+    "Can my son eat before the embolization?",
+    "PICC 拔除後要注意什麼？",
+    "bleeding won't stop at the drain site",
+    "What is a nephrostomy and why is it needed?",
+    "Is sedation used for a port-a-cath insertion?",
+    "我的孩子昏迷了",
+    "How do I care for the gastrostomy tube at home?",
+]
+
+
+def naive_classify(text: str, path: str) -> dict:
+    """Original per-keyword scan from DocumentProcessor._classify_procedure_category."""
+    text_lower = text.lower()
+    path_lower = path.lower()
+    combined_text = f"{text_lower} {path_lower}"
+    scores = {}
+    for category, keywords in PROCEDURE_CATEGORY_KEYWORDS.items():
+        score = 0
+        for keyword in keywords:
+            if keyword in combined_text:
+                score += 3 if keyword in path_lower else 1
+        scores[category] = score
+    return scores
+
+
+def matcher_classify(matcher: KeywordMatcher, text: str, path: str) -> dict:
+    """Same scoring with one matcher pass."""
+    path_lower = path.lower()
+    path_hits = matcher.find(path_lower)
+    return matcher.category_scores(f"{text.lower()} {path_lower}",
+                                   keyword_weights={k: 3 for k in path_hits})
+
+
+def naive_first(keywords, text: str):
+    """Original first-match loop (QueryGrader / emergency checks)."""
+    text_lower = text.lower()
+    for keyword in keywords:
+        if keyword.lower() in text_lower:
+            return keyword.lower()
+    return None
+
+
+def timed(fn, repeat: int) -> float:
+    """Best-of-repeat wall time in milliseconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the compiled keyword matcher")
+    parser.add_argument("kb_folder", nargs='?', default="KB/md", help="Folder of markdown documents (default: KB/md)")
+    parser.add_argument("--repeat", type=int, default=10, help="Timing repetitions (best of N)")
+    args = parser.parse_args()
+
+    documents = []
+    kb_path = Path(args.kb_folder)
+    if kb_path.exists():
+        for file_path in sorted(kb_path.rglob('*.md')):
+            documents.append((file_path.read_text(encoding='utf-8', errors='ignore'), str(file_path)))
+    if not documents:
+        logger.warning(f"No markdown documents in {kb_path}; using sample queries as documents")
+        documents = [(q * 50, f"sample_{i}.md") for i, q in enumerate(SAMPLE_QUERIES)]
+
+    corpus_chars = sum(len(text) for text, _ in documents)
+    logger.info(f"Backend: {'pyahocorasick' if AHOCORASICK_AVAILABLE else 'compiled trie regex'}")
+    logger.info(f"Corpus: {len(documents)} documents, {corpus_chars:,} chars; {len(SAMPLE_QUERIES)} queries")
+
+    category_matcher = KeywordMatcher(PROCEDURE_CATEGORY_KEYWORDS)
+    emergency_matcher = KeywordMatcher(EMERGENCY_KEYWORDS)
+    procedure_matcher = KeywordMatcher(QueryGrader.KNOWN_PROCEDURES)
+    queries = SAMPLE_QUERIES * 100
+
+    workloads = [
+        ("classify documents",
+         lambda: [naive_classify(t, p) for t, p in documents],
+         lambda: [matcher_classify(category_matcher, t, p) for t, p in documents]),
+        ("emergency check (queries)",
+         lambda: [naive_first(EMERGENCY_KEYWORDS, q) for q in queries],
+         lambda: [emergency_matcher.first(q) for q in queries]),
+        ("procedure extraction (queries)",
+         lambda: [naive_first(QueryGrader.KNOWN_PROCEDURES, q) for q in queries],
+         lambda: [procedure_matcher.first(q) for q in queries]),
+    ]
+
+    mismatches = 0
+    logger.info("")
+    logger.info(f"{'workload':34} {'naive ms':>10} {'matcher ms':>11} {'speedup':>8}  results")
+    for name, naive, compiled in workloads:
+        agree = naive() == compiled()
+        mismatches += 0 if agree else 1
+        naive_ms = timed(naive, args.repeat)
+        compiled_ms = timed(compiled, args.repeat)
+        logger.info(f"{name:34} {naive_ms:10.2f} {compiled_ms:11.2f} {naive_ms / max(compiled_ms, 1e-9):7.1f}x  "
+                    f"{'match' if agree else 'MISMATCH'}")
+
+    if mismatches:
+        logger.error(f"❌ {mismatches} workload(s) disagree with the original substring scans")
+        return 1
+    logger.info("✅ Matcher results identical to substring scans")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""Retrieval benchmark: local query expansion vs LLM multi-query paraphrases.
+
+For each evaluation question, retrieves top-k chunks (BM25 + embedding search,
+fused by reciprocal rank) three ways:
+  - original:  the question only
+  - local:     QueryExpander weighted BM25 terms + embedding variants (no LLM)
+  - llm:       MULTI_QUERY_PROMPT paraphrases from the orchestrator LLM (--llm)
+
+Recall is the share of a question's expected_topics found in the retrieved
+text (and of its relevant_sources among the retrieved sources, if given).
+Also reports the time spent producing expansions.
+
+Usage:
+    python scripts/benchmark_query_expansion.py
+    python scripts/benchmark_query_expansion.py --llm --k 5
+    python scripts/benchmark_query_expansion.py --questions my_eval.json
+"""
+import sys
+import os
+import argparse
+import json
+import time
+
+# Add project root to path
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from loguru import logger
+
+from src.query_expansion import get_query_expander, reciprocal_rank_fusion
+from config import settings
+
+
+def llm_paraphrases(llm, question: str):
+    """Paraphrases the way generate_queries produced them with the LLM."""
+    from langchain_core.messages import HumanMessage
+    from src.agentic_rag import MULTI_QUERY_PROMPT
+
+    response = llm.invoke([HumanMessage(content=MULTI_QUERY_PROMPT.format(question=question))])
+    content = response.content if hasattr(response, 'content') else str(response)
+    try:
+        queries = json.loads(content.replace("```json", "").replace("```", "").strip())
+        return [q for q in queries if isinstance(q, str)] if isinstance(queries, list) else []
+    except Exception:
+        return []
+
+
+def retrieve(vector_store, bm25, queries, k: int, term_weights=None):
+    """BM25 (optionally weighted) + embedding search over all queries, fused by reciprocal rank."""
+    lists = [vector_store.similarity_search(query=q, k=k * 2) for q in queries]
+    if bm25 is not None:
+        if term_weights:
+            lists.append(bm25.search(queries[0], k=k * 2, term_weights=term_weights))
+        else:
+            lists.extend(bm25.search(q, k=k * 2) for q in queries)
+    return reciprocal_rank_fusion(lists, limit=k)
+
+
+def recall(results, item) -> float:
+    """Share of expected topics (or relevant sources) covered by the results."""
+    text = " ".join(r.get('content', '') for r in results).lower()
+    targets = [t.lower() for t in item.get('expected_topics', [])]
+    hits = sum(1 for t in targets if t in text)
+    sources = [s.lower() for s in item.get('relevant_sources', [])]
+    if sources:
+        retrieved = " ".join(str(r.get('metadata', {}).get('source', '')) for r in results).lower()
+        targets += sources
+        hits += sum(1 for s in sources if s in retrieved)
+    return hits / len(targets) if targets else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark local query expansion against LLM paraphrases")
+    parser.add_argument("--questions", type=str, default="test_data/sample_questions.json",
+                        help="JSON list of {question, expected_topics[, relevant_sources]}")
+    parser.add_argument("--k", type=int, default=settings.top_k_retrieval, help="Results per question")
+    parser.add_argument("--variants", type=int, default=settings.query_expansion_variants,
+                        help="Embedding variants for the local mode")
+    parser.add_argument("--llm", action="store_true", help="Also run the LLM multi-query baseline")
+    args = parser.parse_args()
+
+    from src.embeddings import get_embedding_model
+    from src.vector_store import VectorStore
+    from src.retriever import BM25Retriever, BM25_AVAILABLE
+    from langchain_core.documents import Document
+
+    with open(args.questions, 'r', encoding='utf-8') as f:
+        questions = json.load(f)
+
+    vector_store = VectorStore(get_embedding_model())
+    bm25 = None
+    if BM25_AVAILABLE:
+        data = vector_store.vectorstore._collection.get()
+        docs = [Document(page_content=c, metadata=m or {}) for c, m in zip(data['documents'], data['metadatas'])]
+        bm25 = BM25Retriever(docs)
+    else:
+        logger.warning("rank_bm25 not installed; comparing embedding search only")
+
+    expander = get_query_expander()
+    llm = None
+    if args.llm:
+        from src.llm import get_langchain_llm
+        llm = get_langchain_llm()
+
+    modes = ['original', 'local'] + (['llm'] if llm else [])
+    totals = {mode: 0.0 for mode in modes}
+    expansion_seconds = {mode: 0.0 for mode in modes}
+    for item in questions:
+        question = item['question']
+        row = []
+        for mode in modes:
+            start = time.perf_counter()
+            term_weights = None
+            if mode == 'local':
+                term_weights = expander.expand_terms(question)
+                queries = [question] + expander.variants(question, max_variants=args.variants)
+            elif mode == 'llm':
+                queries = [question] + llm_paraphrases(llm, question)
+            else:
+                queries = [question]
+            expansion_seconds[mode] += time.perf_counter() - start
+
+            score = recall(retrieve(vector_store, bm25, queries, args.k, term_weights), item)
+            totals[mode] += score
+            row.append(f"{mode}={score:.2f}")
+        logger.info(f"{item.get('id', question[:30]):12} {'  '.join(row)}")
+
+    count = max(len(questions), 1)
+    logger.info("=" * 70)
+    logger.info(f"QUERY EXPANSION BENCHMARK (recall@{args.k}, {len(questions)} questions)")
+    logger.info("=" * 70)
+    for mode in modes:
+        logger.info(f"{mode:9} recall {totals[mode] / count:.3f}   expansion {expansion_seconds[mode] / count * 1000:8.2f} ms/query")
+    if llm:
+        gap = totals['llm'] / count - totals['local'] / count
+        logger.info(f"LLM paraphrase advantage over local expansion: {gap:+.3f}")
+    logger.info("=" * 70)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
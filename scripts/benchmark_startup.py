@@ -0,0 +1,157 @@
+"""Startup benchmark: cold import time of the app's entry modules, with a regression gate.
+
+Each target module is imported in a fresh interpreter under
+``python -X importtime``; the best of --runs is reported (wall time of the
+process and the module's cumulative import time), together with the packages
+that cost the most. Heavy optional packages (torch, transformers,
+sentence_transformers, ...) must not be imported just by loading the modules:
+providers and the reranker import them when they are created.
+
+With a baseline file (written by --update-baseline), exits 1 if a module's
+import time grew by more than --max-regression (plus --slack-ms for noise), or
+if a forbidden package was imported.
+
+Usage:
+    python scripts/benchmark_startup.py
+    python scripts/benchmark_startup.py --update-baseline
+    python scripts/benchmark_startup.py --modules src.api,streamlit_app --runs 5
+"""
+import sys
+import os
+import argparse
+import json
+import re
+import subprocess
+import time
+
+# Add project root to path
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from loguru import logger
+
+DEFAULT_BASELINE = os.path.join(project_root, "startup_baseline.json")
+DEFAULT_MODULES = "src.api,src.rag_pipeline,src.retriever,src.vector_store,src.embeddings,src.llm"
+# Loaded on first use only (embedding provider / reranker / SelfQueryRetriever / Chroma client / document conversion)
+DEFAULT_FORBIDDEN = "torch,transformers,sentence_transformers,ollama,openai,langchain_community,chromadb,markitdown"
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def parse_importtime(stderr: str):
+    """
+    Parse ``-X importtime`` output.
+
+    Returns:
+        Dict of module -> (self µs, cumulative µs, nesting depth)
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules[name] = (int(self_us), int(cumulative_us), (len(indent) - 1) // 2)
+    return modules
+
+
+def measure(module: str):
+    """Import ``module`` in a fresh interpreter; returns (wall seconds, importtime entries)."""
+    env = dict(os.environ, PYTHONPATH=project_root + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=project_root, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        error = [line for line in proc.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError(error[-1] if error else f"import {module} failed")
+    return wall, parse_importtime(proc.stderr)
+
+
+def benchmark(module: str, runs: int, forbidden):
+    """Best-of-``runs`` timings for one module, its heaviest packages and forbidden imports."""
+    best = None
+    for _ in range(runs):
+        wall, modules = measure(module)
+        cumulative = modules.get(module, (0, 0, 0))[1] / 1000
+        if best is None or cumulative < best['import_ms']:
+            top_level = {}
+            for name, (_, cum_us, _) in modules.items():
+                package = name.split('.')[0]
+                if name == package:
+                    top_level[package] = cum_us / 1000
+            best = {
+                'module': module,
+                'wall_ms': round(wall * 1000, 1),
+                'import_ms': round(cumulative, 1),
+                'modules_loaded': len(modules),
+                'heaviest': sorted(top_level.items(), key=lambda x: x[1], reverse=True)[:8],
+                'forbidden': sorted(p for p in forbidden if p in modules),
+            }
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold import time and fail on regressions")
+    parser.add_argument("--modules", type=str, default=DEFAULT_MODULES, help="Comma-separated modules to import")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per module (best is kept)")
+    parser.add_argument("--forbid", type=str, default=DEFAULT_FORBIDDEN,
+                        help="Packages that must not be imported at startup ('' to disable)")
+    parser.add_argument("--baseline", type=str, default=DEFAULT_BASELINE,
+                        help="Baseline JSON (default: startup_baseline.json in the project root)")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="Allowed import time growth over the baseline (fraction)")
+    parser.add_argument("--slack-ms", type=float, default=50.0, help="Absolute allowance for timing noise")
+    args = parser.parse_args()
+
+    modules = [m.strip() for m in args.modules.split(",") if m.strip()]
+    forbidden = [p.strip() for p in args.forbid.split(",") if p.strip()]
+
+    results = []
+    failures = []
+    for module in modules:
+        try:
+            result = benchmark(module, args.runs, forbidden)
+        except RuntimeError as e:
+            logger.error(f"{module}: {e}")
+            failures.append(f"{module} failed to import")
+            continue
+        results.append(result)
+        if result['forbidden']:
+            failures.append(f"{module} imports {', '.join(result['forbidden'])} at startup")
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = {r['module']: r for r in json.load(f).get('modules', [])}
+
+    logger.info("=" * 70)
+    logger.info(f"STARTUP IMPORT TIME (best of {args.runs}, python {sys.version.split()[0]})")
+    logger.info("=" * 70)
+    logger.info(f"{'module':24} {'import ms':>10} {'wall ms':>9} {'modules':>8} {'baseline':>9}")
+    for r in results:
+        base = baseline.get(r['module'])
+        base_text = f"{base['import_ms']:>9.0f}" if base else f"{'-':>9}"
+        logger.info(f"{r['module']:24} {r['import_ms']:>10.0f} {r['wall_ms']:>9.0f} {r['modules_loaded']:>8} {base_text}")
+        logger.info("    heaviest: " + ", ".join(f"{name} {ms:.0f}ms" for name, ms in r['heaviest'][:5]))
+        if base:
+            limit = base['import_ms'] * (1 + args.max_regression) + args.slack_ms
+            if r['import_ms'] > limit:
+                failures.append(f"{r['module']} import time {r['import_ms']:.0f}ms exceeds "
+                                f"baseline {base['import_ms']:.0f}ms (limit {limit:.0f}ms)")
+    logger.info("=" * 70)
+
+    if args.update_baseline and results:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'python': sys.version.split()[0], 'runs': args.runs, 'modules': results}, f, indent=2)
+        logger.info(f"Baseline saved to {args.baseline}")
+
+    for failure in failures:
+        logger.error(failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
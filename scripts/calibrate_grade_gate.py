@@ -0,0 +1,171 @@
+"""Calibrate the retrieval-score thresholds used by grade_documents.
+
+For each evaluation question the knowledge base is searched the way search_kb
+does it, and the top similarity (and rerank score, with --rerank) is paired
+with a relevance label:
+  - topics (default): relevant if the results cover at least --min-recall of
+    the question's expected_topics; the built-in out-of-scope questions are
+    never relevant. Deterministic for a given KB and evaluation set.
+  - llm (--llm-labels): the grader LLM's yes/no on GRADE_PROMPT, i.e. the
+    decision the gate replaces.
+
+Thresholds are chosen so that auto-decisions outside the uncertain band agree
+with the labels at --target-precision, then written to the file RelevanceGate
+loads (settings.grade_thresholds_path). Reports how many questions would skip
+the grader LLM.
+
+Usage:
+    python scripts/calibrate_grade_gate.py
+    python scripts/calibrate_grade_gate.py --questions my_eval.json --llm-labels
+    python scripts/calibrate_grade_gate.py --target-precision 0.9 --dry-run
+"""
+import sys
+import os
+import argparse
+import hashlib
+import json
+
+# Add project root to path
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from loguru import logger
+
+from src.relevance_gate import GradeThresholds, RelevanceGate, calibrate, top_scores
+from config import settings
+
+# Questions the KB should not answer, so the "not relevant" side has samples
+OUT_OF_SCOPE_QUESTIONS = [
+    "What is the capital of France?",
+    "How do I reset my email password?",
+    "Recommend a good restaurant near the hospital",
+    "What is the score of yesterday's football match?",
+    "How do I file my tax return?",
+    "Write a poem about the sea",
+    "What time does the shopping mall open?",
+    "How do I change a car tyre?",
+]
+
+
+def topic_label(results, item, min_recall: float) -> bool:
+    """Relevant if the retrieved text covers enough of the expected topics."""
+    topics = [t.lower() for t in item.get('expected_topics', [])]
+    if not topics:
+        return False
+    text = " ".join(r.get('content', '') for r in results).lower()
+    return sum(1 for t in topics if t in text) / len(topics) >= min_recall
+
+
+def llm_label(llm, question: str, results) -> bool:
+    """The grader LLM's yes/no for the results, as grade_documents asks it."""
+    from langchain_core.messages import HumanMessage
+    from src.agentic_rag import GRADE_PROMPT
+
+    context = "\n---\n".join(r.get('content', '')[:500] for r in results)[:1500]
+    response = llm.invoke([HumanMessage(content=GRADE_PROMPT.format(question=question, context=context))])
+    content = response.content if hasattr(response, 'content') else str(response)
+    return "yes" in content.lower()[:50]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate score thresholds for the document grading gate")
+    parser.add_argument("--questions", type=str, default="test_data/sample_questions.json",
+                        help="JSON list of {question, expected_topics}")
+    parser.add_argument("--k", type=int, default=5, help="Results per search (search_kb default)")
+    parser.add_argument("--target-precision", type=float, default=0.95,
+                        help="Required agreement of auto-decisions with the labels")
+    parser.add_argument("--min-support", type=int, default=3, help="Minimum samples on each side of a threshold")
+    parser.add_argument("--min-recall", type=float, default=0.5, help="Topic recall that counts as relevant")
+    parser.add_argument("--llm-labels", action="store_true", help="Label with the grader LLM instead of topics")
+    parser.add_argument("--rerank", action="store_true", help="Also calibrate rerank thresholds (AdvancedRetriever)")
+    parser.add_argument("--output", type=str, default=settings.grade_thresholds_path, help="Thresholds JSON")
+    parser.add_argument("--dry-run", action="store_true", help="Report without writing the thresholds file")
+    args = parser.parse_args()
+
+    from src.embeddings import get_embedding_model
+    from src.vector_store import VectorStore
+
+    with open(args.questions, 'rb') as f:
+        raw = f.read()
+    questions = json.loads(raw.decode('utf-8'))
+    items = questions + [{'id': f'oos_{i}', 'question': q, 'expected_topics': [], 'out_of_scope': True}
+                         for i, q in enumerate(OUT_OF_SCOPE_QUESTIONS, 1)]
+
+    vector_store = VectorStore(get_embedding_model())
+    retriever = None
+    if args.rerank:
+        from src.retriever import AdvancedRetriever
+        retriever = AdvancedRetriever(vector_store, use_reranker=True)
+    llm = None
+    if args.llm_labels:
+        from src.llm import get_langchain_llm
+        llm = get_langchain_llm()
+
+    similarity_samples, rerank_samples = [], []
+    for item in items:
+        question = item['question']
+        results = vector_store.similarity_search(query=question, k=args.k)
+        if item.get('out_of_scope'):
+            label = False
+        elif llm is not None:
+            label = llm_label(llm, question, results)
+        else:
+            label = topic_label(results, item, args.min_recall)
+
+        score, _ = top_scores(results)
+        if score is not None:
+            similarity_samples.append((score, label))
+        rerank = None
+        if retriever is not None:
+            _, rerank = top_scores(retriever.retrieve(question, k=args.k))
+            if rerank is not None:
+                rerank_samples.append((rerank, label))
+        rerank_text = f"  rerank={rerank:.3f}" if rerank is not None else ""
+        logger.info(f"{item.get('id', question[:30]):12} relevant={str(label):5}  similarity={score or 0:.3f}{rerank_text}")
+
+    score_low, score_high = calibrate(similarity_samples, args.target_precision, args.min_support)
+    # Without --rerank the rerank band is left out, so the gate never guesses at rerank scores
+    rerank_low, rerank_high = (calibrate(rerank_samples, args.target_precision, args.min_support)
+                               if rerank_samples else (None, None))
+    thresholds = GradeThresholds(score_high, score_low, rerank_high, rerank_low)
+
+    # Replay the gate on the samples
+    gate = RelevanceGate(thresholds)
+    agreed = decided = 0
+    for score, label in similarity_samples:
+        decision, _ = gate.decide([{'score': score}])
+        if decision is not None:
+            decided += 1
+            agreed += decision == label
+
+    total = len(similarity_samples)
+    logger.info("=" * 70)
+    logger.info("GRADE GATE CALIBRATION")
+    logger.info("=" * 70)
+    logger.info(f"Samples: {total} ({sum(label for _, label in similarity_samples)} relevant), "
+                f"labels: {'grader LLM' if llm else 'expected topics'}")
+    logger.info(f"Similarity band: not relevant < {score_low:.3f} <= grader LLM < {score_high:.3f} <= relevant")
+    if rerank_samples:
+        logger.info(f"Rerank band:     not relevant < {rerank_low:.3f} <= grader LLM < {rerank_high:.3f} <= relevant")
+    logger.info(f"Decided without the LLM: {decided}/{total} ({decided / max(total, 1):.1%}), "
+                f"agreement {agreed}/{decided or 1} ({agreed / max(decided, 1):.1%})")
+    logger.info("=" * 70)
+
+    if not args.dry_run:
+        thresholds.save(
+            args.output,
+            samples=total,
+            rerank_samples=len(rerank_samples),
+            target_precision=args.target_precision,
+            labels='llm' if llm else 'topics',
+            questions_file=args.questions,
+            questions_sha1=hashlib.sha1(raw).hexdigest(),
+            embedding_provider=settings.embedding_provider,
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""Convert an existing document database to (or from) compressed storage in place.
+
+Usage:
+    # Compress content columns with zstd (falls back to zlib if zstandard is missing)
+    python scripts/compress_document_db.py --codec zstd
+
+    # Decompress back to plain TEXT columns
+    python scripts/compress_document_db.py --codec none --db document_db.sqlite
+"""
+import sys
+import os
+import argparse
+
+# Add project root to path
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from loguru import logger
+
+from src.document_db import DocumentDatabase
+from config import settings
+
+
+def compress_database(db_path: str, codec: str, vacuum: bool = True):
+    """
+    Rewrite all documents and chunks in a database with the given codec.
+
+    Args:
+        db_path: Path to the SQLite database
+        codec: Target codec ('none', 'zlib' or 'zstd')
+        vacuum: Whether to VACUUM afterwards to shrink the file
+    """
+    if not os.path.exists(db_path):
+        logger.error(f"Database not found at {db_path}")
+        return
+
+    size_before = os.path.getsize(db_path)
+    db = DocumentDatabase(db_path=db_path, compression=codec)
+    counts = db.convert_storage(codec, vacuum=vacuum)
+    stats = db.get_stats()
+    db.close()
+    size_after = os.path.getsize(db_path)
+
+    print(f"✅ Converted {counts['documents']} documents and {counts['chunks']} chunks to '{stats['compression']}'")
+    print(f"   File size: {size_before / 1024:.1f} KB → {size_after / 1024:.1f} KB "
+          f"({(1 - size_after / size_before) * 100 if size_before else 0:.1f}% smaller)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compress document database content in place")
+    parser.add_argument("--db", type=str, default=settings.document_db_path,
+                        help="Path to SQLite database")
+    parser.add_argument("--codec", type=str, choices=["none", "zlib", "zstd"], default="zstd",
+                        help="Target codec ('none' decompresses)")
+    parser.add_argument("--no-vacuum", action="store_true",
+                        help="Skip VACUUM after conversion")
+
+    args = parser.parse_args()
+    compress_database(args.db, args.codec, vacuum=not args.no_vacuum)
@@ -16,6 +16,11 @@ from tqdm import tqdm
 import re
 from bs4 import BeautifulSoup, Comment
 
+from src.conversion_cache import ConversionCache, package_version
+
+# Bump when cleaning/conversion logic changes to invalidate cached conversions
+CONVERTER_VERSION = "1"
+
 
 class MarkdownConverter:
     """Convert documents to markdown format."""
@@ -28,17 +33,20 @@ class MarkdownConverter:
         '.mp3', '.wav'
     }
 
-    def __init__(self, source_dir: str, output_dir: str):
+    def __init__(self, source_dir: str, output_dir: str, use_cache: bool = True):
         """
         Initialize converter.
 
         Args:
             source_dir: Source directory containing documents
             output_dir: Output directory for markdown files
+            use_cache: Reuse cached conversions of unchanged source files
         """
         self.source_dir = Path(source_dir)
         self.output_dir = Path(output_dir)
         self.markitdown = MarkItDown()
+        self.cache = ConversionCache() if use_cache else None
+        self.converter_version = f"{CONVERTER_VERSION}+markitdown-{package_version('markitdown')}"
 
         # Statistics
         self.stats = {
@@ -46,7 +54,8 @@ class MarkdownConverter:
             'converted': 0,
             'skipped': 0,
             'failed': 0,
-            'already_md': 0
+            'already_md': 0,
+            'cached': 0
         }
 
     def _should_convert(self, file_path: Path) -> bool:
@@ -212,6 +221,84 @@ class MarkdownConverter:
 
         return text.strip()
 
+    def _convert(self, file_path: Path) -> str:
+        """
+        Convert a single file to cleaned markdown text.
+
+        Args:
+            file_path: Path to file to convert
+
+        Returns:
+            Cleaned markdown text
+        """
+        # Convert to markdown
+        logger.debug(f"Converting {file_path.name}...")
+
+        # For HTML files, clean before conversion
+        if file_path.suffix.lower() in ['.html', '.htm']:
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    html_content = f.read()
+
+                # Clean HTML to remove navigation, headers, footers, etc.
+                cleaned_html = self._clean_html(html_content, file_path)
+
+                # Verify cleaned HTML has content
+                if not cleaned_html or len(cleaned_html.strip()) < 50:
+                    logger.warning(f"Cleaned HTML too short for {file_path.name}, using original HTML")
+                    result = self.markitdown.convert(str(file_path))
+                    markdown_text = result.text_content
+                else:
+                    # Create temporary file with cleaned HTML
+                    import tempfile
+                    import os
+                    with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as tmp_file:
+                        # Wrap cleaned HTML in valid HTML structure if needed
+                        if not cleaned_html.strip().startswith('<!DOCTYPE') and not cleaned_html.strip().startswith('<html'):
+                            wrapped_html = f"""<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"></head>
+<body>
+{cleaned_html}
+</body>
+</html>"""
+                        else:
+                            wrapped_html = cleaned_html
+
+                        tmp_file.write(wrapped_html)
+                        tmp_file_path = tmp_file.name
+
+                    try:
+                        # Convert cleaned HTML
+                        logger.debug(f"Converting cleaned HTML from {file_path.name} (cleaned size: {len(wrapped_html)} chars)")
+                        result = self.markitdown.convert(tmp_file_path)
+                        markdown_text = result.text_content if hasattr(result, 'text_content') else str(result)
+
+                        # Verify we got content
+                        if not markdown_text or len(markdown_text.strip()) < 50:
+                            logger.warning(f"MarkItDown returned empty content for {file_path.name}, trying original HTML")
+                            result = self.markitdown.convert(str(file_path))
+                            markdown_text = result.text_content if hasattr(result, 'text_content') else str(result)
+                    finally:
+                        # Clean up temp file
+                        if os.path.exists(tmp_file_path):
+                            os.unlink(tmp_file_path)
+
+            except Exception as e:
+                logger.warning(f"Failed to clean HTML for {file_path.name}: {e}. Using direct conversion.")
+                logger.exception(e)
+                result = self.markitdown.convert(str(file_path))
+                markdown_text = result.text_content if hasattr(result, 'text_content') else str(result)
+        else:
+            # For non-HTML files, convert directly
+            result = self.markitdown.convert(str(file_path))
+            markdown_text = result.text_content
+
+        # Clean up markdown
+        markdown_text = self._clean_markdown(markdown_text)
+
+        return markdown_text
+
     def convert_file(self, file_path: Path, force: bool = False) -> bool:
         """
         Convert a single file to markdown.
@@ -236,71 +323,17 @@ class MarkdownConverter:
             # Create output directory
             output_path.parent.mkdir(parents=True, exist_ok=True)
 
-            # Convert to markdown
-            logger.debug(f"Converting {file_path.name}...")
-
-            # For HTML files, clean before conversion
-            if file_path.suffix.lower() in ['.html', '.htm']:
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        html_content = f.read()
-
-                    # Clean HTML to remove navigation, headers, footers, etc.
-                    cleaned_html = self._clean_html(html_content, file_path)
-
-                    # Verify cleaned HTML has content
-                    if not cleaned_html or len(cleaned_html.strip()) < 50:
-                        logger.warning(f"Cleaned HTML too short for {file_path.name}, using original HTML")
-                        result = self.markitdown.convert(str(file_path))
-                        markdown_text = result.text_content
-                    else:
-                        # Create temporary file with cleaned HTML
-                        import tempfile
-                        import os
-                        with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as tmp_file:
-                            # Wrap cleaned HTML in valid HTML structure if needed
-                            if not cleaned_html.strip().startswith('<!DOCTYPE') and not cleaned_html.strip().startswith('<html'):
-                                wrapped_html = f"""<!DOCTYPE html>
-<html>
-<head><meta charset="utf-8"></head>
-<body>
-{cleaned_html}
-</body>
-</html>"""
-                            else:
-                                wrapped_html = cleaned_html
-
-                            tmp_file.write(wrapped_html)
-                            tmp_file_path = tmp_file.name
-
-                        try:
-                            # Convert cleaned HTML
-                            logger.debug(f"Converting cleaned HTML from {file_path.name} (cleaned size: {len(wrapped_html)} chars)")
-                            result = self.markitdown.convert(tmp_file_path)
-                            markdown_text = result.text_content if hasattr(result, 'text_content') else str(result)
-
-                            # Verify we got content
-                            if not markdown_text or len(markdown_text.strip()) < 50:
-                                logger.warning(f"MarkItDown returned empty content for {file_path.name}, trying original HTML")
-                                result = self.markitdown.convert(str(file_path))
-                                markdown_text = result.text_content if hasattr(result, 'text_content') else str(result)
-                        finally:
-                            # Clean up temp file
-                            if os.path.exists(tmp_file_path):
-                                os.unlink(tmp_file_path)
-
-                except Exception as e:
-                    logger.warning(f"Failed to clean HTML for {file_path.name}: {e}. Using direct conversion.")
-                    logger.exception(e)
-                    result = self.markitdown.convert(str(file_path))
-                    markdown_text = result.text_content if hasattr(result, 'text_content') else str(result)
+            # Convert to markdown (or reuse the cached conversion of identical content)
+            if self.cache:
+                hits_before = self.cache.hits
+                markdown_text, _ = self.cache.get_or_convert(
+                    str(file_path), "convert_to_markdown", self.converter_version,
+                    lambda: (self._convert(file_path), {"file_type": file_path.suffix.lower()})
+                )
+                if self.cache.hits > hits_before:
+                    self.stats['cached'] += 1
             else:
-                # For non-HTML files, convert directly
-                result = self.markitdown.convert(str(file_path))
-                markdown_text = result.text_content
-
-            # Clean up markdown
-            markdown_text = self._clean_markdown(markdown_text)
+                markdown_text = self._convert(file_path)
 
             # Check if content is too short (likely just metadata)
             if len(markdown_text.strip()) < 100:
@@ -410,6 +443,7 @@ class MarkdownConverter:
         logger.info(f"✅ Successfully converted: {self.stats['converted']}")
         logger.info(f"📄 Markdown files copied:  {self.stats['already_md']}")
         logger.info(f"⏭️  Skipped (exists):       {self.stats['skipped']}")
+        logger.info(f"♻️  Reused from cache:      {self.stats['cached']}")
         logger.info(f"❌ Failed:                 {self.stats['failed']}")
         logger.info("=" * 70)
 
@@ -456,6 +490,11 @@ def main():
         action="store_true",
         help="Clean output directory before conversion"
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Convert every file from scratch instead of reusing the conversion cache"
+    )
 
     args = parser.parse_args()
 
@@ -479,7 +518,7 @@ def main():
             return 0
 
     # Create converter
-    converter = MarkdownConverter(source_dir, output_dir)
+    converter = MarkdownConverter(source_dir, output_dir, use_cache=not args.no_cache)
 
     # Convert
     converter.convert_directory(
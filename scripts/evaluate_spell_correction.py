@@ -0,0 +1,166 @@
+"""Compare the local spell corrector with the LLM query cleaner (QUERY_CLEAN_PROMPT).
+
+Queries come from a file (plain text, one per line, or JSONL with "query" and an
+optional "expected" correction); without a file a built-in set of misspelled IR
+queries is used. For each query the local corrector and, unless --no-llm, the
+orchestrator LLM clean it. Reports:
+  - accuracy against "expected" where given (local and LLM),
+  - agreement with the LLM: share of words the LLM fixed that the local
+    corrector fixed the same way, and words only the local corrector changed,
+  - latency per query (µs local, ms LLM).
+
+Usage:
+    python scripts/evaluate_spell_correction.py
+    python scripts/evaluate_spell_correction.py logged_queries.jsonl --no-llm
+    python scripts/evaluate_spell_correction.py queries.txt --vocabulary spell_vocabulary.json
+
+The vocabulary built at ingestion and the general word list are required, as
+in the API; the script fails instead of deriving a vocabulary from the
+expected answers, which would score the corrector against its own answers.
+"""
+import sys
+import os
+import argparse
+import json
+import re
+import time
+
+# Add project root to path
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from loguru import logger
+
+from src.spell_corrector import load_spell_corrector
+from config import settings
+
+SAMPLE_QUERIES = [
+    {"query": "emoblization recovery time", "expected": "embolization recovery time"},
+    {"query": "how do I care for the cathter at home", "expected": "how do I care for the catheter at home"},
+    {"query": "is sedaton needed for a biopsi", "expected": "is sedation needed for a biopsy"},
+    {"query": "nephrostmy tube care", "expected": "nephrostomy tube care"},
+    {"query": "what is scleratherapy", "expected": "what is sclerotherapy"},
+    {"query": "PICC line flusing", "expected": "PICC line flushing"},
+    {"query": "gastrostmy tube change", "expected": "gastrostomy tube change"},
+    {"query": "angiogarm risks for children", "expected": "angiogram risks for children"},
+    {"query": "fasting before anaesthsia", "expected": "fasting before anaesthesia"},
+    {"query": "PICC 拔除後要注意什麼？", "expected": "PICC 拔除後要注意什麼？"},
+    {"query": "What does HKCH say about fasting?", "expected": "What does HKCH say about fasting?"},
+    {"query": "ultrsound guided drainage", "expected": "ultrasound guided drainage"},
+]
+
+
+def normalize(text: str) -> str:
+    """Lowercase and strip punctuation/extra spaces for comparison."""
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", " ", text.lower())).strip()
+
+
+def load_queries(path: str):
+    """Load queries from a plain-text or JSONL file."""
+    queries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                record = json.loads(line)
+                queries.append({"query": record["query"], "expected": record.get("expected")})
+            else:
+                queries.append({"query": line, "expected": None})
+    return queries
+
+
+def llm_clean(llm, query: str) -> str:
+    """Clean a query the way the agent's QUERY_CLEAN_PROMPT step did."""
+    from langchain_core.messages import HumanMessage
+    from src.agentic_rag import QUERY_CLEAN_PROMPT
+
+    response = llm.invoke([HumanMessage(content=QUERY_CLEAN_PROMPT.format(query=query))])
+    cleaned = response.content.strip() if hasattr(response, 'content') else str(response).strip()
+    return cleaned if cleaned and len(cleaned) < 200 else query
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the local spell corrector against the LLM query cleaner")
+    parser.add_argument("queries", nargs='?', default=None, help="Query file (text or JSONL); default: built-in samples")
+    parser.add_argument("--vocabulary", type=str, default=settings.spell_vocabulary_path,
+                        help=f"Spelling vocabulary (default: {settings.spell_vocabulary_path})")
+    parser.add_argument("--wordlist", type=str, default=settings.spell_wordlist_path,
+                        help=f"General English word list (default: {settings.spell_wordlist_path})")
+    parser.add_argument("--no-llm", action="store_true", help="Skip the LLM cleaner (expected-only evaluation)")
+    parser.add_argument("--show", action="store_true", help="Print every query with both corrections")
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries) if args.queries else SAMPLE_QUERIES
+    corrector = load_spell_corrector(args.vocabulary, args.wordlist)
+    if corrector is None:
+        logger.error("❌ Spell correction is disabled without both the ingested vocabulary and a word list; "
+                     "run scripts/ingest_documents.py and pass --wordlist")
+        return 1
+    logger.info(f"Vocabulary: {len(corrector.terms)} terms; {len(queries)} queries")
+
+    llm = None
+    if not args.no_llm:
+        from src.llm import get_langchain_llm
+        llm = get_langchain_llm()
+
+    local_correct = llm_correct = with_expected = 0
+    llm_fixed_words = llm_fixed_agreed = local_only_changes = 0
+    local_seconds = llm_seconds = 0.0
+    for item in queries:
+        query, expected = item["query"], item["expected"]
+
+        start = time.perf_counter()
+        local = corrector.correct(query)
+        local_seconds += time.perf_counter() - start
+
+        cleaned = None
+        if llm is not None:
+            start = time.perf_counter()
+            try:
+                cleaned = llm_clean(llm, query)
+            except Exception as e:
+                logger.warning(f"LLM cleaning failed for '{query}': {e}")
+            llm_seconds += time.perf_counter() - start
+
+        if expected is not None:
+            with_expected += 1
+            local_correct += normalize(local) == normalize(expected)
+            if cleaned is not None:
+                llm_correct += normalize(cleaned) == normalize(expected)
+
+        if cleaned is not None:
+            original_words = set(normalize(query).split())
+            local_words = set(normalize(local).split())
+            llm_words = set(normalize(cleaned).split())
+            fixed = llm_words - original_words
+            llm_fixed_words += len(fixed)
+            llm_fixed_agreed += len(fixed & local_words)
+            local_only_changes += len((local_words - original_words) - llm_words)
+
+        if args.show:
+            logger.info(f"{query!r}\n    local: {local!r}\n    llm:   {cleaned!r}\n    expected: {expected!r}")
+
+    total = len(queries)
+    logger.info("=" * 70)
+    logger.info("SPELL CORRECTION EVALUATION")
+    logger.info("=" * 70)
+    if with_expected:
+        logger.info(f"Local accuracy vs expected: {local_correct}/{with_expected} ({local_correct / with_expected:.1%})")
+        if llm is not None:
+            logger.info(f"LLM accuracy vs expected:   {llm_correct}/{with_expected} ({llm_correct / with_expected:.1%})")
+    if llm is not None:
+        agreement = llm_fixed_agreed / llm_fixed_words if llm_fixed_words else 1.0
+        logger.info(f"LLM-fixed words also fixed locally: {llm_fixed_agreed}/{llm_fixed_words} ({agreement:.1%})")
+        logger.info(f"Words changed only by the local corrector: {local_only_changes}")
+        logger.info(f"LLM latency:   {llm_seconds / max(total, 1) * 1000:.1f} ms/query")
+    logger.info(f"Local latency: {local_seconds / max(total, 1) * 1e6:.1f} µs/query")
+    logger.info("=" * 70)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
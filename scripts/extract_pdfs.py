@@ -2,68 +2,106 @@
 Extract text from HKCH appointment PDFs using PyMuPDF -> PNG -> Tesseract OCR
 Always use image-based OCR for better Chinese character recognition
 """
+import sys
+import os
+
+# Add parent directory to path so the shared conversion cache can be imported
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
 import fitz  # PyMuPDF
 import pytesseract
 from PIL import Image
 import io
-import os
+
+from src.conversion_cache import ConversionCache, package_version
 
 # Set Tesseract executable path for Windows
 pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
 
 pdf_dir = r"d:\Development area\pedIRbot\KB\HKCH Appt sheet"
 output_dir = os.path.join(pdf_dir, "extracted")
-os.makedirs(output_dir, exist_ok=True)
 
 pdf_files = ["vir.pdf", "nvir.pdf", "usir.pdf", "li.pdf"]
 
-for pdf_file in pdf_files:
-    pdf_path = os.path.join(pdf_dir, pdf_file)
-    if not os.path.exists(pdf_path):
-        print(f"Skipping {pdf_file} - not found")
-        continue
+# OCR output depends on zoom, languages and the Tesseract build; bump OCR_VERSION_PREFIX when
+# changing zoom or languages (the Tesseract build is added by ocr_version())
+OCR_ZOOM = 3
+OCR_LANG = 'chi_tra+eng'
+OCR_VERSION_PREFIX = "1"
+
+
+def ocr_version():
+    """Cache version of the OCR output (runs the tesseract binary, so it is called from main())."""
+    return (f"{OCR_VERSION_PREFIX}+zoom{OCR_ZOOM}+{OCR_LANG}+pymupdf-{package_version('PyMuPDF')}"
+            f"+tesseract-{pytesseract.get_tesseract_version()}")
+
+
+def main():
+    os.makedirs(output_dir, exist_ok=True)
+    version = ocr_version()
+    cache = ConversionCache()
+
+    for pdf_file in pdf_files:
+        pdf_path = os.path.join(pdf_dir, pdf_file)
+        if not os.path.exists(pdf_path):
+            print(f"Skipping {pdf_file} - not found")
+            continue
+
+        print(f"\n=== Processing {pdf_file} ===")
+
+        try:
+            cached = cache.get(pdf_path, "extract_pdfs_ocr", version)
+            if cached is not None:
+                full_text = cached[0]
+                print(f"  Reusing cached OCR output ({cached[1].get('pages', '?')} pages)")
+            else:
+                doc = fitz.open(pdf_path)
+                print(f"Opened PDF with {len(doc)} pages")
+                page_count = len(doc)
 
-    print(f"\n=== Processing {pdf_file} ===")
+                full_text = ""
+                for page_num, page in enumerate(doc):
+                    print(f"  Converting page {page_num + 1} to image...")
 
-    try:
-        doc = fitz.open(pdf_path)
-        print(f"Opened PDF with {len(doc)} pages")
+                    # Always render page to high-res image for OCR
+                    mat = fitz.Matrix(OCR_ZOOM, OCR_ZOOM)  # 3x zoom for better OCR quality
+                    pix = page.get_pixmap(matrix=mat)
+                    img_data = pix.tobytes("png")
+                    img = Image.open(io.BytesIO(img_data))
 
-        full_text = ""
-        for page_num, page in enumerate(doc):
-            print(f"  Converting page {page_num + 1} to image...")
+                    # Save the image for reference
+                    img_dir = os.path.join(output_dir, "images")
+                    os.makedirs(img_dir, exist_ok=True)
+                    img_path = os.path.join(img_dir, f"{pdf_file.replace('.pdf', '')}_page_{page_num + 1}.png")
+                    img.save(img_path)
+                    print(f"    Saved image: {img_path}")
 
-            # Always render page to high-res image for OCR
-            mat = fitz.Matrix(3, 3)  # 3x zoom for better OCR quality
-            pix = page.get_pixmap(matrix=mat)
-            img_data = pix.tobytes("png")
-            img = Image.open(io.BytesIO(img_data))
+                    # OCR with Traditional Chinese + English
+                    print(f"  Running OCR on page {page_num + 1}...")
+                    text = pytesseract.image_to_string(img, lang=OCR_LANG)
+                    full_text += f"\n--- Page {page_num + 1} ---\n{text}\n"
 
-            # Save the image for reference
-            img_dir = os.path.join(output_dir, "images")
-            os.makedirs(img_dir, exist_ok=True)
-            img_path = os.path.join(img_dir, f"{pdf_file.replace('.pdf', '')}_page_{page_num + 1}.png")
-            img.save(img_path)
-            print(f"    Saved image: {img_path}")
+                doc.close()
+                cache.put(pdf_path, "extract_pdfs_ocr", version, full_text, {"pages": page_count})
 
-            # OCR with Traditional Chinese + English
-            print(f"  Running OCR on page {page_num + 1}...")
-            text = pytesseract.image_to_string(img, lang='chi_tra+eng')
-            full_text += f"\n--- Page {page_num + 1} ---\n{text}\n"
+            # Save to markdown
+            output_file = os.path.join(output_dir, pdf_file.replace(".pdf", ".md"))
+            with open(output_file, 'w', encoding='utf-8') as f:
+                f.write(f"# {pdf_file.replace('.pdf', '').upper()} Appointment Sheet\n\n")
+                f.write(full_text)
 
-        doc.close()
+            print(f"Saved to {output_file}")
 
-        # Save to markdown
-        output_file = os.path.join(output_dir, pdf_file.replace(".pdf", ".md"))
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(f"# {pdf_file.replace('.pdf', '').upper()} Appointment Sheet\n\n")
-            f.write(full_text)
+        except Exception as e:
+            print(f"Error processing {pdf_file}: {e}")
+            import traceback
+            traceback.print_exc()
 
-        print(f"Saved to {output_file}")
+    print("\nDone!")
 
-    except Exception as e:
-        print(f"Error processing {pdf_file}: {e}")
-        import traceback
-        traceback.print_exc()
 
-print("\nDone!")
+if __name__ == "__main__":
+    main()
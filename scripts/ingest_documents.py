@@ -13,11 +13,13 @@ if project_root not in sys.path:
 
 """Script to ingest documents from KB folder into vector database."""
 from pathlib import Path
+from typing import Optional
 
 from src.vector_store import VectorStore
 from src.embeddings import get_embedding_model
 from src.document_processor import DocumentProcessor
 from src.document_db import DocumentDatabase
+from src.keyword_matcher import KeywordMatcher
 from config import settings
 from loguru import logger
 
@@ -36,6 +38,32 @@ def _run_review_export(db_path, output_path):
 # isort: on
 
 
+PICC_MATCHER = KeywordMatcher([
+    'picc', 'peripherally inserted central catheter',
+    'peripherally inserted central', 'central venous catheter',
+    'picc line', 'picc insertion', 'picc removal'
+])
+
+
+def _build_spell_vocabulary(document_db: DocumentDatabase):
+    """Rebuild the query spell-correction vocabulary from the stored documents."""
+    from src.spell_corrector import SpellCorrector
+
+    documents = document_db.get_all_documents()
+    corrector = SpellCorrector.from_texts(doc.get('content', '') for doc in documents)
+    corrector.save(settings.spell_vocabulary_path)
+
+
+def _build_query_expansion(document_db: DocumentDatabase):
+    """Rebuild the query expansion co-occurrence graph from stored documents and curated Q&A."""
+    from src.query_expansion import QueryExpander, load_qna_texts
+
+    texts = [doc.get('content', '') for doc in document_db.get_all_documents()]
+    if Path(settings.qna_xml_dir).exists():
+        texts.extend(load_qna_texts(settings.qna_xml_dir))
+    QueryExpander.build(texts).save(settings.query_expansion_path)
+
+
 def _is_picc_related(file_path: Path, content: str = "") -> bool:
     """
     Check if a document is PICC-related based on filename or content.
@@ -47,34 +75,79 @@ def _is_picc_related(file_path: Path, content: str = "") -> bool:
     Returns:
         True if document appears to be PICC-related
     """
-    picc_keywords = [
-        'picc', 'PICC', 'peripherally inserted central catheter',
-        'peripherally inserted central', 'central venous catheter',
-        'picc line', 'picc insertion', 'picc removal'
-    ]
-
-    # Check filename
-    filename_lower = file_path.name.lower()
-    if any(keyword.lower() in filename_lower for keyword in picc_keywords):
-        return True
-
-    # Check file path
-    path_str = str(file_path).lower()
-    if any(keyword.lower() in path_str for keyword in picc_keywords):
+    # Check filename and file path
+    if PICC_MATCHER.contains_any(str(file_path)):
         return True
 
     # Check content if provided
     if content:
-        content_lower = content.lower()
-        # Check if multiple PICC keywords appear (more reliable)
-        matches = sum(1 for keyword in picc_keywords if keyword.lower() in content_lower)
-        if matches >= 2:  # At least 2 keyword matches
+        # Check if multiple PICC keywords appear (more reliable).
+        # 'picc' was listed twice ('picc'/'PICC'), so it alone counts as 2 matches
+        score = PICC_MATCHER.category_scores(content, keyword_weights={'picc': 2})['default']
+        if score >= 2:  # At least 2 keyword matches
             return True
 
     return False
 
 
-def main(kb_folder: str, reset: bool = False, markdown_only: bool = True, picc_only: bool = False, whole_document: bool = False, sqlite_only: bool = False, semantic_chunking: bool = False, extract_metadata: bool = False):
+def _run_streaming_ingestion(kb_folder: str, processor: DocumentProcessor, vector_store: VectorStore,
+                             document_db: DocumentDatabase, file_patterns: list, metadata_extractor=None,
+                             picc_only: bool = False, sqlite_only: bool = False, workers: Optional[int] = None):
+    """Ingest with the streaming pipeline so chunks become searchable while later files convert."""
+    from src.ingestion_pipeline import StreamingIngestionPipeline
+
+    logger.info("\n🚰 Streaming ingestion: documents are stored and embedded as they are converted")
+    pipeline = StreamingIngestionPipeline(
+        processor,
+        vector_store=None if sqlite_only else vector_store,
+        document_db=document_db,
+        workers=workers,
+        metadata_enricher=metadata_extractor.extract if metadata_extractor else None,
+        chunk_filter=(lambda chunk: _is_picc_related(Path(chunk.metadata.get('source', '')), chunk.content))
+        if picc_only else None,
+    )
+    try:
+        stats = pipeline.run(kb_folder, file_patterns)
+    finally:
+        if metadata_extractor:
+            metadata_extractor.close()
+
+    # Auto-export review spreadsheet
+    review_output = os.path.join(project_root, 'review_metadata.xlsx')
+    try:
+        _run_review_export(document_db.db_path, review_output)
+    except Exception as e:
+        logger.warning(f"⚠️  Could not auto-export review spreadsheet: {e}")
+
+    try:
+        _build_spell_vocabulary(document_db)
+    except Exception as e:
+        logger.warning(f"⚠️  Could not build spelling vocabulary: {e}")
+    try:
+        _build_query_expansion(document_db)
+    except Exception as e:
+        logger.warning(f"⚠️  Could not build query expansion graph: {e}")
+
+    sqlite_stats = document_db.get_stats()
+    logger.info("\n" + "=" * 70)
+    logger.info("✅ INGESTION COMPLETE (streaming)")
+    logger.info("=" * 70)
+    logger.info(f"  Files found: {stats['files']}")
+    logger.info(f"  Documents stored: {stats['documents']}")
+    logger.info(f"  Chunks created: {stats['chunks']}")
+    logger.info(f"  Vectors upserted: {stats['vectors']}")
+    logger.info(f"  First vectors searchable after: {stats['first_vectors_after']}s")
+    logger.info(f"  Total time: {stats['seconds']}s")
+    for file_path, error in stats['failed_files']:
+        logger.warning(f"  ❌ {file_path}: {error}")
+    if not sqlite_only:
+        vector_stats = vector_store.get_stats()
+        logger.info(f"  Vector collection: {vector_stats['collection_name']} ({vector_stats['total_documents']} chunks)")
+    logger.info(f"  SQLite documents: {sqlite_stats['total_documents']} ({document_db.db_path})")
+    logger.info("=" * 70)
+
+
+def main(kb_folder: str, reset: bool = False, markdown_only: bool = True, picc_only: bool = False, whole_document: bool = False, sqlite_only: bool = False, semantic_chunking: bool = False, extract_metadata: bool = False, workers: Optional[int] = None, streaming: bool = False):
     """
     Ingest documents from KB folder into vector database.
 
@@ -87,6 +160,8 @@ def main(kb_folder: str, reset: bool = False, markdown_only: bool = True, picc_o
         sqlite_only: Only store in SQLite, skip vector store chunking (default: False)
         semantic_chunking: Use heading-based semantic chunking instead of sliding window
         extract_metadata: Use LLM (OpenRouter) to extract structured metadata
+        workers: Worker processes for document conversion (default: settings.ingest_workers)
+        streaming: Stream files through load → chunk → embed → upsert with bounded queues
     """
     from pathlib import Path
 
@@ -182,20 +257,25 @@ def main(kb_folder: str, reset: bool = False, markdown_only: bool = True, picc_o
     else:
         file_patterns = ['*.md', '*.markdown', '*.html', '*.htm', '*.pdf', '*.txt']
 
-    # Collect full documents before chunking
-    logger.info("\n📚 Collecting full documents for SQLite storage...")
+    if streaming:
+        _run_streaming_ingestion(
+            kb_folder, processor, vector_store, document_db, file_patterns,
+            metadata_extractor=metadata_extractor,
+            picc_only=picc_only,
+            sqlite_only=sqlite_only,
+            workers=workers,
+        )
+        return
+
+    # Convert every document once (in the worker pool with --workers); the same text
+    # feeds the SQLite documents, the SQLite chunks and the vector store
+    logger.info("\n📚 Converting documents...")
     kb_path = Path(kb_folder)
     full_documents = {}
+    loaded_documents = processor.load_directory(kb_folder, file_patterns=file_patterns, workers=workers)
 
-    # Collect full documents from all matching file patterns
-    files_to_process = []
-    for pattern in file_patterns:
-        files_to_process.extend(kb_path.rglob(pattern))
-    files_to_process = list(set(f for f in files_to_process if f.is_file()))
-
-    for file_path in files_to_process:
+    for file_path, text, metadata in loaded_documents:
         try:
-            text, metadata = processor.load_document(str(file_path))
             if not text or len(text.strip()) < 10:
                 logger.warning(f"Skipping empty/tiny document: {file_path.name}")
                 continue
@@ -236,6 +316,7 @@ def main(kb_folder: str, reset: bool = False, markdown_only: bool = True, picc_o
 
     # Store full documents in SQLite
     logger.info(f"💾 Storing {len(full_documents)} full documents in SQLite...")
+    all_chunks = []
     for doc_id, doc_data in full_documents.items():
         document_db.store_document(
             document_id=doc_id,
@@ -246,6 +327,7 @@ def main(kb_folder: str, reset: bool = False, markdown_only: bool = True, picc_o
 
         # Chunk and store in chunks table
         chunks = processor.chunk_text(doc_data['text'], doc_data['metadata'])
+        all_chunks.extend(chunks)
         for chunk in chunks:
             document_db.store_chunk(
                 chunk_id=chunk.chunk_id,
@@ -258,6 +340,8 @@ def main(kb_folder: str, reset: bool = False, markdown_only: bool = True, picc_o
             )
 
     logger.info(f"✅ Stored {len(full_documents)} documents in SQLite database")
+    for file_path, error in processor.failed_files:
+        logger.warning(f"  ❌ {file_path}: {error}")
 
     # Close metadata extractor if used
     if metadata_extractor:
@@ -270,6 +354,15 @@ def main(kb_folder: str, reset: bool = False, markdown_only: bool = True, picc_o
     except Exception as e:
         logger.warning(f"⚠️  Could not auto-export review spreadsheet: {e}")
 
+    try:
+        _build_spell_vocabulary(document_db)
+    except Exception as e:
+        logger.warning(f"⚠️  Could not build spelling vocabulary: {e}")
+    try:
+        _build_query_expansion(document_db)
+    except Exception as e:
+        logger.warning(f"⚠️  Could not build query expansion graph: {e}")
+
     # If sqlite_only mode, skip chunking and vector store entirely
     if sqlite_only:
         logger.info("\n⏭️  Skipping vector store (SQLite-only mode)")
@@ -293,10 +386,7 @@ def main(kb_folder: str, reset: bool = False, markdown_only: bool = True, picc_o
         logger.info("=" * 70)
         return
 
-    # Process documents for chunking (normal mode: SQLite + Vector Store)
-    logger.info("\n🔄 Processing documents for vector store...")
-    all_chunks = processor.process_directory(kb_folder)
-
+    # Normal mode: the chunks stored in SQLite also go to the vector store
     # Filter for PICC-only if requested
     if picc_only:
         logger.info("\n🔍 Filtering for PICC-related documents...")
@@ -412,6 +502,17 @@ if __name__ == "__main__":
         action="store_true",
         help="Use LLM (OpenRouter gemini-2.5-flash-lite) to extract structured metadata"
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Worker processes for document conversion (default: INGEST_WORKERS, -1 = all CPU cores)"
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Stream files through load → chunk → embed → upsert with bounded memory"
+    )
 
     args = parser.parse_args()
 
@@ -424,4 +525,6 @@ if __name__ == "__main__":
         sqlite_only=args.sqlite_only,
         semantic_chunking=args.semantic_chunking,
         extract_metadata=args.extract_metadata,
+        workers=args.workers,
+        streaming=args.streaming,
     )
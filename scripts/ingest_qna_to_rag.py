@@ -19,7 +19,8 @@ if project_root not in sys.path:
 from loguru import logger
 from src.vector_store import VectorStore
 from src.embeddings import get_embedding_model
-from src.document_processor import DocumentChunk
+from src.data_models import DocumentChunk
+from src.curated_qna import parse_qna_markdown, find_qa_files
 from config import settings
 
 
@@ -40,69 +41,8 @@ class QnAMarkdownProcessor:
         Returns:
             List of Q&A pair dictionaries
         """
-        qna_pairs = []
-        
         try:
-            with open(md_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Extract metadata from header
-            category = ""
-            source = ""
-            
-            # Look for Category line
-            category_match = re.search(r'\*\*Category.*?:\*\*\s*(.+)', content)
-            if category_match:
-                category = category_match.group(1).strip()
-            
-            source_match = re.search(r'\*\*Source.*?:\*\*\s*(.+)', content)
-            if source_match:
-                source = source_match.group(1).strip()
-            
-            # Split by Q&A sections (## Q1:, ## Q2:, etc.)
-            # Pattern matches ## Q followed by number and colon
-            qna_pattern = r'##\s+Q(\d+):\s*(.+?)(?=##\s+Q\d+:|---\s*$|\*Medical Disclaimer|\Z)'
-            
-            matches = re.findall(qna_pattern, content, re.DOTALL)
-            
-            for qna_num, qna_content in matches:
-                # Extract the question (first line after Q#:)
-                lines = qna_content.strip().split('\n')
-                question_eng = lines[0].strip() if lines else ""
-                
-                # Look for Chinese question (## 問題X:)
-                chinese_q_match = re.search(r'##\s+問題\d+[：:]\s*(.+)', qna_content)
-                question_chi = chinese_q_match.group(1).strip() if chinese_q_match else ""
-                
-                # Extract answer - everything after "**Answer 答案:**"
-                answer_match = re.search(r'\*\*Answer\s*答案\s*[：:]?\*\*\s*(.+)', qna_content, re.DOTALL)
-                if answer_match:
-                    answer = answer_match.group(1).strip()
-                    # Clean up the answer - remove trailing ---
-                    answer = re.sub(r'\n---\s*$', '', answer).strip()
-                else:
-                    # Fallback: take everything after the Chinese question
-                    if chinese_q_match:
-                        answer_start = chinese_q_match.end()
-                        answer = qna_content[answer_start:].strip()
-                    else:
-                        answer = '\n'.join(lines[1:]).strip()
-                
-                # Combine questions for better retrieval
-                combined_question = question_eng
-                if question_chi:
-                    combined_question = f"{question_eng}\n{question_chi}"
-                
-                qna_pairs.append({
-                    'qna_id': f"q{qna_num}",
-                    'question': combined_question,
-                    'question_eng': question_eng,
-                    'question_chi': question_chi,
-                    'answer': answer,
-                    'category': category,
-                    'source': source
-                })
-            
+            qna_pairs = parse_qna_markdown(md_file)
             logger.info(f"Loaded {len(qna_pairs)} Q&A pairs from {Path(md_file).name}")
             return qna_pairs
 
@@ -229,20 +169,11 @@ class QnAMarkdownProcessor:
         Returns:
             List of Path objects to Q&A files
         """
-        kb_path = Path(kb_dir)
-        qa_files = []
-
-        if not kb_path.exists():
+        if not Path(kb_dir).exists():
             logger.error(f"KB directory not found: {kb_dir}")
-            return qa_files
-
-        # Find files matching *_qa.md in folders starting with digits (00_, 01_, etc.)
-        for folder in sorted(kb_path.iterdir()):
-            if folder.is_dir() and re.match(r'^\d{2}_', folder.name):
-                # Recursively find *_qa.md files
-                for qa_file in folder.rglob('*_qa.md'):
-                    qa_files.append(qa_file)
-                    
+            return []
+
+        qa_files = find_qa_files(kb_dir)
         logger.info(f"Found {len(qa_files)} Q&A files in numbered folders")
         return qa_files
 
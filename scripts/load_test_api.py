@@ -0,0 +1,172 @@
+"""Load test for the FastAPI server: throughput and latency under concurrent conversations.
+
+Sends the evaluation questions to /query (or /query/stream with --stream) at
+increasing concurrency levels from one process, and reports per level:
+throughput, p50/p95 latency (and time to first token when streaming), errors,
+admission-control rejections (429/503), and the throughput speedup over concurrency 1. With the async request path a
+single uvicorn worker should scale until the upstream LLM saturates; a server
+that blocks its event loop stays at ~1x.
+
+Start the server first (one worker), ideally with ANSWER_CACHE_ENABLED=false
+and CURATED_QNA_ENABLED=false so every request runs the graph.
+
+Usage:
+    python scripts/load_test_api.py
+    python scripts/load_test_api.py --concurrency 1,8,32 --requests 64 --stream
+    python scripts/load_test_api.py --min-speedup 3   # exit 1 if the top level scales less
+"""
+import sys
+import os
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+# Add project root to path
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from loguru import logger
+
+
+def percentile(values, fraction: float) -> float:
+    """Nearest-rank percentile (0.0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+async def send_query(client: httpx.AsyncClient, url: str, question: str):
+    """POST /query; returns (latency, None)."""
+    start = time.perf_counter()
+    response = await client.post(f"{url}/query", json={"query": question})
+    response.raise_for_status()
+    response.json()
+    return time.perf_counter() - start, None
+
+
+async def send_stream(client: httpx.AsyncClient, url: str, question: str):
+    """POST /query/stream and read all events; returns (latency, time to first token/answer)."""
+    start = time.perf_counter()
+    first = None
+    async with client.stream("POST", f"{url}/query/stream", json={"query": question}) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[len("data: "):])
+            if first is None and event.get('type') in ('token', 'answer', 'emergency'):
+                first = time.perf_counter() - start
+            if event.get('type') == 'error':
+                raise RuntimeError(event.get('content'))
+    return time.perf_counter() - start, first
+
+
+async def run_level(url: str, questions, concurrency: int, total: int, stream: bool, timeout: float):
+    """Send ``total`` requests with at most ``concurrency`` in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, first_tokens, errors, rejected = [], [], [], []
+    send = send_stream if stream else send_query
+
+    async with httpx.AsyncClient(timeout=timeout, limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def one(i: int):
+            async with semaphore:
+                try:
+                    latency, first = await send(client, url, questions[i % len(questions)])
+                    latencies.append(latency)
+                    if first is not None:
+                        first_tokens.append(first)
+                except httpx.HTTPStatusError as e:
+                    if e.response.status_code in (429, 503):
+                        # Admission control: server saturated, Retry-After set
+                        rejected.append(e.response.headers.get('Retry-After'))
+                    else:
+                        errors.append(str(e))
+                except Exception as e:
+                    errors.append(str(e))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        wall = time.perf_counter() - start
+
+    return {
+        'concurrency': concurrency,
+        'requests': total,
+        'errors': len(errors),
+        'rejected': len(rejected),
+        'wall_time': wall,
+        'throughput': len(latencies) / wall if wall else 0.0,
+        'p50': percentile(latencies, 0.5),
+        'p95': percentile(latencies, 0.95),
+        'ttft_p50': percentile(first_tokens, 0.5) if first_tokens else None,
+        'sample_error': errors[0] if errors else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the RAG API with concurrent requests")
+    parser.add_argument("--url", type=str, default="http://localhost:8000", help="API base URL")
+    parser.add_argument("--questions", type=str, default="test_data/sample_questions.json",
+                        help="JSON list of {question}")
+    parser.add_argument("--concurrency", type=str, default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=0,
+                        help="Requests per level (default: 2x the level, at least the number of questions)")
+    parser.add_argument("--stream", action="store_true", help="Use /query/stream and report time to first token")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-request timeout in seconds")
+    parser.add_argument("--min-speedup", type=float, default=0.0,
+                        help="Exit 1 if the highest level's throughput is below this multiple of the first level's")
+    parser.add_argument("--output", type=str, default="", help="Optional JSON report path")
+    args = parser.parse_args()
+
+    with open(args.questions, 'r', encoding='utf-8') as f:
+        questions = [item['question'] for item in json.load(f)]
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+
+    try:
+        health = httpx.get(f"{args.url}/health", timeout=10.0)
+        health.raise_for_status()
+    except Exception as e:
+        logger.error(f"API not reachable at {args.url}: {e}")
+        return 1
+
+    results = []
+    for level in levels:
+        total = args.requests or max(2 * level, len(questions))
+        logger.info(f"Running {total} requests at concurrency {level}...")
+        result = asyncio.run(run_level(args.url, questions, level, total, args.stream, args.timeout))
+        results.append(result)
+        if result['sample_error']:
+            logger.warning(f"{result['errors']} errors, e.g. {result['sample_error']}")
+
+    baseline = results[0]['throughput'] or 1e-9
+    logger.info("=" * 70)
+    logger.info(f"API LOAD TEST ({'/query/stream' if args.stream else '/query'})")
+    logger.info("=" * 70)
+    logger.info(f"{'conc':>5} {'reqs':>5} {'errors':>6} {'429/503':>7} {'req/s':>7} {'p50 s':>7} {'p95 s':>7} "
+                f"{'ttft s':>7} {'speedup':>8}")
+    for r in results:
+        ttft = f"{r['ttft_p50']:.2f}" if r['ttft_p50'] is not None else "-"
+        r['speedup'] = r['throughput'] / baseline
+        logger.info(f"{r['concurrency']:>5} {r['requests']:>5} {r['errors']:>6} {r['rejected']:>7} {r['throughput']:>7.2f} "
+                    f"{r['p50']:>7.2f} {r['p95']:>7.2f} {ttft:>7} {r['speedup']:>7.1f}x")
+    logger.info("=" * 70)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'url': args.url, 'stream': args.stream, 'levels': results}, f, indent=2)
+        logger.info(f"Report saved to {args.output}")
+
+    if args.min_speedup and results[-1]['speedup'] < args.min_speedup:
+        logger.error(f"Throughput speedup {results[-1]['speedup']:.1f}x at concurrency "
+                     f"{results[-1]['concurrency']} is below --min-speedup {args.min_speedup}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,10 +8,12 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 # isort: off  - Don't reorder imports below this line
 import uvicorn
 from loguru import logger
+from config import settings
 # isort: on
 
 
-def main(host: str = "0.0.0.0", port: int = 8000, reload: bool = False):
+def main(host: str = "0.0.0.0", port: int = 8000, reload: bool = False, workers: int = 1,
+         preload: bool = True):
     """
     Start the FastAPI server.
 
@@ -19,10 +21,18 @@ def main(host: str = "0.0.0.0", port: int = 8000, reload: bool = False):
         host: Host to bind to
         port: Port to bind to
         reload: Enable auto-reload on code changes
+        workers: Worker processes; above 1 the read-only components are
+            preloaded once and shared by the forked workers
+        preload: Preload components before forking workers
     """
     logger.info(f"Starting PedIR RAG API server on {host}:{port}")
     logger.info(f"Auto-reload: {reload}")
 
+    if workers > 1 and not reload:
+        from src.serving import serve
+        serve(host=host, port=port, workers=workers, preload_components=preload)
+        return
+
     uvicorn.run(
         "src.api:app",
         host=host,
@@ -42,7 +52,11 @@ if __name__ == "__main__":
                         help="Port to bind to")
     parser.add_argument("--reload", action="store_true",
                         help="Enable auto-reload")
+    parser.add_argument("--workers", type=int, default=settings.api_workers,
+                        help="Worker processes (shared preloaded components)")
+    parser.add_argument("--no-preload", action="store_true",
+                        help="Let each worker load its own components")
 
     args = parser.parse_args()
 
-    main(args.host, args.port, args.reload)
+    main(args.host, args.port, args.reload, args.workers, not args.no_preload)
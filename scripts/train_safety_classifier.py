@@ -0,0 +1,157 @@
+"""Train the local answer-safety classifier from logged verdicts and report tier metrics.
+
+Reads JSONL verdicts ({"text": ..., "label": "safe"|"unsafe"}), e.g. the LLM
+verdicts appended to SAFETY_VERDICT_LOG_PATH by TieredSafetyChecker, fits a
+TF-IDF + logistic regression model, and exports it as JSON for
+src/safety_classifier.LocalSafetyClassifier (no scikit-learn needed at runtime).
+
+On a held-out split it reports, for the configured thresholds, how many answers
+each tier decides, the LLM escalation rate, accuracy of local decisions,
+unsafe recall, and local latency.
+
+Usage:
+    python scripts/train_safety_classifier.py logs/safety_verdicts.jsonl
+    python scripts/train_safety_classifier.py data.jsonl --output models/safety_classifier.json --safe-threshold 0.1
+    python scripts/train_safety_classifier.py data.jsonl --eval-only
+"""
+import sys
+import os
+import argparse
+import json
+import time
+from pathlib import Path
+
+# Add project root to path
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from loguru import logger
+
+from src.safety_classifier import TieredSafetyChecker, tokenize
+from config import settings
+
+
+def load_verdicts(path: str):
+    """Load (text, is_unsafe) pairs, keeping only LLM/human labels when a tier is recorded."""
+    texts, labels = [], []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            # Locally-decided verdicts would just teach the model its own output
+            if record.get('tier') in ('rules', 'model'):
+                continue
+            texts.append(record['text'])
+            labels.append(1 if record['label'] == 'unsafe' else 0)
+    return texts, labels
+
+
+def train(texts, labels, output_path: str):
+    """Fit TF-IDF + logistic regression and export the model JSON."""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+
+    vectorizer = TfidfVectorizer(analyzer=tokenize, min_df=2)
+    features = vectorizer.fit_transform(texts)
+    model = LogisticRegression(class_weight='balanced', max_iter=1000)
+    model.fit(features, labels)
+
+    export = {
+        'version': time.strftime('%Y%m%d-%H%M%S'),
+        'vocabulary': {term: int(index) for term, index in vectorizer.vocabulary_.items()},
+        'idf': [float(v) for v in vectorizer.idf_],
+        'coef': [float(v) for v in model.coef_[0]],
+        'intercept': float(model.intercept_[0]),
+        'training_examples': len(texts),
+    }
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(export, f, ensure_ascii=False)
+    logger.info(f"💾 Saved model ({len(export['vocabulary'])} features) to {output_path}")
+
+
+def evaluate(texts, labels, model_path: str, safe_threshold: float, unsafe_threshold: float):
+    """Report per-tier coverage, escalation rate and accuracy of local decisions."""
+    checker = TieredSafetyChecker(
+        model_path=model_path,
+        mode="tiered",
+        safe_threshold=safe_threshold,
+        unsafe_threshold=unsafe_threshold,
+        verdict_log_path="",
+    )
+
+    decided = {'rules': 0, 'model': 0}
+    correct = {'rules': 0, 'model': 0}
+    escalated = 0
+    unsafe_total = sum(labels)
+    unsafe_caught_locally = 0
+    unsafe_passed_locally = 0
+    start = time.perf_counter()
+    for text, is_unsafe in zip(texts, labels):
+        is_safe, tier, _ = checker.classify_locally(text)
+        if is_safe is None:
+            escalated += 1
+            continue
+        decided[tier] += 1
+        if is_safe != bool(is_unsafe):
+            correct[tier] += 1
+        if is_unsafe:
+            if is_safe:
+                unsafe_passed_locally += 1
+            else:
+                unsafe_caught_locally += 1
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    total = len(texts)
+    logger.info("=" * 70)
+    logger.info(f"TIERED SAFETY EVALUATION (safe ≤ {safe_threshold}, unsafe ≥ {unsafe_threshold})")
+    logger.info("=" * 70)
+    logger.info(f"Examples:               {total} ({unsafe_total} unsafe)")
+    for tier in ('rules', 'model'):
+        accuracy = correct[tier] / decided[tier] if decided[tier] else 0.0
+        logger.info(f"Decided by {tier:5}:       {decided[tier]} ({decided[tier] / max(total, 1):.1%}), accuracy {accuracy:.1%}")
+    logger.info(f"Escalated to LLM:       {escalated} ({escalated / max(total, 1):.1%})")
+    logger.info(f"Unsafe blocked locally: {unsafe_caught_locally}/{unsafe_total}")
+    logger.info(f"Unsafe passed locally:  {unsafe_passed_locally}/{unsafe_total}  ← must stay near 0")
+    logger.info(f"Local latency:          {elapsed_ms / max(total, 1):.3f} ms/answer")
+    logger.info("=" * 70)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train and evaluate the local answer-safety classifier")
+    parser.add_argument("verdicts", type=str, help="JSONL file of verdicts ({'text', 'label'})")
+    parser.add_argument("--output", type=str, default=settings.safety_classifier_path,
+                        help=f"Model output path (default: {settings.safety_classifier_path})")
+    parser.add_argument("--test-fraction", type=float, default=0.2, help="Held-out fraction for evaluation")
+    parser.add_argument("--safe-threshold", type=float, default=settings.safety_local_safe_threshold)
+    parser.add_argument("--unsafe-threshold", type=float, default=settings.safety_local_unsafe_threshold)
+    parser.add_argument("--eval-only", action="store_true", help="Evaluate the existing model on all verdicts")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    texts, labels = load_verdicts(args.verdicts)
+    logger.info(f"Loaded {len(texts)} verdicts ({sum(labels)} unsafe) from {args.verdicts}")
+    if not texts:
+        logger.error("No usable verdicts found")
+        return 1
+
+    if args.eval_only:
+        evaluate(texts, labels, args.output, args.safe_threshold, args.unsafe_threshold)
+        return 0
+
+    from sklearn.model_selection import train_test_split
+    stratify = labels if 0 < sum(labels) < len(labels) and min(sum(labels), len(labels) - sum(labels)) >= 2 else None
+    train_texts, test_texts, train_labels, test_labels = train_test_split(
+        texts, labels, test_size=args.test_fraction, random_state=args.seed, stratify=stratify
+    )
+    train(train_texts, train_labels, args.output)
+    evaluate(test_texts, test_labels, args.output, args.safe_threshold, args.unsafe_threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
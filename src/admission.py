@@ -0,0 +1,322 @@
+"""Admission control for the API server: request and per-stage concurrency limits with backpressure."""
+import asyncio
+import functools
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from loguru import logger
+
+from config import settings
+
+
+class AdmissionRejected(Exception):
+    """Request refused by admission control (429: queue full, 503: queue-time SLO exceeded)."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Global concurrency limit for queries, with a bounded FIFO wait queue.
+
+    At most ``max_concurrent`` queries run at once; up to ``max_queue`` more
+    wait for a slot. A query arriving to a full queue is rejected at once
+    (429), one that waits longer than ``queue_timeout`` is rejected with 503;
+    both carry a Retry-After estimated from recent service times. Emergency
+    queries are admitted immediately, bypassing the limit and the queue (their
+    answer comes from the safety pre-screen, not the LLM).
+
+    Runs on the event loop: acquire/release must be called from the loop thread.
+    """
+
+    def __init__(self, max_concurrent: int = None, max_queue: int = None, queue_timeout: float = None):
+        """
+        Initialize the controller.
+
+        Args:
+            max_concurrent: Queries running at once (default from settings)
+            max_queue: Queries waiting for a slot (default from settings)
+            queue_timeout: Queue-time SLO in seconds (default from settings)
+        """
+        self.max_concurrent = max_concurrent or settings.admission_max_concurrent
+        self.max_queue = max_queue if max_queue is not None else settings.admission_max_queue
+        self.queue_timeout = queue_timeout or settings.admission_queue_timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._service_time = 5.0  # Moving average of query durations, for Retry-After
+        self.stats = {
+            'admitted': 0, 'queued': 0, 'emergency_admitted': 0,
+            'rejected_queue_full': 0, 'rejected_timeout': 0,
+            'queue_time_total': 0.0, 'queue_time_max': 0.0, 'max_queue_depth': 0,
+        }
+        logger.info(f"Admission control: {self.max_concurrent} concurrent, queue {self.max_queue}, "
+                    f"queue-time SLO {self.queue_timeout}s")
+
+    @property
+    def queue_depth(self) -> int:
+        """Queries currently waiting for a slot."""
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free for a new request (1-60)."""
+        waves = (self.queue_depth + 1) / self.max_concurrent
+        return max(1, min(60, math.ceil(waves * self._service_time)))
+
+    async def acquire(self, emergency: bool = False) -> float:
+        """
+        Wait for a query slot.
+
+        Args:
+            emergency: Admit immediately (emergency-keyword queries)
+
+        Returns:
+            Seconds spent in the queue
+
+        Raises:
+            AdmissionRejected: Queue full (429) or queue-time SLO exceeded (503)
+        """
+        if emergency:
+            self.active += 1
+            self.stats['emergency_admitted'] += 1
+            return 0.0
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            self.stats['admitted'] += 1
+            return 0.0
+        if len(self._waiters) >= self.max_queue:
+            self.stats['rejected_queue_full'] += 1
+            logger.warning(f"🚦 Admission rejected: queue full ({len(self._waiters)} waiting, {self.active} active)")
+            raise AdmissionRejected(429, "Server busy, too many queued requests", self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self.stats['queued'] += 1
+        self.stats['max_queue_depth'] = max(self.stats['max_queue_depth'], len(self._waiters))
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not (future.done() and not future.cancelled()):
+                self._remove_waiter(future)
+                self.stats['rejected_timeout'] += 1
+                logger.warning(f"🚦 Admission rejected: waited {self.queue_timeout}s without a free slot")
+                raise AdmissionRejected(503, "Server overloaded, queue-time limit exceeded", self.retry_after())
+            # The slot was handed over just as the wait timed out: keep it
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                self._remove_waiter(future)
+            raise
+        waited = time.monotonic() - start
+        self.stats['admitted'] += 1
+        self.stats['queue_time_total'] += waited
+        self.stats['queue_time_max'] = max(self.stats['queue_time_max'], waited)
+        return waited
+
+    def _remove_waiter(self, future: asyncio.Future):
+        try:
+            self._waiters.remove(future)
+        except ValueError:
+            pass
+
+    def release(self, service_time: Optional[float] = None):
+        """
+        Free a query slot, handing it to the longest-waiting query if any.
+
+        Args:
+            service_time: Duration of the finished query (updates the Retry-After estimate)
+        """
+        if service_time is not None:
+            self._service_time = 0.8 * self._service_time + 0.2 * service_time
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(True)  # Slot passes to the waiter; active count unchanged
+                return
+        self.active = max(0, self.active - 1)
+
+    @asynccontextmanager
+    async def admit(self, emergency: bool = False):
+        """Hold a query slot for the duration of the block (see acquire())."""
+        await self.acquire(emergency)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current state and counters, for the metrics endpoint."""
+        admitted = self.stats['admitted']
+        return {
+            'active': self.active,
+            'queue_depth': self.queue_depth,
+            'max_concurrent': self.max_concurrent,
+            'max_queue': self.max_queue,
+            'queue_timeout': self.queue_timeout,
+            'retry_after_estimate': self.retry_after(),
+            'avg_service_time': round(self._service_time, 3),
+            'avg_queue_time': round(self.stats['queue_time_total'] / admitted, 3) if admitted else 0.0,
+            **{k: (round(v, 3) if isinstance(v, float) else v) for k, v in self.stats.items()
+               if k != 'queue_time_total'},
+        }
+
+
+class StageLimiter:
+    """
+    Concurrency limit for one expensive stage (LLM, reranker, embeddings).
+
+    Thread-based, since stage work runs in worker threads (sync nodes, tools,
+    callback handlers of async LLM calls). A limit of 0 only counts.
+    """
+
+    def __init__(self, name: str, limit: int):
+        """
+        Initialize the limiter.
+
+        Args:
+            name: Stage name
+            limit: Maximum concurrent calls (0 = unlimited)
+        """
+        self.name = name
+        self.limit = limit
+        self.active = 0
+        self.waiting = 0
+        self._condition = threading.Condition()
+        self.stats = {'calls': 0, 'waited': 0, 'wait_seconds': 0.0, 'max_active': 0}
+
+    def acquire(self):
+        """Block until the stage has a free slot."""
+        start = time.perf_counter()
+        with self._condition:
+            if self.limit > 0 and self.active >= self.limit:
+                self.waiting += 1
+                self.stats['waited'] += 1
+                while self.active >= self.limit:
+                    self._condition.wait()
+                self.waiting -= 1
+            self.active += 1
+            self.stats['calls'] += 1
+            self.stats['wait_seconds'] += time.perf_counter() - start
+            self.stats['max_active'] = max(self.stats['max_active'], self.active)
+
+    def release(self):
+        """Free a slot."""
+        with self._condition:
+            self.active = max(0, self.active - 1)
+            self._condition.notify()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current state and counters, for the metrics endpoint."""
+        return {'limit': self.limit, 'active': self.active, 'waiting': self.waiting,
+                **{k: (round(v, 3) if isinstance(v, float) else v) for k, v in self.stats.items()}}
+
+
+# Process-wide stage limiters (created on first use)
+_stage_limiters: Dict[str, StageLimiter] = {}
+_stage_limiters_lock = threading.Lock()
+
+
+def get_stage_limiter(stage: str) -> StageLimiter:
+    """
+    Get or create the limiter for a stage.
+
+    Args:
+        stage: 'llm', 'reranker' or 'embeddings' (limit from settings.admission_<stage>_concurrency)
+
+    Returns:
+        StageLimiter shared by the whole process
+    """
+    limiter = _stage_limiters.get(stage)
+    if limiter is None:
+        with _stage_limiters_lock:
+            limiter = _stage_limiters.get(stage)
+            if limiter is None:
+                limit = getattr(settings, f"admission_{stage}_concurrency", 0)
+                limiter = _stage_limiters[stage] = StageLimiter(stage, limit)
+    return limiter
+
+
+def stage_metrics() -> Dict[str, Dict[str, Any]]:
+    """Snapshot of all stage limiters created so far."""
+    return {name: limiter.snapshot() for name, limiter in _stage_limiters.items()}
+
+
+def stage_limited(stage: str):
+    """
+    Decorator running a (non-reentrant) call under a stage limit.
+
+    Args:
+        stage: Stage name for get_stage_limiter()
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_stage_limiter(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class StageLimitCallback(BaseCallbackHandler):
+    """
+    Holds a stage slot from the start to the end of each chat model call.
+
+    Attached to the LangChain chat models, so every call - sync invoke, async
+    ainvoke (the handler runs in a worker thread), streaming - is limited
+    without changing the call sites.
+    """
+
+    def __init__(self, stage: str = "llm"):
+        """
+        Initialize the callback.
+
+        Args:
+            stage: Stage name for get_stage_limiter()
+        """
+        self.limiter = get_stage_limiter(stage)
+        self._runs = set()
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID):
+        self.limiter.acquire()
+        with self._lock:
+            self._runs.add(run_id)
+
+    def _finish(self, run_id: UUID):
+        with self._lock:
+            if run_id not in self._runs:
+                return
+            self._runs.discard(run_id)
+        self.limiter.release()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs):
+        self._start(run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs):
+        self._start(run_id)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        self._finish(run_id)
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs):
+        self._finish(run_id)
@@ -1,6 +1,8 @@
 """LangGraph-based Agentic RAG implementation for Ollama."""
-from typing import List, Dict, Any, Optional, Literal, Union
+from typing import List, Dict, Any, Optional, Literal, Tuple, Union
+import asyncio
 import re
+import time
 
 from src.safety_guard import SafetyGuard, RiskLevel, SafetyAssessment
 from src.data_models import RAGResponse
@@ -9,18 +11,30 @@ from langgraph.prebuilt import ToolNode, tools_condition
 from langchain_core.language_models import BaseChatModel
 from langchain_core.tools import BaseTool
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from loguru import logger
 from pydantic import BaseModel, Field
 
-from src.llm import get_langchain_llm
+from src.components import shared_llm
 from src.tools import get_knowledge_base_tools
 from src.vector_store import VectorStore
-from src.guardrails import EmergencyGuardrailMiddleware, SafetyCheckGuardrail, EMERGENCY_RESPONSE
+from src.guardrails import SafetyCheckGuardrail, EMERGENCY_RESPONSE
+from src.safety_screen import SafetyScreenResult, get_emergency_trigger_prescreen
+from src.safety_classifier import TieredSafetyChecker
+from src.query_router import FastPathRouter
+from src.query_expansion import get_query_expander
+from src.context_packer import ContextPacker, model_token_counter
+from src.context_compression import SentenceCompressor
+from src.relevance_gate import RelevanceGate
 from config import settings
 
 import json
 from langchain_core.tools import render_text_description
 
+# Tag carried by the answer model's plain-text call: only its tokens are streamed to the client
+# (the grader/safety LLM runs inside the same node, often on the same shared client)
+ANSWER_STREAM_TAG = "answer_stream"
+
 def _extract_json(text: str) -> Optional[Dict]:
     """Extract JSON object from text."""
     try:
@@ -80,6 +94,12 @@ except ImportError:
         return decorator
 
 
+class AgentState(MessagesState):
+    """Graph state: conversation messages, the safety pre-screen result and the latest retrieval scores."""
+    safety: Optional[SafetyScreenResult]
+    retrieval_scores: Optional[List[Dict[str, Any]]]
+
+
 class GradeDocuments(BaseModel):
     """Grade documents using a binary score for relevance check."""
     binary_score: str = Field(
@@ -112,6 +132,7 @@ REWRITE_PROMPT = """Rewrite the Question to be specific keywords for search.
 Original: {question}
 Keywords:"""
 
+# LLM paraphrases, the baseline scripts/benchmark_query_expansion.py compares local expansion against
 MULTI_QUERY_PROMPT = """You are an AI assistant helping with information retrieval.
 Generate 3 different versions of the given user question to retrieve relevant documents from a vector database.
 By generating multiple perspectives on the user question, your goal is to help the user overcome some of the limitations of distance-based similarity search.
@@ -168,13 +189,13 @@ def create_agentic_rag_graph(
     logger.info(f"DEBUG: create_agentic_rag_graph called. Settings provider: {settings.llm_provider}")
     if orchestrator_llm is None:
         # Use configured LLM provider
-        orchestrator_llm = get_langchain_llm()
+        orchestrator_llm = shared_llm()
         logger.info(f"Using orchestrator LLM from provider: {settings.llm_provider}")
 
     # Get answer LLM (for final medical answer generation)
     if answer_llm is None:
         # Use configured LLM provider
-        answer_llm = get_langchain_llm()
+        answer_llm = shared_llm()
         logger.info(f"Using answer LLM from provider: {settings.llm_provider}")
 
     # Use orchestrator_llm for grading if not specified
@@ -205,99 +226,76 @@ def create_agentic_rag_graph(
     retriever_tool = tools[0] if tools else None
 
     # Initialize guardrails
-    emergency_guardrail = EmergencyGuardrailMiddleware()
-    safety_check = SafetyCheckGuardrail(llm=grader_llm)  # Use grader_llm for safety checks
+    # Emergency routing uses the dedicated trigger list only, not the broad SafetyGuard patterns
+    safety_prescreen = get_emergency_trigger_prescreen()
+    # Local rules/model decide clear-cut answers; grader_llm only sees ambiguous ones
+    safety_check = TieredSafetyChecker(SafetyCheckGuardrail(llm=grader_llm), name="answer")
+
+    # Answer context: deduplicated tool results packed into a budget of answer-model tokens
+    token_counter = model_token_counter(answer_llm)
+    streaming_answer_llm = answer_llm.with_config(tags=[ANSWER_STREAM_TAG])
+    compressor = None
+    if settings.context_compression_enabled:
+        compressor = SentenceCompressor(vector_store.embedding_model, token_counter=token_counter)
+        logger.info(f"Context compression enabled (budget {compressor.max_tokens} tokens)")
+    context_packer = ContextPacker(token_counter=token_counter, compressor=compressor)
+
+    # Retrieval-score gate in front of the grader LLM
+    relevance_gate = RelevanceGate() if settings.grade_gate_enabled else None
+
+    # Rule-based planner for search_kb turns (needs the search_kb tool to be available)
+    fast_path_router = None
+    if settings.fast_path_routing and any(getattr(t, 'name', None) == "search_kb" for t in tools):
+        fast_path_router = FastPathRouter()
+        logger.info("Fast-path routing enabled: search_kb calls planned by rules, LLM planner as fallback")
 
     # Node 0: Emergency check (before agent processing)
     @traceable(name="emergency_check", run_type="chain", metadata={"node": "guardrail"})
-    def check_emergency_node(state: MessagesState):
-        """Check for emergency keywords before processing."""
+    def check_emergency_node(state: AgentState):
+        """Run the safety pre-screen once and store its result in state."""
         try:
             logger.info("=== Node: emergency_check ===")
-            messages = state["messages"]
+
+            # Callers such as RAGPipeline may already have screened the query
+            if state.get("safety") is not None:
+                logger.info("Using safety pre-screen result from caller")
+                return {}
 
             # Extract user query
             query = ""
-            for msg in messages:
+            for msg in state["messages"]:
                 if isinstance(msg, HumanMessage) or (isinstance(msg, dict) and msg.get('role') == 'user'):
                     content = msg.content if hasattr(msg, 'content') else msg.get('content', '')
                     query = extract_text_from_content(content)
                     break
 
-            # Store emergency detection result in a message for routing
-            if query:
-                emergency_response = emergency_guardrail.check_emergency(query)
-                if emergency_response:
-                    logger.warning("🚨 Emergency detected, routing to emergency handler")
-                    # Add a marker message to indicate emergency
-                    # The routing function will check for this
-                    return {"messages": messages + [AIMessage(content="__EMERGENCY_DETECTED__")]}
-
-            logger.info("No emergency detected, continuing")
-            return {"messages": messages}
+            safety = safety_prescreen.screen(query)
+            if safety.is_emergency:
+                logger.warning("🚨 Emergency detected, routing to emergency handler")
+            else:
+                logger.info("No emergency detected, continuing")
+            return {"safety": safety}
         except Exception as e:
             logger.error(f"Error in emergency_check: {e}")
             logger.exception(e)
             # On error, continue processing
-            return {"messages": state["messages"]}
+            return {}
 
     # Conditional routing function for emergency check
-    def route_emergency(state: MessagesState) -> Literal["handle_emergency", "generate_query_or_respond"]:
-        """Route based on emergency detection."""
-        messages = state.get("messages", [])
-
-        # Check if emergency marker is present
-        for msg in messages:
-            if isinstance(msg, AIMessage) and hasattr(msg, 'content'):
-                # Handle both string and structured content
-                content = msg.content
-                if isinstance(content, str) and content == "__EMERGENCY_DETECTED__":
-                    return "handle_emergency"
-                elif isinstance(content, list):
-                    # Check if any block contains the marker
-                    for block in content:
-                        if isinstance(block, dict) and block.get('text') == "__EMERGENCY_DETECTED__":
-                            return "handle_emergency"
-
+    def route_emergency(state: AgentState) -> Literal["handle_emergency", "generate_query_or_respond"]:
+        """Route based on the pre-screen result in state."""
+        safety = state.get("safety")
+        if safety is not None and safety.is_emergency:
+            return "handle_emergency"
         return "generate_query_or_respond"
 
     # Node 0.5: Emergency response handler
     @traceable(name="handle_emergency", run_type="chain", metadata={"node": "guardrail"})
-    def handle_emergency(state: MessagesState):
-        """Return emergency response when emergency keywords detected."""
-        messages = state["messages"]
-
-        # Remove the emergency marker message (handle both string and structured content)
-        def is_emergency_marker(msg):
-            if not (isinstance(msg, AIMessage) and hasattr(msg, 'content')):
-                return False
-            content = msg.content
-            if isinstance(content, str):
-                return content == "__EMERGENCY_DETECTED__"
-            elif isinstance(content, list):
-                for block in content:
-                    if isinstance(block, dict) and block.get('text') == "__EMERGENCY_DETECTED__":
-                        return True
-            return False
-
-        filtered_messages = [m for m in messages if not is_emergency_marker(m)]
-
-        # Extract user query to detect language
-        query = ""
-        for msg in filtered_messages:
-            if isinstance(msg, HumanMessage) or (isinstance(msg, dict) and msg.get('role') == 'user'):
-                content = msg.content if hasattr(msg, 'content') else msg.get('content', '')
-                query = extract_text_from_content(content)
-                break
-
-        # Use emergency guardrail to get appropriate response
-        emergency_response = emergency_guardrail.check_emergency(query)
-        if emergency_response:
-            logger.info("Returning emergency response")
-            return {"messages": [AIMessage(content=emergency_response)]}
-        else:
-            # Fallback emergency response
-            return {"messages": [AIMessage(content=EMERGENCY_RESPONSE)]}
+    def handle_emergency(state: AgentState):
+        """Return the emergency response chosen by the pre-screen."""
+        safety = state.get("safety")
+        logger.info("Returning emergency response")
+        return {"messages": [AIMessage(content=(safety.response if safety else None) or EMERGENCY_RESPONSE)]}
 
     # Node 1: Generate query or respond (uses orchestrator_llm with tool calling)
     @traceable(name="generate_query_or_respond", run_type="chain", metadata={"node": "orchestrator"})
@@ -309,6 +307,22 @@ def create_agentic_rag_graph(
 
             # Add system instruction to prefer semantic search
             messages = state["messages"]
+
+            # Fast path: plan the search_kb call with rules, skipping the planner and query-cleaning LLM calls
+            if fast_path_router is not None:
+                human_texts = [
+                    extract_text_from_content(msg.content if hasattr(msg, 'content') else msg.get('content', ''))
+                    for msg in messages
+                    if isinstance(msg, HumanMessage) or (isinstance(msg, dict) and msg.get('role') == 'user')
+                ]
+                if human_texts:
+                    # Search with the latest (possibly rewritten) question, filter by what the user asked
+                    plan = fast_path_router.plan(human_texts[-1], filter_source=human_texts[0])
+                    if plan.confident:
+                        import uuid
+                        tool_call = plan.tool_call(f"call_{uuid.uuid4().hex[:8]}")
+                        logger.info(f"⚡ Fast-path tool call: {tool_call['name']} {tool_call['args']}")
+                        return {"messages": [AIMessage(content="", tool_calls=[tool_call])]}
             system_instruction = """RETRIEVAL STRATEGY:
 1. **ALWAYS START with `search_kb`** (Semantic Search) to find relevant information by meaning.
 2. **IMPORTANT: When the user mentions a specific organization (HKCH, SickKids, SIR, HKSIR, CIRSE, Hong Kong Children's Hospital), you MUST pass the `source_org` parameter** to `search_kb` to filter results. For example:
@@ -406,8 +420,9 @@ NOW, call the search_kb tool for this question:"""
                         logger.info(f"Manual tool call detected: {tool_name}")
 
                         # Preprocess query to correct typos before search
+                        # (local mode: search_kb corrects against the KB vocabulary instead)
                         original_args = tool_call_json.get("arguments", tool_call_json.get("args", {}))
-                        if tool_name == "search_kb" and "query" in original_args:
+                        if tool_name == "search_kb" and "query" in original_args and settings.query_clean_mode == "llm":
                             original_query = original_args["query"]
                             try:
                                 clean_prompt = QUERY_CLEAN_PROMPT.format(query=original_query)
@@ -498,8 +513,9 @@ NOW, call the search_kb tool for this question:"""
                     logger.info(f"Manual tool call detected: {tool_name}")
 
                     # Preprocess query to correct typos before search
+                    # (local mode: search_kb corrects against the KB vocabulary instead)
                     original_args = tool_call_json.get("arguments", tool_call_json.get("args", {}))
-                    if tool_name == "search_kb" and "query" in original_args:
+                    if tool_name == "search_kb" and "query" in original_args and settings.query_clean_mode == "llm":
                         original_query = original_args["query"]
                         try:
                             clean_prompt = QUERY_CLEAN_PROMPT.format(query=original_query)
@@ -542,64 +558,92 @@ NOW, call the search_kb tool for this question:"""
             return {"messages": [response]}
 
     # Node 2: Grade documents
+    def prepare_grade(state: AgentState) -> Tuple[Optional[str], str]:
+        """Route decided without the grader LLM, or (None, grading prompt)."""
+        messages = state["messages"]
+        logger.info(f"State messages count: {len(messages)}")
+
+        # Extract question from first human message
+        question = ""
+        for msg in messages:
+            if isinstance(msg, HumanMessage) or (isinstance(msg, dict) and msg.get('role') == 'user'):
+                content = msg.content if hasattr(msg, 'content') else msg.get('content', '')
+                question = extract_text_from_content(content)
+                logger.info(f"Extracted question: {question[:100]}...")
+                break
+
+        # Get the last tool message (retrieved content)
+        context = ""
+        for msg in reversed(messages):
+            if isinstance(msg, ToolMessage):
+                context = msg.content if hasattr(msg, 'content') else str(msg)
+                logger.info(f"Found ToolMessage context (length: {len(context)} chars)")
+                logger.info(f"ToolMessage name: {msg.name if hasattr(msg, 'name') else 'unknown'}")
+                logger.info(f"ToolMessage content preview: {context[:300]}...")
+                break
+            elif isinstance(msg, dict) and msg.get('role') == 'tool':
+                context = msg.get('content', '')
+                logger.info(f"Found tool dict context (length: {len(context)} chars)")
+                break
+            elif hasattr(msg, 'name') and msg.name:
+                context = msg.content if hasattr(msg, 'content') else str(msg)
+                logger.info(f"Found named message context (length: {len(context)} chars)")
+                break
+
+        # Check rewrite count to prevent infinite loops
+        rewrite_count = sum(1 for msg in messages if isinstance(msg, HumanMessage)) - 1
+        if rewrite_count >= 2:
+            logger.warning(f"Maximum rewrite attempts reached ({rewrite_count}), forcing generate_answer")
+            return "generate_answer", ""
+
+        if not context:
+            logger.warning("No context found for grading, defaulting to generate_answer")
+            return "generate_answer", ""
+
+        # Clear-cut retrieval scores decide without the grader LLM
+        if relevance_gate is not None:
+            relevant, reason = relevance_gate.decide(state.get("retrieval_scores"))
+            if relevant is not None:
+                route = "generate_answer" if relevant else "rewrite_question"
+                logger.info(f"⚡ Score-gated grade: {'yes' if relevant else 'no'} ({reason}), routing to {route}")
+                return route, ""
+            logger.info(f"Scores uncertain ({reason}), asking grader LLM")
+
+        # Enhance context with metadata for better grading
+        # Extract filename and source info from context if available
+        enhanced_context = context[:1500]  # Limit context length
+        # Try to extract document title/filename from context string
+        # Context format from tools.py: "[Document X] Source: {org} - {filename}..."
+        filename_match = re.search(r'\[Document \d+\] Source: [^-]+ - ([^\n\(]+)', context)
+        if filename_match:
+            filename = filename_match.group(1).strip()
+            enhanced_context = f"Document Title/Filename: {filename}\n\n" + enhanced_context
+            logger.info(f"Extracted filename for grading: {filename}")
+
+        prompt = GRADE_PROMPT.format(question=question, context=enhanced_context)
+        logger.debug(f"Grading prompt length: {len(prompt)} chars")
+        return None, prompt
+
+    def text_grade(response, window: Optional[int] = None) -> str:
+        """Parse yes/no from a plain grader response (optionally only its first ``window`` chars)."""
+        content = response.content if hasattr(response, 'content') else str(response)
+        logger.info(f"Grader response: {content[:200]}...")
+        return "yes" if "yes" in content.lower()[:window] else "no"
+
+    def grade_route(score: str) -> str:
+        """Map a yes/no grade to the next node."""
+        logger.info(f"Document grade: {score}")
+        logger.info(f"Routing to: {'generate_answer' if score == 'yes' else 'rewrite_question'}")
+        return "generate_answer" if score == "yes" else "rewrite_question"
+
     @traceable(name="grade_documents", run_type="chain", metadata={"node": "grader"})
-    def grade_documents(state: MessagesState) -> Literal["generate_answer", "rewrite_question"]:
+    def grade_documents(state: AgentState) -> Literal["generate_answer", "rewrite_question"]:
         """Determine whether the retrieved documents are relevant to the question."""
         try:
             logger.info("=== Node: grade_documents ===")
-            messages = state["messages"]
-            logger.info(f"State messages count: {len(messages)}")
-
-            # Extract question from first human message
-            question = ""
-            for msg in messages:
-                if isinstance(msg, HumanMessage) or (isinstance(msg, dict) and msg.get('role') == 'user'):
-                    content = msg.content if hasattr(msg, 'content') else msg.get('content', '')
-                    question = extract_text_from_content(content)
-                    logger.info(f"Extracted question: {question[:100]}...")
-                    break
-
-            # Get the last tool message (retrieved content)
-            context = ""
-            for msg in reversed(messages):
-                if isinstance(msg, ToolMessage):
-                    context = msg.content if hasattr(msg, 'content') else str(msg)
-                    logger.info(f"Found ToolMessage context (length: {len(context)} chars)")
-                    logger.info(f"ToolMessage name: {msg.name if hasattr(msg, 'name') else 'unknown'}")
-                    logger.info(f"ToolMessage content preview: {context[:300]}...")
-                    break
-                elif isinstance(msg, dict) and msg.get('role') == 'tool':
-                    context = msg.get('content', '')
-                    logger.info(f"Found tool dict context (length: {len(context)} chars)")
-                    break
-                elif hasattr(msg, 'name') and msg.name:
-                    context = msg.content if hasattr(msg, 'content') else str(msg)
-                    logger.info(f"Found named message context (length: {len(context)} chars)")
-                    break
-
-            # Check rewrite count to prevent infinite loops
-            rewrite_count = sum(1 for msg in messages if isinstance(msg, HumanMessage)) - 1
-            if rewrite_count >= 2:
-                logger.warning(f"Maximum rewrite attempts reached ({rewrite_count}), forcing generate_answer")
-                return "generate_answer"
-
-            if not context:
-                logger.warning("No context found for grading, defaulting to generate_answer")
-                return "generate_answer"
-
-            # Enhance context with metadata for better grading
-            # Extract filename and source info from context if available
-            enhanced_context = context[:1500]  # Limit context length
-            # Try to extract document title/filename from context string
-            # Context format from tools.py: "[Document X] Source: {org} - {filename}..."
-            filename_match = re.search(r'\[Document \d+\] Source: [^-]+ - ([^\n\(]+)', context)
-            if filename_match:
-                filename = filename_match.group(1).strip()
-                enhanced_context = f"Document Title/Filename: {filename}\n\n" + enhanced_context
-                logger.info(f"Extracted filename for grading: {filename}")
-
-            prompt = GRADE_PROMPT.format(question=question, context=enhanced_context)
-            logger.debug(f"Grading prompt length: {len(prompt)} chars")
+            route, prompt = prepare_grade(state)
+            if route is not None:
+                return route
 
             # Use structured output if available, otherwise parse manually
             if hasattr(grader_llm, 'with_structured_output'):
@@ -612,118 +656,176 @@ NOW, call the search_kb tool for this question:"""
                 except Exception as e:
                     logger.warning(f"Structured output failed, using fallback: {e}")
                     # Fallback: simple prompt
-                    response = grader_llm.invoke([HumanMessage(content=prompt)])
-                    content = response.content if hasattr(response, 'content') else str(response)
-                    logger.info(f"Grader response: {content[:200]}...")
-                    score = "yes" if "yes" in content.lower() else "no"
+                    score = text_grade(grader_llm.invoke([HumanMessage(content=prompt)]))
             else:
                 # For Ollama, use simple prompt and parse
-                response = grader_llm.invoke([HumanMessage(content=prompt)])
-                content = response.content if hasattr(response, 'content') else str(response)
-                logger.info(f"Grader response: {content[:200]}...")
-                score = "yes" if "yes" in content.lower()[:50] else "no"
-
-            logger.info(f"Document grade: {score}")
-            logger.info(f"Routing to: {'generate_answer' if score == 'yes' else 'rewrite_question'}")
-            return "generate_answer" if score == "yes" else "rewrite_question"
+                score = text_grade(grader_llm.invoke([HumanMessage(content=prompt)]), window=50)
+            return grade_route(score)
         except Exception as e:
             logger.error(f"Error in grade_documents: {e}")
             logger.exception(e)
             # Default to generate_answer on error
             return "generate_answer"
 
+    @traceable(name="grade_documents", run_type="chain", metadata={"node": "grader"})
+    async def agrade_documents(state: AgentState) -> Literal["generate_answer", "rewrite_question"]:
+        """Async grade_documents: the grader LLM call does not block the event loop."""
+        try:
+            logger.info("=== Node: grade_documents ===")
+            route, prompt = prepare_grade(state)
+            if route is not None:
+                return route
+
+            if hasattr(grader_llm, 'with_structured_output'):
+                try:
+                    response = await grader_llm.with_structured_output(GradeDocuments).ainvoke(
+                        [HumanMessage(content=prompt)]
+                    )
+                    score = response.binary_score if hasattr(response, 'binary_score') else "yes"
+                    logger.info(f"Structured output grade: {score}")
+                except Exception as e:
+                    logger.warning(f"Structured output failed, using fallback: {e}")
+                    score = text_grade(await grader_llm.ainvoke([HumanMessage(content=prompt)]))
+            else:
+                score = text_grade(await grader_llm.ainvoke([HumanMessage(content=prompt)]), window=50)
+            return grade_route(score)
+        except Exception as e:
+            logger.error(f"Error in grade_documents: {e}")
+            logger.exception(e)
+            return "generate_answer"
+
     # Node 3: Rewrite question
+    def prepare_rewrite(state: MessagesState) -> Tuple[Optional[Dict[str, Any]], str]:
+        """Rewrite made without the LLM (loop limit, local expansion), or (None, original question)."""
+        messages = state["messages"]
+        logger.info(f"State messages count: {len(messages)}")
+
+        # Check if we've already rewritten too many times (prevent infinite loops)
+        rewrite_count = sum(1 for msg in messages if isinstance(msg, HumanMessage)) - 1  # Subtract original question
+        if rewrite_count >= 2:  # Max 2 rewrites
+            logger.warning(f"Maximum rewrite attempts reached ({rewrite_count}), proceeding to generate answer")
+            # Extract original question and go straight to answer generation
+            original_question = ""
+            for msg in messages:
+                if isinstance(msg, HumanMessage) or (isinstance(msg, dict) and msg.get('role') == 'user'):
+                    content = msg.content if hasattr(msg, 'content') else msg.get('content', '')
+                    original_question = extract_text_from_content(content)
+                    break
+            # Return original question to proceed to answer generation (will be routed to generate_answer)
+            return {"messages": [HumanMessage(content=original_question)]}, original_question
+
+        # Extract original question
+        question = ""
+        for msg in messages:
+            if isinstance(msg, HumanMessage) or (isinstance(msg, dict) and msg.get('role') == 'user'):
+                content = msg.content if hasattr(msg, 'content') else msg.get('content', '')
+                question = extract_text_from_content(content)
+                logger.info(f"Original question: {question}")
+                break
+
+        if settings.query_expansion_mode == "local":
+            # Keyword/synonym rewrite from the expansion tables, no LLM call;
+            # each retry uses a different rephrasing
+            expander = get_query_expander()
+            candidates = list(dict.fromkeys([expander.rewrite(question)] + expander.variants(question)))
+            rewritten = candidates[min(rewrite_count, len(candidates) - 1)]
+            logger.info("=" * 80)
+            logger.info("🔄 QUESTION REWRITTEN (local expansion):")
+            logger.info(f"Original Question: {question}")
+            logger.info(f"Rewritten Question: {rewritten}")
+            logger.info("=" * 80)
+            return {"messages": [HumanMessage(content=rewritten)]}, question
+
+        return None, question
+
+    def clean_rewrite(rewritten: str, question: str) -> Dict[str, Any]:
+        """Extract the rewritten question from the LLM response."""
+        logger.info(f"Raw rewritten response: {rewritten[:200]}...")
+
+        # Clean up the response - extract just the question text
+        # Remove markdown formatting, explanations, rationales, etc.
+
+        # Try to extract text in quotes first
+        quoted_match = re.search(r'["\']([^"\']+)["\']', rewritten)
+        if quoted_match:
+            rewritten = quoted_match.group(1)
+        else:
+            # Remove markdown bold and other formatting
+            rewritten = re.sub(r'\*\*([^*]+)\*\*', r'\1', rewritten)
+            rewritten = re.sub(r'#+\s*', '', rewritten)
+            rewritten = re.sub(r'^\s*[-*]\s*', '', rewritten, flags=re.MULTILINE)
+
+            # Remove common prefixes/suffixes
+            rewritten = re.sub(r'^(Improved Question|Question|Rewritten|Rewritten Question):\s*', '', rewritten, flags=re.IGNORECASE)
+            rewritten = re.sub(r'\*\*Rationale:\*\*.*$', '', rewritten, flags=re.DOTALL | re.IGNORECASE)
+            rewritten = re.sub(r'This version.*$', '', rewritten, flags=re.DOTALL | re.IGNORECASE)
+
+            # Take first line or first sentence
+            rewritten = rewritten.split('\n')[0].strip()
+            rewritten = rewritten.split('.')[0].strip()
+
+        # If still too long or contains explanations, try to extract just the question part
+        if len(rewritten) > 200 or 'rationale' in rewritten.lower() or 'improved' in rewritten.lower():
+            # Look for question marks - take the sentence with the question mark
+            sentences = re.split(r'[.!?]', rewritten)
+            for sent in sentences:
+                if '?' in sent:
+                    rewritten = sent.strip()
+                    break
+
+        logger.info(f"Rewritten question: {rewritten}")
+
+        # Log the rewritten question prominently
+        logger.info("=" * 80)
+        logger.info("🔄 QUESTION REWRITTEN:")
+        logger.info(f"Original Question: {question}")
+        logger.info(f"Rewritten Question: {rewritten}")
+        logger.info("=" * 80)
+
+        return {"messages": [HumanMessage(content=rewritten)]}
+
     @traceable(name="rewrite_question", run_type="chain", metadata={"node": "rewriter"})
     def rewrite_question(state: MessagesState):
         """Rewrite the original user question for better retrieval."""
         try:
             logger.info("=== Node: rewrite_question ===")
-            messages = state["messages"]
-            logger.info(f"State messages count: {len(messages)}")
-
-            # Check if we've already rewritten too many times (prevent infinite loops)
-            rewrite_count = sum(1 for msg in messages if isinstance(msg, HumanMessage)) - 1  # Subtract original question
-            if rewrite_count >= 2:  # Max 2 rewrites
-                logger.warning(f"Maximum rewrite attempts reached ({rewrite_count}), proceeding to generate answer")
-                # Extract original question and go straight to answer generation
-                original_question = ""
-                for msg in messages:
-                    if isinstance(msg, HumanMessage) or (isinstance(msg, dict) and msg.get('role') == 'user'):
-                        content = msg.content if hasattr(msg, 'content') else msg.get('content', '')
-                        original_question = extract_text_from_content(content)
-                        break
-                # Return original question to proceed to answer generation (will be routed to generate_answer)
-                return {"messages": [HumanMessage(content=original_question)]}
-
-            # Extract original question
-            question = ""
-            for msg in messages:
-                if isinstance(msg, HumanMessage) or (isinstance(msg, dict) and msg.get('role') == 'user'):
-                    content = msg.content if hasattr(msg, 'content') else msg.get('content', '')
-                    question = extract_text_from_content(content)
-                    logger.info(f"Original question: {question}")
-                    break
+            result, question = prepare_rewrite(state)
+            if result is not None:
+                return result
 
             prompt = REWRITE_PROMPT.format(question=question)
             logger.debug(f"Rewrite prompt: {prompt[:200]}...")
 
             response = orchestrator_llm.invoke([HumanMessage(content=prompt)])
             logger.info(f"Rewrite response type: {type(response).__name__}")
+            return clean_rewrite(response.content if hasattr(response, 'content') else str(response), question)
+        except Exception as e:
+            logger.error(f"Error in rewrite_question: {e}")
+            # Return original question on error
+            return {"messages": [m for m in state["messages"] if isinstance(m, HumanMessage)][:1]}
 
-            rewritten = response.content if hasattr(response, 'content') else str(response)
-            logger.info(f"Raw rewritten response: {rewritten[:200]}...")
-
-            # Clean up the response - extract just the question text
-            # Remove markdown formatting, explanations, rationales, etc.
+    @traceable(name="rewrite_question", run_type="chain", metadata={"node": "rewriter"})
+    async def arewrite_question(state: MessagesState):
+        """Async rewrite_question: the rewrite LLM call does not block the event loop."""
+        try:
+            logger.info("=== Node: rewrite_question ===")
+            result, question = prepare_rewrite(state)
+            if result is not None:
+                return result
 
-            # Try to extract text in quotes first
-            quoted_match = re.search(r'["\']([^"\']+)["\']', rewritten)
-            if quoted_match:
-                rewritten = quoted_match.group(1)
-            else:
-                # Remove markdown bold and other formatting
-                rewritten = re.sub(r'\*\*([^*]+)\*\*', r'\1', rewritten)
-                rewritten = re.sub(r'#+\s*', '', rewritten)
-                rewritten = re.sub(r'^\s*[-*]\s*', '', rewritten, flags=re.MULTILINE)
-
-                # Remove common prefixes/suffixes
-                rewritten = re.sub(r'^(Improved Question|Question|Rewritten|Rewritten Question):\s*', '', rewritten, flags=re.IGNORECASE)
-                rewritten = re.sub(r'\*\*Rationale:\*\*.*$', '', rewritten, flags=re.DOTALL | re.IGNORECASE)
-                rewritten = re.sub(r'This version.*$', '', rewritten, flags=re.DOTALL | re.IGNORECASE)
-
-                # Take first line or first sentence
-                rewritten = rewritten.split('\n')[0].strip()
-                rewritten = rewritten.split('.')[0].strip()
-
-            # If still too long or contains explanations, try to extract just the question part
-            if len(rewritten) > 200 or 'rationale' in rewritten.lower() or 'improved' in rewritten.lower():
-                # Look for question marks - take the sentence with the question mark
-                sentences = re.split(r'[.!?]', rewritten)
-                for sent in sentences:
-                    if '?' in sent:
-                        rewritten = sent.strip()
-                        break
-
-            logger.info(f"Rewritten question: {rewritten}")
-
-            # Log the rewritten question prominently
-            logger.info("=" * 80)
-            logger.info("🔄 QUESTION REWRITTEN:")
-            logger.info(f"Original Question: {question}")
-            logger.info(f"Rewritten Question: {rewritten}")
-            logger.info("=" * 80)
+            prompt = REWRITE_PROMPT.format(question=question)
+            logger.debug(f"Rewrite prompt: {prompt[:200]}...")
 
-            return {"messages": [HumanMessage(content=rewritten)]}
+            response = await orchestrator_llm.ainvoke([HumanMessage(content=prompt)])
+            logger.info(f"Rewrite response type: {type(response).__name__}")
+            return clean_rewrite(response.content if hasattr(response, 'content') else str(response), question)
         except Exception as e:
             logger.error(f"Error in rewrite_question: {e}")
-            # Return original question on error
             return {"messages": [m for m in state["messages"] if isinstance(m, HumanMessage)][:1]}
 
     # Node 4: Generate answer
-    @traceable(name="generate_answer", run_type="chain", metadata={"node": "answer_generator"})
-    def generate_answer(state: MessagesState):
-        """Generate answer using RAG context and Pydantic structured output."""
-        logger.info("=== Node: generate_answer ===")
+    def answer_prompt(state: MessagesState) -> str:
+        """Answer prompt with the packed retrieval context."""
         messages = state["messages"]
 
         # Extract question
@@ -734,16 +836,16 @@ NOW, call the search_kb tool for this question:"""
                 question = extract_text_from_content(content)
                 break
 
-        # Extract context from tool messages
-        context_parts = []
+        # Extract context from tool messages: dedupe, rank and pack into the token budget
+        tool_outputs = []
         for msg in messages:
             if isinstance(msg, ToolMessage):
                 content = msg.content if hasattr(msg, 'content') else str(msg)
-                context_parts.append(content)
+                tool_outputs.append((getattr(msg, 'name', '') or '', content))
             elif isinstance(msg, dict) and msg.get('role') == 'tool':
-                context_parts.append(msg.get('content', ''))
+                tool_outputs.append((msg.get('name', ''), msg.get('content', '')))
 
-        context = "\n\n".join(context_parts) if context_parts else ""
+        context = context_packer.pack(tool_outputs, question=question) if tool_outputs else ""
         logger.info(f"Total context length: {len(context)} chars")
         logger.info(f"Context preview: {context[:300]}...")
         logger.info(f"Generating answer for question: {question[:50]}...")
@@ -753,8 +855,51 @@ NOW, call the search_kb tool for this question:"""
             logger.warning("No context found, generating answer without context")
             context = "No specific context was retrieved."
 
-        prompt = GENERATE_PROMPT.format(question=question, context=context[:4000])  # Limit context
+        prompt = GENERATE_PROMPT.format(question=question, context=context)
         logger.debug(f"Generate prompt length: {len(prompt)} chars")
+        return prompt
+
+    def checked_answer(answer: str, label: str, content: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Run the post-agent safety check on an answer.
+
+        Args:
+            answer: Answer text to check
+            label: Generation path, for logging
+            content: Message content to return when safe (default: the answer)
+
+        Returns:
+            State update with the answer or the safety error message
+        """
+        logger.info(f"=== Running post-agent safety check ({label}) ===")
+        is_safe, error_message = safety_check.check_safety(answer, llm=grader_llm)
+
+        if not is_safe:
+            logger.warning(f"⚠️ Safety check failed ({label}), returning safety error message")
+            return {"messages": [AIMessage(content=error_message or "I cannot provide that response. Please consult with your doctor or nurse.")]}
+
+        logger.info(f"✅ Safety check passed ({label})")
+        return {"messages": [AIMessage(content=answer if content is None else content)]}
+
+    def wants_stream(config: Optional[RunnableConfig]) -> bool:
+        """Whether the caller asked for plain-text generation to stream answer tokens."""
+        # Token streaming (RAGPipeline.astream_response) needs plain text: a structured
+        # output arrives as tool-call JSON that cannot be shown as it is generated
+        return bool((config or {}).get("configurable", {}).get("stream_answer"))
+
+    @traceable(name="generate_answer", run_type="chain", metadata={"node": "answer_generator"})
+    def generate_answer(state: MessagesState, config: RunnableConfig = None):
+        """Generate answer using RAG context and Pydantic structured output."""
+        logger.info("=== Node: generate_answer ===")
+        prompt = answer_prompt(state)
+
+        def generate_plain(label: str):
+            """Plain-text generation + safety check (streaming path and structured-output fallback)."""
+            response = streaming_answer_llm.invoke([HumanMessage(content=prompt)], config=config)
+            return checked_answer(response.content if hasattr(response, 'content') else str(response), label)
+
+        if wants_stream(config):
+            return generate_plain("streaming")
 
         # Use structured output
         try:
@@ -764,136 +909,57 @@ NOW, call the search_kb tool for this question:"""
             # Convert Pydantic model to string for compatibility with existing LangGraph format
             # But we can also return the raw object if downstream nodes support it.
             # For now, let's wrap it in AIMessage content as JSON string to be safe.
-            content = response.model_dump_json()
-
-            # Post-agent safety check
-            logger.info("=== Running post-agent safety check ===")
-            is_safe, error_message = safety_check.check_safety(response.answer, llm=grader_llm)
-
-            if not is_safe:
-                logger.warning("⚠️ Safety check failed, returning safety error message")
-                return {"messages": [AIMessage(content=error_message or "I cannot provide that response. Please consult with your doctor or nurse.")]}
-
-            logger.info("✅ Safety check passed")
-            return {"messages": [AIMessage(content=content)]}
+            return checked_answer(response.answer, "structured", content=response.model_dump_json())
 
         except Exception as e:
             logger.error(f"Structured output failed, falling back to raw generation: {e}")
-            # Fallback to standard generation
-            response = answer_llm.invoke([HumanMessage(content=prompt)])
-            response_content = response.content if hasattr(response, 'content') else str(response)
+            return generate_plain("fallback")
 
-            # Post-agent safety check for fallback
-            logger.info("=== Running post-agent safety check (fallback) ===")
-            is_safe, error_message = safety_check.check_safety(response_content, llm=grader_llm)
+    @traceable(name="generate_answer", run_type="chain", metadata={"node": "answer_generator"})
+    async def agenerate_answer(state: MessagesState, config: RunnableConfig = None):
+        """Async generate_answer: async answer model; packing and the safety check run in a worker thread."""
+        logger.info("=== Node: generate_answer ===")
+        prompt = await asyncio.to_thread(answer_prompt, state)
 
-            if not is_safe:
-                logger.warning("⚠️ Safety check failed (fallback), returning safety error message")
-                return {"messages": [AIMessage(content=error_message or "I cannot provide that response. Please consult with your doctor or nurse.")]}
+        async def generate_plain(label: str):
+            """Plain-text generation + safety check."""
+            response = await streaming_answer_llm.ainvoke([HumanMessage(content=prompt)], config=config)
+            answer = response.content if hasattr(response, 'content') else str(response)
+            return await asyncio.to_thread(checked_answer, answer, label)
 
-            logger.info("✅ Safety check passed (fallback)")
-            return {"messages": [AIMessage(content=response_content)]}
+        if wants_stream(config):
+            return await generate_plain("streaming")
+
+        try:
+            response = await answer_llm.with_structured_output(RAGResponse).ainvoke([HumanMessage(content=prompt)])
+            return await asyncio.to_thread(checked_answer, response.answer, "structured",
+                                           content=response.model_dump_json())
+        except Exception as e:
+            logger.error(f"Structured output failed, falling back to raw generation: {e}")
+            return await generate_plain("fallback")
 
     # Build the graph
-    workflow = StateGraph(MessagesState)
+    workflow = StateGraph(AgentState)
 
     # Create ToolNode instance once
     tool_node = ToolNode(tools)
 
-    # Node 1.5: Generate multiple queries
-    @traceable(name="generate_queries", run_type="chain", metadata={"node": "query_generator"})
-    def generate_queries(state: MessagesState):
-        """Generate multiple search queries for better recall."""
-        try:
-            logger.info("=== Node: generate_queries ===")
-            messages = state["messages"]
-
-            # Extract original question
-            question = ""
-            for msg in messages:
-                if isinstance(msg, HumanMessage) or (isinstance(msg, dict) and msg.get('role') == 'user'):
-                    content = msg.content if hasattr(msg, 'content') else msg.get('content', '')
-                    question = extract_text_from_content(content)
-                    break
-
-            prompt = MULTI_QUERY_PROMPT.format(question=question)
-            response = orchestrator_llm.invoke([HumanMessage(content=prompt)])
-            content = response.content if hasattr(response, 'content') else str(response)
-
-            # Extract JSON array
-            try:
-                # Clean markdown code blocks if present
-                content = content.replace("```json", "").replace("```", "").strip()
-                queries = json.loads(content)
-                if not isinstance(queries, list):
-                    queries = [question]
-            except Exception:
-                # Fallback: simple line splitting or just use original
-                logger.warning(f"Failed to parse multi-query JSON: {content[:100]}...")
-                queries = [question]
-
-            logger.info(f"Generated {len(queries)} queries: {queries}")
-
-            # Store queries in a special ToolMessage for the retriever to find
-            query_msg = ToolMessage(
-                content=json.dumps(queries),
-                tool_call_id="multi_query",
-                name="multi_query_generator"
-            )
-
-            return {"messages": [query_msg]}
-        except Exception as e:
-            logger.error(f"Error in generate_queries: {e}")
-            # Continue with original question implies no extra queries
-            return {"messages": []}
-
-    # Node wrapper for tool execution with validation/timing/multi-query support
-    def retrieve_with_timing(state: MessagesState):
-        """Wrapper around ToolNode that logs tool execution details and timing."""
-        import time
-
+    def with_retrieval_scores(tool_result: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy the retrieval scores from tool artifacts into state (None if no tool reported any)."""
+        scores = None
+        for msg in tool_result.get("messages", []):
+            artifact = getattr(msg, 'artifact', None)
+            if isinstance(artifact, list):
+                scores = (scores or []) + artifact
+        return {**tool_result, "retrieval_scores": scores}
+
+    # Node wrapper for tool execution with validation/timing
+    def retrieval_input(state: AgentState) -> Tuple[Dict[str, Any], Optional[str]]:
+        """ToolNode input for this turn, and the label its execution time is logged under (None = not timed)."""
         # Get messages that need tool execution
         messages = state.get("messages", [])
 
-        # Check for multi-query input
-        queries = []
-        for msg in reversed(messages):
-            if isinstance(msg, ToolMessage) and msg.name == "multi_query_generator":
-                try:
-                    queries = json.loads(msg.content)
-                    logger.info(f"Using {len(queries)} generated queries for retrieval")
-                except:
-                    pass
-                break
-
-        # If we have multiple queries, we need to run retrieval for EACH
-        if queries and len(queries) > 1:
-            all_tool_calls = []
-
-            # We assume we are using the 'search_kb' tool (vector search) for these
-            # Find the search_kb tool definition to get correct name
-            search_tool_name = "search_kb"
-
-            for q in queries:
-                 all_tool_calls.append({
-                    "name": search_tool_name,
-                    "args": {"query": q},
-                    "id": f"call_{hash(q)}"
-                 })
-
-            # Create a temporary state with AIMessage requesting these tool calls
-            # This is a bit of a hack to use ToolNode with multiple calls
-            temp_ai_msg = AIMessage(content="", tool_calls=all_tool_calls)
-
-            # Invoke ToolNode
-            start_time = time.time()
-            tool_result = tool_node.invoke({"messages": [temp_ai_msg]})
-            execution_time = time.time() - start_time
-            logger.info(f"⏱️  Multi-query Retrieval Time: {execution_time:.2f} seconds")
-
-            return tool_result
-
-        # Find the last AIMessage with tool_calls (Original Logic)
+        # Find the last AIMessage with tool_calls
         tool_calls_info = []
         for msg in reversed(messages):
             if isinstance(msg, AIMessage) and hasattr(msg, 'tool_calls') and msg.tool_calls:
@@ -912,30 +978,43 @@ NOW, call the search_kb tool for this question:"""
                 for key, value in tool_args.items():
                     logger.info(f"   {key}: {value}")
                 logger.info("-" * 80)
+            return state, "Execution Time"
 
-            # Time the tool execution
-            start_time = time.time()
-
-            # Execute the tool using ToolNode
-            tool_result_state = tool_node.invoke(state)
-
-            execution_time = time.time() - start_time
-
-            logger.info(f"⏱️  Execution Time: {execution_time:.2f} seconds")
-            logger.info("=" * 80)
+        # If no tool calls found, use standard ToolNode behavior
+        return state, None
 
-            return tool_result_state
+    def log_retrieval_time(label: Optional[str], start_time: float):
+        """Log the ToolNode execution time under the label from retrieval_input()."""
+        if label is not None:
+            logger.info(f"⏱️  {label}: {time.time() - start_time:.2f} seconds")
+            if label == "Execution Time":
+                logger.info("=" * 80)
 
-        # If no tool calls found, use standard ToolNode behavior
-        return tool_node.invoke(state)
+    def retrieve_with_timing(state: AgentState, config: RunnableConfig = None):
+        """Wrapper around ToolNode that logs tool execution details and timing."""
+        tool_input, label = retrieval_input(state)
+        start_time = time.time()
+        tool_result = tool_node.invoke(tool_input, config)
+        log_retrieval_time(label, start_time)
+        return with_retrieval_scores(tool_result)
+
+    async def aretrieve_with_timing(state: AgentState, config: RunnableConfig = None):
+        """Async retrieve: ToolNode runs the tool calls concurrently."""
+        tool_input, label = retrieval_input(state)
+        start_time = time.time()
+        tool_result = await tool_node.ainvoke(tool_input, config)
+        log_retrieval_time(label, start_time)
+        return with_retrieval_scores(tool_result)
 
     # Add nodes
     workflow.add_node("check_emergency", check_emergency_node)
     workflow.add_node("handle_emergency", handle_emergency)
     workflow.add_node("generate_query_or_respond", generate_query_or_respond)
-    workflow.add_node("retrieve", retrieve_with_timing)
-    workflow.add_node("rewrite_question", rewrite_question)
-    workflow.add_node("generate_answer", generate_answer)
+    # Nodes with an async variant don't hold a worker thread while waiting on the LLM
+    # or on tools when the graph runs with ainvoke/astream (the API server)
+    workflow.add_node("retrieve", RunnableLambda(retrieve_with_timing, afunc=aretrieve_with_timing, name="retrieve"))
+    workflow.add_node("rewrite_question", RunnableLambda(rewrite_question, afunc=arewrite_question, name="rewrite_question"))
+    workflow.add_node("generate_answer", RunnableLambda(generate_answer, afunc=agenerate_answer, name="generate_answer"))
 
     # Add edges - start with emergency check
     workflow.add_edge(START, "check_emergency")
@@ -953,7 +1032,7 @@ NOW, call the search_kb tool for this question:"""
     # Emergency handler goes to END
     workflow.add_edge("handle_emergency", END)
 
-    # Conditional edge: decide whether to run multi-query or direct retrieval
+    # Conditional edge: retrieve if the orchestrator called a tool, otherwise done
     workflow.add_conditional_edges(
         "generate_query_or_respond",
         tools_condition,
@@ -963,25 +1042,10 @@ NOW, call the search_kb tool for this question:"""
         },
     )
 
-    # For now, we'll insert multi-query in the semantic search path
-    # But complicating the graph too much might break existing flows.
-    # Let's simple insert "generate_queries" before any retrieval if it's semantic.
-
-    # Actually, the original design has "generate_query_or_respond" -> "retrieve".
-    # We should intercept this.
-    # But since tools_condition is a prebuilt router, validation is complex.
-    # For this implementation, we will keep it simple:
-    # IF tools_condition says "tools", we go to "retrieve" (which now supports multi-query inside)
-    # The generation of multi-queries should ideally happen inside "generate_query_or_respond" or between.
-
-    # Let's add the node but for safety in this iteration, we make it optional/parallel.
-    # Or better: "retrieve" node now checks if it should expand the query.
-
-
     # Conditional edge: grade documents and route accordingly
     workflow.add_conditional_edges(
         "retrieve",
-        grade_documents,
+        RunnableLambda(grade_documents, afunc=agrade_documents, name="grade_documents"),
         {
             "generate_answer": "generate_answer",
             "rewrite_question": "rewrite_question",
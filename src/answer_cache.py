@@ -0,0 +1,280 @@
+"""Semantic answer cache: reuse answers to previously asked questions with the same meaning."""
+import json
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from config import settings
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    logger.debug("numpy not available, answer cache similarity will use pure Python")
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation for exact-repeat matching."""
+    return re.sub(r"\s+", " ", (query or "").lower()).strip().rstrip("?？.!。！ ")
+
+
+def filter_key(filters: Optional[Dict[str, Any]]) -> str:
+    """Canonical string for a metadata filter dict."""
+    return json.dumps(filters or {}, sort_keys=True, ensure_ascii=False)
+
+
+def _unit(vector: List[float]) -> List[float]:
+    """L2-normalize a vector."""
+    norm = sum(v * v for v in vector) ** 0.5 or 1.0
+    return [v / norm for v in vector]
+
+
+@dataclass
+class CacheLookup:
+    """Result of AnswerCache.lookup()."""
+    hit: bool
+    entry: Optional[Dict[str, Any]] = None
+    similarity: float = 0.0
+    embedding: Optional[List[float]] = None  # Query embedding, reused by store() on a miss
+    reason: str = ""
+
+
+class AnswerCache:
+    """
+    Nearest-neighbour cache of final answers, stored in SQLite.
+
+    Entries are partitioned by language and metadata filters and tagged with
+    the KB version they were answered from; entries from another KB version
+    or older than the TTL are never returned. Exact repeats (after
+    normalization) are answered without embedding the query; otherwise the
+    query embedding is compared with the partition's cached queries by cosine
+    similarity.
+    """
+
+    def __init__(
+        self,
+        embedding_model,
+        db_path: str = None,
+        similarity_threshold: float = None,
+        ttl_seconds: int = None,
+        max_entries: int = None,
+        kb_version_fn: Optional[Callable[[], str]] = None,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            embedding_model: Model with embed_query(text) (the KB embedding model)
+            db_path: SQLite path (default from settings)
+            similarity_threshold: Minimum cosine similarity for a hit (default from settings)
+            ttl_seconds: Maximum entry age (default from settings, 0 = no expiry)
+            max_entries: Oldest entries beyond this are evicted (default from settings)
+            kb_version_fn: Returns the current KB version (default: DocumentDatabase.get_kb_version)
+        """
+        self.embedding_model = embedding_model
+        self.db_path = db_path or settings.answer_cache_path
+        self.similarity_threshold = similarity_threshold if similarity_threshold is not None else settings.answer_cache_similarity_threshold
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.answer_cache_ttl_seconds
+        self.max_entries = max_entries or settings.answer_cache_max_entries
+        if kb_version_fn is None:
+            from src.sql_tools import get_document_db
+            kb_version_fn = lambda: settings.kb_version or get_document_db().get_kb_version()
+        self.kb_version_fn = kb_version_fn
+
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                query TEXT NOT NULL,
+                normalized_query TEXT NOT NULL,
+                language TEXT NOT NULL,
+                filter_key TEXT NOT NULL,
+                kb_version TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                response TEXT NOT NULL,
+                sources_json TEXT,
+                created_at REAL NOT NULL,
+                hits INTEGER DEFAULT 0
+            )
+        """)
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_answers_partition ON answers(kb_version, language, filter_key)"
+        )
+        self.connection.commit()
+
+        # In-memory index for the current KB version: partition -> (ids, normalized queries, unit vectors)
+        self._kb_version: Optional[str] = None
+        self._partitions: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.stats = {'hits': 0, 'exact_hits': 0, 'misses': 0, 'stored': 0}
+        logger.info(f"Initialized answer cache at {self.db_path} (threshold {self.similarity_threshold}, ttl {self.ttl_seconds}s)")
+
+    def _sync_kb_version(self):
+        """Reload the index when the KB version changes, dropping entries from other versions."""
+        kb_version = self.kb_version_fn()
+        if kb_version == self._kb_version:
+            return
+        deleted = self.connection.execute("DELETE FROM answers WHERE kb_version != ?", (kb_version,)).rowcount
+        self.connection.commit()
+        if deleted:
+            logger.info(f"🗑️  Answer cache: dropped {deleted} entries from previous KB versions")
+        self._kb_version = kb_version
+        self._partitions = {}
+        rows = self.connection.execute(
+            "SELECT id, normalized_query, language, filter_key, embedding FROM answers WHERE kb_version = ? ORDER BY id",
+            (kb_version,),
+        ).fetchall()
+        for row in rows:
+            self._index(row['id'], row['normalized_query'], row['language'], row['filter_key'],
+                        list(array('f', row['embedding'])))
+        logger.info(f"Answer cache loaded {len(rows)} entries for KB version {kb_version}")
+
+    def _index(self, entry_id: int, normalized: str, language: str, filters: str, vector: List[float]):
+        """Add an entry to the in-memory partition index."""
+        partition = self._partitions.setdefault((language, filters), {'ids': [], 'queries': {}, 'vectors': [], 'matrix': None})
+        partition['ids'].append(entry_id)
+        partition['queries'][normalized] = entry_id
+        partition['vectors'].append(vector)
+        partition['matrix'] = None  # Rebuilt on next search
+
+    def _nearest(self, partition: Dict[str, Any], vector: List[float]) -> Tuple[Optional[int], float]:
+        """Most similar entry id and its cosine similarity."""
+        if not partition['ids']:
+            return None, 0.0
+        if NUMPY_AVAILABLE:
+            if partition['matrix'] is None:
+                partition['matrix'] = np.asarray(partition['vectors'], dtype=np.float32)
+            similarities = partition['matrix'] @ np.asarray(vector, dtype=np.float32)
+            best = int(similarities.argmax())
+            return partition['ids'][best], float(similarities[best])
+        best, best_similarity = None, -1.0
+        for entry_id, cached in zip(partition['ids'], partition['vectors']):
+            similarity = sum(a * b for a, b in zip(cached, vector))
+            if similarity > best_similarity:
+                best, best_similarity = entry_id, similarity
+        return best, best_similarity
+
+    def _load_entry(self, entry_id: int) -> Optional[Dict[str, Any]]:
+        """Fetch an entry if it has not expired."""
+        row = self.connection.execute("SELECT * FROM answers WHERE id = ?", (entry_id,)).fetchone()
+        if row is None:
+            return None
+        if self.ttl_seconds and time.time() - row['created_at'] > self.ttl_seconds:
+            return None
+        self.connection.execute("UPDATE answers SET hits = hits + 1 WHERE id = ?", (entry_id,))
+        self.connection.commit()
+        return {
+            'id': row['id'],
+            'query': row['query'],
+            'response': row['response'],
+            'sources': json.loads(row['sources_json'] or '[]'),
+            'created_at': row['created_at'],
+            'kb_version': row['kb_version'],
+        }
+
+    def lookup(self, query: str, language: str = "en", filters: Optional[Dict[str, Any]] = None) -> CacheLookup:
+        """
+        Find a cached answer for a query.
+
+        Args:
+            query: User query
+            language: Query language ('en' / 'zh')
+            filters: Metadata filters the answer must have been produced with
+
+        Returns:
+            CacheLookup (``embedding`` is set when the query had to be embedded)
+        """
+        with self._lock:
+            self._sync_kb_version()
+            partition = self._partitions.get((language, filter_key(filters)))
+
+            # Exact repeat: no embedding call needed
+            normalized = normalize_query(query)
+            if partition and normalized in partition['queries']:
+                entry = self._load_entry(partition['queries'][normalized])
+                if entry is not None:
+                    self.stats['hits'] += 1
+                    self.stats['exact_hits'] += 1
+                    logger.info(f"💾 Answer cache HIT (exact repeat of '{entry['query'][:80]}')")
+                    return CacheLookup(hit=True, entry=entry, similarity=1.0, reason="exact")
+
+        vector = _unit(self.embedding_model.embed_query(query))
+        with self._lock:
+            entry_id, similarity = self._nearest(partition, vector) if partition else (None, 0.0)
+            if entry_id is not None and similarity >= self.similarity_threshold:
+                entry = self._load_entry(entry_id)
+                if entry is not None:
+                    self.stats['hits'] += 1
+                    logger.info(f"💾 Answer cache HIT (similarity {similarity:.3f} to '{entry['query'][:80]}')")
+                    return CacheLookup(hit=True, entry=entry, similarity=similarity, embedding=vector, reason="similar")
+                reason = "expired"
+            else:
+                reason = "no entries" if entry_id is None else f"best similarity {similarity:.3f} < {self.similarity_threshold}"
+            self.stats['misses'] += 1
+            logger.info(f"Answer cache MISS ({reason})")
+            return CacheLookup(hit=False, similarity=similarity, embedding=vector, reason=reason)
+
+    def store(self, query: str, response: str, sources: List[Dict[str, Any]], language: str = "en",
+              filters: Optional[Dict[str, Any]] = None, embedding: Optional[List[float]] = None):
+        """
+        Cache an answer.
+
+        Args:
+            query: User query
+            response: Final answer text
+            sources: Source dicts returned with the answer
+            language: Query language
+            filters: Metadata filters used
+            embedding: Unit query embedding from lookup() (computed if missing)
+        """
+        vector = embedding or _unit(self.embedding_model.embed_query(query))
+        with self._lock:
+            self._sync_kb_version()
+            normalized = normalize_query(query)
+            filters_key = filter_key(filters)
+            cursor = self.connection.execute("""
+                INSERT INTO answers (query, normalized_query, language, filter_key, kb_version,
+                                     embedding, response, sources_json, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (query, normalized, language, filters_key, self._kb_version,
+                  array('f', vector).tobytes(), response, json.dumps(sources, ensure_ascii=False), time.time()))
+            self.connection.commit()
+            self._index(cursor.lastrowid, normalized, language, filters_key, list(vector))
+            self.stats['stored'] += 1
+            logger.info(f"💾 Answer cache stored answer for '{query[:80]}'")
+            self._evict()
+
+    def _evict(self):
+        """Remove expired entries and the oldest ones beyond max_entries."""
+        removed = 0
+        if self.ttl_seconds:
+            removed += self.connection.execute(
+                "DELETE FROM answers WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            ).rowcount
+        count = self.connection.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        if count > self.max_entries:
+            removed += self.connection.execute(
+                "DELETE FROM answers WHERE id IN (SELECT id FROM answers ORDER BY created_at LIMIT ?)",
+                (count - self.max_entries,),
+            ).rowcount
+        if removed:
+            self.connection.commit()
+            self._kb_version = None  # Force index reload
+            logger.info(f"🗑️  Answer cache evicted {removed} entries")
+
+    def clear(self):
+        """Delete all cached answers."""
+        with self._lock:
+            self.connection.execute("DELETE FROM answers")
+            self.connection.commit()
+            self._partitions = {}
+            self._kb_version = None
+            logger.info("Answer cache cleared")
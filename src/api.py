@@ -1,6 +1,11 @@
 """FastAPI server for RAG chatbot testing."""
-from typing import Optional, Dict, Any
-from contextlib import asynccontextmanager
+from typing import Callable, List, Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, nullcontext
+import asyncio
+import json
+import os
+import time
 import uuid
 
 from fastapi import FastAPI, HTTPException
@@ -10,11 +15,12 @@ from pydantic import BaseModel, Field
 from loguru import logger
 
 from config import settings
-from src.embeddings import get_embedding_model
 from src.vector_store import VectorStore
-from src.retriever import AdvancedRetriever
-from src.llm import get_langchain_llm
+from src.components import get_registry, shared_retriever, shared_vector_store
+from src.serving import process_memory
 from src.rag_pipeline import RAGPipeline
+from src.admission import AdmissionController, AdmissionRejected, stage_metrics
+from src.safety_classifier import safety_check_metrics
 
 # Import LangSmith traceable decorator
 try:
@@ -35,29 +41,38 @@ except ImportError:
 # Global instances
 rag_pipeline: Optional[RAGPipeline] = None
 vector_store: Optional[VectorStore] = None
+admission: Optional[AdmissionController] = None
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan context manager for startup and shutdown."""
     # Startup
-    global rag_pipeline, vector_store
+    global rag_pipeline, vector_store, admission
 
     logger.info("Initializing RAG system...")
 
-    try:
-        # Initialize embedding model
-        embedding_model = get_embedding_model()
+    # Blocking work (sync graph nodes, tools, SQLite, embeddings) runs in the loop's default
+    # executor; size it for many concurrent conversations rather than CPU count
+    executor = ThreadPoolExecutor(max_workers=settings.api_thread_pool_size, thread_name_prefix="rag")
+    asyncio.get_running_loop().set_default_executor(executor)
+    logger.info(f"Thread pool for blocking work: {settings.api_thread_pool_size} workers")
 
-        # Initialize vector store
-        vector_store = VectorStore(embedding_model)
+    try:
+        # Shared components: the embedding model, Chroma client and LLM clients are
+        # built once and reused by the retriever, the graph and the safety guard
+        vector_store = shared_vector_store()
 
-        # Initialize retriever (optional, for direct retrieval)
-        retriever = AdvancedRetriever(vector_store, llm=get_langchain_llm())
+        # Initialize retriever (for direct retrieval and the /retrieve endpoints)
+        retriever = shared_retriever()
 
         # Initialize RAG pipeline with agent
         rag_pipeline = RAGPipeline(vector_store, retriever=retriever)
 
+        # Bounded concurrency and queue for queries
+        if settings.admission_control_enabled:
+            admission = AdmissionController()
+
         logger.info("RAG system initialized successfully")
 
     except Exception as e:
@@ -68,6 +83,7 @@ async def lifespan(app: FastAPI):
 
     # Shutdown
     logger.info("Shutting down...")
+    executor.shutdown(wait=False, cancel_futures=True)
 
 
 # Initialize FastAPI app
@@ -100,6 +116,40 @@ class QueryRequest(BaseModel):
     include_sources: bool = Field(True, description="Include source documents")
 
 
+class BatchQueryItem(BaseModel):
+    """One query of a batch."""
+    query: str = Field(..., description="User query")
+    filter: Optional[Dict[str, Any]] = Field(None, description="Metadata filter")
+    include_sources: Optional[bool] = Field(None, description="Include source documents (default: batch setting)")
+
+
+class BatchQueryRequest(BaseModel):
+    """Request model for a batch of queries."""
+    queries: List[BatchQueryItem] = Field(..., description="Queries to answer")
+    concurrency: Optional[int] = Field(None, ge=1, description="Queries running at once (capped at the server setting)")
+    include_sources: bool = Field(True, description="Include source documents")
+
+
+class RetrieveOptions(BaseModel):
+    """Retrieval options shared by /retrieve and /retrieve/batch."""
+    k: Optional[int] = Field(None, ge=1, le=50, description="Number of chunks to return")
+    filter: Optional[Dict[str, Any]] = Field(None, description="Metadata filter (field equality)")
+    hybrid: Optional[bool] = Field(None, description="BM25 + semantic hybrid search (default: server setting)")
+    rerank: bool = Field(False, description="Rerank with the cross-encoder (slow)")
+    self_query: bool = Field(False, description="Parse filters from the query with the LLM (slow)")
+    window: int = Field(0, ge=0, le=5, description="Neighboring chunks returned on each side of a hit")
+
+
+class RetrieveRequest(RetrieveOptions):
+    """Request model for retrieval without the agent graph."""
+    query: str = Field(..., description="Search query")
+
+
+class RetrieveBatchRequest(RetrieveOptions):
+    """Request model for retrieving chunks for many queries."""
+    queries: List[str] = Field(..., description="Search queries")
+
+
 class QueryResponse(BaseModel):
     """Response model for chat query."""
     response: str
@@ -141,7 +191,7 @@ async def health_check():
 
     return {
         "status": "healthy",
-        "vector_store_stats": vector_store.get_stats(),
+        "vector_store_stats": await asyncio.to_thread(vector_store.get_stats),
         "settings": {
             "embedding_provider": settings.embedding_provider,
             "llm_provider": settings.llm_provider,
@@ -152,13 +202,13 @@ async def health_check():
 
 
 @traceable(name="api_query", metadata={"endpoint": "/query", "component": "api"})
-def _process_query(query: str, k: Optional[int], filter_dict: Optional[Dict[str, Any]],
-                   temperature: float, include_sources: bool) -> Dict[str, Any]:
+async def _process_query(query: str, k: Optional[int], filter_dict: Optional[Dict[str, Any]],
+                         temperature: float, include_sources: bool) -> Dict[str, Any]:
     """Internal function to process query with LangSmith tracing."""
     if rag_pipeline is None:
         raise ValueError("RAG system not initialized")
 
-    result = rag_pipeline.generate_response(
+    result = await rag_pipeline.agenerate_response(
         query=query,
         k=k,
         filter_dict=filter_dict,
@@ -168,6 +218,17 @@ def _process_query(query: str, k: Optional[int], filter_dict: Optional[Dict[str,
     return result
 
 
+def is_emergency_query(query: str) -> bool:
+    """Emergency-trigger queries skip the admission queue (the pipeline's pre-screen answers them)."""
+    return rag_pipeline.safety_prescreen.screen(query).is_emergency
+
+
+def admission_rejected(error: AdmissionRejected) -> HTTPException:
+    """429/503 response with Retry-After for a rejected query."""
+    return HTTPException(status_code=error.status_code, detail=error.reason,
+                         headers={"Retry-After": str(error.retry_after)})
+
+
 @app.post("/query", response_model=QueryResponse)
 async def query(request: QueryRequest):
     """
@@ -186,25 +247,54 @@ async def query(request: QueryRequest):
         raise HTTPException(
             status_code=503, detail="RAG system not initialized")
 
+    slot = admission.admit(emergency=is_emergency_query(request.query)) if admission else nullcontext()
     try:
-        result = _process_query(
-            query=request.query,
-            k=request.k,
-            filter_dict=request.filter,
-            temperature=request.temperature,
-            include_sources=request.include_sources
-        )
+        async with slot:
+            result = await _process_query(
+                query=request.query,
+                k=request.k,
+                filter_dict=request.filter,
+                temperature=request.temperature,
+                include_sources=request.include_sources
+            )
 
         # Add run_id to result for feedback tracking
         result['run_id'] = run_id
 
         return QueryResponse(**result)
 
+    except AdmissionRejected as e:
+        raise admission_rejected(e)
     except Exception as e:
         logger.error(f"Error processing query: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def sse_frame(event: Dict[str, Any]) -> str:
+    """Server-sent event frame: event type as the SSE event name, JSON payload as data."""
+    return f"event: {event.get('type', 'message')}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that holds an admission slot until sending is over.
+
+    The slot is released however the response ends, including a client that
+    disconnects before the body starts: the body generator never runs then,
+    so its own finally block cannot be relied on.
+    """
+
+    def __init__(self, content, on_close: Callable[[], None], **kwargs):
+        super().__init__(content, **kwargs)
+        self._on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._on_close()
+
+
 @app.post("/query/stream")
 async def query_stream(request: QueryRequest):
     """
@@ -214,26 +304,267 @@ async def query_stream(request: QueryRequest):
         request: QueryRequest with user query and parameters
 
     Returns:
-        Streaming response
+        Server-sent events (JSON data): progress, sources, token, answer,
+        retraction, emergency, error, done
     """
     if rag_pipeline is None:
         raise HTTPException(
             status_code=503, detail="RAG system not initialized")
 
+    # Admit before the response starts, so a rejection is still a plain 429/503
+    if admission is not None:
+        try:
+            await admission.acquire(emergency=is_emergency_query(request.query))
+        except AdmissionRejected as e:
+            raise admission_rejected(e)
+    start_time = time.monotonic()
+    released = False
+
+    def release_slot():
+        nonlocal released
+        if admission is not None and not released:
+            released = True
+            admission.release(time.monotonic() - start_time)
+
     async def generate():
         try:
-            for chunk in rag_pipeline.stream_response(
+            async for event in rag_pipeline.astream_response(
                 query=request.query,
                 k=request.k,
                 filter_dict=request.filter,
-                temperature=request.temperature
+                temperature=request.temperature,
+                include_sources=request.include_sources,
             ):
-                yield f"data: {chunk}\n\n"
+                yield sse_frame(event)
         except Exception as e:
             logger.error(f"Error streaming response: {e}")
-            yield f"data: {{'type': 'error', 'content': '{str(e)}'}}\n\n"
+            yield sse_frame({'type': 'error', 'content': str(e)})
+
+    try:
+        return AdmittedStreamingResponse(generate(), on_close=release_slot, media_type="text/event-stream",
+                                         headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    except Exception:
+        release_slot()
+        raise
+
+
+@asynccontextmanager
+async def batch_slot():
+    """
+    Admission slot for one batch query: waits out rejections instead of
+    failing, so bulk work backs off while interactive traffic is heavy.
+    """
+    while True:
+        try:
+            await admission.acquire()
+            break
+        except AdmissionRejected as e:
+            await asyncio.sleep(e.retry_after)
+    start_time = time.monotonic()
+    try:
+        yield
+    finally:
+        admission.release(time.monotonic() - start_time)
+
+
+@app.post("/query/batch")
+async def query_batch(request: BatchQueryRequest):
+    """
+    Answer many queries with bounded concurrency (evaluation runs, FAQ refreshes).
+
+    Args:
+        request: BatchQueryRequest with the queries and optional concurrency
+
+    Returns:
+        NDJSON stream: one line per query as it completes (with 'index' into
+        the request and either the response fields or 'error'), then a
+        summary line with 'done': true
+    """
+    if rag_pipeline is None:
+        raise HTTPException(
+            status_code=503, detail="RAG system not initialized")
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="No queries")
+    if len(request.queries) > settings.batch_max_queries:
+        raise HTTPException(status_code=413,
+                            detail=f"Batch too large ({len(request.queries)} > {settings.batch_max_queries} queries)")
+
+    items = [item.model_dump(exclude_none=True) for item in request.queries]
+    concurrency = min(request.concurrency or settings.batch_concurrency, settings.batch_concurrency)
+
+    async def generate():
+        start_time = time.monotonic()
+        failed = 0
+        async for result in rag_pipeline.agenerate_batch(
+            items,
+            concurrency=concurrency,
+            include_sources=request.include_sources,
+            admit=batch_slot if admission is not None else None,
+        ):
+            failed += 'error' in result
+            yield json.dumps(result, ensure_ascii=False, default=str) + "\n"
+        yield json.dumps({'done': True, 'total': len(items), 'failed': failed,
+                          'total_time': time.monotonic() - start_time}) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def chunk_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Structured chunk for the retrieval endpoints."""
+    metadata = result.get('metadata') or {}
+    return {
+        'id': result.get('id') or metadata.get('chunk_id', ''),
+        'score': result.get('score'),
+        'rerank_score': result.get('rerank_score'),
+        'retrieval_type': result.get('retrieval_type', 'semantic'),
+        'document_id': metadata.get('document_id'),
+        'chunk_index': metadata.get('chunk_index'),
+        'content': result.get('content', ''),
+        'metadata': metadata,
+    }
+
+
+def retrieve_chunks(query: str, options: RetrieveOptions) -> Dict[str, Any]:
+    """
+    Run AdvancedRetriever.retrieve for one query (blocking; call from a worker thread).
 
-    return StreamingResponse(generate(), media_type="text/event-stream")
+    Args:
+        query: Search query
+        options: Retrieval options
+
+    Returns:
+        Dict with 'query', 'results' (structured chunks) and 'timings' (ms per stage and total)
+    """
+    from src.chunk_expansion import ChunkExpander
+    from src.sql_tools import get_document_db
+
+    start = time.perf_counter()
+    timings: Dict[str, float] = {}
+    results = rag_pipeline.retriever.retrieve(
+        query,
+        k=options.k,
+        filter_dict=options.filter,
+        use_hybrid=options.hybrid,
+        use_reranker=options.rerank,
+        use_self_query=options.self_query,
+        timings=timings,
+    )
+    chunks = [chunk_result(r) for r in results]
+
+    if options.window and results:
+        # Each hit's ±window neighbors from the chunks table (merged where they overlap)
+        window_start = time.perf_counter()
+        expander = ChunkExpander(get_document_db(), mode="neighbors", window=options.window, max_chars=0, max_tokens=0)
+        by_hit = {}
+        for window in expander.expand(results):
+            for hit_id in window.get('hit_ids', []):
+                by_hit[hit_id] = {'document_id': window['document_id'], 'chunk_indices': window['chunk_indices'],
+                                  'content': window['content']}
+        for chunk in chunks:
+            chunk['window'] = by_hit.get(chunk['id']) if chunk['id'] else None
+        timings['window'] = (time.perf_counter() - window_start) * 1000
+
+    timings['total'] = (time.perf_counter() - start) * 1000
+    return {'query': query, 'results': chunks, 'timings': {k: round(v, 2) for k, v in timings.items()}}
+
+
+def prime_query_texts(queries: List[str], hybrid: Optional[bool]) -> float:
+    """
+    Embed the queries, and in hybrid search their local rephrasings, in one batched call.
+
+    Hybrid retrieval searches the vector store once per variant; without
+    priming each of those is its own embedding round trip.
+
+    Args:
+        queries: Query texts
+        hybrid: Per-request hybrid flag (None = the retriever's default)
+
+    Returns:
+        Time spent embedding in ms
+    """
+    start = time.perf_counter()
+    texts = list(queries)
+    hybrid = hybrid if hybrid is not None else rag_pipeline.retriever.use_hybrid_search
+    if hybrid and settings.query_expansion_mode == "local":
+        from src.query_expansion import get_query_expander
+        expander = get_query_expander()
+        texts += [v for q in queries
+                  for v in expander.variants(q, max_variants=settings.query_expansion_variants)]
+    rag_pipeline.prime_batch(texts)
+    return (time.perf_counter() - start) * 1000
+
+
+def require_retriever():
+    """503 unless the retriever is ready."""
+    if rag_pipeline is None or rag_pipeline.retriever is None:
+        raise HTTPException(status_code=503, detail="Retriever not initialized")
+
+
+@app.post("/retrieve")
+async def retrieve(request: RetrieveRequest):
+    """
+    Retrieve knowledge base chunks without the agent graph (no LLM call unless
+    self_query is set).
+
+    Args:
+        request: RetrieveRequest with the query and retrieval options
+
+    Returns:
+        Dict with 'query', 'results' (id, scores, document position, content,
+        metadata, optional neighbor 'window') and per-stage 'timings' in ms
+        ('embedding' is the batched query/variant embedding done up front)
+    """
+    require_retriever()
+    try:
+        embedding_ms = await asyncio.to_thread(prime_query_texts, [request.query], request.hybrid)
+        result = await asyncio.to_thread(retrieve_chunks, request.query, request)
+        result['timings']['embedding'] = round(embedding_ms, 2)
+        result['timings']['total'] = round(result['timings']['total'] + embedding_ms, 2)
+        return result
+    except Exception as e:
+        logger.error(f"Error retrieving chunks: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/retrieve/batch")
+async def retrieve_batch(request: RetrieveBatchRequest):
+    """
+    Retrieve chunks for many queries: their embeddings are computed in one
+    batched call, then the searches run concurrently.
+
+    Args:
+        request: RetrieveBatchRequest with the queries and shared retrieval options
+
+    Returns:
+        Dict with 'results' (one /retrieve result per query, in order; failed
+        queries have 'error') and 'timings' ('embedding' and 'total' in ms)
+    """
+    require_retriever()
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="No queries")
+    if len(request.queries) > settings.batch_max_queries:
+        raise HTTPException(status_code=413,
+                            detail=f"Batch too large ({len(request.queries)} > {settings.batch_max_queries} queries)")
+
+    start = time.perf_counter()
+    embedding_ms = await asyncio.to_thread(prime_query_texts, list(request.queries), request.hybrid)
+
+    semaphore = asyncio.Semaphore(settings.batch_concurrency)
+
+    async def one(query: str) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                return await asyncio.to_thread(retrieve_chunks, query, request)
+            except Exception as e:
+                logger.warning(f"Batch retrieval failed for '{query[:50]}': {e}")
+                return {'query': query, 'error': str(e)}
+
+    results = await asyncio.gather(*(one(q) for q in request.queries))
+    return {
+        'results': results,
+        'timings': {'embedding': round(embedding_ms, 2), 'total': round((time.perf_counter() - start) * 1000, 2)},
+    }
 
 
 @app.get("/stats")
@@ -243,19 +574,38 @@ async def get_stats():
         raise HTTPException(
             status_code=503, detail="Vector store not initialized")
 
-    return vector_store.get_stats()
+    return await asyncio.to_thread(vector_store.get_stats)
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Admission, stage concurrency, request coalescing and answer safety check metrics (queue depth, rejections, waits, tiers)."""
+    return {
+        "admission": admission.snapshot() if admission is not None else None,
+        "stages": stage_metrics(),
+        "coalescing": rag_pipeline.coalescer.snapshot() if rag_pipeline and rag_pipeline.coalescer else None,
+        "safety_check": safety_check_metrics(),
+        "components": get_registry().snapshot(),
+        "process": process_memory(),
+    }
 
 
 @app.post("/rebuild-index")
 async def rebuild_index():
-    """Rebuild the BM25 index (call after adding new documents)."""
+    """
+    Rebuild the BM25 index (call after adding new documents).
+
+    With several workers (scripts/start_api.py --workers N), only the worker
+    process that receives this request rebuilds its index; the others keep
+    serving the old one. Restart the server to refresh every worker.
+    """
     if rag_pipeline is None:
         raise HTTPException(
             status_code=503, detail="RAG system not initialized")
 
     try:
-        rag_pipeline.retriever.rebuild_bm25_index()
-        return {"message": "BM25 index rebuilt successfully"}
+        await asyncio.to_thread(rag_pipeline.retriever.rebuild_bm25_index)
+        return {"message": "BM25 index rebuilt successfully", "pid": os.getpid()}
     except Exception as e:
         logger.error(f"Error rebuilding index: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -277,7 +627,8 @@ async def submit_feedback(request: FeedbackRequest):
             status_code=503, detail="LangSmith is not available")
 
     try:
-        langsmith_client.create_feedback(
+        await asyncio.to_thread(
+            langsmith_client.create_feedback,
             request.run_id,
             key="user-score",
             score=request.score,
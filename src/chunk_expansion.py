@@ -0,0 +1,238 @@
+"""Expand retrieved chunk hits to neighboring chunks or whole sections."""
+from typing import List, Dict, Any, Optional, Callable
+
+from loguru import logger
+
+from src.document_db import DocumentDatabase
+from config import settings
+
+
+def approx_token_count(text: str) -> int:
+    """Rough token estimate (~4 characters per token) used when no tokenizer is given."""
+    return (len(text) + 3) // 4
+
+
+def _join_overlapping(parts: List[str], max_overlap: int = 400) -> str:
+    """
+    Join consecutive chunk texts, removing text repeated by sliding-window overlap.
+
+    Args:
+        parts: Chunk contents in document order
+        max_overlap: Largest overlap (in characters) to look for
+
+    Returns:
+        Joined text
+    """
+    if not parts:
+        return ""
+    joined = parts[0]
+    for part in parts[1:]:
+        probe = part[:50]
+        tail = joined[-max_overlap:]
+        pos = tail.find(probe) if probe else -1
+        if pos >= 0 and part.startswith(tail[pos:]):
+            joined += part[len(tail) - pos:]
+        else:
+            joined += "\n\n" + part
+    return joined
+
+
+class ChunkExpander:
+    """
+    Retrieval post-processor that widens top-k chunk hits into local context windows.
+
+    Each hit is expanded to ±N neighboring chunks (or its whole section) using the
+    chunks table, overlapping windows within a document are merged, and the result
+    is trimmed to fit a character or token budget.
+    """
+
+    def __init__(
+        self,
+        document_db: DocumentDatabase,
+        mode: str = None,
+        window: int = None,
+        max_chars: int = None,
+        max_tokens: int = None,
+        token_counter: Optional[Callable[[str], int]] = None,
+    ):
+        """
+        Initialize the expander.
+
+        Args:
+            document_db: DocumentDatabase holding the chunks table
+            mode: 'neighbors', 'section' or 'off' (default from settings)
+            window: Number of neighboring chunks on each side (default from settings)
+            max_chars: Character budget across all windows (default from settings)
+            max_tokens: Token budget across all windows, 0/None to disable (default from settings)
+            token_counter: Callable returning the token count of a string
+        """
+        self.document_db = document_db
+        self.mode = mode or settings.context_expansion_mode
+        self.window = window if window is not None else settings.context_expansion_window
+        self.max_chars = max_chars if max_chars is not None else settings.context_expansion_max_chars
+        self.max_tokens = max_tokens if max_tokens is not None else settings.context_expansion_max_tokens
+        self.token_counter = token_counter or approx_token_count
+
+    def _hit_position(self, hit: Dict[str, Any], doc_ids_by_path: Dict[str, str]) -> Optional[tuple]:
+        """Return (document_id, chunk_index, section_title) for a hit, or None if unknown."""
+        metadata = hit.get('metadata', {}) or {}
+        chunk_index = metadata.get('chunk_index')
+        if chunk_index is None:
+            return None
+        document_id = metadata.get('document_id') or doc_ids_by_path.get(metadata.get('source', ''))
+        if not document_id:
+            return None
+        return document_id, int(chunk_index), metadata.get('section_title')
+
+    def _fits(self, used_chars: int, used_tokens: int, text: str) -> bool:
+        """Check whether text fits in the remaining budget."""
+        if self.max_chars and used_chars + len(text) > self.max_chars:
+            return False
+        if self.max_tokens and used_tokens + self.token_counter(text) > self.max_tokens:
+            return False
+        return True
+
+    def _truncate(self, used_chars: int, used_tokens: int, text: str) -> Optional[str]:
+        """Cut text to the remaining budget (None if the budget is used up)."""
+        remaining = self.max_chars - used_chars if self.max_chars else len(text)
+        if self.max_tokens:
+            remaining = min(remaining, (self.max_tokens - used_tokens) * 4)
+        return text[:remaining] if remaining > 0 else None
+
+    def expand(self, hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Expand hits into merged, budgeted context windows.
+
+        Args:
+            hits: Retrieval results with 'content', 'metadata' and 'score'
+
+        Returns:
+            List of window dicts (same shape as retrieval results, plus
+            'document_id', 'chunk_indices' and 'hit_ids'), ordered by best hit score.
+            Hits that cannot be located in the chunks table are passed through
+            unexpanded, in score order; they count against the same budget.
+        """
+        if self.mode == "off" or not hits:
+            return hits
+
+        paths = [h.get('metadata', {}).get('source', '') for h in hits
+                 if not h.get('metadata', {}).get('document_id')]
+        doc_ids_by_path = self.document_db.resolve_document_ids(paths) if paths else {}
+
+        # 1. Build one window request per hit
+        requests = []
+        positions = []
+        for hit in hits:
+            position = self._hit_position(hit, doc_ids_by_path)
+            positions.append(position)
+            if position is None:
+                continue
+            document_id, chunk_index, section_title = position
+            if self.mode == "section" and section_title:
+                requests.append({'document_id': document_id, 'section_title': section_title})
+            else:
+                requests.append({
+                    'document_id': document_id,
+                    'start': max(0, chunk_index - self.window),
+                    'end': chunk_index + self.window,
+                })
+
+        # 2. One batched query for every window
+        rows = self.document_db.get_chunk_windows(requests)
+        by_document: Dict[str, Dict[int, Dict[str, Any]]] = {}
+        for row in rows:
+            by_document.setdefault(row['document_id'], {})[row['chunk_index']] = row
+
+        # 3. Resolve each hit to the set of chunk indices it covers
+        spans = []
+        passthrough = []
+        for hit, position in zip(hits, positions):
+            chunks = by_document.get(position[0]) if position else None
+            if not chunks or position[1] not in chunks:
+                passthrough.append(hit)
+                continue
+            document_id, chunk_index, section_title = position
+            if self.mode == "section" and section_title:
+                indices = {i for i, c in chunks.items() if c['section_title'] == section_title}
+            else:
+                indices = {i for i in chunks
+                           if chunk_index - self.window <= i <= chunk_index + self.window}
+            indices.add(chunk_index)
+            spans.append({
+                'document_id': document_id,
+                'start': min(indices),
+                'end': max(indices),
+                'hits': {chunk_index},
+                'score': hit.get('score', 0),
+                'hit_ids': [hit.get('id', '')],
+                'metadata': hit.get('metadata', {}),
+            })
+
+        # 4. Merge overlapping or adjacent spans within the same document
+        spans.sort(key=lambda s: (s['document_id'], s['start']))
+        merged: List[Dict[str, Any]] = []
+        for span in spans:
+            last = merged[-1] if merged else None
+            if last and last['document_id'] == span['document_id'] and span['start'] <= last['end'] + 1:
+                last['end'] = max(last['end'], span['end'])
+                last['hits'] |= span['hits']
+                last['hit_ids'].extend(span['hit_ids'])
+                if span['score'] > last['score']:
+                    last['score'] = span['score']
+                    last['metadata'] = span['metadata']
+            else:
+                merged.append(span)
+
+        # Windows and passthrough hits share the budget, best score first
+        ranked = [(span['score'] or 0, span, None) for span in merged]
+        ranked += [(hit.get('score') or 0, None, hit) for hit in passthrough]
+        ranked.sort(key=lambda entry: entry[0], reverse=True)
+
+        # 5. Assemble text and apply the budget, shrinking windows towards their hits
+        windows = []
+        used_chars = 0
+        used_tokens = 0
+        for _, span, hit in ranked:
+            if hit is not None:
+                text = hit.get('content', '')
+                if not self._fits(used_chars, used_tokens, text):
+                    text = self._truncate(used_chars, used_tokens, text)
+                    if text is None:
+                        break
+                    hit = {**hit, 'content': text}
+                used_chars += len(text)
+                used_tokens += self.token_counter(text)
+                windows.append(hit)
+                continue
+
+            chunks = by_document[span['document_id']]
+            indices = [i for i in range(span['start'], span['end'] + 1) if i in chunks]
+            text = _join_overlapping([chunks[i]['content'] for i in indices])
+            while not self._fits(used_chars, used_tokens, text) and len(indices) > len(span['hits']):
+                # Drop the chunk farthest from any hit
+                farthest = max(
+                    (i for i in indices if i not in span['hits']),
+                    key=lambda i: min(abs(i - h) for h in span['hits'])
+                )
+                indices.remove(farthest)
+                text = _join_overlapping([chunks[i]['content'] for i in indices])
+            if not self._fits(used_chars, used_tokens, text):
+                text = self._truncate(used_chars, used_tokens, text)
+                if text is None:
+                    break
+            used_chars += len(text)
+            used_tokens += self.token_counter(text)
+            windows.append({
+                'content': text,
+                'metadata': span['metadata'],
+                'score': span['score'],
+                'id': span['hit_ids'][0],
+                'document_id': span['document_id'],
+                'chunk_indices': indices,
+                'hit_ids': span['hit_ids'],
+            })
+
+        logger.info(f"Expanded {len(hits)} hits into {len(windows)} context windows "
+                    f"({len(passthrough)} not expandable; {used_chars} chars, mode: {self.mode}, "
+                    f"window: ±{self.window})")
+        return windows
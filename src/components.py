@@ -0,0 +1,259 @@
+"""Process-wide registry of heavy components: each is built once per configuration and shared."""
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from loguru import logger
+
+from config import settings
+
+
+class ComponentRegistry:
+    """
+    Builds each component once per configuration key and hands out the shared instance.
+
+    Thread-safe: concurrent first requests for the same key wait for a single
+    build instead of each loading their own copy. A failed build is not
+    remembered, so the next request retries.
+    """
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._instances: Dict[Tuple[str, Hashable], Any] = {}
+        self._build_locks: Dict[Tuple[str, Hashable], threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.stats = {'built': 0, 'reused': 0}
+
+    def get(self, kind: str, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """
+        Get the shared component, building it on first use.
+
+        Args:
+            kind: Component kind ('llm', 'embeddings', 'vector_store', ...)
+            key: Configuration the instance was built from
+            factory: Builds the component (called at most once per kind and key)
+
+        Returns:
+            Shared instance
+        """
+        full_key = (kind, key)
+        with self._lock:
+            if full_key in self._instances:
+                self.stats['reused'] += 1
+                return self._instances[full_key]
+            build_lock = self._build_locks.setdefault(full_key, threading.Lock())
+        with build_lock:
+            with self._lock:
+                if full_key in self._instances:
+                    self.stats['reused'] += 1
+                    return self._instances[full_key]
+            logger.info(f"🧩 Building shared {kind} component {key}")
+            instance = factory()
+            with self._lock:
+                self._instances[full_key] = instance
+                self.stats['built'] += 1
+            return instance
+
+    def clear(self, kind: Optional[str] = None):
+        """
+        Drop shared instances (all, or one kind), e.g. after the configuration changed.
+
+        Args:
+            kind: Component kind to drop (default: everything)
+        """
+        with self._lock:
+            for full_key in [k for k in self._instances if kind is None or k[0] == kind]:
+                del self._instances[full_key]
+            for full_key in [k for k in self._build_locks if kind is None or k[0] == kind]:
+                del self._build_locks[full_key]
+
+    def discard(self, kind: str, key: Hashable):
+        """
+        Drop one shared instance.
+
+        Args:
+            kind: Component kind
+            key: Configuration key it was built with
+        """
+        with self._lock:
+            self._instances.pop((kind, key), None)
+            self._build_locks.pop((kind, key), None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters and the components currently held, for the metrics endpoint."""
+        components: Dict[str, int] = {}
+        with self._lock:
+            for kind, _ in self._instances:
+                components[kind] = components.get(kind, 0) + 1
+            stats = dict(self.stats)
+        return {'components': components, **stats}
+
+
+_registry = ComponentRegistry()
+
+
+def get_registry() -> ComponentRegistry:
+    """Get the process-wide component registry."""
+    return _registry
+
+
+def _freeze(kwargs: Dict[str, Any]) -> Tuple:
+    """Hashable form of keyword arguments."""
+    return tuple(sorted((k, repr(v)) for k, v in kwargs.items()))
+
+
+def shared_llm(provider: str = None, **kwargs):
+    """
+    Shared LangChain chat model (see llm.get_langchain_llm).
+
+    Args:
+        provider: LLM provider (default from settings)
+        **kwargs: Model parameters; different parameters give a different instance
+
+    Returns:
+        LangChain BaseChatModel instance
+    """
+    from src.llm import get_langchain_llm
+
+    provider = provider or settings.llm_provider
+    model = kwargs.get('model') or {
+        'openai': settings.openai_chat_model,
+        'ollama': settings.ollama_chat_model,
+        'lmstudio': settings.lmstudio_chat_model,
+        'openrouter': settings.openrouter_chat_model,
+    }.get(provider)
+    return _registry.get('llm', (provider, model, _freeze(kwargs)),
+                         lambda: get_langchain_llm(provider=provider, **kwargs))
+
+
+def shared_llm_provider(provider: str = None, **kwargs):
+    """
+    Shared legacy LLMProvider (see llm.get_llm_provider).
+
+    Args:
+        provider: LLM provider (default from settings)
+        **kwargs: Provider parameters
+
+    Returns:
+        LLMProvider instance
+    """
+    from src.llm import get_llm_provider
+
+    provider = provider or settings.llm_provider
+    return _registry.get('llm_provider', (provider, _freeze(kwargs)),
+                         lambda: get_llm_provider(provider, **kwargs))
+
+
+def shared_embedding_model(provider: str = None):
+    """
+    Shared embedding model (see embeddings.get_embedding_model).
+
+    Args:
+        provider: Embedding provider (default from settings)
+
+    Returns:
+        EmbeddingModel instance
+    """
+    from src.embeddings import get_embedding_model
+
+    provider = provider or settings.embedding_provider
+    model = {
+        'openai': settings.openai_embedding_model,
+        'sentence-transformer': settings.sentence_transformer_model,
+        'ollama': settings.ollama_embedding_model,
+        'lmstudio': settings.lmstudio_embedding_model,
+    }.get(provider)
+    return _registry.get('embeddings', (provider, model), lambda: get_embedding_model(provider))
+
+
+def shared_vector_store(collection_name: str = None, persist_directory: str = None):
+    """
+    Shared Chroma vector store on the shared embedding model.
+
+    Args:
+        collection_name: Collection (default from settings)
+        persist_directory: Chroma directory (default from settings)
+
+    Returns:
+        VectorStore instance
+    """
+    from src.vector_store import VectorStore
+
+    collection_name = collection_name or settings.collection_name
+    persist_directory = persist_directory or settings.chroma_persist_directory
+    embedding_model = shared_embedding_model()
+    key = (collection_name, persist_directory, settings.embedding_provider)
+    return _registry.get('vector_store', key, lambda: VectorStore(
+        embedding_model, collection_name=collection_name, persist_directory=persist_directory))
+
+
+def shared_bm25_index(vector_store):
+    """
+    Shared BM25 index (and chunk texts) for a vector store's collection.
+
+    Args:
+        vector_store: VectorStore whose chunks are indexed
+
+    Returns:
+        BM25Retriever, or None if the collection is empty (not cached, so a later call retries)
+    """
+    from src.retriever import build_bm25_index
+
+    key = (vector_store.collection_name, vector_store.persist_directory)
+    index = _registry.get('bm25', key, lambda: build_bm25_index(vector_store))
+    if index is None:
+        _registry.discard('bm25', key)
+    return index
+
+
+def shared_reranker(model_name: str, top_n: int):
+    """
+    Shared Qwen3 reranker (the model weights are loaded once per process).
+
+    Args:
+        model_name: HuggingFace model name
+        top_n: Documents kept after reranking
+
+    Returns:
+        Qwen3Reranker instance
+    """
+    from src.qwen3_reranker import Qwen3Reranker
+
+    return _registry.get('reranker', (model_name, top_n),
+                         lambda: Qwen3Reranker(model_name=model_name, top_n=top_n))
+
+
+def shared_retriever(use_llm: bool = True, use_reranker: bool = None):
+    """
+    Shared AdvancedRetriever over the shared vector store (builds the BM25 index once).
+
+    Args:
+        use_llm: Give the retriever the shared LLM for SelfQueryRetriever
+        use_reranker: Whether to rerank (default from settings)
+
+    Returns:
+        AdvancedRetriever instance
+    """
+    from src.retriever import AdvancedRetriever
+
+    use_reranker = settings.use_reranker if use_reranker is None else use_reranker
+    vector_store = shared_vector_store()
+    key = (settings.collection_name, settings.chroma_persist_directory,
+           settings.llm_provider if use_llm else None, use_reranker)
+    return _registry.get('retriever', key, lambda: AdvancedRetriever(
+        vector_store, llm=shared_llm() if use_llm else None, use_reranker=use_reranker))
+
+
+def shared_document_db(db_path: str = None):
+    """
+    Shared document database.
+
+    Args:
+        db_path: SQLite path (default from settings)
+
+    Returns:
+        DocumentDatabase instance
+    """
+    from src.document_db import DocumentDatabase
+
+    db_path = db_path or settings.document_db_path
+    return _registry.get('document_db', db_path, lambda: DocumentDatabase(db_path))
@@ -0,0 +1,154 @@
+"""Extractive context compression: keep the retrieved sentences that answer the question."""
+import re
+from dataclasses import replace
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+
+from config import settings
+from src.answer_cache import _unit
+from src.chunk_expansion import approx_token_count
+from src.context_packer import ContextChunk
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    logger.debug("numpy not available, context compression scoring will use pure Python")
+
+# Sentence ends (Latin and CJK punctuation) and line breaks, so headings and list items stand alone
+_SENTENCE_RE = re.compile(r"[^\n.!?。！？]+(?:[.!?。！？]+|\n|$)")
+GAP_MARKER = "…"  # Joins non-adjacent kept sentences
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Split text into sentences / lines.
+
+    Args:
+        text: Chunk text
+
+    Returns:
+        Non-empty stripped sentences in order
+    """
+    return [s.strip() for s in _SENTENCE_RE.findall(text or "") if s.strip()]
+
+
+class SentenceCompressor:
+    """
+    Query-focused extractive compression of retrieved chunks.
+
+    All candidate sentences are embedded in one batch with the KB embedding
+    model and scored by cosine similarity to the question. The best sentences
+    are taken together with ``neighbors`` sentences either side (for pronouns
+    and list context) until the token budget is used or scores fall well
+    below the best one; each chunk keeps its
+    selected sentences in original order, with gaps marked, so the source
+    header and citation stay attached to the text it came from.
+    """
+
+    def __init__(
+        self,
+        embedding_model,
+        max_tokens: int = None,
+        neighbors: int = None,
+        max_sentences: int = 400,
+        min_relative_score: float = 0.6,
+        token_counter: Optional[Callable[[str], int]] = None,
+    ):
+        """
+        Initialize the compressor.
+
+        Args:
+            embedding_model: Model with embed_documents/embed_query (the KB embedding model)
+            max_tokens: Token budget for the kept sentences (default from settings)
+            neighbors: Sentences kept either side of a selected one (default from settings)
+            max_sentences: Candidate sentences embedded per request, from the best-ranked chunks
+            min_relative_score: Sentences scoring below this share of the best score are not selected
+            token_counter: Callable returning the token count of a string (default: ~4 chars/token)
+        """
+        self.embedding_model = embedding_model
+        self.max_tokens = max_tokens or settings.context_compression_max_tokens
+        self.neighbors = neighbors if neighbors is not None else settings.context_compression_neighbors
+        self.max_sentences = max_sentences
+        self.min_relative_score = min_relative_score
+        self.token_counter = token_counter or approx_token_count
+
+    def _scores(self, question: str, sentences: List[str]) -> List[float]:
+        """Cosine similarity of each sentence with the question, from one batched embedding call."""
+        question_vector = _unit(self.embedding_model.embed_query(question))
+        vectors = self.embedding_model.embed_documents(sentences)
+        if NUMPY_AVAILABLE:
+            matrix = np.asarray(vectors, dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1)
+            norms[norms == 0] = 1.0
+            return ((matrix @ np.asarray(question_vector, dtype=np.float32)) / norms).tolist()
+        return [sum(a * b for a, b in zip(_unit(vector), question_vector)) for vector in vectors]
+
+    def compress(self, question: str, chunks: List[ContextChunk]) -> List[ContextChunk]:
+        """
+        Keep the sentences most related to the question.
+
+        Args:
+            question: User question
+            chunks: Deduplicated chunks, best first
+
+        Returns:
+            Chunks with compressed text (chunks with no kept sentence are dropped)
+        """
+        # Candidate sentences, tagged with (chunk index, position)
+        sentences: List[Tuple[int, int, str]] = []
+        per_chunk: List[List[str]] = []
+        for chunk_index, chunk in enumerate(chunks):
+            chunk_sentences = split_sentences(chunk.text)
+            per_chunk.append(chunk_sentences)
+            for position, sentence in enumerate(chunk_sentences):
+                if len(sentences) < self.max_sentences:
+                    sentences.append((chunk_index, position, sentence))
+        if not sentences:
+            return chunks
+
+        tokens_before = sum(self.token_counter(chunk.text) for chunk in chunks)
+        scores = self._scores(question, [sentence for _, _, sentence in sentences])
+
+        selected: Dict[int, Set[int]] = {}
+        used = 0
+        ranked = sorted(range(len(sentences)), key=scores.__getitem__, reverse=True)
+        floor = scores[ranked[0]] * self.min_relative_score
+        for best in ranked:
+            if used and scores[best] < floor:
+                break
+            chunk_index, position, _ = sentences[best]
+            kept = selected.setdefault(chunk_index, set())
+            window = range(max(0, position - self.neighbors),
+                           min(len(per_chunk[chunk_index]), position + self.neighbors + 1))
+            added = [p for p in window if p not in kept]
+            cost = sum(self.token_counter(per_chunk[chunk_index][p] + " ") for p in added)
+            if used + cost > self.max_tokens:
+                if used:
+                    continue  # A smaller window further down the ranking may still fit
+                added = [position]  # Always keep the single best sentence
+                cost = self.token_counter(per_chunk[chunk_index][position])
+            kept.update(added)
+            used += cost
+            if used >= self.max_tokens:
+                break
+
+        compressed = []
+        for chunk_index, chunk in enumerate(chunks):
+            positions = sorted(selected.get(chunk_index, ()))
+            if not positions:
+                continue
+            parts = []
+            for i, position in enumerate(positions):
+                if i and position != positions[i - 1] + 1:
+                    parts.append(GAP_MARKER)
+                parts.append(per_chunk[chunk_index][position])
+            compressed.append(replace(chunk, text=" ".join(parts)))
+
+        tokens_after = sum(self.token_counter(chunk.text) for chunk in compressed)
+        logger.info(f"🗜️  Context compression: {tokens_before} → {tokens_after} tokens "
+                    f"({len(sentences)} sentences scored, {sum(len(p) for p in selected.values())} kept, "
+                    f"{len(compressed)}/{len(chunks)} chunks)")
+        return compressed
@@ -0,0 +1,286 @@
+"""Assemble the answer context: parse tool results, deduplicate, rank and pack into a token budget."""
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set
+
+from loguru import logger
+
+from config import settings
+from src.chunk_expansion import approx_token_count
+
+# search_kb: [Document N] Source: ORG | Region: X | Category: Y | filename (Relevance: 0.XXX) [chunk: id]
+_KB_HEADER_RE = re.compile(
+    r"^\[Document \d+\] Source: (?P<org>[^|]+) \| Region: (?P<region>[^|]+) \| Category: (?P<category>[^|]+) \| "
+    r"(?P<filename>[^(]+) \(Relevance: (?P<score>[\d.]+)\)(?: \[chunk: (?P<chunk>[^\]]+)\])?[ \t]*$",
+    re.MULTILINE,
+)
+# search_by_metadata: [ORG Document N] filename (Relevance: 0.XXX)
+_ORG_HEADER_RE = re.compile(
+    r"^\[(?P<org>[^\]]+?) Document \d+\] (?P<filename>[^(]+) \(Relevance: (?P<score>[\d.]+)\)[ \t]*$",
+    re.MULTILINE,
+)
+# SQL tools: "Document ID: ..." followed by Filename/Source/Region/Category lines, then the full content
+_SQL_DOCUMENT_RE = re.compile(
+    r"Document ID: (?P<document_id>.*?)\n\s*Filename: (?P<filename>.*?)\n\s*Source: (?P<org>.*?)\n"
+    r"\s*Region: (?P<region>.*?)\n\s*(?:Procedure )?Category: (?P<category>.*?)\n[^\n]*\n"
+    r"(?:\s*={10,}\n)?\s*(?:FULL CONTENT:|Full Content:)?\s*"
+    r"(?P<content>.*?)(?=\n={10,}\n(?:\[\d+\] )?Document ID:|\Z)",
+    re.DOTALL,
+)
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?。！？])\s+|\n+")
+_SHINGLE_WORD_RE = re.compile(r"\w+")
+
+
+@dataclass
+class ContextChunk:
+    """One retrieved passage with its provenance."""
+    text: str
+    filename: str = "Unknown"
+    source_org: str = "Unknown"
+    region: str = ""
+    category: str = ""
+    score: float = 0.0  # Relevance reported by the tool
+    chunk_id: str = ""
+    tool: str = ""
+    fused_score: float = 0.0  # Reciprocal-rank score across all tool results
+    shingles: Set[str] = field(default_factory=set, repr=False)
+
+    @property
+    def key(self) -> str:
+        """Identity used for exact deduplication."""
+        return self.chunk_id or f"{self.filename}:{hash(self.text)}"
+
+    def header(self, number: int) -> str:
+        """Citation header in the search_kb format the answer prompt is used to."""
+        return (f"[Document {number}] Source: {self.source_org} | Region: {self.region or 'Not categorized'} | "
+                f"Category: {self.category or 'Not categorized'} | {self.filename} (Relevance: {self.score:.3f})")
+
+
+def parse_tool_output(content: str, tool_name: str = "") -> List[ContextChunk]:
+    """
+    Split one tool result into chunks.
+
+    Understands the search_kb, search_by_metadata and SQL tool formats; any
+    other output becomes a single chunk.
+
+    Args:
+        content: ToolMessage content
+        tool_name: Name of the tool that produced it
+
+    Returns:
+        Chunks in the tool's ranking order
+    """
+    content = content or ""
+    for header_re in (_KB_HEADER_RE, _ORG_HEADER_RE):
+        headers = list(header_re.finditer(content))
+        if not headers:
+            continue
+        chunks = []
+        for i, match in enumerate(headers):
+            end = headers[i + 1].start() if i + 1 < len(headers) else len(content)
+            text = content[match.end():end].strip()
+            text = re.sub(r"\n---\s*$", "", text).strip()
+            if text.endswith("..."):
+                text = text[:-3].rstrip()  # search_kb's preview marker
+            groups = match.groupdict()
+            chunks.append(ContextChunk(
+                text=text,
+                filename=groups['filename'].strip(),
+                source_org=groups['org'].strip(),
+                region=(groups.get('region') or '').strip(),
+                category=(groups.get('category') or '').strip(),
+                score=float(groups['score']),
+                chunk_id=(groups.get('chunk') or '').strip(),
+                tool=tool_name,
+            ))
+        return chunks
+
+    documents = list(_SQL_DOCUMENT_RE.finditer(content))
+    if documents:
+        return [ContextChunk(
+            text=match.group('content').strip(),
+            filename=match.group('filename').strip(),
+            source_org=match.group('org').strip(),
+            region=match.group('region').strip(),
+            category=match.group('category').strip(),
+            score=1.0,
+            chunk_id=f"document:{match.group('document_id').strip()}",
+            tool=tool_name,
+        ) for match in documents]
+
+    text = content.strip()
+    if not text or text.startswith(("No relevant information", "No documents found", "Error")):
+        return []
+    return [ContextChunk(text=text, tool=tool_name)]
+
+
+def _shingles(text: str, size: int = 5) -> Set[str]:
+    """Word n-gram shingles for near-duplicate detection."""
+    words = _SHINGLE_WORD_RE.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class ContextPacker:
+    """
+    Build the generate_answer context from all retrieval tool results.
+
+    Results are parsed into chunks, fused across tool calls by reciprocal rank
+    (a chunk found by several multi-query searches ranks higher), deduplicated
+    by chunk id and by near-duplicate text (5-word shingle containment, which
+    also drops a truncated preview of a passage already present in full), and
+    packed best-first into a token budget. A chunk that does not fit is cut at
+    a sentence boundary rather than mid-word.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = None,
+        token_counter: Optional[Callable[[str], int]] = None,
+        duplicate_threshold: float = None,
+        min_chunk_tokens: int = 60,
+        rrf_k: int = 60,
+        compressor=None,
+    ):
+        """
+        Initialize the packer.
+
+        Args:
+            max_tokens: Token budget for the packed context (default from settings)
+            token_counter: Callable returning the token count of a string (default: ~4 chars/token)
+            duplicate_threshold: Share of a chunk's shingles found in a kept chunk that makes it a duplicate
+            min_chunk_tokens: Don't add a truncated chunk shorter than this
+            rrf_k: Reciprocal rank fusion constant
+            compressor: Optional SentenceCompressor applied to the chunks before packing
+        """
+        self.max_tokens = max_tokens or settings.answer_context_max_tokens
+        self.token_counter = token_counter or approx_token_count
+        self.duplicate_threshold = duplicate_threshold if duplicate_threshold is not None else settings.answer_context_duplicate_threshold
+        self.min_chunk_tokens = min_chunk_tokens
+        self.rrf_k = rrf_k
+        self.compressor = compressor
+
+    def collect(self, tool_outputs: List[tuple]) -> List[ContextChunk]:
+        """
+        Parse, fuse and deduplicate tool results.
+
+        Args:
+            tool_outputs: (tool_name, content) per ToolMessage
+
+        Returns:
+            Unique chunks, best first
+        """
+        by_key: Dict[str, ContextChunk] = {}
+        for tool_name, content in tool_outputs:
+            for rank, chunk in enumerate(parse_tool_output(content, tool_name)):
+                existing = by_key.get(chunk.key)
+                if existing is None:
+                    by_key[chunk.key] = existing = chunk
+                elif chunk.score > existing.score:
+                    existing.score = chunk.score
+                existing.fused_score += 1.0 / (self.rrf_k + rank + 1)
+
+        # Best first; ties go to the longer text so the full passage survives deduplication
+        ranked = sorted(by_key.values(), key=lambda c: (c.fused_score, c.score, len(c.text)), reverse=True)
+        unique: List[ContextChunk] = []
+        for chunk in ranked:
+            chunk.shingles = _shingles(chunk.text)
+            duplicate_of = None
+            for kept in unique:
+                smaller, larger = (chunk, kept) if len(chunk.shingles) <= len(kept.shingles) else (kept, chunk)
+                if smaller.shingles and len(smaller.shingles & larger.shingles) / len(smaller.shingles) >= self.duplicate_threshold:
+                    duplicate_of = kept
+                    break
+            if duplicate_of is None:
+                unique.append(chunk)
+            elif len(chunk.text) > len(duplicate_of.text):
+                # Keep the better-ranked slot but the fuller text
+                duplicate_of.text, duplicate_of.shingles = chunk.text, chunk.shingles
+        if len(unique) < len(by_key):
+            logger.info(f"🧹 Context dedup: {len(by_key)} chunks → {len(unique)} unique")
+        return unique
+
+    def _truncate(self, text: str, budget: int) -> str:
+        """Longest prefix of whole sentences within the token budget."""
+        kept = []
+        used = 0
+        for sentence in _SENTENCE_END_RE.split(text):
+            if not sentence.strip():
+                continue
+            cost = self.token_counter(sentence + " ")
+            if used + cost > budget:
+                break
+            kept.append(sentence)
+            used += cost
+        return " ".join(kept)
+
+    def pack(self, tool_outputs: List[tuple], question: str = "") -> str:
+        """
+        Build the context string for the answer prompt.
+
+        Args:
+            tool_outputs: (tool_name, content) per ToolMessage
+            question: User question (needed for compression)
+
+        Returns:
+            Packed context ("" if nothing was retrieved)
+        """
+        chunks = self.collect(tool_outputs)
+        if self.compressor is not None and question and chunks:
+            try:
+                chunks = self.compressor.compress(question, chunks)
+            except Exception as e:
+                logger.warning(f"Context compression failed, packing uncompressed chunks: {e}")
+        parts = []
+        used = 0
+        for chunk in chunks:
+            header = chunk.header(len(parts) + 1)
+            header_cost = self.token_counter(header + "\n")
+            remaining = self.max_tokens - used - header_cost
+            if remaining < self.min_chunk_tokens:
+                break
+            text = chunk.text
+            if self.token_counter(text) > remaining:
+                text = self._truncate(text, remaining)
+                if self.token_counter(text) < self.min_chunk_tokens:
+                    continue
+            parts.append(f"{header}\n{text}")
+            used += header_cost + self.token_counter(text)
+
+        logger.info(f"📦 Packed {len(parts)}/{len(chunks)} chunks into ~{used}/{self.max_tokens} tokens")
+        return "\n---\n".join(parts)
+
+
+def model_token_counter(llm) -> Callable[[str], int]:
+    """
+    Token counter for the context budget: ~4 chars/token unless the model's tokenizer is opted in.
+
+    With answer_context_tokenizer="model" the chat model's get_num_tokens is
+    used. Most LangChain chat models implement it by loading the GPT-2
+    tokenizer from transformers, which is slow to import and runs on the
+    request path, so the approximation is the default.
+
+    Args:
+        llm: LangChain chat model
+
+    Returns:
+        Callable returning token counts (falls back to ~4 chars/token)
+    """
+    if settings.answer_context_tokenizer == "model" and hasattr(llm, 'get_num_tokens'):
+        try:
+            llm.get_num_tokens("tokenizer check")
+            cache: Dict[str, int] = {}
+
+            def count(text: str) -> int:
+                if text not in cache:
+                    if len(cache) > 2048:
+                        cache.clear()
+                    cache[text] = llm.get_num_tokens(text)
+                return cache[text]
+
+            logger.info(f"Context packer counts tokens with {type(llm).__name__}'s tokenizer")
+            return count
+        except Exception as e:
+            logger.info(f"No tokenizer available for {type(llm).__name__} ({e}); using ~4 chars/token")
+    return approx_token_count
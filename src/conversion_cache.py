@@ -0,0 +1,160 @@
+"""Content-addressed cache for document-to-markdown conversion output."""
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable, Tuple
+
+from loguru import logger
+
+from config import settings
+
+
+def file_sha256(file_path: str, block_size: int = 1 << 20) -> str:
+    """
+    Hash a file's bytes.
+
+    Args:
+        file_path: Path to the file
+        block_size: Read size in bytes
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def package_version(package: str) -> str:
+    """Installed version of a package, or 'unknown' (used to build converter versions)."""
+    try:
+        from importlib.metadata import version
+        return version(package)
+    except Exception:
+        return "unknown"
+
+
+class ConversionCache:
+    """
+    Cache of converted markdown keyed by source content hash + converter version.
+
+    Entries are JSON files under ``cache_dir/<xx>/<key>.json`` holding the
+    cleaned markdown and the metadata extracted during conversion. Keys ignore
+    the file path, so moved or duplicated sources hit the same entry, and
+    bumping a converter version invalidates only that converter's entries.
+    Writes are atomic, so several processes can share one cache directory.
+    """
+
+    def __init__(self, cache_dir: str = None):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Cache directory (default from settings)
+        """
+        self.cache_dir = Path(cache_dir or settings.conversion_cache_dir)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(source_hash: str, converter: str, version: str) -> str:
+        """Build the cache key for a source hash and converter version."""
+        return hashlib.sha256(f"{converter}\0{version}\0{source_hash}".encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, file_path: str, converter: str, version: str,
+            source_hash: Optional[str] = None) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Look up a cached conversion.
+
+        Args:
+            file_path: Source file
+            converter: Converter name (e.g. 'markitdown')
+            version: Converter version string
+            source_hash: Precomputed source hash (optional)
+
+        Returns:
+            Tuple of (markdown_text, metadata) or None on a miss
+        """
+        source_hash = source_hash or file_sha256(file_path)
+        entry_path = self._entry_path(self.make_key(source_hash, converter, version))
+        try:
+            with open(entry_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable conversion cache entry {entry_path}: {e}")
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        logger.debug(f"Conversion cache hit for {Path(file_path).name} ({converter} {version})")
+        return entry['text'], entry.get('metadata', {})
+
+    def put(self, file_path: str, converter: str, version: str, text: str,
+            metadata: Optional[Dict[str, Any]] = None, source_hash: Optional[str] = None):
+        """
+        Store a conversion result.
+
+        Args:
+            file_path: Source file
+            converter: Converter name
+            version: Converter version string
+            text: Cleaned markdown
+            metadata: Metadata extracted during conversion
+            source_hash: Precomputed source hash (optional)
+        """
+        source_hash = source_hash or file_sha256(file_path)
+        entry_path = self._entry_path(self.make_key(source_hash, converter, version))
+        entry = {
+            'text': text,
+            'metadata': metadata or {},
+            'converter': converter,
+            'version': version,
+            'source_hash': source_hash,
+            'source': str(file_path),
+            'created_at': time.time(),
+        }
+        try:
+            entry_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=entry_path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, entry_path)
+        except Exception as e:
+            logger.warning(f"Could not write conversion cache entry for {file_path}: {e}")
+
+    def get_or_convert(self, file_path: str, converter: str, version: str,
+                       convert: Callable[[], Tuple[str, Dict[str, Any]]]) -> Tuple[str, Dict[str, Any]]:
+        """
+        Return a cached conversion or run ``convert`` and cache its result.
+
+        Empty conversions are not cached so failures are retried next run.
+
+        Args:
+            file_path: Source file
+            converter: Converter name
+            version: Converter version string
+            convert: Callable returning (markdown_text, metadata)
+
+        Returns:
+            Tuple of (markdown_text, metadata)
+        """
+        source_hash = file_sha256(file_path)
+        cached = self.get(file_path, converter, version, source_hash=source_hash)
+        if cached is not None:
+            return cached
+
+        text, metadata = convert()
+        if text and text.strip():
+            self.put(file_path, converter, version, text, metadata, source_hash=source_hash)
+        return text, metadata
@@ -0,0 +1,536 @@
+"""Curated Q&A index: answer reviewed standard questions directly, without the agent graph."""
+import hashlib
+import json
+import re
+import threading
+import xml.etree.ElementTree as ET
+from array import array
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from config import settings
+from src.answer_cache import normalize_query, _unit
+from src.query_expansion import STOPWORDS
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    logger.debug("numpy not available, curated Q&A similarity will use pure Python")
+
+DISCLAIMER_EN = (
+    "Please remember, this information is for educational purposes only and is not a substitute for "
+    "professional medical advice. Always discuss any specific medical questions or concerns with your "
+    "doctor or nurse."
+)
+DISCLAIMER_ZH = "請記住，此資訊僅供教育目的，不能代替專業醫療建議。請務必與您的醫生或護士討論任何具體的醫療問題或疑慮。"
+
+# XML procedure names carry the source leaflet's organization, language and id
+# ("Angioplasty And Stent Eng", "Sickkids Abscess Drainage Using Image Guidance 7059")
+_PROCEDURE_NOISE_RE = re.compile(r"^sickkids\s+|\s+(\(?(eng|en|chi|chinese|english)\)?|\d+)$", re.IGNORECASE)
+TOPIC_MIN_WORDS = 2  # Topic words a query must contain for a procedure-qualified question
+
+# Fallback text the Q&A generator wrote when it had no answer for a question
+_PLACEHOLDER_RE = re.compile(r"please consult with your (pediatric )?interventional radiologist for specific details",
+                             re.IGNORECASE)
+_COMPLETE_END_RE = re.compile(r"[.!?。！？)）」』\"”'’|\d\u2e80-\u9fff\uff00-\uffef]$")
+_BARE_MARKER_RE = re.compile(r"^([-*•]|\d+[.)])$")
+_OPEN_HEADING_RE = re.compile(r"^\*\*[^*]+[?:：？]\*\*$")
+_DANGLING_WORDS = {'a', 'an', 'and', 'as', 'at', 'by', 'for', 'from', 'if', 'in', 'into', 'is', 'of', 'on', 'or',
+                   'so', 'that', 'the', 'their', 'to', 'was', 'which', 'will', 'with', 'your'}
+
+
+def is_placeholder_answer(answer: str) -> bool:
+    """Whether an answer is the generator's "please consult ... for specific details" fallback."""
+    return bool(_PLACEHOLDER_RE.search(answer))
+
+
+def is_truncated_answer(answer: str) -> bool:
+    """
+    Whether an answer stops mid-sentence (generation cut off at the token limit).
+
+    Table rows and Chinese text end without a full stop, so an answer only
+    counts as cut off when its last line is English text without closing
+    punctuation or ending on a connective ("... return to"), a heading or
+    empty list item, an unclosed or short table row, an ellipsis, or the
+    answer leaves bold markup open.
+
+    Args:
+        answer: Answer text
+
+    Returns:
+        True if the answer looks truncated
+    """
+    lines = [line.strip() for line in answer.strip().splitlines() if line.strip()]
+    if not lines:
+        return True
+    if answer.count('**') % 2:
+        return True
+    last = lines[-1]
+    if last.startswith('|'):
+        # A table must end on a closed, full-width row that is not the header separator
+        start = len(lines) - 1
+        while start > 0 and lines[start - 1].startswith('|'):
+            start -= 1
+        return (not last.endswith('|') or not last.strip('|-: ') or start == len(lines) - 1
+                or last.count('|') < lines[start].count('|'))
+    if last.startswith('#') or _BARE_MARKER_RE.match(last) or _OPEN_HEADING_RE.match(last):
+        # Ends on a heading or an empty list item, before the content it introduces
+        return True
+    text = last.rstrip('*_ ').rstrip()
+    if not text or text[-1] in ',;(-–—‑' or text.endswith(('...', '…')):
+        return True
+    words = re.findall(r"[A-Za-z']+$", text)
+    if words and words[0].lower() in _DANGLING_WORDS:
+        return True
+    return not _COMPLETE_END_RE.search(text)
+
+
+def is_servable_answer(qa: "CuratedQA") -> bool:
+    """Whether a curated answer may be returned to a user as-is."""
+    return not is_placeholder_answer(qa.answer) and not is_truncated_answer(qa.answer)
+
+
+@dataclass
+class CuratedQA:
+    """A reviewed question with its answer."""
+    question: str
+    answer: str
+    language: str = "en"  # Language of the question ('en' / 'zh')
+    topic: str = ""  # Procedure the question is about when the question itself does not name it
+    category: str = ""
+    source: str = ""  # Source file name
+    source_path: str = ""
+    qna_id: str = ""
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def index_text(self) -> str:
+        """Text embedded for matching (generic questions are qualified with their procedure)."""
+        return f"{self.question} ({self.topic})" if self.topic else self.question
+
+
+def parse_qna_markdown(md_file: str) -> List[Dict[str, Any]]:
+    """
+    Load bilingual Q&A pairs from a curated *_qa.md file.
+
+    Args:
+        md_file: Path to markdown file
+
+    Returns:
+        List of Q&A pair dictionaries (qna_id, question, question_eng,
+        question_chi, answer, category, source)
+    """
+    with open(md_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    # Extract metadata from header
+    category_match = re.search(r'\*\*Category.*?:\*\*\s*(.+)', content)
+    category = category_match.group(1).strip() if category_match else ""
+    source_match = re.search(r'\*\*Source.*?:\*\*\s*(.+)', content)
+    source = source_match.group(1).strip() if source_match else ""
+
+    # Split by Q&A sections (## Q1:, ## Q2:, etc.)
+    qna_pattern = r'##\s+Q(\d+):\s*(.+?)(?=##\s+Q\d+:|---\s*$|\*Medical Disclaimer|\Z)'
+    qna_pairs = []
+    for qna_num, qna_content in re.findall(qna_pattern, content, re.DOTALL):
+        lines = qna_content.strip().split('\n')
+        question_eng = lines[0].strip() if lines else ""
+
+        chinese_q_match = re.search(r'##\s+問題\d+[：:]\s*(.+)', qna_content)
+        question_chi = chinese_q_match.group(1).strip() if chinese_q_match else ""
+
+        # Answer is everything after "**Answer 答案:**"
+        answer_match = re.search(r'\*\*Answer\s*答案\s*[：:]?\*\*\s*(.+)', qna_content, re.DOTALL)
+        if answer_match:
+            answer = re.sub(r'\n---\s*$', '', answer_match.group(1).strip()).strip()
+        elif chinese_q_match:
+            answer = qna_content[chinese_q_match.end():].strip()
+        else:
+            answer = '\n'.join(lines[1:]).strip()
+
+        qna_pairs.append({
+            'qna_id': f"q{qna_num}",
+            'question': f"{question_eng}\n{question_chi}" if question_chi else question_eng,
+            'question_eng': question_eng,
+            'question_chi': question_chi,
+            'answer': answer,
+            'category': category,
+            'source': source,
+        })
+    return qna_pairs
+
+
+def find_qa_files(kb_dir: str) -> List[Path]:
+    """
+    Find curated *_qa.md files in the numbered KB folders (01_..., 02_...).
+
+    Args:
+        kb_dir: KB root directory
+
+    Returns:
+        Sorted list of markdown paths
+    """
+    kb_path = Path(kb_dir)
+    if not kb_path.exists():
+        return []
+    qa_files = []
+    for folder in sorted(kb_path.iterdir()):
+        if folder.is_dir() and re.match(r'^\d{2}_', folder.name):
+            qa_files.extend(sorted(folder.rglob('*_qa.md')))
+    return qa_files
+
+
+def load_qna_xml(qna_dir: str) -> List[CuratedQA]:
+    """
+    Load Q&A pairs from the per-procedure XML files (see scripts/create_qna_xml.py).
+
+    Args:
+        qna_dir: Folder of *_qna*.xml files
+
+    Returns:
+        List of CuratedQA, with the procedure name as topic. ``metadata['reviewed']``
+        is True only for pairs a clinician marked ``reviewed="true"`` (on the
+        procedure or the qna element); generated pairs are unreviewed.
+    """
+    pairs = []
+    for xml_path in sorted(Path(qna_dir).glob('*.xml')):
+        try:
+            root = ET.parse(xml_path).getroot()
+        except ET.ParseError as e:
+            logger.warning(f"Skipping unreadable Q&A file {xml_path.name}: {e}")
+            continue
+        for procedure in root.iter('procedure'):
+            topic = procedure.get('name', '')
+            while _PROCEDURE_NOISE_RE.search(topic):
+                topic = _PROCEDURE_NOISE_RE.sub('', topic).strip()
+            procedure_reviewed = procedure.get('reviewed', '').lower() == 'true'
+            for qna in procedure.iter('qna'):
+                question = (qna.findtext('question') or '').strip()
+                answer = (qna.findtext('answer') or '').strip()
+                if not question or not answer:
+                    continue
+                pairs.append(CuratedQA(
+                    question=question,
+                    answer=answer,
+                    topic=topic,
+                    category=qna.findtext('metadata/question_category') or '',
+                    source=xml_path.name,
+                    source_path=str(xml_path),
+                    qna_id=qna.get('id', ''),
+                    metadata={'confidence': qna.findtext('metadata/confidence') or '',
+                              'curation_method': procedure.get('curation_method', ''),
+                              'reviewed': procedure_reviewed or qna.get('reviewed', '').lower() == 'true'},
+                ))
+    return pairs
+
+
+def load_qna_markdown_pairs(kb_dir: str) -> List[CuratedQA]:
+    """
+    Load the bilingual markdown Q&A pairs, one entry per question language.
+
+    Args:
+        kb_dir: KB root directory
+
+    Returns:
+        List of CuratedQA (English and Chinese questions share the bilingual answer)
+    """
+    pairs = []
+    for md_file in find_qa_files(kb_dir):
+        try:
+            parsed = parse_qna_markdown(str(md_file))
+        except Exception as e:
+            logger.warning(f"Skipping unreadable Q&A file {md_file.name}: {e}")
+            continue
+        for qna in parsed:
+            for language, question in (('en', qna['question_eng']), ('zh', qna['question_chi'])):
+                if question and qna['answer']:
+                    pairs.append(CuratedQA(
+                        question=question,
+                        answer=qna['answer'],
+                        language=language,
+                        category=qna['category'],
+                        source=md_file.name,
+                        source_path=str(md_file),
+                        qna_id=qna['qna_id'],
+                    ))
+    return pairs
+
+
+@dataclass
+class CuratedMatch:
+    """Result of CuratedAnswerIndex.match()."""
+    qa: CuratedQA
+    similarity: float
+    reason: str  # 'exact' or 'similar'
+
+
+class CuratedAnswerIndex:
+    """
+    Question-to-question index over the curated Q&A pairs.
+
+    Questions are matched two ways: normalized-text exact keys (no embedding
+    call) and cosine similarity against a flat matrix of unit question
+    embeddings, kept separately per language. Generic questions that only make
+    sense for one procedure ("Are there alternative options?") are embedded
+    together with the procedure name and only match when the user names the
+    procedure. A similar match must also beat the best question with a
+    different answer by ``margin``, so near-duplicate questions never pick an
+    answer at random. Embeddings are saved next to the KB fingerprint and
+    embedding model, so restarts do not re-embed unchanged pairs. Placeholder
+    and truncated answers are dropped on construction and never returned.
+    """
+
+    def __init__(
+        self,
+        embedding_model,
+        pairs: List[CuratedQA],
+        similarity_threshold: float = None,
+        margin: float = None,
+        cache_path: str = None,
+    ):
+        """
+        Initialize the index.
+
+        Args:
+            embedding_model: Model with embed_documents/embed_query (the KB embedding model)
+            pairs: Curated Q&A pairs to index
+            similarity_threshold: Minimum cosine similarity for a match (default from settings)
+            margin: Required lead over the best conflicting question (default from settings)
+            cache_path: Embedding cache file ("" disables it; default from settings)
+        """
+        self.embedding_model = embedding_model
+        self.pairs = [qa for qa in pairs if is_servable_answer(qa)]
+        if len(self.pairs) < len(pairs):
+            logger.warning(f"Skipping {len(pairs) - len(self.pairs)} curated Q&A pairs with placeholder "
+                           f"or truncated answers")
+        pairs = self.pairs
+        self.similarity_threshold = similarity_threshold if similarity_threshold is not None else settings.curated_qna_similarity_threshold
+        self.margin = margin if margin is not None else settings.curated_qna_margin
+        self.cache_path = settings.curated_qna_index_path if cache_path is None else cache_path
+        self._lock = threading.Lock()
+        self.stats = {'exact_hits': 0, 'similar_hits': 0, 'misses': 0}
+
+        # Exact keys: only questions with a single answer (generic questions repeat across procedures)
+        keys: Dict[Tuple[str, str], List[int]] = {}
+        for i, qa in enumerate(pairs):
+            keys.setdefault((qa.language, normalize_query(qa.question)), []).append(i)
+        self._exact = {key: ids[0] for key, ids in keys.items() if len({pairs[i].answer for i in ids}) == 1}
+
+        # Content words of each procedure, for the topic check on procedure-qualified questions
+        self._topic_words = {
+            qa.topic: {w for w in re.findall(r"\w+", qa.topic.lower()) if len(w) > 2 and w not in STOPWORDS}
+            for qa in pairs if qa.topic
+        }
+
+        vectors = self._load_or_embed()
+        self._languages: Dict[str, Dict[str, Any]] = {}
+        for i, (qa, vector) in enumerate(zip(pairs, vectors)):
+            partition = self._languages.setdefault(qa.language, {'ids': [], 'vectors': []})
+            partition['ids'].append(i)
+            partition['vectors'].append(vector)
+        for partition in self._languages.values():
+            partition['matrix'] = np.asarray(partition['vectors'], dtype=np.float32) if NUMPY_AVAILABLE else None
+
+        logger.info(f"Initialized curated Q&A index: {len(pairs)} questions, {len(self._exact)} exact keys "
+                    f"(threshold {self.similarity_threshold}, margin {self.margin})")
+
+    def _fingerprint(self) -> str:
+        """Hash of the embedding model and indexed texts."""
+        model = getattr(self.embedding_model, 'model_name', None) or getattr(self.embedding_model, 'model', None)
+        digest = hashlib.sha1(f"{type(self.embedding_model).__name__}:{model}".encode('utf-8'))
+        for qa in self.pairs:
+            digest.update(qa.index_text.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def _read_cache_header(self) -> Optional[Dict[str, Any]]:
+        """Header line of the embedding cache file (None if there is no readable file)."""
+        if not self.cache_path or not Path(self.cache_path).exists():
+            return None
+        with open(self.cache_path, 'rb') as f:
+            return json.loads(f.readline().decode('utf-8'))
+
+    def is_cached(self) -> bool:
+        """Whether the cache file holds this index's question embeddings (a rebuild would not embed)."""
+        if not self.pairs:
+            return True
+        try:
+            header = self._read_cache_header()
+        except Exception:
+            return False
+        return header is not None and header.get('fingerprint') == self._fingerprint()
+
+    def _load_or_embed(self) -> List[List[float]]:
+        """Unit question embeddings, from the cache file when the fingerprint matches."""
+        if not self.pairs:
+            return []
+        fingerprint = self._fingerprint()
+        path = Path(self.cache_path) if self.cache_path else None
+        if path is not None and path.exists():
+            try:
+                with open(path, 'rb') as f:
+                    header = json.loads(f.readline().decode('utf-8'))
+                    if header.get('fingerprint') == fingerprint:
+                        flat = array('f')
+                        flat.frombytes(f.read())
+                        dimension = header['dimension']
+                        logger.info(f"Loaded curated Q&A embeddings from {path}")
+                        return [list(flat[i * dimension:(i + 1) * dimension]) for i in range(len(self.pairs))]
+            except Exception as e:
+                logger.warning(f"Could not load curated Q&A embeddings from {path}: {e}")
+
+        logger.info(f"Embedding {len(self.pairs)} curated questions...")
+        vectors = [_unit(v) for v in self.embedding_model.embed_documents([qa.index_text for qa in self.pairs])]
+        if path is not None:
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with open(path, 'wb') as f:
+                    header = {'fingerprint': fingerprint, 'dimension': len(vectors[0]), 'count': len(vectors)}
+                    f.write((json.dumps(header) + '\n').encode('utf-8'))
+                    f.write(array('f', [v for vector in vectors for v in vector]).tobytes())
+                logger.info(f"💾 Saved curated Q&A embeddings to {path}")
+            except Exception as e:
+                logger.warning(f"Could not save curated Q&A embeddings to {path}: {e}")
+        return vectors
+
+    def _similarities(self, partition: Dict[str, Any], vector: List[float]) -> List[float]:
+        """Cosine similarity of the query with every question in a language partition."""
+        if partition['matrix'] is not None:
+            return (partition['matrix'] @ np.asarray(vector, dtype=np.float32)).tolist()
+        return [sum(a * b for a, b in zip(cached, vector)) for cached in partition['vectors']]
+
+    def _topic_mentioned(self, qa: CuratedQA, query_words: set) -> bool:
+        """Whether the query names the procedure a generic question is about."""
+        if not qa.topic:
+            return True
+        words = self._topic_words[qa.topic]
+        return len(words & query_words) >= min(TOPIC_MIN_WORDS, len(words))
+
+    def match(self, query: str, language: str = "en") -> Optional[CuratedMatch]:
+        """
+        Find a curated question matching the user question with high confidence.
+
+        Args:
+            query: User question
+            language: Query language ('en' / 'zh')
+
+        Returns:
+            CuratedMatch, or None if no curated question is a confident match
+        """
+        normalized = normalize_query(query)
+        exact = self._exact.get((language, normalized))
+        if exact is not None and not self.pairs[exact].topic:
+            with self._lock:
+                self.stats['exact_hits'] += 1
+            logger.info(f"📗 Curated Q&A HIT (exact: '{self.pairs[exact].question[:80]}')")
+            return CuratedMatch(self.pairs[exact], 1.0, 'exact')
+
+        partition = self._languages.get(language)
+        if not partition:
+            return None
+        vector = _unit(self.embedding_model.embed_query(query))
+        similarities = self._similarities(partition, vector)
+        query_words = set(re.findall(r"\w+", normalized))
+
+        ranked = sorted(range(len(similarities)), key=similarities.__getitem__, reverse=True)
+        best = None
+        for position in ranked:
+            qa = self.pairs[partition['ids'][position]]
+            if self._topic_mentioned(qa, query_words):
+                best = position
+                break
+        if best is None or similarities[best] < self.similarity_threshold:
+            with self._lock:
+                self.stats['misses'] += 1
+            score = similarities[best] if best is not None else 0.0
+            logger.info(f"Curated Q&A MISS (best similarity {score:.3f} < {self.similarity_threshold})")
+            return None
+
+        best_qa = self.pairs[partition['ids'][best]]
+        runner_up = next((similarities[p] for p in ranked
+                          if self.pairs[partition['ids'][p]].answer != best_qa.answer
+                          and self._topic_mentioned(self.pairs[partition['ids'][p]], query_words)), 0.0)
+        if similarities[best] - runner_up < self.margin:
+            with self._lock:
+                self.stats['misses'] += 1
+            logger.info(f"Curated Q&A MISS (ambiguous: {similarities[best]:.3f} vs {runner_up:.3f})")
+            return None
+
+        with self._lock:
+            self.stats['similar_hits'] += 1
+        logger.info(f"📗 Curated Q&A HIT (similarity {similarities[best]:.3f} to '{best_qa.question[:80]}')")
+        return CuratedMatch(best_qa, similarities[best], 'similar')
+
+    def format_answer(self, match: CuratedMatch, language: str = "en") -> str:
+        """
+        Reviewed answer with the disclaimer appended.
+
+        Args:
+            match: Match returned by match()
+            language: Query language ('en' / 'zh')
+
+        Returns:
+            Answer text
+        """
+        disclaimer = DISCLAIMER_ZH if language == "zh" else DISCLAIMER_EN
+        return f"{match.qa.answer}\n\n{disclaimer}"
+
+    def sources(self, match: CuratedMatch) -> List[Dict[str, Any]]:
+        """
+        Source entries for a match, in the pipeline's source format.
+
+        Args:
+            match: Match returned by match()
+
+        Returns:
+            List with one source dict
+        """
+        qa = match.qa
+        return [{
+            'filename': qa.source,
+            'source_org': 'Curated Q&A',
+            'category': qa.category or qa.topic,
+            'score': round(match.similarity, 4),
+            'tool': 'curated_qna',
+            'question': qa.question,
+            'content': qa.answer[:200] + '...' if len(qa.answer) > 200 else qa.answer,
+        }]
+
+
+_curated_index: Optional[CuratedAnswerIndex] = None
+_curated_index_loaded = False
+_curated_index_lock = threading.Lock()
+
+
+def get_curated_index(embedding_model) -> Optional[CuratedAnswerIndex]:
+    """
+    Get the shared curated Q&A index, building it on first use.
+
+    Args:
+        embedding_model: KB embedding model
+
+    Returns:
+        CuratedAnswerIndex, or None if no curated Q&A files were found. Only the
+        clinician-reviewed *_qa.md pairs are indexed unless
+        ``curated_qna_include_xml`` opts in to reviewed XML pairs.
+    """
+    global _curated_index, _curated_index_loaded
+    with _curated_index_lock:
+        if not _curated_index_loaded:
+            _curated_index_loaded = True
+            pairs = load_qna_markdown_pairs(settings.curated_qna_kb_dir)
+            if settings.curated_qna_include_xml:
+                # The XML pairs are model-generated; only clinician-reviewed ones are served
+                xml_pairs = load_qna_xml(settings.qna_xml_dir)
+                pairs += [qa for qa in xml_pairs if qa.metadata.get('reviewed')]
+                logger.info(f"Curated Q&A: {len(pairs)} reviewed pairs ({len(xml_pairs)} XML pairs read)")
+            if not pairs:
+                logger.info("No curated Q&A pairs found; curated answers disabled")
+            else:
+                _curated_index = CuratedAnswerIndex(embedding_model, pairs)
+        return _curated_index
@@ -1,6 +1,16 @@
-"""Data models for structured RAG outputs."""
+"""Data models for structured RAG outputs and document chunks."""
+from dataclasses import dataclass
 from pydantic import BaseModel, Field
-from typing import List, Literal
+from typing import Any, Dict, List, Literal
+
+
+@dataclass
+class DocumentChunk:
+    """Represents a chunk of document text with metadata."""
+    content: str
+    metadata: Dict[str, Any]
+    chunk_id: str
+
 
 class RAGResponse(BaseModel):
     """Structured response for RAG queries."""
@@ -1,6 +1,10 @@
 """SQLite database for storing full document content."""
 import sqlite3
+import hashlib
 import json
+import re
+import threading
+import zlib
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 from datetime import datetime
@@ -8,19 +12,183 @@ from loguru import logger
 
 from config import settings
 
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+    logger.debug("zstandard not available, zstd compression will fall back to zlib")
+
+
+# One-byte codec tags prefixed to compressed BLOBs. Plain TEXT values are never tagged,
+# so compressed and uncompressed rows can live side by side in the same table.
+_CODEC_TAGS = {"zlib": b"z", "zstd": b"s"}
+
+# Metadata fields whose values repeat across many rows (same org/region/category on every
+# chunk of every document). These are stored as integer references into metadata_values.
+DICTIONARY_FIELDS = (
+    'source', 'filename', 'file_type', 'document_id', 'source_org', 'region',
+    'procedure_category', 'procedure_type', 'doc_type', 'age_group',
+    'target_audience', 'chunking_method', 'section_title',
+)
+_DICT_MARKER = "__dict__"
+
+
+def compress_text(text: str, codec: str = "zlib", level: int = 6) -> Any:
+    """
+    Compress text for storage in a content column.
+
+    Args:
+        text: Text to compress
+        codec: 'none', 'zlib' or 'zstd' (zstd falls back to zlib if not installed)
+        level: Compression level
+
+    Returns:
+        Original string for 'none', otherwise a tagged bytes object
+    """
+    if codec == "none" or text is None:
+        return text
+    if codec == "zstd" and not ZSTD_AVAILABLE:
+        codec = "zlib"
+    raw = text.encode('utf-8')
+    if codec == "zstd":
+        return _CODEC_TAGS["zstd"] + zstandard.ZstdCompressor(level=level).compress(raw)
+    return _CODEC_TAGS["zlib"] + zlib.compress(raw, level)
+
+
+def decompress_text(value: Any) -> str:
+    """
+    Decompress a value read from a content column.
+
+    Args:
+        value: Stored value (plain str or tagged bytes)
+
+    Returns:
+        Decompressed text
+    """
+    if value is None or isinstance(value, str):
+        return value
+    value = bytes(value)
+    tag, payload = value[:1], value[1:]
+    if tag == _CODEC_TAGS["zlib"]:
+        return zlib.decompress(payload).decode('utf-8')
+    if tag == _CODEC_TAGS["zstd"]:
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("Row is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(payload).decode('utf-8')
+    # Untagged BLOB: treat as raw UTF-8
+    return value.decode('utf-8', errors='ignore')
+
+
+def _like_to_regex(pattern: str) -> "re.Pattern":
+    """Translate an SQL LIKE pattern into an equivalent case-insensitive regex."""
+    parts = []
+    for char in pattern:
+        if char == '%':
+            parts.append('.*')
+        elif char == '_':
+            parts.append('.')
+        else:
+            parts.append(re.escape(char))
+    return re.compile('^' + ''.join(parts) + '$', re.IGNORECASE | re.DOTALL)
+
+
+class LazyRecord(dict):
+    """
+    Row dict whose compressed 'content' is only decompressed on first access.
+
+    Behaves like a plain dict for callers: indexing, get(), iteration and
+    items() all see the decompressed text.
+    """
+
+    def __init__(self, *args, raw_content: Any = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._raw_content = raw_content
+
+    def _materialize(self):
+        if self._raw_content is not None:
+            dict.__setitem__(self, 'content', decompress_text(self._raw_content))
+            self._raw_content = None
+
+    def __missing__(self, key):
+        if key == 'content' and self._raw_content is not None:
+            self._materialize()
+            return dict.__getitem__(self, key)
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key == 'content' and self._raw_content is not None or dict.__contains__(self, key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        self._materialize()
+        return dict.keys(self)
+
+    def values(self):
+        self._materialize()
+        return dict.values(self)
+
+    def items(self):
+        self._materialize()
+        return dict.items(self)
+
+    def __iter__(self):
+        self._materialize()
+        return dict.__iter__(self)
+
+    def __len__(self):
+        return dict.__len__(self) + (1 if self._raw_content is not None else 0)
+
+    def copy(self):
+        self._materialize()
+        return dict(self)
+
+    def __repr__(self):
+        self._materialize()
+        return dict.__repr__(self)
+
 
 class DocumentDatabase:
     """SQLite database for storing full document content and metadata."""
 
-    def __init__(self, db_path: str = None):
+    # Columns copied into result dicts (content and metadata are handled separately)
+    DOCUMENT_FIELDS = [
+        'document_id', 'filename', 'source_org', 'region', 'procedure_category',
+        'procedure_type', 'file_path', 'created_at', 'updated_at',
+    ]
+    REVIEW_FIELDS = ['doc_type', 'age_group', 'target_audience']
+    CHUNK_FIELDS = [
+        'chunk_id', 'document_id', 'section_title', 'chunk_index', 'chunking_method',
+    ]
+
+    def __init__(self, db_path: str = None, compression: str = None):
         """
         Initialize document database.
 
         Args:
             db_path: Path to SQLite database file (default: ./document_db.sqlite)
+            compression: Codec for new content rows: 'none', 'zlib' or 'zstd'
+                (default from settings). Existing rows are readable under any setting.
         """
         self.db_path = db_path or getattr(settings, 'document_db_path', './document_db.sqlite')
+        self.compression = compression or getattr(settings, 'document_db_compression', 'none')
+        self.compression_level = getattr(settings, 'document_db_compression_level', 6)
+        if self.compression == "zstd" and not ZSTD_AVAILABLE:
+            logger.warning("zstd compression requested but zstandard is not installed, using zlib")
+            self.compression = "zlib"
         self.connection = None
+        # Per-thread read connections (tools run concurrently in the API server's worker threads)
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        # In-memory mirror of the metadata_values dictionary table
+        self._value_ids: Dict[tuple, int] = {}
+        self._values_by_id: Dict[int, tuple] = {}
         self._initialize_db()
 
     def _initialize_db(self):
@@ -67,6 +235,16 @@ class DocumentDatabase:
             )
         """)
 
+        # Dictionary of repeated metadata values (used when compression is enabled)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS metadata_values (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                field TEXT NOT NULL,
+                value TEXT NOT NULL,
+                UNIQUE(field, value)
+            )
+        """)
+
         # Migrate: add new columns to existing documents table if missing
         self._migrate_add_columns(cursor)
 
@@ -98,9 +276,16 @@ class DocumentDatabase:
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_chunk_id ON chunks(chunk_id)
         """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_chunks_doc_position ON chunks(document_id, chunk_index)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_file_path ON documents(file_path)
+        """)
 
         self.connection.commit()
-        logger.info(f"Initialized document database at {self.db_path}")
+        self._load_value_dictionary()
+        logger.info(f"Initialized document database at {self.db_path} (compression: {self.compression})")
 
     def _migrate_add_columns(self, cursor):
         """Add new columns to existing tables if they don't exist (safe migration)."""
@@ -118,6 +303,118 @@ class DocumentDatabase:
                 cursor.execute(f"ALTER TABLE documents ADD COLUMN {col_name} {col_type}")
                 logger.info(f"Migrated: added column '{col_name}' to documents table")
 
+    def _reader(self) -> sqlite3.Connection:
+        """
+        Connection for read queries, one per thread.
+
+        Concurrent reads on separate connections don't interleave on a shared
+        cursor; writes keep using ``self.connection``.
+
+        Returns:
+            sqlite3 connection for the calling thread (the main connection for in-memory databases)
+        """
+        if self.db_path == ":memory:":
+            return self.connection
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, check_same_thread=False)
+            connection.row_factory = sqlite3.Row
+            self._local.connection = connection
+            with self._readers_lock:
+                self._readers.append(connection)
+        return connection
+
+    def _load_value_dictionary(self):
+        """Load the metadata_values table into memory."""
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT id, field, value FROM metadata_values")
+        for row in cursor.fetchall():
+            self._value_ids[(row['field'], row['value'])] = row['id']
+            self._values_by_id[row['id']] = (row['field'], row['value'])
+
+    def _value_id(self, cursor, field: str, value: str) -> int:
+        """Get (or create) the dictionary id for a metadata value."""
+        key = (field, value)
+        value_id = self._value_ids.get(key)
+        if value_id is None:
+            cursor.execute(
+                "INSERT OR IGNORE INTO metadata_values (field, value) VALUES (?, ?)", key
+            )
+            cursor.execute(
+                "SELECT id FROM metadata_values WHERE field = ? AND value = ?", key
+            )
+            value_id = cursor.fetchone()['id']
+            self._value_ids[key] = value_id
+            self._values_by_id[value_id] = key
+        return value_id
+
+    def _encode_metadata(self, cursor, metadata: Dict[str, Any]) -> str:
+        """
+        Serialize metadata to JSON, dictionary-encoding repeated values when compression is on.
+
+        Args:
+            cursor: Active cursor (used to register new dictionary values)
+            metadata: Metadata dict
+
+        Returns:
+            JSON string
+        """
+        if self.compression == "none":
+            return json.dumps(metadata)
+
+        encoded = {}
+        dict_fields = []
+        for key, value in metadata.items():
+            if key in DICTIONARY_FIELDS and isinstance(value, str):
+                encoded[key] = self._value_id(cursor, key, value)
+                dict_fields.append(key)
+            else:
+                encoded[key] = value
+        if dict_fields:
+            encoded[_DICT_MARKER] = dict_fields
+        return json.dumps(encoded, separators=(',', ':'))
+
+    def _decode_metadata(self, metadata_json: Optional[str]) -> Dict[str, Any]:
+        """Parse a metadata_json column, resolving dictionary-encoded values."""
+        if not metadata_json:
+            return {}
+        metadata = json.loads(metadata_json)
+        dict_fields = metadata.pop(_DICT_MARKER, None)
+        if dict_fields:
+            missing = [metadata[f] for f in dict_fields if metadata.get(f) not in self._values_by_id]
+            if missing:
+                # Another connection may have added values since we loaded the dictionary
+                self._load_value_dictionary()
+            for field in dict_fields:
+                entry = self._values_by_id.get(metadata.get(field))
+                metadata[field] = entry[1] if entry else ''
+        return metadata
+
+    def _compress(self, text: str) -> Any:
+        """Compress content with the configured codec."""
+        return compress_text(text, self.compression, self.compression_level)
+
+    def _record(self, row: sqlite3.Row, fields: List[str], content_column: str = 'content') -> LazyRecord:
+        """
+        Build a lazily-decompressed record from a row.
+
+        Args:
+            row: SQLite row
+            fields: Column names to copy into the record (besides content/metadata)
+            content_column: Name of the content column
+
+        Returns:
+            LazyRecord with 'content' and 'metadata' keys
+        """
+        record = LazyRecord(
+            {field: row[field] for field in fields},
+            raw_content=row[content_column] if not isinstance(row[content_column], str) else None,
+        )
+        if isinstance(row[content_column], str):
+            record['content'] = row[content_column]
+        record['metadata'] = self._decode_metadata(row['metadata_json'])
+        return record
+
     def store_document(
         self,
         document_id: str,
@@ -152,7 +449,7 @@ class DocumentDatabase:
             file_path = metadata.get('source', '')
 
             # Store full metadata as JSON
-            metadata_json = json.dumps(metadata)
+            metadata_json = self._encode_metadata(cursor, metadata)
 
             cursor.execute("""
                 INSERT OR REPLACE INTO documents (
@@ -163,7 +460,7 @@ class DocumentDatabase:
             """, (
                 document_id,
                 filename,
-                content,
+                self._compress(content),
                 source_org,
                 region,
                 procedure_category,
@@ -211,7 +508,7 @@ class DocumentDatabase:
         """
         try:
             cursor = self.connection.cursor()
-            metadata_json = json.dumps(metadata or {})
+            metadata_json = self._encode_metadata(cursor, metadata or {})
 
             cursor.execute("""
                 INSERT OR REPLACE INTO chunks (
@@ -221,7 +518,7 @@ class DocumentDatabase:
             """, (
                 chunk_id,
                 document_id,
-                content,
+                self._compress(content),
                 section_title,
                 chunk_index,
                 chunking_method,
@@ -245,28 +542,80 @@ class DocumentDatabase:
             List of chunk dicts ordered by chunk_index
         """
         try:
-            cursor = self.connection.cursor()
+            cursor = self._reader().cursor()
             cursor.execute("""
                 SELECT * FROM chunks WHERE document_id = ? ORDER BY chunk_index
             """, (document_id,))
 
-            chunks = []
-            for row in cursor.fetchall():
-                metadata = json.loads(row['metadata_json']) if row['metadata_json'] else {}
-                chunks.append({
-                    'chunk_id': row['chunk_id'],
-                    'document_id': row['document_id'],
-                    'content': row['content'],
-                    'section_title': row['section_title'],
-                    'chunk_index': row['chunk_index'],
-                    'chunking_method': row['chunking_method'],
-                    'metadata': metadata,
-                })
-            return chunks
+            return [self._record(row, self.CHUNK_FIELDS) for row in cursor.fetchall()]
         except Exception as e:
             logger.error(f"Error retrieving chunks for {document_id}: {e}")
             return []
 
+    def get_chunk_windows(self, windows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Fetch chunks for several windows in one batched query.
+
+        Each window is either a position range
+        ``{'document_id': ..., 'start': int, 'end': int}`` or a whole section
+        ``{'document_id': ..., 'section_title': ...}``. Range lookups use the
+        (document_id, chunk_index) index.
+
+        Args:
+            windows: List of window specifications
+
+        Returns:
+            List of chunk dicts ordered by document_id and chunk_index
+        """
+        if not windows:
+            return []
+
+        conditions = []
+        params = []
+        for window in windows:
+            if window.get('section_title') is not None:
+                conditions.append("(document_id = ? AND section_title = ?)")
+                params.extend([window['document_id'], window['section_title']])
+            else:
+                conditions.append("(document_id = ? AND chunk_index BETWEEN ? AND ?)")
+                params.extend([window['document_id'], window['start'], window['end']])
+
+        try:
+            cursor = self._reader().cursor()
+            cursor.execute(f"""
+                SELECT * FROM chunks
+                WHERE {' OR '.join(conditions)}
+                ORDER BY document_id, chunk_index
+            """, params)
+            return [self._record(row, self.CHUNK_FIELDS) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Error retrieving chunk windows: {e}")
+            return []
+
+    def resolve_document_ids(self, file_paths: List[str]) -> Dict[str, str]:
+        """
+        Map source file paths (chunk metadata 'source') to document IDs.
+
+        Args:
+            file_paths: List of file paths as stored in metadata['source']
+
+        Returns:
+            Dict of file_path -> document_id for paths found in the database
+        """
+        file_paths = [p for p in set(file_paths) if p]
+        if not file_paths:
+            return {}
+        try:
+            placeholders = ','.join('?' * len(file_paths))
+            cursor = self._reader().cursor()
+            cursor.execute(f"""
+                SELECT file_path, document_id FROM documents WHERE file_path IN ({placeholders})
+            """, file_paths)
+            return {row['file_path']: row['document_id'] for row in cursor.fetchall()}
+        except Exception as e:
+            logger.error(f"Error resolving document IDs: {e}")
+            return {}
+
     def get_all_documents(self) -> List[Dict[str, Any]]:
         """
         Retrieve all documents (for review export).
@@ -275,29 +624,13 @@ class DocumentDatabase:
             List of all document dicts
         """
         try:
-            cursor = self.connection.cursor()
+            cursor = self._reader().cursor()
             cursor.execute("SELECT * FROM documents ORDER BY filename")
 
-            documents = []
-            for row in cursor.fetchall():
-                metadata = json.loads(row['metadata_json']) if row['metadata_json'] else {}
-                documents.append({
-                    'document_id': row['document_id'],
-                    'filename': row['filename'],
-                    'content': row['content'],
-                    'source_org': row['source_org'],
-                    'region': row['region'],
-                    'procedure_category': row['procedure_category'],
-                    'procedure_type': row['procedure_type'],
-                    'doc_type': row['doc_type'] if 'doc_type' in row.keys() else '',
-                    'age_group': row['age_group'] if 'age_group' in row.keys() else '',
-                    'target_audience': row['target_audience'] if 'target_audience' in row.keys() else '',
-                    'file_path': row['file_path'],
-                    'metadata': metadata,
-                    'created_at': row['created_at'],
-                    'updated_at': row['updated_at']
-                })
-            return documents
+            return [
+                self._record(row, self.DOCUMENT_FIELDS + self.REVIEW_FIELDS)
+                for row in cursor.fetchall()
+            ]
         except Exception as e:
             logger.error(f"Error retrieving all documents: {e}")
             return []
@@ -313,29 +646,14 @@ class DocumentDatabase:
             Document dict with content and metadata, or None if not found
         """
         try:
-            cursor = self.connection.cursor()
+            cursor = self._reader().cursor()
             cursor.execute("""
                 SELECT * FROM documents WHERE document_id = ?
             """, (document_id,))
 
             row = cursor.fetchone()
             if row:
-                # Parse metadata JSON
-                metadata = json.loads(row['metadata_json']) if row['metadata_json'] else {}
-
-                return {
-                    'document_id': row['document_id'],
-                    'filename': row['filename'],
-                    'content': row['content'],
-                    'source_org': row['source_org'],
-                    'region': row['region'],
-                    'procedure_category': row['procedure_category'],
-                    'procedure_type': row['procedure_type'],
-                    'file_path': row['file_path'],
-                    'metadata': metadata,
-                    'created_at': row['created_at'],
-                    'updated_at': row['updated_at']
-                }
+                return self._record(row, self.DOCUMENT_FIELDS)
             return None
         except Exception as e:
             logger.error(f"Error retrieving document {document_id}: {e}")
@@ -357,29 +675,12 @@ class DocumentDatabase:
                 return []
 
             placeholders = ','.join('?' * len(document_ids))
-            cursor = self.connection.cursor()
+            cursor = self._reader().cursor()
             cursor.execute(f"""
                 SELECT * FROM documents WHERE document_id IN ({placeholders})
             """, document_ids)
 
-            documents = []
-            for row in cursor.fetchall():
-                metadata = json.loads(row['metadata_json']) if row['metadata_json'] else {}
-                documents.append({
-                    'document_id': row['document_id'],
-                    'filename': row['filename'],
-                    'content': row['content'],
-                    'source_org': row['source_org'],
-                    'region': row['region'],
-                    'procedure_category': row['procedure_category'],
-                    'procedure_type': row['procedure_type'],
-                    'file_path': row['file_path'],
-                    'metadata': metadata,
-                    'created_at': row['created_at'],
-                    'updated_at': row['updated_at']
-                })
-
-            return documents
+            return [self._record(row, self.DOCUMENT_FIELDS) for row in cursor.fetchall()]
         except Exception as e:
             logger.error(f"Error retrieving documents: {e}")
             logger.exception(e)
@@ -411,7 +712,7 @@ class DocumentDatabase:
             List of matching documents
         """
         try:
-            cursor = self.connection.cursor()
+            cursor = self._reader().cursor()
             conditions = []
             params = []
 
@@ -433,15 +734,18 @@ class DocumentDatabase:
                     filename_pattern = f"%{filename_pattern}%"
                 conditions.append("filename LIKE ?")
                 params.append(filename_pattern)
+            content_regex = None
             if content:
                 # Auto-add wildcards if not present
                 if '%' not in content:
                     content = f"%{content}%"
-                conditions.append("content LIKE ?")
+                # Plain TEXT rows can be filtered by SQLite; compressed BLOB rows are
+                # matched in Python after decompression
+                conditions.append("(typeof(content) = 'blob' OR content LIKE ?)")
                 params.append(content)
+                content_regex = _like_to_regex(content)
 
             where_clause = " AND ".join(conditions) if conditions else "1=1"
-            params.append(limit)
 
             query = f"""
                 SELECT * FROM documents
@@ -449,27 +753,21 @@ class DocumentDatabase:
                 ORDER BY
                     CASE WHEN region = 'Hong Kong' THEN 1 ELSE 2 END ASC,
                     updated_at DESC
-                LIMIT ?
             """
+            if content_regex is None:
+                query += " LIMIT ?"
+                params.append(limit)
 
             cursor.execute(query, params)
 
             documents = []
-            for row in cursor.fetchall():
-                metadata = json.loads(row['metadata_json']) if row['metadata_json'] else {}
-                documents.append({
-                    'document_id': row['document_id'],
-                    'filename': row['filename'],
-                    'content': row['content'],
-                    'source_org': row['source_org'],
-                    'region': row['region'],
-                    'procedure_category': row['procedure_category'],
-                    'procedure_type': row['procedure_type'],
-                    'file_path': row['file_path'],
-                    'metadata': metadata,
-                    'created_at': row['created_at'],
-                    'updated_at': row['updated_at']
-                })
+            for row in cursor:
+                record = self._record(row, self.DOCUMENT_FIELDS)
+                if content_regex is not None and not content_regex.match(record['content']):
+                    continue
+                documents.append(record)
+                if len(documents) >= limit:
+                    break
 
             logger.debug(f"Found {len(documents)} documents matching filters")
             return documents
@@ -481,7 +779,7 @@ class DocumentDatabase:
     def get_stats(self) -> Dict[str, Any]:
         """Get database statistics."""
         try:
-            cursor = self.connection.cursor()
+            cursor = self._reader().cursor()
 
             cursor.execute("SELECT COUNT(*) as total FROM documents")
             total = cursor.fetchone()['total']
@@ -494,8 +792,17 @@ class DocumentDatabase:
             """)
             stats = cursor.fetchone()
 
+            cursor.execute("""
+                SELECT SUM(typeof(content) = 'blob') as compressed, COUNT(*) as total
+                FROM chunks
+            """)
+            chunk_stats = cursor.fetchone()
+
             return {
                 'total_documents': total,
+                'total_chunks': chunk_stats['total'] if chunk_stats else 0,
+                'compressed_chunks': (chunk_stats['compressed'] or 0) if chunk_stats else 0,
+                'compression': self.compression,
                 'unique_orgs': stats['orgs'] if stats else 0,
                 'unique_regions': stats['regions'] if stats else 0,
                 'unique_categories': stats['categories'] if stats else 0
@@ -504,19 +811,102 @@ class DocumentDatabase:
             logger.error(f"Error getting stats: {e}")
             return {}
 
+    def get_kb_version(self) -> str:
+        """
+        Short fingerprint of the stored knowledge base.
+
+        Changes whenever documents or chunks are added, replaced or removed
+        (replaced rows get new row ids), so caches keyed on it go stale after
+        re-ingestion.
+
+        Returns:
+            12-character hex string ('' on error)
+        """
+        try:
+            cursor = self._reader().cursor()
+            cursor.execute("SELECT COUNT(*) AS n, MAX(id) AS max_id, MAX(updated_at) AS updated FROM documents")
+            documents = cursor.fetchone()
+            cursor.execute("SELECT COUNT(*) AS n, MAX(id) AS max_id FROM chunks")
+            chunks = cursor.fetchone()
+            fingerprint = f"{documents['n']}:{documents['max_id']}:{documents['updated']}:{chunks['n']}:{chunks['max_id']}"
+            return hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()[:12]
+        except Exception as e:
+            logger.error(f"Error computing KB version: {e}")
+            return ''
+
     def reset_database(self):
         """Reset database (delete all documents and chunks)."""
         try:
             cursor = self.connection.cursor()
             cursor.execute("DELETE FROM chunks")
             cursor.execute("DELETE FROM documents")
+            cursor.execute("DELETE FROM metadata_values")
             self.connection.commit()
+            self._value_ids.clear()
+            self._values_by_id.clear()
             logger.warning("Database reset - all documents and chunks deleted")
         except Exception as e:
             logger.error(f"Error resetting database: {e}")
 
+    def convert_storage(self, compression: str, vacuum: bool = True) -> Dict[str, int]:
+        """
+        Rewrite every content and metadata column in place using the given codec.
+
+        Rows are decoded with whatever format they were written in, so this both
+        compresses plain databases and decompresses (compression='none') compressed ones.
+
+        Args:
+            compression: Target codec: 'none', 'zlib' or 'zstd'
+            vacuum: Run VACUUM afterwards so freed pages are returned to the filesystem
+
+        Returns:
+            Dict with 'documents' and 'chunks' counts of rewritten rows
+        """
+        if compression == "zstd" and not ZSTD_AVAILABLE:
+            logger.warning("zstandard is not installed, converting with zlib instead")
+            compression = "zlib"
+        self.compression = compression
+
+        counts = {'documents': 0, 'chunks': 0}
+        cursor = self.connection.cursor()
+        try:
+            for table, key in (('documents', 'document_id'), ('chunks', 'chunk_id')):
+                rows = self.connection.execute(
+                    f"SELECT {key}, content, metadata_json FROM {table}"
+                ).fetchall()
+                for row in rows:
+                    text = decompress_text(row['content'])
+                    metadata = self._decode_metadata(row['metadata_json'])
+                    cursor.execute(
+                        f"UPDATE {table} SET content = ?, metadata_json = ? WHERE {key} = ?",
+                        (self._compress(text), self._encode_metadata(cursor, metadata), row[key])
+                    )
+                    counts[table] += 1
+            if compression == "none":
+                cursor.execute("DELETE FROM metadata_values")
+                self._value_ids.clear()
+                self._values_by_id.clear()
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+
+        if vacuum:
+            self.connection.execute("VACUUM")
+
+        logger.info(
+            f"Converted {counts['documents']} documents and {counts['chunks']} chunks "
+            f"to compression='{compression}'"
+        )
+        return counts
+
     def close(self):
-        """Close database connection."""
+        """Close database connections."""
+        with self._readers_lock:
+            for connection in self._readers:
+                connection.close()
+            self._readers.clear()
+        self._local = threading.local()
         if self.connection:
             self.connection.close()
             logger.debug("Database connection closed")
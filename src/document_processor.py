@@ -2,14 +2,22 @@
 import os
 import re
 from pathlib import Path
-from typing import List, Dict, Any, Optional
-from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Tuple
 
-from markitdown import MarkItDown
 import markdown
 from bs4 import BeautifulSoup
 from loguru import logger
 
+from config import settings
+from src.data_models import DocumentChunk
+from src.conversion_cache import ConversionCache, package_version
+from src.keyword_matcher import KeywordMatcher
+from src.worker_pool import TimedWorkerPool
+
+# Bump when conversion/cleaning logic changes to invalidate cached conversions
+HTML_CONVERTER_VERSION = "1"
+MARKITDOWN_CONVERTER_VERSION = "1"
+
 try:
     import markdownify
     MARKDOWNIFY_AVAILABLE = True
@@ -18,18 +26,57 @@ except ImportError:
     logger.debug("markdownify not available, HTML loading will use basic extraction")
 
 
-@dataclass
-class DocumentChunk:
-    """Represents a chunk of document text with metadata."""
-    content: str
-    metadata: Dict[str, Any]
-    chunk_id: str
+# Keywords for each procedure category (see DocumentProcessor._classify_procedure_category)
+PROCEDURE_CATEGORY_KEYWORDS = {
+    'venous_access': [
+        'picc', 'peripherally inserted central catheter', 'central venous catheter',
+        'cvc', 'central line', 'venous access', 'vascular access',
+        'catheter insertion', 'catheter placement', 'catheter removal',
+        'tunneled catheter', 'port-a-cath', 'portacath', 'implanted port',
+        'hickman', 'broviac', 'vascular catheter'
+    ],
+    'angiogram_related': [
+        'angiogram', 'angiography', 'angioplasty', 'angiographic',
+        'vascular imaging', 'arteriography', 'venography',
+        'selective angiography', 'digital subtraction angiography', 'dsa',
+        'ct angiography', 'cta', 'mr angiography', 'mra',
+        'balloon angioplasty', 'stent placement', 'stent insertion',
+        'vascular stent', 'vascular intervention'
+    ],
+    'embolization_related': [
+        'embolization', 'embolotherapy', 'embolize', 'embolic',
+        'transarterial embolization', 'tae', 'selective embolization',
+        'coil embolization', 'particle embolization', 'glue embolization',
+        'vascular embolization', 'arterial embolization'
+    ],
+    'biopsy_related': [
+        'biopsy', 'tissue sampling', 'needle biopsy', 'core biopsy',
+        'fine needle aspiration', 'fna', 'trucut biopsy',
+        'image guided biopsy', 'percutaneous biopsy', 'tissue diagnosis'
+    ],
+    'pain_injection_relief_related': [
+        'pain injection', 'pain relief injection', 'nerve block',
+        'local anesthetic', 'pain management injection', 'steroid injection',
+        'therapeutic injection', 'pain control injection', 'analgesic injection',
+        'transforaminal injection', 'facet injection', 'joint injection',
+        'epidural injection', 'corticosteroid injection'
+    ]
+}
+PROCEDURE_CATEGORY_MATCHER = KeywordMatcher(PROCEDURE_CATEGORY_KEYWORDS)
+# Display names stored in the procedure_category metadata field
+PROCEDURE_CATEGORY_NAMES = {
+    'venous_access': 'Venous Access',
+    'angiogram_related': 'Angiogram Related',
+    'embolization_related': 'Embolization Related',
+    'biopsy_related': 'Biopsy Related',
+    'pain_injection_relief_related': 'Pain Injection Relief Related'
+}
 
 
 class DocumentProcessor:
     """Process various document formats and chunk them for vectorization."""
 
-    def __init__(self, chunk_size: int = 512, chunk_overlap: int = 50, markdown_only: bool = False, whole_document: bool = False, semantic_chunking: bool = False):
+    def __init__(self, chunk_size: int = 512, chunk_overlap: int = 50, markdown_only: bool = False, whole_document: bool = False, semantic_chunking: bool = False, use_conversion_cache: Optional[bool] = None):
         """
         Initialize the document processor.
 
@@ -39,6 +86,7 @@ class DocumentProcessor:
             markdown_only: If True, only process markdown files (no MarkItDown conversion)
             whole_document: If True, embed entire documents without chunking
             semantic_chunking: If True, chunk by markdown headings instead of fixed character count
+            use_conversion_cache: Reuse cached conversions of unchanged files (default from settings)
         """
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
@@ -48,6 +96,8 @@ class DocumentProcessor:
 
         # Only initialize MarkItDown if we need conversion
         if not markdown_only:
+            # Imported here: the serving path imports this module without converting anything
+            from markitdown import MarkItDown
             self.markitdown = MarkItDown()
             logger.info(
                 "Initialized MarkItDown converter for unified document processing")
@@ -55,6 +105,12 @@ class DocumentProcessor:
             self.markitdown = None
             logger.info("Markdown-only mode: MarkItDown conversion disabled")
 
+        if use_conversion_cache is None:
+            use_conversion_cache = settings.conversion_cache_enabled
+        self.conversion_cache = ConversionCache() if use_conversion_cache else None
+        self.html_converter_version = f"{HTML_CONVERTER_VERSION}+markdownify-{package_version('markdownify')}"
+        self.markitdown_converter_version = f"{MARKITDOWN_CONVERTER_VERSION}+markitdown-{package_version('markitdown')}"
+
     def load_document(self, file_path: str) -> tuple[str, Dict[str, Any]]:
         """
         Load a document and extract its text content using MarkItDown.
@@ -86,7 +142,14 @@ class DocumentProcessor:
         # Route by file type
         # Check for HTML first (custom loader)
         if file_path.suffix.lower() in ['.html', '.htm']:
-            return self._load_html(file_path), metadata
+            if self.conversion_cache:
+                text, conversion_metadata = self.conversion_cache.get_or_convert(
+                    str(file_path), "html", self.html_converter_version,
+                    lambda: self._convert_html(file_path)
+                )
+            else:
+                text, conversion_metadata = self._convert_html(file_path)
+            return text, self._with_conversion_metadata(metadata, conversion_metadata)
 
         # Check for PDF (custom loader attempt or MarkItDown)
         # MarkItDown handles PDF well, so we'll leave it to MarkItDown unless we need custom handling
@@ -115,15 +178,16 @@ class DocumentProcessor:
              return "", metadata
 
         try:
-            # Use MarkItDown for unified conversion to Markdown
-            logger.debug(
-                f"Converting {file_path.name} to Markdown using MarkItDown...")
-            result = self.markitdown.convert(str(file_path))
-
-            # Extract text content
-            text = result.text_content
+            # Reuse an earlier conversion of identical content
+            if self.conversion_cache:
+                text, conversion_metadata = self.conversion_cache.get_or_convert(
+                    str(file_path), "markitdown", self.markitdown_converter_version,
+                    lambda: self._convert_with_markitdown(file_path)
+                )
+            else:
+                text, conversion_metadata = self._convert_with_markitdown(file_path)
 
-            return text, metadata
+            return text, self._with_conversion_metadata(metadata, conversion_metadata)
 
         except Exception as e:
             logger.error(f"Error converting {file_path} with MarkItDown: {e}")
@@ -138,18 +202,50 @@ class DocumentProcessor:
                 logger.error(f"Fallback extraction failed for {file_path}: {e2}")
                 return "", metadata
 
+    @staticmethod
+    def _with_conversion_metadata(metadata: Dict[str, Any], conversion_metadata: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Merge the metadata extracted by a (possibly cached) conversion into the
+        metadata built from the file path.
+
+        Path-derived fields (source, filename, file_type, source_org, region)
+        win: the cache is content-addressed, so a hit may come from a copy of
+        the file stored under another path.
+        """
+        return {**(conversion_metadata or {}), **metadata}
+
+    def _convert_with_markitdown(self, file_path: Path) -> Tuple[str, Dict[str, Any]]:
+        """Convert a file to Markdown with MarkItDown; returns (markdown, extracted metadata)."""
+        logger.debug(
+            f"Converting {file_path.name} to Markdown using MarkItDown...")
+        result = self.markitdown.convert(str(file_path))
+        conversion_metadata = {}
+        if getattr(result, 'title', None):
+            conversion_metadata["document_title"] = result.title.strip()
+        return result.text_content, conversion_metadata
+
     def _load_html(self, file_path: Path) -> str:
         """
         Load and extract content from an HTML file (e.g., Sickkids pages).
 
-        Targets the main article content and converts it to Markdown.
-
         Args:
             file_path: Path to the HTML file
 
         Returns:
             Extracted text content as Markdown or plain text
         """
+        return self._convert_html(file_path)[0]
+
+    def _convert_html(self, file_path: Path) -> Tuple[str, Dict[str, Any]]:
+        """
+        Convert an HTML file to Markdown, targeting the main article content.
+
+        Args:
+            file_path: Path to the HTML file
+
+        Returns:
+            Tuple of (Markdown or plain text, extracted metadata: document_title, last_reviewed)
+        """
         with open(file_path, 'r', encoding='utf-8') as f:
             html_content = f.read()
 
@@ -172,11 +268,13 @@ class DocumentProcessor:
         overview = soup.find(id='article-overview')
 
         parts = []
+        conversion_metadata = {}
 
         # Extract title
         title_el = soup.find(id='article_title') or soup.find('h1')
         if title_el:
-            parts.append(f"# {title_el.get_text(strip=True)}")
+            conversion_metadata["document_title"] = title_el.get_text(strip=True)
+            parts.append(f"# {conversion_metadata['document_title']}")
 
         # Extract overview
         if overview:
@@ -206,9 +304,10 @@ class DocumentProcessor:
         # Extract review date if present
         review_date = soup.find(id='review-date')
         if review_date:
-            parts.append(f"\n---\nLast updated: {review_date.get_text(strip=True)}")
+            conversion_metadata["last_reviewed"] = review_date.get_text(strip=True)
+            parts.append(f"\n---\nLast updated: {conversion_metadata['last_reviewed']}")
 
-        return '\n\n'.join(parts)
+        return '\n\n'.join(parts), conversion_metadata
 
     def _markdown_to_text(self, markdown_text: str) -> str:
         """
@@ -314,55 +413,12 @@ class DocumentProcessor:
         path_lower = file_path.lower()
         combined_text = f"{text_lower} {path_lower}"
 
-        # Define keywords for each category
-        category_keywords = {
-            'venous_access': [
-                'picc', 'peripherally inserted central catheter', 'central venous catheter',
-                'cvc', 'central line', 'venous access', 'vascular access',
-                'catheter insertion', 'catheter placement', 'catheter removal',
-                'tunneled catheter', 'port-a-cath', 'portacath', 'implanted port',
-                'hickman', 'broviac', 'vascular catheter'
-            ],
-            'angiogram_related': [
-                'angiogram', 'angiography', 'angioplasty', 'angiographic',
-                'vascular imaging', 'arteriography', 'venography',
-                'selective angiography', 'digital subtraction angiography', 'dsa',
-                'ct angiography', 'cta', 'mr angiography', 'mra',
-                'balloon angioplasty', 'stent placement', 'stent insertion',
-                'vascular stent', 'vascular intervention'
-            ],
-            'embolization_related': [
-                'embolization', 'embolotherapy', 'embolize', 'embolic',
-                'transarterial embolization', 'tae', 'selective embolization',
-                'coil embolization', 'particle embolization', 'glue embolization',
-                'vascular embolization', 'arterial embolization'
-            ],
-            'biopsy_related': [
-                'biopsy', 'tissue sampling', 'needle biopsy', 'core biopsy',
-                'fine needle aspiration', 'fna', 'trucut biopsy',
-                'image guided biopsy', 'percutaneous biopsy', 'tissue diagnosis'
-            ],
-            'pain_injection_relief_related': [
-                'pain injection', 'pain relief injection', 'nerve block',
-                'local anesthetic', 'pain management injection', 'steroid injection',
-                'therapeutic injection', 'pain control injection', 'analgesic injection',
-                'transforaminal injection', 'facet injection', 'joint injection',
-                'epidural injection', 'corticosteroid injection'
-            ]
-        }
-
-        # Count matches for each category
-        category_scores = {}
-        for category, keywords in category_keywords.items():
-            score = 0
-            for keyword in keywords:
-                if keyword in combined_text:
-                    # Give more weight to filename matches
-                    if keyword in path_lower:
-                        score += 3
-                    else:
-                        score += 1
-            category_scores[category] = score
+        # One pass over the document for all category keywords;
+        # filename matches get more weight
+        path_hits = PROCEDURE_CATEGORY_MATCHER.find(path_lower)
+        category_scores = PROCEDURE_CATEGORY_MATCHER.category_scores(
+            combined_text, keyword_weights={keyword: 3 for keyword in path_hits}
+        )
 
         # Find category with highest score
         max_score = max(category_scores.values()) if category_scores.values() else 0
@@ -374,15 +430,7 @@ class DocumentProcessor:
         best_category = max(category_scores, key=category_scores.get)
 
         # Map internal names to user-friendly names
-        category_mapping = {
-            'venous_access': 'Venous Access',
-            'angiogram_related': 'Angiogram Related',
-            'embolization_related': 'Embolization Related',
-            'biopsy_related': 'Biopsy Related',
-            'pain_injection_relief_related': 'Pain Injection Relief Related'
-        }
-
-        return category_mapping.get(best_category, 'Other')
+        return PROCEDURE_CATEGORY_NAMES.get(best_category, 'Other')
 
     def chunk_text(self, text: str, metadata: Dict[str, Any]) -> List[DocumentChunk]:
         """
@@ -617,25 +665,23 @@ class DocumentProcessor:
         text = '\n'.join(lines)
         return text.strip()
 
-    def process_directory(self, directory_path: str,
-                          file_patterns: Optional[List[str]] = None) -> List[DocumentChunk]:
+    def discover_files(self, directory_path: str,
+                       file_patterns: Optional[List[str]] = None) -> List[Path]:
         """
-        Process all documents in a directory using MarkItDown.
+        Find the documents in a directory that this processor should handle.
 
         Args:
             directory_path: Path to directory containing documents
             file_patterns: Optional list of file patterns to match (e.g., ['*.pdf', '*.docx'])
 
         Returns:
-            List of all DocumentChunk objects from all documents
+            Sorted list of unique file paths
         """
         directory = Path(directory_path)
 
         if not directory.exists():
             raise FileNotFoundError(f"Directory not found: {directory}")
 
-        all_chunks = []
-
         # Markdown-only mode: only process markdown files
         if self.markdown_only:
             file_patterns = ['*.md', '*.markdown']
@@ -654,30 +700,188 @@ class DocumentProcessor:
         # Collect all matching files
         files = []
         for pattern in file_patterns:
-            files.extend(directory.rglob(pattern))
+            files.extend(f for f in directory.rglob(pattern) if f.is_file())
+
+        # Remove duplicates and sort so output order is deterministic
+        return sorted(set(files))
+
+    def process_file(self, file_path: str) -> List[DocumentChunk]:
+        """
+        Load, classify and chunk a single document.
+
+        Args:
+            file_path: Path to the document file
+
+        Returns:
+            List of DocumentChunk objects for the document
+        """
+        text, metadata = self.load_document(str(file_path))
+
+        # Classify procedure category based on content
+        # We need the text content for classification
+        procedure_category = self._classify_procedure_category(text, str(file_path))
+        metadata["procedure_category"] = procedure_category
+
+        return self.chunk_text(text, metadata)
+
+    def process_directory(self, directory_path: str,
+                          file_patterns: Optional[List[str]] = None,
+                          workers: Optional[int] = None,
+                          file_timeout: Optional[float] = None) -> List[DocumentChunk]:
+        """
+        Process all documents in a directory using MarkItDown.
+
+        With workers > 1, files are converted in a process pool, one file per
+        worker at a time (see TimedWorkerPool). Chunks are always returned in sorted
+        file-path order, and files that fail or time out are logged and listed
+        in ``self.failed_files``.
 
-        # Remove duplicates
-        files = list(set(files))
+        Args:
+            directory_path: Path to directory containing documents
+            file_patterns: Optional list of file patterns to match (e.g., ['*.pdf', '*.docx'])
+            workers: Number of worker processes (default: settings.ingest_workers, <= 1 = serial)
+            file_timeout: Per-file timeout in seconds for pool mode (default: settings.ingest_file_timeout)
 
-        logger.info(f"Found {len(files)} files to process in {directory}")
+        Returns:
+            List of all DocumentChunk objects from all documents
+        """
+        files = self.discover_files(directory_path, file_patterns)
+
+        logger.info(f"Found {len(files)} files to process in {directory_path}")
         logger.info(
             f"Using MarkItDown for unified conversion to Markdown format")
 
-        for file_path in files:
-            try:
-                logger.info(f"Processing: {file_path}")
-                text, metadata = self.load_document(str(file_path))
+        workers = settings.ingest_workers if workers is None else workers
+        if workers == -1:
+            workers = os.cpu_count() or 1
+        file_timeout = settings.ingest_file_timeout if file_timeout is None else file_timeout
 
-                # Classify procedure category based on content
-                # We need the text content for classification
-                procedure_category = self._classify_procedure_category(text, str(file_path))
-                metadata["procedure_category"] = procedure_category
+        self.failed_files: List[Tuple[str, str]] = []
 
-                chunks = self.chunk_text(text, metadata)
-                all_chunks.extend(chunks)
-            except Exception as e:
-                logger.error(f"Error processing {file_path}: {e}")
-                continue
+        if workers > 1 and len(files) > 1:
+            results = self._process_files_parallel(files, workers, file_timeout)
+        else:
+            results = []
+            for file_path in files:
+                try:
+                    logger.info(f"Processing: {file_path}")
+                    results.append(self.process_file(str(file_path)))
+                except Exception as e:
+                    logger.error(f"Error processing {file_path}: {e}")
+                    self.failed_files.append((str(file_path), str(e)))
+                    results.append([])
 
+        all_chunks = [chunk for chunks in results for chunk in chunks]
+
+        if self.failed_files:
+            logger.warning(f"⚠️  {len(self.failed_files)} file(s) failed to process")
         logger.info(f"Total chunks created: {len(all_chunks)}")
         return all_chunks
+
+    def worker_config(self) -> Dict[str, Any]:
+        """Constructor arguments for recreating this processor in a worker process."""
+        return {
+            "chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap,
+            "markdown_only": self.markdown_only,
+            "whole_document": self.whole_document,
+            "semantic_chunking": self.semantic_chunking,
+            "use_conversion_cache": self.conversion_cache is not None,
+        }
+
+    def _process_files_parallel(self, files: List[Path], workers: int,
+                                file_timeout: float) -> List[List[DocumentChunk]]:
+        """
+        Process files in a process pool with per-file timeouts.
+
+        Args:
+            files: Sorted list of files to process
+            workers: Number of worker processes
+            file_timeout: Seconds a file may run before its worker is replaced (0 = no limit)
+
+        Returns:
+            Chunk lists aligned with ``files`` (empty list for failed files)
+        """
+        results: List[List[DocumentChunk]] = [[] for _ in files]
+        for index, chunks, error in self._run_in_pool(_process_file_in_worker, files, workers, file_timeout):
+            if error is None:
+                results[index] = chunks
+                logger.info(f"Processed: {files[index]} ({len(chunks)} chunks)")
+        return results
+
+    def load_directory(self, directory_path: str,
+                       file_patterns: Optional[List[str]] = None,
+                       workers: Optional[int] = None,
+                       file_timeout: Optional[float] = None) -> List[Tuple[Path, str, Dict[str, Any]]]:
+        """
+        Convert all documents in a directory without chunking them.
+
+        Conversion is the expensive step, so it runs in the process pool; the
+        caller classifies, stores and chunks each (text, metadata) once.
+        Failed files are listed in ``self.failed_files``.
+
+        Args:
+            directory_path: Path to directory containing documents
+            file_patterns: Optional list of file patterns to match
+            workers: Number of worker processes (default: settings.ingest_workers, <= 1 = serial)
+            file_timeout: Per-file timeout in seconds for pool mode (default: settings.ingest_file_timeout)
+
+        Returns:
+            List of (file_path, text, metadata) in sorted file-path order
+        """
+        files = self.discover_files(directory_path, file_patterns)
+        workers = settings.ingest_workers if workers is None else workers
+        if workers == -1:
+            workers = os.cpu_count() or 1
+        file_timeout = settings.ingest_file_timeout if file_timeout is None else file_timeout
+        self.failed_files: List[Tuple[str, str]] = []
+        logger.info(f"Found {len(files)} files to convert in {directory_path}")
+
+        loaded: List[Optional[tuple]] = [None] * len(files)
+        if workers > 1 and len(files) > 1:
+            for index, document, error in self._run_in_pool(_load_document_in_worker, files, workers, file_timeout):
+                if error is None:
+                    loaded[index] = document
+        else:
+            for index, file_path in enumerate(files):
+                try:
+                    loaded[index] = self.load_document(str(file_path))
+                except Exception as e:
+                    logger.error(f"Error loading {file_path}: {e}")
+                    self.failed_files.append((str(file_path), str(e)))
+
+        if self.failed_files:
+            logger.warning(f"⚠️  {len(self.failed_files)} file(s) failed to convert")
+        return [(file_path, *document) for file_path, document in zip(files, loaded) if document is not None]
+
+    def _run_in_pool(self, func, files: List[Path], workers: int, file_timeout: float):
+        """Run a worker function over files in a TimedWorkerPool, recording failures in ``self.failed_files``."""
+        logger.info(f"⚡ Converting {len(files)} files with {workers} worker processes "
+                    f"(timeout: {file_timeout or 'none'}s per file)")
+        with TimedWorkerPool(workers, initializer=_init_worker_processor,
+                             initargs=(self.worker_config(),), timeout=file_timeout) as pool:
+            for index, result, error in pool.imap_unordered(func, [str(f) for f in files]):
+                if error is not None:
+                    logger.error(f"Error processing {files[index]}: {error}")
+                    self.failed_files.append((str(files[index]), error))
+                yield index, result, error
+
+
+# Per-process DocumentProcessor used by process pool workers
+_worker_processor: Optional[DocumentProcessor] = None
+
+
+def _init_worker_processor(processor_config: Dict[str, Any]) -> None:
+    """Create the DocumentProcessor owned by a pool worker process."""
+    global _worker_processor
+    _worker_processor = DocumentProcessor(**processor_config)
+
+
+def _process_file_in_worker(file_path: str) -> List[DocumentChunk]:
+    """Process one file inside a pool worker."""
+    return _worker_processor.process_file(file_path)
+
+
+def _load_document_in_worker(file_path: str) -> tuple[str, Dict[str, Any]]:
+    """Convert one file inside a pool worker (used by the streaming ingestion pipeline)."""
+    return _worker_processor.load_document(file_path)
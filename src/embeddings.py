@@ -1,20 +1,76 @@
-"""Embedding generation for documents and queries."""
-from typing import List, Union
+"""Embedding generation for documents and queries (provider SDKs are imported on first use)."""
+import functools
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Union
 from abc import ABC, abstractmethod
 
-import numpy as np
-from openai import OpenAI
-from sentence_transformers import SentenceTransformer
-import ollama
 from loguru import logger
 from tenacity import retry, stop_after_attempt, wait_exponential
 
+from src.admission import stage_limited
 from config import settings
 
+# Query embeddings kept after prime_query_embeddings() (least recently used dropped first)
+PRIMED_QUERY_LIMIT = 1024
+_primed_lock = threading.Lock()
+
+
+def primed_query(func):
+    """
+    Decorator for embed_query: answer from the vectors primed by
+    prime_query_embeddings() before calling the model (and taking a stage slot).
+    """
+    @functools.wraps(func)
+    def wrapper(self, text: str) -> List[float]:
+        embedding = self._primed_embedding(text)
+        if embedding is not None:
+            return embedding
+        return func(self, text)
+    return wrapper
+
 
 class EmbeddingModel(ABC):
     """Abstract base class for embedding models."""
 
+    def _primed_embedding(self, text: str):
+        primed = getattr(self, '_primed', None)
+        if not primed:
+            return None
+        with _primed_lock:
+            embedding = primed.get(text)
+            if embedding is not None:
+                primed.move_to_end(text)
+            return embedding
+
+    def prime_query_embeddings(self, texts: List[str]) -> int:
+        """
+        Embed many queries in one batched call ahead of their use.
+
+        A query runs embed_query several times (answer cache, curated Q&A,
+        knowledge base search, compression); after priming, those calls for
+        the primed texts return the stored vector without calling the model.
+
+        Args:
+            texts: Query texts
+
+        Returns:
+            Number of texts embedded (already primed ones are skipped)
+        """
+        pending = [t for t in dict.fromkeys(texts) if t and self._primed_embedding(t) is None]
+        if not pending:
+            return 0
+        embeddings = self.embed_documents(pending)
+        with _primed_lock:
+            primed = self.__dict__.setdefault('_primed', OrderedDict())
+            for text, embedding in zip(pending, embeddings):
+                primed[text] = embedding
+                primed.move_to_end(text)
+            while len(primed) > PRIMED_QUERY_LIMIT:
+                primed.popitem(last=False)
+        logger.info(f"Primed {len(pending)} query embeddings in one batch")
+        return len(pending)
+
     @abstractmethod
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """Embed a list of documents."""
@@ -44,6 +100,8 @@ class OpenAIEmbeddings(EmbeddingModel):
             api_key: OpenAI API key (default from settings)
             base_url: API base URL (default from settings)
         """
+        from openai import OpenAI
+
         self.model = model or settings.openai_embedding_model
         self.client = OpenAI(
             api_key=api_key or settings.openai_api_key,
@@ -53,6 +111,7 @@ class OpenAIEmbeddings(EmbeddingModel):
         logger.info(f"Initialized OpenAI embeddings with model: {self.model}")
 
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
+    @stage_limited("embeddings")
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """
         Embed a list of documents with retry logic.
@@ -79,6 +138,7 @@ class OpenAIEmbeddings(EmbeddingModel):
             logger.error(f"Error generating embeddings: {e}")
             raise
 
+    @primed_query
     def embed_query(self, text: str) -> List[float]:
         """
         Embed a single query.
@@ -111,12 +171,15 @@ class SentenceTransformerEmbeddings(EmbeddingModel):
         Args:
             model_name: Model name (default from settings)
         """
+        from sentence_transformers import SentenceTransformer
+
         self.model_name = model_name or settings.sentence_transformer_model
         logger.info(f"Loading Sentence Transformer model: {self.model_name}")
         self.model = SentenceTransformer(self.model_name)
         self._dimension = self.model.get_sentence_embedding_dimension()
         logger.info(f"Model loaded. Embedding dimension: {self._dimension}")
 
+    @stage_limited("embeddings")
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """
         Embed a list of documents.
@@ -134,6 +197,8 @@ class SentenceTransformerEmbeddings(EmbeddingModel):
         )
         return embeddings.tolist()
 
+    @primed_query
+    @stage_limited("embeddings")
     def embed_query(self, text: str) -> List[float]:
         """
         Embed a single query.
@@ -167,14 +232,16 @@ class OllamaEmbeddings(EmbeddingModel):
         self.model = model or settings.ollama_embedding_model
         self.base_url = base_url or settings.ollama_api_base
 
-        # Set the Ollama host
+        # Set the Ollama host (read by the client when the package is first imported)
         if self.base_url:
             import os
             os.environ['OLLAMA_HOST'] = self.base_url
+        import ollama
+        self._ollama = ollama
 
         # Test connection and get dimension
         try:
-            test_embedding = ollama.embeddings(model=self.model, prompt="test")
+            test_embedding = self._ollama.embeddings(model=self.model, prompt="test")
             self._dimension = len(test_embedding['embedding'])
             logger.info(
                 f"Initialized Ollama embeddings with model: {self.model}")
@@ -209,6 +276,7 @@ class OllamaEmbeddings(EmbeddingModel):
         return truncated
 
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
+    @stage_limited("embeddings")
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """
         Embed a list of documents.
@@ -230,7 +298,7 @@ class OllamaEmbeddings(EmbeddingModel):
                 else:
                     truncated_text = text
 
-                response = ollama.embeddings(
+                response = self._ollama.embeddings(
                     model=self.model,
                     prompt=truncated_text
                 )
@@ -242,7 +310,7 @@ class OllamaEmbeddings(EmbeddingModel):
                     # Try with aggressive truncation as last resort
                     try:
                         very_short_text = self._truncate_text(text, max_length=200)
-                        response = ollama.embeddings(
+                        response = self._ollama.embeddings(
                             model=self.model,
                             prompt=very_short_text
                         )
@@ -257,6 +325,8 @@ class OllamaEmbeddings(EmbeddingModel):
 
         return embeddings
 
+    @primed_query
+    @stage_limited("embeddings")
     def embed_query(self, text: str) -> List[float]:
         """
         Embed a single query.
@@ -271,7 +341,7 @@ class OllamaEmbeddings(EmbeddingModel):
             # Truncate query if needed
             truncated_text = self._truncate_text(text, max_length=1024)
 
-            response = ollama.embeddings(
+            response = self._ollama.embeddings(
                 model=self.model,
                 prompt=truncated_text
             )
@@ -297,6 +367,8 @@ class LMStudioEmbeddings(EmbeddingModel):
             model: Model name (default from settings)
             base_url: LM Studio API base URL (default from settings)
         """
+        from openai import OpenAI
+
         self.model = model or settings.lmstudio_embedding_model
         self.base_url = base_url or settings.lmstudio_api_base
         
@@ -310,6 +382,7 @@ class LMStudioEmbeddings(EmbeddingModel):
         logger.info(f"LM Studio API base: {self.base_url}")
 
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
+    @stage_limited("embeddings")
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """
         Embed a list of documents.
@@ -337,6 +410,7 @@ class LMStudioEmbeddings(EmbeddingModel):
             logger.error(f"Make sure LM Studio is running with an embedding model loaded")
             raise
 
+    @primed_query
     def embed_query(self, text: str) -> List[float]:
         """
         Embed a single query.
@@ -359,6 +433,26 @@ class LMStudioEmbeddings(EmbeddingModel):
         return self._dimension
 
 
+# Provider name -> model factory; classes import their SDK only when instantiated
+EMBEDDING_PROVIDERS: Dict[str, Callable[[], EmbeddingModel]] = {
+    "openai": OpenAIEmbeddings,
+    "sentence-transformer": SentenceTransformerEmbeddings,
+    "ollama": OllamaEmbeddings,
+    "lmstudio": LMStudioEmbeddings,
+}
+
+
+def register_embedding_provider(name: str, factory: Callable[[], EmbeddingModel]):
+    """
+    Register an embedding provider for get_embedding_model().
+
+    Args:
+        name: Provider name (the embedding_provider setting)
+        factory: Callable returning an EmbeddingModel; import heavy SDKs inside it
+    """
+    EMBEDDING_PROVIDERS[name] = factory
+
+
 def get_embedding_model(provider: str = None) -> EmbeddingModel:
     """
     Factory function to get the appropriate embedding model.
@@ -371,13 +465,7 @@ def get_embedding_model(provider: str = None) -> EmbeddingModel:
     """
     provider = provider or settings.embedding_provider
 
-    if provider == "openai":
-        return OpenAIEmbeddings()
-    elif provider == "sentence-transformer":
-        return SentenceTransformerEmbeddings()
-    elif provider == "ollama":
-        return OllamaEmbeddings()
-    elif provider == "lmstudio":
-        return LMStudioEmbeddings()
-    else:
+    factory = EMBEDDING_PROVIDERS.get(provider)
+    if factory is None:
         raise ValueError(f"Unknown embedding provider: {provider}")
+    return factory()
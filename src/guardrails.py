@@ -3,6 +3,8 @@ from typing import Any, Optional
 from langchain_core.messages import HumanMessage, AIMessage
 from loguru import logger
 
+from src.keyword_matcher import KeywordMatcher
+
 # Emergency keywords that trigger canned responses
 # Note: For PedIR context, we need specific qualifiers to avoid false positives
 # when discussing procedures like embolization that involve bleeding management
@@ -21,6 +23,7 @@ EMERGENCY_KEYWORDS = [
     'uncontrolled bleeding', 'heavy bleeding', "bleeding won't stop", "bleeding will not stop",
     '大量出血', '無法止血'
 ]
+EMERGENCY_MATCHER = KeywordMatcher(EMERGENCY_KEYWORDS)
 
 EMERGENCY_RESPONSE = """This sounds like it could be an emergency. Please do not rely on this chatbot.
 
@@ -86,16 +89,15 @@ class EmergencyGuardrailMiddleware:
         """
         # Extract text from potentially structured content
         query_text = self._extract_text_content(query)
-        query_lower = query_text.lower()
-
-        for keyword in self.emergency_keywords:
-            if keyword in query_lower:
-                logger.warning(f"🚨 Emergency keyword detected: {keyword}")
-                # Detect language and return appropriate response
-                if any(ord(char) > 127 for char in query_text):  # Contains non-ASCII (likely Chinese)
-                    return self.emergency_response_zh
-                else:
-                    return self.emergency_response
+
+        keyword = EMERGENCY_MATCHER.first(query_text)
+        if keyword:
+            logger.warning(f"🚨 Emergency keyword detected: {keyword}")
+            # Detect language and return appropriate response
+            if any(ord(char) > 127 for char in query_text):  # Contains non-ASCII (likely Chinese)
+                return self.emergency_response_zh
+            else:
+                return self.emergency_response
 
         return None
 
@@ -0,0 +1,281 @@
+"""Streaming ingestion pipeline: discover → load → chunk → embed → upsert."""
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Callable, Iterator, Tuple
+
+from loguru import logger
+
+from src.document_processor import (
+    DocumentChunk,
+    DocumentProcessor,
+    _init_worker_processor,
+    _load_document_in_worker,
+)
+from src.document_db import DocumentDatabase
+from src.worker_pool import TimedWorkerPool
+from config import settings
+
+# Marks the end of a stage's output
+_DONE = object()
+
+
+class StreamingIngestionPipeline:
+    """
+    Generator-based ingestion with bounded queues between stages.
+
+    A loader thread converts and chunks files one at a time (optionally with a
+    process pool for conversion), an embedder thread batches chunks and embeds
+    them, and the calling thread writes each document to SQLite and each
+    embedded batch to Chroma as soon as it arrives. Queues are bounded, so
+    memory stays flat regardless of corpus size, and early batches are
+    searchable while later files are still being converted.
+    """
+
+    def __init__(
+        self,
+        processor: DocumentProcessor,
+        vector_store=None,
+        document_db: Optional[DocumentDatabase] = None,
+        batch_size: int = None,
+        queue_size: int = None,
+        workers: int = None,
+        metadata_enricher: Optional[Callable[[str], Dict[str, Any]]] = None,
+        chunk_filter: Optional[Callable[[DocumentChunk], bool]] = None,
+    ):
+        """
+        Initialize the pipeline.
+
+        Args:
+            processor: DocumentProcessor used to load and chunk files
+            vector_store: VectorStore to upsert embedded chunks into (None = skip vectors)
+            document_db: DocumentDatabase for full documents and chunks (None = skip SQLite)
+            batch_size: Chunks per embedding batch (default from settings)
+            queue_size: Maximum items buffered between stages (default from settings)
+            workers: Process pool size for document conversion (default from settings, <= 1 = in-thread)
+            metadata_enricher: Optional callable(text) -> extra metadata (e.g. LLM extraction)
+            chunk_filter: Optional predicate selecting which chunks go to the vector store
+        """
+        self.processor = processor
+        self.vector_store = vector_store
+        self.document_db = document_db
+        self.batch_size = batch_size or settings.ingest_batch_size
+        self.queue_size = queue_size or settings.ingest_queue_size
+        workers = settings.ingest_workers if workers is None else workers
+        self.workers = (os.cpu_count() or 1) if workers == -1 else workers
+        self.metadata_enricher = metadata_enricher
+        self.chunk_filter = chunk_filter
+
+        self._error: Optional[BaseException] = None
+        self._stop = threading.Event()
+
+    # ------------------------------------------------------------------
+    # Stage 1: discover + load (+ classify, enrich, chunk)
+    # ------------------------------------------------------------------
+    def _iter_loaded(self, files: List[Path]) -> Iterator[Tuple[Path, Optional[tuple], Optional[str]]]:
+        """Yield (file_path, (text, metadata) or None, error); in file order serially, else as conversions finish."""
+        if self.workers <= 1:
+            for file_path in files:
+                try:
+                    yield file_path, self.processor.load_document(str(file_path)), None
+                except Exception as e:
+                    yield file_path, None, str(e)
+            return
+
+        # One file per worker at a time; a file that runs past the timeout gets its worker replaced,
+        # and stopping early terminates the busy workers instead of waiting for them
+        with TimedWorkerPool(self.workers, initializer=_init_worker_processor,
+                             initargs=(self.processor.worker_config(),),
+                             timeout=settings.ingest_file_timeout) as pool:
+            for index, loaded, error in pool.imap_unordered(_load_document_in_worker, [str(f) for f in files]):
+                yield files[index], loaded, error
+                if self._stop.is_set():
+                    return
+
+    def _load_stage(self, kb_path: Path, files: List[Path], out_queue: queue.Queue, stats: Dict[str, Any]):
+        """Convert, classify, enrich and chunk each file, then hand it downstream."""
+        try:
+            for file_path, loaded, error in self._iter_loaded(files):
+                if self._stop.is_set():
+                    break
+                if error is not None:
+                    logger.warning(f"Error loading document {file_path}: {error}")
+                    stats['failed_files'].append((str(file_path), error))
+                    continue
+
+                text, metadata = loaded
+                if not text or len(text.strip()) < 10:
+                    logger.warning(f"Skipping empty/tiny document: {file_path.name}")
+                    continue
+
+                # Rule-based procedure classification
+                metadata["procedure_category"] = self.processor._classify_procedure_category(text, str(file_path))
+
+                # Optional LLM metadata extraction
+                if self.metadata_enricher:
+                    try:
+                        metadata.update(self.metadata_enricher(text))
+                    except Exception as e:
+                        logger.warning(f"Metadata extraction failed for {file_path.name}: {e}")
+
+                # Document ID from relative path (same scheme as ingest_documents.py)
+                try:
+                    document_id = file_path.relative_to(kb_path).as_posix()
+                except ValueError:
+                    document_id = file_path.name
+                metadata['document_id'] = document_id
+
+                chunks = self.processor.chunk_text(text, metadata)
+                out_queue.put(('document', document_id, text, metadata, chunks))
+        except BaseException as e:
+            self._error = e
+        finally:
+            out_queue.put(_DONE)
+
+    # ------------------------------------------------------------------
+    # Stage 2: batch + embed
+    # ------------------------------------------------------------------
+    def _embed_stage(self, in_queue: queue.Queue, out_queue: queue.Queue):
+        """Group chunks into batches and embed them; forward documents unchanged."""
+        batch: List[DocumentChunk] = []
+
+        def flush():
+            if not batch:
+                return
+            texts = [chunk.content for chunk in batch]
+            embeddings = self.vector_store.embedding_model.embed_documents(texts)
+            out_queue.put(('batch', list(batch), embeddings))
+            batch.clear()
+
+        try:
+            while True:
+                try:
+                    item = in_queue.get(timeout=0.5)
+                except queue.Empty:
+                    # Loader is busy converting: embed what we have so it becomes searchable
+                    flush()
+                    continue
+                if item is _DONE or self._stop.is_set():
+                    break
+                out_queue.put(item)
+                if self.vector_store is None:
+                    continue
+                for chunk in item[4]:
+                    if self.chunk_filter and not self.chunk_filter(chunk):
+                        continue
+                    batch.append(chunk)
+                    if len(batch) >= self.batch_size:
+                        flush()
+            if not self._stop.is_set():
+                flush()
+        except BaseException as e:
+            self._error = e
+            self._stop.set()
+        finally:
+            out_queue.put(_DONE)
+
+    # ------------------------------------------------------------------
+    # Stage 3: write (runs in the calling thread)
+    # ------------------------------------------------------------------
+    def _store_document(self, document_id: str, text: str, metadata: Dict[str, Any], chunks: List[DocumentChunk]):
+        """Write a full document and its chunks to SQLite."""
+        self.document_db.store_document(
+            document_id=document_id,
+            filename=metadata.get('filename', document_id),
+            content=text,
+            metadata=metadata
+        )
+        for chunk in chunks:
+            self.document_db.store_chunk(
+                chunk_id=chunk.chunk_id,
+                document_id=document_id,
+                content=chunk.content,
+                section_title=chunk.metadata.get('section_title', ''),
+                chunk_index=chunk.metadata.get('chunk_index', 0),
+                chunking_method=chunk.metadata.get('chunking_method', 'sliding_window'),
+                metadata=chunk.metadata,
+            )
+
+    def run(self, directory_path: str, file_patterns: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Ingest a directory end to end.
+
+        Args:
+            directory_path: KB folder to ingest
+            file_patterns: Optional list of file patterns to match
+
+        Returns:
+            Stats dict with files, documents, chunks, vectors, failed_files,
+            seconds and first_vectors_after (seconds until the first batch was searchable)
+        """
+        kb_path = Path(directory_path)
+        files = self.processor.discover_files(directory_path, file_patterns)
+        stats: Dict[str, Any] = {
+            'files': len(files),
+            'documents': 0,
+            'chunks': 0,
+            'vectors': 0,
+            'failed_files': [],
+            'first_vectors_after': None,
+        }
+        logger.info(f"🚰 Streaming ingestion of {len(files)} files "
+                    f"(batch: {self.batch_size}, queue: {self.queue_size}, workers: {self.workers})")
+
+        start = time.perf_counter()
+        self._error = None
+        self._stop.clear()
+        loaded_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        embedded_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        threads = [
+            threading.Thread(target=self._load_stage, args=(kb_path, files, loaded_queue, stats),
+                             name="ingest-load", daemon=True),
+            threading.Thread(target=self._embed_stage, args=(loaded_queue, embedded_queue),
+                             name="ingest-embed", daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                item = embedded_queue.get()
+                if item is _DONE:
+                    break
+                if item[0] == 'document':
+                    _, document_id, text, metadata, chunks = item
+                    if self.document_db is not None:
+                        self._store_document(document_id, text, metadata, chunks)
+                    stats['documents'] += 1
+                    stats['chunks'] += len(chunks)
+                    logger.info(f"📄 {document_id}: {len(chunks)} chunks")
+                else:
+                    _, batch, embeddings = item
+                    self.vector_store.upsert_chunks(batch, embeddings)
+                    stats['vectors'] += len(batch)
+                    if stats['first_vectors_after'] is None:
+                        stats['first_vectors_after'] = round(time.perf_counter() - start, 2)
+                    logger.info(f"🧮 Upserted {len(batch)} vectors ({stats['vectors']} total)")
+        except BaseException:
+            self._stop.set()
+            raise
+        finally:
+            self._stop.set()
+            # Unblock producers waiting on a full queue
+            for q in (loaded_queue, embedded_queue):
+                while True:
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        break
+            for thread in threads:
+                thread.join(timeout=5)
+
+        if self._error is not None:
+            raise self._error
+
+        stats['seconds'] = round(time.perf_counter() - start, 2)
+        logger.info(f"✅ Streamed {stats['documents']} documents, {stats['chunks']} chunks, "
+                    f"{stats['vectors']} vectors in {stats['seconds']}s "
+                    f"({len(stats['failed_files'])} failed)")
+        return stats
@@ -0,0 +1,200 @@
+"""Compiled multi-pattern keyword matching for classification, routing and safety checks."""
+import re
+from typing import Dict, List, Optional, Iterable, Set, Union
+
+from loguru import logger
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+    logger.debug("pyahocorasick not available, keyword matching will use a compiled trie regex")
+
+
+def _trie_pattern(keywords: Iterable[str]) -> str:
+    """
+    Build a regex alternation shaped like a prefix trie.
+
+    Sharing prefixes means the engine only follows branches whose first
+    character matches, instead of trying every keyword at every position.
+    Longer continuations are tried first so each match is the longest
+    keyword starting at that position.
+    """
+    trie: Dict[str, dict] = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        terminal = '' in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if terminal:
+            return '(?:' + body + ')?'
+        return body
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """
+    Finds every keyword of a fixed vocabulary in one linear pass over the text.
+
+    Matching is case-insensitive substring matching, so ``'picc' in text``
+    and ``'picc' in matcher.find(text)`` agree. Uses an Aho-Corasick automaton
+    when ``pyahocorasick`` is installed, otherwise a single compiled trie regex.
+    Keywords can belong to named categories with weights for scoring.
+    """
+
+    def __init__(self, categories: Union[Dict[str, Iterable[str]], Iterable[str]],
+                 category_weights: Optional[Dict[str, float]] = None):
+        """
+        Initialize the matcher.
+
+        Args:
+            categories: Dict of category -> keywords, or a flat keyword list
+                (stored under the 'default' category)
+            category_weights: Optional weight per category (default 1.0)
+        """
+        if not isinstance(categories, dict):
+            categories = {'default': categories}
+
+        self.categories: Dict[str, List[str]] = {}
+        self.keyword_categories: Dict[str, List[str]] = {}
+        self.keywords: List[str] = []  # Declaration order, used by first()
+        for category, keywords in categories.items():
+            lowered = []
+            for keyword in keywords:
+                keyword = keyword.lower()
+                if not keyword:
+                    continue
+                lowered.append(keyword)
+                if keyword not in self.keyword_categories:
+                    self.keyword_categories[keyword] = []
+                    self.keywords.append(keyword)
+                if category not in self.keyword_categories[keyword]:
+                    self.keyword_categories[keyword].append(category)
+            self.categories[category] = lowered
+        self.category_weights = {c: (category_weights or {}).get(c, 1.0) for c in self.categories}
+        self._order = {keyword: i for i, keyword in enumerate(self.keywords)}
+
+        if AHOCORASICK_AVAILABLE:
+            self._automaton = ahocorasick.Automaton()
+            for keyword in self.keywords:
+                self._automaton.add_word(keyword, keyword)
+            self._automaton.make_automaton()
+            self._regex = None
+        else:
+            self._automaton = None
+            self._regex = re.compile(_trie_pattern(self.keywords)) if self.keywords else None
+            # The regex reports non-overlapping longest matches. Keywords inside a match are
+            # implied by it; keywords that start inside a match and run past its end
+            # (a suffix of the match is their prefix) are verified with a substring check.
+            self._implied = {
+                keyword: [other for other in self.keywords if other in keyword]
+                for keyword in self.keywords
+            }
+            self._overlaps = {
+                keyword: [
+                    other for other in self.keywords
+                    if other not in keyword and any(
+                        other.startswith(keyword[i:]) for i in range(1, len(keyword))
+                    )
+                ]
+                for keyword in self.keywords
+            }
+
+    def find(self, text: str) -> Set[str]:
+        """
+        Return the distinct keywords present in text.
+
+        Args:
+            text: Text to scan (case-insensitive)
+
+        Returns:
+            Set of matched keywords (lowercased)
+        """
+        if not text or not self.keywords:
+            return set()
+        text = text.lower()
+        if self._automaton is not None:
+            return {keyword for _, keyword in self._automaton.iter(text)}
+
+        found: Set[str] = set()
+        matched: Set[str] = set()
+        candidates: Set[str] = set()
+        for match in self._regex.finditer(text):
+            longest = match.group(0)
+            if longest not in matched:
+                matched.add(longest)
+                found.update(self._implied[longest])
+                candidates.update(self._overlaps[longest])
+        for keyword in candidates - found:
+            if keyword in text:
+                found.add(keyword)
+        return found
+
+    def first(self, text: str) -> Optional[str]:
+        """
+        Return the earliest-declared keyword present in text (list-order priority).
+
+        Args:
+            text: Text to scan
+
+        Returns:
+            Keyword or None
+        """
+        found = self.find(text)
+        return min(found, key=self._order.__getitem__) if found else None
+
+    def contains_any(self, text: str) -> bool:
+        """Check whether any keyword is present in text."""
+        return bool(self.find(text))
+
+    def category_counts(self, text: str = None, found: Optional[Set[str]] = None) -> Dict[str, int]:
+        """
+        Count distinct keyword hits per category.
+
+        Args:
+            text: Text to scan (ignored if found is given)
+            found: Precomputed result of find()
+
+        Returns:
+            Dict of category -> number of distinct matched keywords
+        """
+        found = self.find(text) if found is None else found
+        counts = {category: 0 for category in self.categories}
+        for keyword in found:
+            for category in self.keyword_categories.get(keyword, []):
+                counts[category] += 1
+        return counts
+
+    def category_scores(self, text: str = None, found: Optional[Set[str]] = None,
+                        keyword_weights: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+        """
+        Category-weighted hit scores.
+
+        Each distinct matched keyword adds category_weight * keyword weight
+        (default 1.0) to every category it belongs to.
+
+        Args:
+            text: Text to scan (ignored if found is given)
+            found: Precomputed result of find()
+            keyword_weights: Optional per-keyword weight overrides
+
+        Returns:
+            Dict of category -> score
+        """
+        found = self.find(text) if found is None else found
+        keyword_weights = keyword_weights or {}
+        scores = {category: 0.0 for category in self.categories}
+        for keyword in found:
+            weight = keyword_weights.get(keyword, 1.0)
+            for category in self.keyword_categories.get(keyword, []):
+                scores[category] += self.category_weights[category] * weight
+        return scores
@@ -7,8 +7,7 @@ project_root = Path(__file__).parent.parent
 if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
-from src.embeddings import get_embedding_model
-from src.vector_store import VectorStore
+from src.components import shared_vector_store
 from src.agentic_rag import create_agentic_rag_graph
 from loguru import logger
 
@@ -16,11 +15,8 @@ from loguru import logger
 # This is the entry point that LangGraph Studio will use
 logger.info("Initializing agent for LangGraph Studio...")
 
-# Initialize embedding model
-embedding_model = get_embedding_model()
-
-# Initialize vector store
-vector_store = VectorStore(embedding_model)
+# Initialize vector store (shared embedding model and Chroma client)
+vector_store = shared_vector_store()
 
 # Create the agent graph
 agent = create_agentic_rag_graph(vector_store)
@@ -5,17 +5,23 @@ import os
 from loguru import logger
 from tenacity import retry, stop_after_attempt, wait_exponential
 
-try:
-    from langchain_openai import ChatOpenAI
-except ImportError:
-    from langchain_community.chat_models import ChatOpenAI
-from langchain_ollama import ChatOllama
 from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 
+from src.admission import StageLimitCallback
+from src.components import shared_llm
 from config import settings
 
 
+def _chat_openai():
+    """ChatOpenAI class, imported on first use (only the configured provider's package is loaded)."""
+    try:
+        from langchain_openai import ChatOpenAI
+    except ImportError:
+        from langchain_community.chat_models import ChatOpenAI
+    return ChatOpenAI
+
+
 def get_langchain_llm(provider: str = None, **kwargs) -> BaseChatModel:
     """
     Get a LangChain LLM instance.
@@ -30,7 +36,7 @@ def get_langchain_llm(provider: str = None, **kwargs) -> BaseChatModel:
     provider = provider or settings.llm_provider
 
     if provider == "openai":
-        return ChatOpenAI(
+        llm = _chat_openai()(
             model=kwargs.get('model', settings.openai_chat_model),
             api_key=kwargs.get('api_key', settings.openai_api_key),
             base_url=kwargs.get('base_url', settings.openai_api_base),
@@ -45,7 +51,9 @@ def get_langchain_llm(provider: str = None, **kwargs) -> BaseChatModel:
             import os
             os.environ['OLLAMA_HOST'] = base_url.replace('http://', '').replace('https://', '')
 
-        return ChatOllama(
+        from langchain_ollama import ChatOllama
+
+        llm = ChatOllama(
             model=kwargs.get('model', settings.ollama_chat_model),
             base_url=base_url,
             temperature=kwargs.get('temperature', settings.agent_temperature),
@@ -53,7 +61,7 @@ def get_langchain_llm(provider: str = None, **kwargs) -> BaseChatModel:
         )
     elif provider == "lmstudio":
         # LM Studio uses OpenAI-compatible API
-        return ChatOpenAI(
+        llm = _chat_openai()(
             model=kwargs.get('model') or settings.lmstudio_chat_model,
             api_key="lm-studio",  # LM Studio doesn't require real key
             base_url=kwargs.get('base_url') or settings.lmstudio_api_base,
@@ -63,7 +71,7 @@ def get_langchain_llm(provider: str = None, **kwargs) -> BaseChatModel:
         )
     elif provider == "openrouter":
         # OpenRouter uses OpenAI-compatible API
-        return ChatOpenAI(
+        llm = _chat_openai()(
             model=kwargs.get('model', settings.openrouter_chat_model),
             api_key=kwargs.get('api_key', settings.openrouter_api_key),
             base_url=kwargs.get('base_url', settings.openrouter_api_base),
@@ -75,6 +83,11 @@ def get_langchain_llm(provider: str = None, **kwargs) -> BaseChatModel:
     else:
         raise ValueError(f"Unknown LLM provider: {provider}")
 
+    # Every call holds a slot of the process-wide LLM concurrency limit
+    if settings.admission_llm_concurrency > 0:
+        llm.callbacks = list(llm.callbacks or []) + [StageLimitCallback("llm")]
+    return llm
+
 
 # Legacy compatibility classes (kept for backward compatibility)
 class LLMProvider:
@@ -94,7 +107,7 @@ class OpenAIProvider(LLMProvider):
 
     def __init__(self, **kwargs):
         """Initialize OpenAI provider."""
-        self.langchain_llm = get_langchain_llm(provider="openai", **kwargs)
+        self.langchain_llm = shared_llm(provider="openai", **kwargs)
         logger.info(f"Initialized OpenAI provider (legacy mode)")
 
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
@@ -126,7 +139,7 @@ class OllamaProvider(LLMProvider):
 
     def __init__(self, **kwargs):
         """Initialize Ollama provider."""
-        self.langchain_llm = get_langchain_llm(provider="ollama", **kwargs)
+        self.langchain_llm = shared_llm(provider="ollama", **kwargs)
         logger.info(f"Initialized Ollama provider (legacy mode)")
 
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
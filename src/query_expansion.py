@@ -0,0 +1,497 @@
+"""Local query expansion: abbreviation/synonym tables plus a KB co-occurrence graph, no LLM calls."""
+import json
+import math
+import re
+import time
+import xml.etree.ElementTree as ET
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+from config import settings
+
+# Hand-maintained IR abbreviations (abbreviation -> long forms)
+IR_ABBREVIATIONS = {
+    'picc': ['peripherally inserted central catheter'],
+    'cvc': ['central venous catheter', 'central line'],
+    'npo': ['nil by mouth', 'fasting'],
+    'nbm': ['nil by mouth', 'fasting'],
+    'ga': ['general anaesthesia'],
+    'ir': ['interventional radiology'],
+    'ct': ['computed tomography'],
+    'mri': ['magnetic resonance imaging'],
+    'dsa': ['digital subtraction angiography'],
+    'tae': ['transarterial embolization'],
+    'fna': ['fine needle aspiration'],
+    'avm': ['arteriovenous malformation'],
+    'avf': ['arteriovenous fistula'],
+    'vm': ['venous malformation'],
+    'lm': ['lymphatic malformation'],
+    'dvt': ['deep vein thrombosis'],
+    'iv': ['intravenous'],
+    'g-tube': ['gastrostomy tube'],
+    'gj': ['gastrojejunostomy'],
+    'emla': ['numbing cream', 'local anaesthetic cream'],
+    'a&e': ['accident and emergency', 'emergency department'],
+}
+
+# Interchangeable terms (spelling variants, lay vs clinical wording)
+SYNONYM_GROUPS = [
+    ['fasting', 'nil by mouth', 'no food or drink'],
+    ['anaesthesia', 'anesthesia'],
+    ['anaesthetic', 'anesthetic'],
+    ['embolization', 'embolisation'],
+    ['haemangioma', 'hemangioma'],
+    ['haematoma', 'hematoma'],
+    ['tunnelled', 'tunneled'],
+    ['bleeding', 'haemorrhage', 'hemorrhage'],
+    ['port', 'port-a-cath', 'implanted port'],
+    ['line', 'catheter'],
+    ['wound', 'puncture site', 'incision'],
+    ['dressing', 'bandage'],
+    ['sedation', 'sleep medicine'],
+    ['discharge', 'going home'],
+    ['risks', 'complications', 'side effects'],
+]
+
+# Traditional Chinese terms -> English KB wording (most KB documents are English)
+ZH_TERMS = {
+    '禁食': ['fasting', 'nil by mouth'],
+    '栓塞': ['embolization'],
+    '鎮靜': ['sedation'],
+    '麻醉': ['anaesthesia'],
+    '活檢': ['biopsy'],
+    '活組織檢查': ['biopsy'],
+    '導管': ['catheter'],
+    '血管造影': ['angiogram', 'angiography'],
+    '引流': ['drainage'],
+    '風險': ['risks', 'complications'],
+    '併發症': ['complications'],
+    '傷口': ['wound', 'dressing'],
+    '出院': ['discharge'],
+    '住院': ['hospital stay'],
+}
+
+STOPWORDS = set("""
+a about above after again all also am an and any are as at be because been before being below between both
+but by can could did do does doing down during each few for from further had has have having he her here
+hers him his how i if in into is it its itself just may me might more most must my no nor not now of off on
+once only or other our ours out over own same she should so some such than that the their theirs them then
+there these they this those through to too under until up very was we were what when where which while who
+whom why will with would you your yours child children kid kids son daughter please tell know need want
+""".split())
+
+_WORD_RE = re.compile(r"[a-z][a-z'&-]*[a-z]|[a-z]")
+_SENTENCE_RE = re.compile(r"(?<=[.!?。！？])\s+|\n+")
+_REPEATED_WORD_RE = re.compile(r"\b(\w+)(?:\s+\1\b)+", re.IGNORECASE)
+_ABBREVIATION_RE = re.compile(r"((?:[A-Za-z][\w'-]*\s+){1,8})\(([A-Z][A-Za-z]{1,6})\)")
+
+
+def _append_new_words(text: str, phrases: Iterable[str]) -> str:
+    """Text followed by the words of ``phrases`` that it (or an earlier phrase) does not already contain."""
+    seen = set(re.findall(r"\w+", text.lower()))
+    extra = []
+    for phrase in phrases:
+        for word in phrase.split():
+            if word.lower() not in seen:
+                seen.add(word.lower())
+                extra.append(word)
+    return f"{text.strip()} {' '.join(extra)}" if extra else text
+
+
+def content_terms(text: str) -> List[str]:
+    """Lowercase English content words (stopwords removed), in order."""
+    return [w for w in _WORD_RE.findall((text or "").lower()) if w not in STOPWORDS and len(w) > 2]
+
+
+def discover_abbreviations(text: str) -> Dict[str, str]:
+    """
+    Find "long form (ABBR)" definitions whose initials spell the abbreviation.
+
+    Args:
+        text: Document text
+
+    Returns:
+        Dict of lowercase abbreviation -> lowercase long form
+    """
+    found = {}
+    for match in _ABBREVIATION_RE.finditer(text or ""):
+        words = match.group(1).split()
+        abbreviation = match.group(2).lower()
+        # Shortest trailing run of words whose initials spell the abbreviation
+        for start in range(len(words) - 1, -1, -1):
+            candidate = words[start:]
+            initials = ''.join(word[0].lower() for word in candidate)
+            if initials == abbreviation:
+                if candidate[0].lower() not in STOPWORDS:
+                    found[abbreviation] = ' '.join(candidate).lower()
+                break
+            if len(candidate) > len(abbreviation):
+                break
+    return found
+
+
+def load_qna_texts(qna_dir: str) -> List[str]:
+    """
+    Load curated Q&A pairs as "question answer" texts.
+
+    Args:
+        qna_dir: Folder of *_qna*.xml files (see scripts/create_qna_xml.py)
+
+    Returns:
+        List of texts, one per Q&A pair
+    """
+    texts = []
+    for xml_path in sorted(Path(qna_dir).glob('*.xml')):
+        try:
+            root = ET.parse(xml_path).getroot()
+        except ET.ParseError as e:
+            logger.warning(f"Skipping unreadable Q&A file {xml_path.name}: {e}")
+            continue
+        for qna in root.iter('qna'):
+            question = qna.findtext('question') or ''
+            answer = qna.findtext('answer') or ''
+            if question or answer:
+                texts.append(f"{question}\n{answer}")
+    return texts
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict]], k: int = 60, limit: int = None) -> List[Dict]:
+    """
+    Merge ranked result lists by reciprocal rank.
+
+    Args:
+        result_lists: Result dicts (with 'id' or 'content') per query
+        k: RRF constant
+        limit: Max results to return
+
+    Returns:
+        Fused results with 'rrf_score', best first
+    """
+    scores: Dict[str, float] = {}
+    first_seen: Dict[str, Dict] = {}
+    for results in result_lists:
+        for rank, result in enumerate(results):
+            key = result.get('id') or result.get('content', '')[:100]
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+            first_seen.setdefault(key, result)
+    fused = []
+    for key in sorted(scores, key=scores.get, reverse=True)[:limit]:
+        result = first_seen[key]
+        result['rrf_score'] = scores[key]
+        fused.append(result)
+    return fused
+
+
+def build_cooccurrence_graph(texts: Iterable[str], min_df: int = 3, min_pair_count: int = 3,
+                             min_npmi: float = 0.3, max_neighbors: int = 8,
+                             max_df_ratio: float = 0.2) -> Tuple[Dict[str, List[Tuple[str, float]]], Dict[str, str], int]:
+    """
+    Build a term co-occurrence graph (sentence windows, NPMI-weighted).
+
+    Args:
+        texts: Document and Q&A texts
+        min_df: Minimum sentences a term must appear in
+        min_pair_count: Minimum sentences a pair must share
+        min_npmi: Minimum normalized PMI for an edge
+        max_neighbors: Edges kept per term
+        max_df_ratio: Terms in more than this share of sentences are ignored
+
+    Returns:
+        Tuple of (term -> [(neighbor, npmi)], discovered abbreviations, sentence count)
+    """
+    sentences: List[List[str]] = []
+    abbreviations: Dict[str, str] = {}
+    df = Counter()
+    for text in texts:
+        abbreviations.update(discover_abbreviations(text))
+        for sentence in _SENTENCE_RE.split(text or ""):
+            terms = sorted(set(content_terms(sentence)))
+            if len(terms) >= 2:
+                sentences.append(terms)
+                df.update(terms)
+
+    total = len(sentences)
+    if not total:
+        return {}, abbreviations, 0
+    max_df = max(min_df, int(total * max_df_ratio))
+    vocabulary = {term for term, count in df.items() if min_df <= count <= max_df}
+
+    pairs = Counter()
+    for terms in sentences:
+        kept = [t for t in terms if t in vocabulary][:40]
+        for i, a in enumerate(kept):
+            for b in kept[i + 1:]:
+                pairs[(a, b)] += 1
+
+    neighbors: Dict[str, List[Tuple[str, float]]] = defaultdict(list)
+    for (a, b), count in pairs.items():
+        if count < min_pair_count:
+            continue
+        p_ab = count / total
+        if p_ab >= 1.0:
+            continue
+        npmi = math.log(p_ab / ((df[a] / total) * (df[b] / total))) / -math.log(p_ab)
+        if npmi >= min_npmi:
+            neighbors[a].append((b, round(npmi, 3)))
+            neighbors[b].append((a, round(npmi, 3)))
+
+    graph = {
+        term: sorted(edges, key=lambda edge: edge[1], reverse=True)[:max_neighbors]
+        for term, edges in neighbors.items()
+    }
+    return graph, abbreviations, total
+
+
+class QueryExpander:
+    """
+    Expands queries without an LLM.
+
+    Combines the IR abbreviation table, synonym groups, Chinese-to-English
+    term hints, abbreviations discovered in the KB ("long form (ABBR)") and a
+    co-occurrence graph built at ingest from the KB and curated Q&A pairs.
+    Produces weighted terms for BM25 and a few query variants for embedding
+    search, replacing the MULTI_QUERY_PROMPT and REWRITE_PROMPT calls.
+    """
+
+    def __init__(self, neighbors: Optional[Dict[str, List[Tuple[str, float]]]] = None,
+                 abbreviations: Optional[Dict[str, str]] = None,
+                 synonym_weight: float = 0.7, neighbor_weight: float = 0.4):
+        """
+        Initialize the expander.
+
+        Args:
+            neighbors: Co-occurrence graph (term -> [(neighbor, npmi)])
+            abbreviations: Abbreviations discovered in the KB (abbr -> long form)
+            synonym_weight: BM25 weight of abbreviation/synonym expansions
+            neighbor_weight: BM25 weight multiplier for co-occurrence neighbors
+        """
+        self.neighbors = {term: [tuple(edge) for edge in edges] for term, edges in (neighbors or {}).items()}
+        self.synonym_weight = synonym_weight
+        self.neighbor_weight = neighbor_weight
+
+        # Phrase -> alternative phrases, in both directions
+        self.alternatives: Dict[str, List[str]] = defaultdict(list)
+
+        def link(phrase: str, others: List[str]):
+            for other in others:
+                if other != phrase and other not in self.alternatives[phrase]:
+                    self.alternatives[phrase].append(other)
+
+        table = dict(IR_ABBREVIATIONS)
+        for abbreviation, long_form in (abbreviations or {}).items():
+            if long_form not in table.setdefault(abbreviation, []):
+                table[abbreviation].append(long_form)
+        self._abbreviations = set(table)
+        for abbreviation, long_forms in table.items():
+            link(abbreviation, long_forms)
+            for long_form in long_forms:
+                link(long_form, [abbreviation])
+        for group in SYNONYM_GROUPS:
+            for phrase in group:
+                link(phrase, group)
+        for zh_term, english in ZH_TERMS.items():
+            link(zh_term, english)
+
+        # Longest phrases first; word boundaries for Latin phrases only
+        alternatives = []
+        for phrase in sorted(self.alternatives, key=len, reverse=True):
+            escaped = re.escape(phrase)
+            alternatives.append(rf"(?<![\w-]){escaped}(?![\w-])" if phrase.isascii() else escaped)
+        self._phrase_re = re.compile('|'.join(alternatives), re.IGNORECASE) if alternatives else None
+
+    def matched_phrases(self, query: str) -> List[str]:
+        """Table phrases present in the query (lowercased, in order, distinct)."""
+        if self._phrase_re is None:
+            return []
+        seen = []
+        for match in self._phrase_re.finditer(query or ""):
+            phrase = match.group(0).lower()
+            if phrase not in seen:
+                seen.append(phrase)
+        return seen
+
+    def related_terms(self, query: str, per_term: int = 2) -> List[Tuple[str, float]]:
+        """
+        Co-occurrence neighbors of the query's content words.
+
+        Args:
+            query: Query text
+            per_term: Neighbors taken per query word
+
+        Returns:
+            List of (term, npmi) not already in the query, strongest first
+        """
+        terms = content_terms(query)
+        present = set(terms)
+        related: Dict[str, float] = {}
+        for term in terms:
+            for neighbor, npmi in self.neighbors.get(term, [])[:per_term]:
+                if neighbor not in present:
+                    related[neighbor] = max(related.get(neighbor, 0.0), npmi)
+        return sorted(related.items(), key=lambda item: item[1], reverse=True)
+
+    def expand_terms(self, query: str, per_term: int = 3) -> Dict[str, float]:
+        """
+        Weighted terms for BM25.
+
+        Query words weigh 1.0, abbreviation/synonym expansions synonym_weight,
+        co-occurrence neighbors npmi * neighbor_weight.
+
+        Args:
+            query: Query text
+            per_term: Co-occurrence neighbors per query word
+
+        Returns:
+            Dict of term -> weight
+        """
+        weights: Dict[str, float] = {term: 1.0 for term in content_terms(query)}
+        for phrase in self.matched_phrases(query):
+            for alternative in self.alternatives[phrase]:
+                for term in content_terms(alternative) or [alternative.lower()]:
+                    weights[term] = max(weights.get(term, 0.0), self.synonym_weight)
+        for term, npmi in self.related_terms(query, per_term=per_term):
+            weights[term] = max(weights.get(term, 0.0), round(npmi * self.neighbor_weight, 3))
+        return weights
+
+    def _swap(self, phrase: str) -> str:
+        """First alternative for a phrase, never contracting a long form into an abbreviation."""
+        for alternative in self.alternatives[phrase.lower()]:
+            if alternative not in self._abbreviations:
+                return alternative
+        return phrase
+
+    def variants(self, query: str, max_variants: int = 3) -> List[str]:
+        """
+        Alternative phrasings for embedding search.
+
+        Args:
+            query: Query text
+            max_variants: Maximum variants returned (excluding the query itself)
+
+        Returns:
+            List of distinct variants: table phrases swapped for their first
+            alternative, the query with all alternatives appended, and a
+            keyword form with co-occurring terms
+        """
+        phrases = self.matched_phrases(query)
+        candidates = []
+        if phrases:
+            swapped = self._phrase_re.sub(lambda match: self._swap(match.group(0)), query)
+            # "catheter catheter" when both "picc" and "line" were swapped
+            candidates.append(_REPEATED_WORD_RE.sub(r"\1", swapped))
+            candidates.append(_append_new_words(query, [alt for phrase in phrases for alt in self.alternatives[phrase]]))
+        candidates.append(self.rewrite(query))
+
+        variants = []
+        for candidate in candidates:
+            candidate = re.sub(r"\s+", " ", candidate).strip()
+            if candidate and candidate.lower() != query.strip().lower() and candidate not in variants:
+                variants.append(candidate)
+        return variants[:max_variants]
+
+    def rewrite(self, query: str, max_terms: int = 12) -> str:
+        """
+        Keyword form of the query for a retry search (what REWRITE_PROMPT asked the LLM for).
+
+        Args:
+            query: Query text
+            max_terms: Maximum keywords
+
+        Returns:
+            Space-separated keywords. When the keywords would drop most of the
+            question's words (short words, stopwords, Chinese: "Can my child go
+            home the same day?" -> "home day"), the question itself followed by
+            the expansion keywords; the query if there is nothing to add.
+        """
+        terms = list(dict.fromkeys(content_terms(query)))
+        expansions = []
+        for phrase in self.matched_phrases(query):
+            for alternative in self.alternatives[phrase]:
+                if alternative.isascii() and alternative not in terms and alternative not in expansions:
+                    expansions.append(alternative)
+        expansions.extend(term for term, _ in self.related_terms(query) if term not in terms + expansions)
+        if len(terms) * 2 < len(re.findall(r"\w+", query)):
+            return _append_new_words(query, expansions[:max_terms])
+        keywords = list(dict.fromkeys(word for keyword in terms + expansions for word in keyword.split()))
+        if not keywords:
+            return query
+        return ' '.join(keywords[:max_terms])
+
+    @classmethod
+    def build(cls, texts: Iterable[str], **graph_kwargs) -> "QueryExpander":
+        """
+        Build an expander from KB and Q&A texts.
+
+        Args:
+            texts: Document and Q&A texts
+            **graph_kwargs: Passed to build_cooccurrence_graph
+
+        Returns:
+            QueryExpander instance
+        """
+        neighbors, abbreviations, sentences = build_cooccurrence_graph(texts, **graph_kwargs)
+        expander = cls(neighbors, abbreviations)
+        expander.sentences = sentences
+        expander.discovered_abbreviations = abbreviations
+        return expander
+
+    def save(self, path: str):
+        """
+        Save the co-occurrence graph and discovered abbreviations.
+
+        Args:
+            path: JSON output path
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': 1,
+                'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'sentences': getattr(self, 'sentences', 0),
+                'abbreviations': getattr(self, 'discovered_abbreviations', {}),
+                'neighbors': self.neighbors,
+            }, f, ensure_ascii=False)
+        logger.info(f"💾 Saved query expansion graph ({len(self.neighbors)} terms) to {path}")
+
+    @classmethod
+    def load(cls, path: str) -> "QueryExpander":
+        """
+        Load an expander saved by save().
+
+        Args:
+            path: JSON path
+
+        Returns:
+            QueryExpander instance
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data.get('neighbors', {}), data.get('abbreviations', {}))
+
+
+_query_expander: Optional[QueryExpander] = None
+
+
+def get_query_expander() -> QueryExpander:
+    """
+    Get the shared QueryExpander.
+
+    Uses the graph built at ingest if present; otherwise only the curated
+    abbreviation and synonym tables.
+    """
+    global _query_expander
+    if _query_expander is None:
+        path = Path(settings.query_expansion_path)
+        if path.exists():
+            try:
+                _query_expander = QueryExpander.load(str(path))
+                logger.info(f"Loaded query expansion graph ({len(_query_expander.neighbors)} terms) from {path}")
+            except Exception as e:
+                logger.warning(f"Could not load query expansion graph from {path}: {e}")
+        if _query_expander is None:
+            logger.info("Query expansion using curated tables only (no KB graph built yet)")
+            _query_expander = QueryExpander()
+    return _query_expander
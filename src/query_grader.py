@@ -8,6 +8,7 @@ import re
 from loguru import logger
 
 from src.llm import LLMProvider
+from src.keyword_matcher import KeywordMatcher
 
 
 class QueryType(Enum):
@@ -80,6 +81,7 @@ class QueryGrader:
         "transfusion",
         "injection", "joint injection",
     ]
+    _procedure_matcher = KeywordMatcher(KNOWN_PROCEDURES)
 
     QUERY_CLASSIFICATION_PROMPT = """You are a query classifier for a pediatric interventional radiology chatbot.
 
@@ -145,11 +147,7 @@ Respond in JSON only:
         Returns:
             Detected procedure name or None
         """
-        query_lower = query.lower()
-        for procedure in self.KNOWN_PROCEDURES:
-            if procedure in query_lower:
-                return procedure
-        return None
+        return self._procedure_matcher.first(query)
 
     def _parse_json_response(self, response: str) -> Optional[Dict[str, Any]]:
         """
@@ -0,0 +1,197 @@
+"""Rule-based fast path that plans the search_kb tool call without the orchestrator LLM."""
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional
+
+from loguru import logger
+
+from config import settings
+
+# Organization mentions -> source_org metadata value. Order matters: at the same
+# position the earlier alternative wins (e.g. HKSIR's full name before SIR's).
+ORG_PATTERNS = {
+    'HKCH': [r"\bhkch\b", r"\bhong\s*kong\s+children'?s'?\s+hospital\b", r"香港兒童醫院", r"兒童醫院"],
+    'HKSIR': [r"\bhksir\b", r"\bhong\s*kong\s+society\s+of\s+interventional\s+radiology\b", r"香港介入放射學會"],
+    'SickKids': [r"\bsick\s*kids\b", r"\bsick_kids\b", r"\bhospital\s+for\s+sick\s+children\b"],
+    'CIRSE': [r"\bcirse\b", r"\bcardiovascular\s+and\s+interventional\s+radiological\s+society\b"],
+    # Uppercase token only: "Sir" / "sir" is a salutation
+    'SIR': [r"(?-i:\bSIR\b)", r"\bsociety\s+of\s+interventional\s+radiology\b"],
+}
+
+# Region mentions -> region metadata value (see DocumentProcessor._detect_region)
+REGION_PATTERNS = {
+    'Hong Kong': [r"\bhong\s*kong\b", r"\bhk\b", r"香港"],
+    'Non-Hong Kong': [r"\boverseas\b", r"\binternational\b", r"海外", r"外國"],
+}
+
+# Requests the LLM should plan itself (browsing / SQL tools, document lookups)
+BROWSE_PATTERNS = [
+    r"\b(list|browse|show)\b.{0,30}\b(documents?|leaflets?|files?|sources?)\b",
+    r"\ball\s+(documents?|leaflets?|files?)\b",
+    r"\bdocument[_\s]?id\b",
+    r"\bhow\s+many\s+(documents?|leaflets?|files?)\b",
+    r"列出", r"所有文件",
+]
+
+# Messages with nothing to search for
+SMALL_TALK_PATTERN = r"^\s*(hi|hello|hey|thanks?|thank\s+you|ok(ay)?|bye|goodbye|你好|多謝|謝謝|唔該)\W*$"
+
+# Prepositions/possessives that only tie an org or region mention to the sentence
+_MENTION_PREFIX = r"(?:\b(?:according\s+to|from|by|at|in|per|for)\s+(?:the\s+)?)?"
+_LEADING_FILLER = re.compile(
+    r"^\s*(?:what\s+(?:does|do|did)\s+(?:say|recommend|suggest)\s+(?:about|on|for)|tell\s+me\s+about)\s+",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class RoutePlan:
+    """A planned tool call, or the reason the rules declined to plan one."""
+    confident: bool
+    tool: str = "search_kb"
+    args: Dict[str, Any] = field(default_factory=dict)
+    reason: str = ""
+
+    def tool_call(self, call_id: str) -> Dict[str, Any]:
+        """Tool call dict for AIMessage(tool_calls=[...])."""
+        return {"name": self.tool, "args": dict(self.args), "id": call_id}
+
+
+class FastPathRouter:
+    """
+    Deterministic planner for the common "search the KB for this question" turn.
+
+    Organization, region and procedure category are pulled out of the query
+    with compiled patterns and turned into search_kb filters, so most turns
+    need no orchestrator or query-cleaning LLM call. Queries the rules are not
+    sure about (browsing requests, several organizations, small talk, very long
+    questions) are left to the LLM planner.
+    """
+
+    def __init__(self, max_words: int = None, category_filter: bool = None):
+        """
+        Initialize the router.
+
+        Args:
+            max_words: Longer queries go to the LLM planner (default from settings)
+            category_filter: Whether to pass an unambiguous procedure_category filter (default from settings)
+        """
+        # Imported here so the router does not pull the document converters in at module import
+        from src.document_processor import PROCEDURE_CATEGORY_MATCHER, PROCEDURE_CATEGORY_NAMES
+
+        self.max_words = max_words or settings.fast_path_max_words
+        self.category_filter = settings.fast_path_category_filter if category_filter is None else category_filter
+        self._category_matcher = PROCEDURE_CATEGORY_MATCHER
+        self._category_names = PROCEDURE_CATEGORY_NAMES
+
+        # One named alternative per rule (orgs before regions so "Hong Kong Children's
+        # Hospital" is read as HKCH rather than as a region)
+        self._rules = {}
+        alternatives = []
+        for kind, table in (('source_org', ORG_PATTERNS), ('region', REGION_PATTERNS)):
+            for value, patterns in table.items():
+                for pattern in patterns:
+                    name = f"r{len(self._rules)}"
+                    self._rules[name] = (kind, value)
+                    alternatives.append(f"(?P<{name}>{pattern})")
+        self._mention_re = re.compile('|'.join(alternatives), re.IGNORECASE)
+        self._strip_re = re.compile(_MENTION_PREFIX + "(?:" + '|'.join(alternatives) + r")(?:'s)?", re.IGNORECASE)
+        self._browse_re = re.compile('|'.join(BROWSE_PATTERNS), re.IGNORECASE)
+        self._small_talk_re = re.compile(SMALL_TALK_PATTERN, re.IGNORECASE)
+        self.stats = {'fast_path': 0, 'llm': 0}
+
+    def extract_filters(self, text: str) -> Dict[str, List[str]]:
+        """
+        Find organization and region mentions.
+
+        Args:
+            text: Query text
+
+        Returns:
+            Dict with 'source_org' and 'region' lists of distinct values in order of appearance
+        """
+        found: Dict[str, List[str]] = {'source_org': [], 'region': []}
+        for match in self._mention_re.finditer(text or ""):
+            kind, value = self._rules[match.lastgroup]
+            if value not in found[kind]:
+                found[kind].append(value)
+        return found
+
+    def extract_category(self, text: str) -> Optional[str]:
+        """
+        Procedure category when exactly one category's keywords appear.
+
+        Args:
+            text: Query text
+
+        Returns:
+            procedure_category metadata value or None
+        """
+        counts = self._category_matcher.category_counts(text)
+        hits = [category for category, count in counts.items() if count]
+        if len(hits) != 1:
+            return None
+        return self._category_names.get(hits[0])
+
+    def strip_mentions(self, text: str) -> str:
+        """Remove organization/region mentions and filler, leaving the search keywords."""
+        stripped = self._strip_re.sub(" ", text)
+        stripped = _LEADING_FILLER.sub("", stripped)
+        stripped = re.sub(r"\s+", " ", stripped).strip(" ,;:-")
+        stripped = re.sub(r"\s+([?.!,，。？])", r"\1", stripped)
+        return stripped
+
+    def plan(self, query: str, filter_source: Optional[str] = None) -> RoutePlan:
+        """
+        Plan a search_kb call for a query.
+
+        Args:
+            query: Text to search for (latest user or rewritten question)
+            filter_source: Text to read filters from (default: query), e.g. the
+                original question when query is a rewrite that may have dropped them
+
+        Returns:
+            RoutePlan; ``confident`` is False when the LLM planner should decide
+        """
+        query = (query or "").strip()
+        filter_source = filter_source if filter_source is not None else query
+
+        if not query:
+            return self._decline("empty query")
+        if self._small_talk_re.match(query):
+            return self._decline("small talk")
+        if self._browse_re.search(query):
+            return self._decline("browse / document lookup request")
+        if len(query.split()) > self.max_words:
+            return self._decline(f"long query (> {self.max_words} words)")
+
+        filters = self.extract_filters(filter_source)
+        if len(filters['source_org']) > 1:
+            return self._decline(f"several organizations mentioned: {filters['source_org']}")
+        if len(filters['region']) > 1:
+            return self._decline(f"several regions mentioned: {filters['region']}")
+
+        search_query = self.strip_mentions(query)
+        if len(search_query) < 2:
+            # Query was only an org/region name; search for it as written
+            search_query = query
+
+        args: Dict[str, Any] = {"query": search_query}
+        if filters['source_org']:
+            # The organization implies its region, so no separate region filter
+            args["source_org"] = filters['source_org'][0]
+        elif filters['region']:
+            args["region"] = filters['region'][0]
+        if self.category_filter:
+            category = self.extract_category(filter_source)
+            if category:
+                args["procedure_category"] = category
+
+        self.stats['fast_path'] += 1
+        return RoutePlan(confident=True, args=args, reason="rules")
+
+    def _decline(self, reason: str) -> RoutePlan:
+        """Leave the turn to the LLM planner."""
+        self.stats['llm'] += 1
+        logger.info(f"Fast-path router declined ({reason}), using LLM planner")
+        return RoutePlan(confident=False, reason=reason)
@@ -1,9 +1,12 @@
 """Custom Qwen3 Reranker implementation for LangChain."""
+import importlib.util
 from typing import List, Optional
 
 from langchain_core.documents import Document
 from loguru import logger
 
+from src.admission import stage_limited
+
 # Try different import paths for BaseDocumentCompressor (LangChain 1.0+ compatible)
 try:
     from langchain_core.retrievers.document_compressors import BaseDocumentCompressor
@@ -25,19 +28,14 @@ except ImportError:
                         """Compress documents based on query."""
                         pass
 
-# Check for required dependencies
-try:
-    import torch
-    TORCH_AVAILABLE = True
-except ImportError:
-    TORCH_AVAILABLE = False
+# Check for required dependencies without importing them: torch and transformers
+# take seconds to import, so they are loaded when a reranker is created
+TORCH_AVAILABLE = importlib.util.find_spec("torch") is not None
+if not TORCH_AVAILABLE:
     logger.warning("torch not available, Qwen3 reranker will be disabled")
 
-try:
-    from transformers import AutoTokenizer, AutoModelForCausalLM
-    TRANSFORMERS_AVAILABLE = True
-except ImportError:
-    TRANSFORMERS_AVAILABLE = False
+TRANSFORMERS_AVAILABLE = importlib.util.find_spec("transformers") is not None
+if not TRANSFORMERS_AVAILABLE:
     logger.warning("transformers not available, Qwen3 reranker will be disabled")
 
 if not (TORCH_AVAILABLE and TRANSFORMERS_AVAILABLE):
@@ -86,6 +84,9 @@ class Qwen3Reranker(BaseDocumentCompressor):
         object.__setattr__(self, '_max_length', max_length)
         object.__setattr__(self, '_use_flash_attention', use_flash_attention)
 
+        import torch
+        from transformers import AutoTokenizer, AutoModelForCausalLM
+
         # Initialize tokenizer and model
         logger.info(f"Loading Qwen3 Reranker model: {model_name}")
         object.__setattr__(self, 'tokenizer', AutoTokenizer.from_pretrained(model_name, padding_side='left'))
@@ -160,6 +161,8 @@ class Qwen3Reranker(BaseDocumentCompressor):
 
     def compute_logits(self, inputs) -> List[float]:
         """Compute relevance scores for input pairs."""
+        import torch
+
         batch_scores = self.model(**inputs).logits[:, -1, :]
         true_vector = batch_scores[:, self.token_true_id]
         false_vector = batch_scores[:, self.token_false_id]
@@ -168,6 +171,7 @@ class Qwen3Reranker(BaseDocumentCompressor):
         scores = batch_scores[:, 1].exp().tolist()
         return scores
 
+    @stage_limited("reranker")  # One forward pass at a time; concurrent passes thrash the CPU
     def compress_documents(
         self,
         documents: List[Document],
@@ -206,8 +210,12 @@ class Qwen3Reranker(BaseDocumentCompressor):
         doc_scores = list(zip(documents, scores))
         doc_scores.sort(key=lambda x: x[1], reverse=True)
 
-        # Return top_n documents
-        reranked_docs = [doc for doc, score in doc_scores[:self._top_n]]
+        # Return top_n documents with the score for downstream relevance gating, on copies:
+        # the inputs' metadata dicts are shared with the BM25 index and the vector store results
+        reranked_docs = [
+            Document(page_content=doc.page_content, metadata={**doc.metadata, 'rerank_score': float(score)})
+            for doc, score in doc_scores[:self._top_n]
+        ]
 
         logger.debug(f"Reranked {len(documents)} documents, returning top {len(reranked_docs)}")
         return reranked_docs
@@ -1,17 +1,34 @@
 """RAG pipeline implementation using LangGraph Agentic RAG."""
-from typing import List, Dict, Any, Optional
+import asyncio
+import re
+import time
+from typing import AsyncContextManager, AsyncIterator, Callable, List, Dict, Any, Optional, Tuple, Union
 
 from langgraph.graph import StateGraph
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
 from loguru import logger
 
-from src.agentic_rag import create_agentic_rag_graph
+from src.agentic_rag import ANSWER_STREAM_TAG, create_agentic_rag_graph
 from src.vector_store import VectorStore
 from src.retriever import AdvancedRetriever
 from src.safety_guard import SafetyGuard, SafetyAssessment, RiskLevel
-from src.llm import get_llm_provider
+from src.components import shared_llm_provider
+from src.safety_screen import SafetyScreenResult, get_emergency_trigger_prescreen
+from src.answer_cache import AnswerCache, CacheLookup, filter_key, normalize_query
+from src.curated_qna import get_curated_index
+from src.request_coalescing import SingleFlight
+from src.safety_classifier import TieredSafetyChecker, SAFETY_BLOCK_MESSAGE
 from config import settings
 
+# Progress messages for graph nodes in streaming responses
+STREAM_STAGES = {
+    "generate_query_or_respond": "Planning the search...",
+    "retrieve": "Searching the knowledge base...",
+    "rewrite_question": "Rewriting question for better retrieval...",
+    "generate_answer": "Writing the answer...",
+}
+SENTENCE_END_RE = re.compile(r"[.!?。！？\n]")
+
 # Import LangSmith traceable decorator
 try:
     from langsmith import traceable
@@ -28,45 +45,14 @@ except ImportError:
 class RAGPipeline:
     """RAG pipeline using LangGraph Agentic RAG for generating responses."""
 
-    # Emergency keywords that trigger canned responses
-    # Note: For PedIR context, we need specific qualifiers to avoid false positives
-    # when discussing procedures like embolization that involve bleeding management
-    EMERGENCY_KEYWORDS = [
-        # Breathing emergencies (always urgent)
-        "can't breathe", "cannot breathe", "not breathing", "stopped breathing",
-        # Cardiac (always urgent)
-        'chest pain', 'heart attack',
-        # Severe allergic reaction
-        'anaphylaxis', 'severe allergic reaction', 'throat swelling',
-        # True emergencies
-        'emergency room', 'call 999', 'call ambulance', '999', 'unconscious', 'passed out',
-        # Chinese emergency terms
-        '不能呼吸', '胸痛', '過敏反應', '緊急', '昏迷', '急症室',
-        # Post-procedure true emergencies (require "heavy/uncontrolled" qualifier)
-        'uncontrolled bleeding', 'heavy bleeding', "bleeding won't stop", "bleeding will not stop",
-        '大量出血', '無法止血'
-    ]
-
-    EMERGENCY_RESPONSE = """This sounds like it could be an emergency. Please do not rely on this chatbot.
-
-**Call 999 or go to the nearest Accident & Emergency department immediately.**
-
-If you have urgent questions about your procedure, please contact the HKCH IR nurse coordinator at [phone number].
-"""
-
-    EMERGENCY_RESPONSE_ZH = """這聽起來可能是緊急情況。請不要依賴此聊天機器人。
-
-**請立即致電999或前往最近的急症室。**
-
-如果您對手術有緊急疑問，請致電[電話號碼]聯絡香港兒童醫院介入放射科護士協調員。
-"""
-
     def __init__(
         self,
         vector_store: VectorStore,
         retriever: Optional[AdvancedRetriever] = None,
         graph: Optional[StateGraph] = None,
         use_safety_guard: bool = True,
+        use_answer_cache: Optional[bool] = None,
+        use_curated_answers: Optional[bool] = None,
     ):
         """
         Initialize the RAG pipeline using LangGraph.
@@ -76,6 +62,8 @@ If you have urgent questions about your procedure, please contact the HKCH IR nu
             retriever: AdvancedRetriever instance (optional, kept for compatibility)
             graph: Compiled LangGraph StateGraph (optional, will be created if not provided)
             use_safety_guard: Whether to use the safety guardrail agent
+            use_answer_cache: Whether to reuse answers to near-identical questions (default from settings)
+            use_curated_answers: Whether to answer curated Q&A questions directly (default from settings)
         """
         self.vector_store = vector_store
         self.retriever = retriever
@@ -84,7 +72,7 @@ If you have urgent questions about your procedure, please contact the HKCH IR nu
         # Initialize SafetyGuard if enabled
         if use_safety_guard:
             try:
-                llm_provider = get_llm_provider()
+                llm_provider = shared_llm_provider()
                 self.safety_guard = SafetyGuard(llm_provider, use_llm_check=False)  # Pattern-based for speed
                 logger.info("Initialized RAG pipeline with SafetyGuard")
             except Exception as e:
@@ -94,6 +82,31 @@ If you have urgent questions about your procedure, please contact the HKCH IR nu
         else:
             self.safety_guard = None
 
+        # Same trigger list as the graph's emergency check and the API's admission bypass, so the
+        # three paths make one emergency decision (the broad SafetyGuard patterns never short-circuit)
+        self.safety_prescreen = get_emergency_trigger_prescreen()
+        # Local-only safety tiers for checking streamed answers sentence by sentence
+        self.stream_safety = TieredSafetyChecker(mode="local", verdict_log_path="")
+
+        # Semantic answer cache in front of the graph
+        self.answer_cache = None
+        if settings.answer_cache_enabled if use_answer_cache is None else use_answer_cache:
+            try:
+                self.answer_cache = AnswerCache(vector_store.embedding_model)
+            except Exception as e:
+                logger.warning(f"Failed to initialize answer cache: {e}")
+
+        # Identical concurrent async requests share one pipeline run
+        self.coalescer = SingleFlight() if settings.request_coalescing_enabled else None
+
+        # Reviewed answers for the curated standard questions
+        self.curated_index = None
+        if settings.curated_qna_enabled if use_curated_answers is None else use_curated_answers:
+            try:
+                self.curated_index = get_curated_index(vector_store.embedding_model)
+            except Exception as e:
+                logger.warning(f"Failed to initialize curated Q&A index: {e}")
+
         # Create LangGraph if not provided
         if graph is None:
             self.graph = create_agentic_rag_graph(vector_store)
@@ -102,377 +115,823 @@ If you have urgent questions about your procedure, please contact the HKCH IR nu
 
         logger.info("Initialized RAG pipeline with LangGraph Agentic RAG")
 
-    def _check_emergency(self, query: str) -> Optional[str]:
+    def _answer_without_graph(
+        self,
+        query: str,
+        language: str,
+        filter_dict: Optional[Dict[str, Any]],
+        include_sources: bool,
+        start_time: float,
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[CacheLookup]]:
         """
-        Check if query contains emergency keywords.
+        Answer from the curated Q&A index or the answer cache, if either matches.
 
         Args:
             query: User query
+            language: Query language from the safety pre-screen
+            filter_dict: Metadata filters
+            include_sources: Whether to include sources
+            start_time: Request start (for total_time)
 
         Returns:
-            Emergency response if triggered, None otherwise
+            Tuple of (response dict or None, cache lookup to reuse when storing the graph's answer)
         """
-        query_lower = query.lower()
-
-        for keyword in self.EMERGENCY_KEYWORDS:
-            if keyword in query_lower:
-                logger.warning(f"Emergency keyword detected: {keyword}")
-                # Detect language and return appropriate response
-                if any(ord(char) > 127 for char in query):  # Contains non-ASCII (likely Chinese)
-                    return self.EMERGENCY_RESPONSE_ZH
-                else:
-                    return self.EMERGENCY_RESPONSE
+        # Curated Q&A: a reviewed answer beats both the cache and the graph (unfiltered queries only)
+        if self.curated_index is not None and not filter_dict:
+            curated = None
+            try:
+                curated = self.curated_index.match(query, language=language)
+            except Exception as e:
+                logger.warning(f"Curated Q&A lookup failed: {e}")
+            if curated is not None:
+                total_time = time.time() - start_time
+                logger.info("=" * 80)
+                logger.info(f"✅ QUERY COMPLETED (Curated Q&A, {curated.reason}, similarity {curated.similarity:.3f})")
+                logger.info(f"⏱️  Total Time: {total_time:.3f} seconds")
+                logger.info("=" * 80)
+                sources = self.curated_index.sources(curated) if include_sources else []
+                return {
+                    'response': self.curated_index.format_answer(curated, language=language),
+                    'sources': sources,
+                    'source_documents': sources,
+                    'is_emergency': False,
+                    'total_time': total_time,
+                    'curated': True,
+                    'curated_question': curated.qa.question,
+                    'curated_similarity': curated.similarity,
+                }, None
+
+        # Answer cache: same language + filters + KB version, similar enough question
+        cache_lookup = None
+        if self.answer_cache is not None:
+            try:
+                cache_lookup = self.answer_cache.lookup(query, language=language, filters=filter_dict)
+            except Exception as e:
+                logger.warning(f"Answer cache lookup failed: {e}")
+            if cache_lookup is not None and cache_lookup.hit:
+                total_time = time.time() - start_time
+                logger.info("=" * 80)
+                logger.info(f"✅ QUERY COMPLETED (Answer Cache, similarity {cache_lookup.similarity:.3f})")
+                logger.info(f"⏱️  Total Time: {total_time:.3f} seconds")
+                logger.info("=" * 80)
+                sources = cache_lookup.entry['sources'] if include_sources else []
+                return {
+                    'response': cache_lookup.entry['response'],
+                    'sources': sources,
+                    'source_documents': sources,
+                    'is_emergency': False,
+                    'total_time': total_time,
+                    'cached': True,
+                    'cache_similarity': cache_lookup.similarity,
+                    'cached_query': cache_lookup.entry['query'],
+                }, cache_lookup
 
-        return None
+        return None, cache_lookup
 
-    @traceable(name="rag_generate_response", metadata={"component": "rag_pipeline"})
-    def generate_response(
+    @staticmethod
+    def _extract_sources(messages: List[Any]) -> List[Dict[str, Any]]:
+        """
+        Parse source documents from the graph's tool messages.
+
+        Args:
+            messages: Graph messages
+
+        Returns:
+            List of source dicts (filename, source_org, region, category, score, tool, content)
+        """
+        sources = []
+        for msg in messages:
+            if isinstance(msg, ToolMessage) or (hasattr(msg, 'name') and msg.name):
+                tool_name = msg.name if hasattr(msg, 'name') else 'Unknown'
+                content = msg.content if hasattr(msg, 'content') else str(msg)
+
+                # Parse document info from formatted tool output
+                # Format: [Document N] Source: ORG | Region: X | Category: Y | filename (Relevance: 0.XXX)
+                doc_pattern = r'\[Document \d+\] Source: ([^|]+) \| Region: ([^|]+) \| Category: ([^|]+) \| ([^(]+) \(Relevance: ([\d.]+)\)'
+                matches = re.findall(doc_pattern, content)
+
+                if matches:
+                    for match in matches:
+                        source_org, region, category, filename, score = match
+                        sources.append({
+                            'filename': filename.strip(),
+                            'source_org': source_org.strip(),
+                            'region': region.strip(),
+                            'category': category.strip(),
+                            'score': float(score),
+                            'tool': tool_name,
+                            'content': content[:200] + '...' if len(content) > 200 else content
+                        })
+                else:
+                    # Format 2: SQL Tool
+                    # [N] Document ID: ...
+                    #     Filename: ...
+                    sql_pattern = r'Document ID: (.*?)\n\s+Filename: (.*?)\n\s+Source: (.*?)\n\s+Region: (.*?)\n\s+Category: (.*?)\n'
+                    matches_sql = re.findall(sql_pattern, content, re.DOTALL)
+
+                    if matches_sql:
+                        for match in matches_sql:
+                            doc_id, filename, source_org, region, category = match
+                            sources.append({
+                                'filename': filename.strip(),
+                                'source_org': source_org.strip(),
+                                'region': region.strip(),
+                                'category': category.strip(),
+                                'score': 1.0,  # SQL search implies exact match relevance
+                                'tool': tool_name,
+                                'content': content[:200] + '...' if len(content) > 200 else content
+                            })
+                    else:
+                        # Fallback: just include tool and content
+                        sources.append({
+                            'tool': tool_name,
+                            'filename': 'Unknown',
+                            'source_org': 'Unknown',
+                            'score': 0.0,
+                            'content': content[:200] + '...' if len(content) > 200 else content
+                        })
+        return sources
+
+    def _prepare(
         self,
         query: str,
-        k: int = None,
-        filter_dict: Optional[Dict[str, Any]] = None,
-        temperature: float = 0.1,
-        include_sources: bool = True,
-    ) -> Dict[str, Any]:
+        filter_dict: Optional[Dict[str, Any]],
+        include_sources: bool,
+        start_time: float,
+    ) -> Tuple[Optional[Dict[str, Any]], SafetyScreenResult, Optional[CacheLookup]]:
         """
-        Generate a response using LangGraph Agentic RAG.
+        Steps before the graph: safety screening, curated answers and the answer cache.
 
         Args:
             query: User query
-            k: Number of documents to retrieve (not used, kept for compatibility)
-            filter_dict: Optional metadata filter (not directly used, kept for compatibility)
-            temperature: LLM temperature (not directly used, kept for compatibility)
-            include_sources: Whether to include source documents in response
+            filter_dict: Metadata filters
+            include_sources: Whether to include sources
+            start_time: Request start (for total_time)
 
         Returns:
-            Dict with 'response', 'sources', 'is_emergency', and 'total_time' keys
+            Tuple of (response dict if answered without the graph, safety pre-screen result, cache lookup)
         """
-        import time
-        start_time = time.time()
-        logger.info("=" * 80)
-        logger.info(f"🔄 STARTING QUERY PROCESSING")
-        logger.info(f"📝 Query: {query}")
-        logger.info(f"⏰ Start Time: {time.strftime('%H:%M:%S', time.localtime(start_time))}")
-        logger.info("=" * 80)
+        # Safety pre-screen on the emergency trigger list (the result is passed to the graph)
+        safety = self.safety_prescreen.screen(query)
+        if safety.is_emergency:
+            end_time = time.time()
+            total_time = end_time - start_time
+            logger.info("=" * 80)
+            logger.info(f"✅ QUERY COMPLETED (Emergency Response)")
+            logger.info(f"⏱️  Total Time: {total_time:.2f} seconds")
+            logger.info("=" * 80)
+            return {
+                'response': safety.response,
+                'sources': [],
+                'is_emergency': True,
+                'total_time': total_time,
+                'safety_assessment': {
+                    'risk_level': safety.risk_level.value,
+                    'concerns': safety.concerns
+                }
+            }, safety, None
 
-        # Safety Guard: Pre-query assessment
-        safety_assessment = None
-        if self.use_safety_guard and self.safety_guard:
-            safety_assessment = self.safety_guard.assess_query(query)
+        # Optional LLM assessment for emergencies without obvious keywords (its broad patterns are skipped)
+        if self.use_safety_guard and self.safety_guard and self.safety_guard.use_llm_check:
+            safety_assessment = self.safety_guard.assess_query(query, check_patterns=False)
             logger.info(f"Safety assessment: {safety_assessment.risk_level.value} (emergency: {safety_assessment.is_emergency})")
 
-            # Handle critical emergencies from SafetyGuard
             if safety_assessment.is_emergency or safety_assessment.risk_level == RiskLevel.CRITICAL:
-                end_time = time.time()
-                total_time = end_time - start_time
                 logger.warning(f"SafetyGuard detected emergency: {safety_assessment.clinical_concerns}")
                 return {
                     'response': self.safety_guard.get_emergency_response(query),
                     'sources': [],
                     'is_emergency': True,
-                    'total_time': total_time,
+                    'total_time': time.time() - start_time,
                     'safety_assessment': {
                         'risk_level': safety_assessment.risk_level.value,
                         'concerns': safety_assessment.clinical_concerns
                     }
-                }
+                }, safety, None
 
-        # Check for emergency keywords (fallback if SafetyGuard disabled)
-        emergency_response = self._check_emergency(query)
-        if emergency_response:
-            end_time = time.time()
-            total_time = end_time - start_time
-            logger.info("=" * 80)
-            logger.info(f"✅ QUERY COMPLETED (Emergency Response)")
-            logger.info(f"⏱️  Total Time: {total_time:.2f} seconds")
-            logger.info("=" * 80)
-            return {
-                'response': emergency_response,
-                'sources': [],
-                'is_emergency': True,
-                'total_time': total_time,
-            }
-
-        # Use LangGraph to generate response
-        try:
-            logger.info("Invoking LangGraph agentic RAG...")
+        shortcut, cache_lookup = self._answer_without_graph(query, safety.language, filter_dict, include_sources, start_time)
+        return shortcut, safety, cache_lookup
 
-            # Run the graph
-            result = self.graph.invoke({
-                "messages": [HumanMessage(content=query)]
-            })
-
-            # Extract final response from messages
-            messages = result.get("messages", [])
-            response_text = ""
-            sources = []
+    def _finalize(
+        self,
+        query: str,
+        result: Dict[str, Any],
+        safety: SafetyScreenResult,
+        cache_lookup: Optional[CacheLookup],
+        filter_dict: Optional[Dict[str, Any]],
+        include_sources: bool,
+        start_time: float,
+    ) -> Dict[str, Any]:
+        """
+        Build the response dict from the graph's final state and cache grounded answers.
 
-            # Log all messages in full detail for human observers
-            logger.info("=" * 80)
-            logger.info(f"📨 CONVERSATION MESSAGES ({len(messages)} total)")
-            logger.info("=" * 80)
+        Args:
+            query: User query
+            result: Final graph state
+            safety: Safety pre-screen result
+            cache_lookup: Lookup from _prepare (its embedding is reused to store the answer)
+            filter_dict: Metadata filters
+            include_sources: Whether to include sources
+            start_time: Request start (for total_time)
 
-            for i, msg in enumerate(messages):
-                logger.info(f"\n--- Message {i+1} ---")
-                msg_type = type(msg).__name__
+        Returns:
+            Dict with 'response', 'sources', 'is_emergency', and 'total_time' keys
+        """
+        # Extract final response from messages
+        messages = result.get("messages", [])
+        response_text = ""
+        sources = []
 
-                if isinstance(msg, AIMessage):
-                    logger.info(f"Type: {msg_type} (AI Response)")
-                    # Show full content
-                    if hasattr(msg, 'content') and msg.content:
-                        logger.info(f"Content:\n{msg.content}")
-                    else:
-                        logger.info(f"Content: (empty)")
-
-                    # Show tool calls with full details
-                    if hasattr(msg, 'tool_calls') and msg.tool_calls:
-                        logger.info(f"\nTool Calls ({len(msg.tool_calls)}):")
-                        for j, tc in enumerate(msg.tool_calls, 1):
-                            tool_name = tc.get('name', 'unknown')
-                            tool_args = tc.get('args', {})
-                            logger.info(f"  {j}. Tool: {tool_name}")
-                            logger.info(f"     Arguments:")
-                            for key, value in tool_args.items():
-                                logger.info(f"       - {key}: {value}")
-
-                elif isinstance(msg, ToolMessage):
-                    tool_name = msg.name if hasattr(msg, 'name') else 'Unknown'
-                    logger.info(f"Type: {msg_type} (Tool Result)")
-                    logger.info(f"Tool: {tool_name}")
-                    # Show full content
-                    if hasattr(msg, 'content') and msg.content:
-                        content = msg.content
-                        # Show first 1000 chars if very long, otherwise full
-                        if len(content) > 1000:
-                            logger.info(f"Content (first 1000 chars):\n{content[:1000]}...")
-                            logger.info(f"... ({len(content) - 1000} more characters)")
-                        else:
-                            logger.info(f"Content:\n{content}")
-                    else:
-                        logger.info(f"Content: (empty)")
+        # Log all messages in full detail for human observers
+        logger.info("=" * 80)
+        logger.info(f"📨 CONVERSATION MESSAGES ({len(messages)} total)")
+        logger.info("=" * 80)
 
-                elif isinstance(msg, HumanMessage):
-                    logger.info(f"Type: {msg_type} (User Query)")
-                    # Show full content
-                    if hasattr(msg, 'content') and msg.content:
-                        logger.info(f"Content:\n{msg.content}")
-                    else:
-                        logger.info(f"Content: (empty)")
+        for i, msg in enumerate(messages):
+            logger.info(f"\n--- Message {i+1} ---")
+            msg_type = type(msg).__name__
 
-                elif isinstance(msg, dict):
-                    msg_role = msg.get('role', 'unknown')
-                    msg_type_name = msg.get('type', 'unknown')
-                    logger.info(f"Type: dict (role={msg_role}, type={msg_type_name})")
-                    content = str(msg.get('content', ''))
+            if isinstance(msg, AIMessage):
+                logger.info(f"Type: {msg_type} (AI Response)")
+                # Show full content
+                if hasattr(msg, 'content') and msg.content:
+                    logger.info(f"Content:\n{msg.content}")
+                else:
+                    logger.info(f"Content: (empty)")
+
+                # Show tool calls with full details
+                if hasattr(msg, 'tool_calls') and msg.tool_calls:
+                    logger.info(f"\nTool Calls ({len(msg.tool_calls)}):")
+                    for j, tc in enumerate(msg.tool_calls, 1):
+                        tool_name = tc.get('name', 'unknown')
+                        tool_args = tc.get('args', {})
+                        logger.info(f"  {j}. Tool: {tool_name}")
+                        logger.info(f"     Arguments:")
+                        for key, value in tool_args.items():
+                            logger.info(f"       - {key}: {value}")
+
+            elif isinstance(msg, ToolMessage):
+                tool_name = msg.name if hasattr(msg, 'name') else 'Unknown'
+                logger.info(f"Type: {msg_type} (Tool Result)")
+                logger.info(f"Tool: {tool_name}")
+                # Show full content
+                if hasattr(msg, 'content') and msg.content:
+                    content = msg.content
+                    # Show first 1000 chars if very long, otherwise full
                     if len(content) > 1000:
                         logger.info(f"Content (first 1000 chars):\n{content[:1000]}...")
+                        logger.info(f"... ({len(content) - 1000} more characters)")
                     else:
                         logger.info(f"Content:\n{content}")
                 else:
-                    logger.info(f"Type: {msg_type}")
-                    msg_str = str(msg)
-                    if len(msg_str) > 500:
-                        logger.info(f"Content (first 500 chars):\n{msg_str[:500]}...")
-                    else:
-                        logger.info(f"Content:\n{msg_str}")
+                    logger.info(f"Content: (empty)")
 
-            logger.info("=" * 80)
+            elif isinstance(msg, HumanMessage):
+                logger.info(f"Type: {msg_type} (User Query)")
+                # Show full content
+                if hasattr(msg, 'content') and msg.content:
+                    logger.info(f"Content:\n{msg.content}")
+                else:
+                    logger.info(f"Content: (empty)")
+
+            elif isinstance(msg, dict):
+                msg_role = msg.get('role', 'unknown')
+                msg_type_name = msg.get('type', 'unknown')
+                logger.info(f"Type: dict (role={msg_role}, type={msg_type_name})")
+                content = str(msg.get('content', ''))
+                if len(content) > 1000:
+                    logger.info(f"Content (first 1000 chars):\n{content[:1000]}...")
+                else:
+                    logger.info(f"Content:\n{content}")
+            else:
+                logger.info(f"Type: {msg_type}")
+                msg_str = str(msg)
+                if len(msg_str) > 500:
+                    logger.info(f"Content (first 500 chars):\n{msg_str[:500]}...")
+                else:
+                    logger.info(f"Content:\n{msg_str}")
 
-            # Find the final assistant message (AIMessage from LangChain)
-            logger.debug(f"Total messages in result: {len(messages)}")
-            for msg in reversed(messages):
-                # Check for AIMessage instance (LangChain message object)
-                if isinstance(msg, AIMessage):
+        logger.info("=" * 80)
+
+        # Find the final assistant message (AIMessage from LangChain)
+        logger.debug(f"Total messages in result: {len(messages)}")
+        for msg in reversed(messages):
+            # Check for AIMessage instance (LangChain message object)
+            if isinstance(msg, AIMessage):
+                response_text = msg.content if hasattr(msg, 'content') else str(msg)
+                logger.debug(f"Found AIMessage with content length: {len(response_text) if response_text else 0}")
+                break
+            # Fallback: check for dict format
+            elif isinstance(msg, dict):
+                if msg.get('role') == 'assistant' or 'type' in msg and msg.get('type') == 'ai':
+                    response_text = msg.get('content', '')
+                    logger.debug(f"Found assistant message in dict format")
+                    break
+            # Fallback: check for content attribute
+            elif hasattr(msg, 'content'):
+                # Make sure it's not a HumanMessage or ToolMessage
+                if not isinstance(msg, (HumanMessage, ToolMessage)):
                     response_text = msg.content if hasattr(msg, 'content') else str(msg)
-                    logger.debug(f"Found AIMessage with content length: {len(response_text) if response_text else 0}")
+                    logger.debug(f"Found message with content attribute")
                     break
-                # Fallback: check for dict format
-                elif isinstance(msg, dict):
-                    if msg.get('role') == 'assistant' or 'type' in msg and msg.get('type') == 'ai':
-                        response_text = msg.get('content', '')
-                        logger.debug(f"Found assistant message in dict format")
-                        break
-                # Fallback: check for content attribute
-                elif hasattr(msg, 'content'):
-                    # Make sure it's not a HumanMessage or ToolMessage
-                    if not isinstance(msg, (HumanMessage, ToolMessage)):
-                        response_text = msg.content if hasattr(msg, 'content') else str(msg)
-                        logger.debug(f"Found message with content attribute")
-                        break
-
-            # Extract sources from tool messages
-            if include_sources:
-                import re
-                for msg in messages:
-                    if isinstance(msg, ToolMessage) or (hasattr(msg, 'name') and msg.name):
-                        tool_name = msg.name if hasattr(msg, 'name') else 'Unknown'
-                        content = msg.content if hasattr(msg, 'content') else str(msg)
-
-                        # Parse document info from formatted tool output
-                        # Format: [Document N] Source: ORG | Region: X | Category: Y | filename (Relevance: 0.XXX)
-                        doc_pattern = r'\[Document \d+\] Source: ([^|]+) \| Region: ([^|]+) \| Category: ([^|]+) \| ([^(]+) \(Relevance: ([\d.]+)\)'
-                        matches = re.findall(doc_pattern, content)
-
-                        if matches:
-                            for match in matches:
-                                source_org, region, category, filename, score = match
-                                sources.append({
-                                    'filename': filename.strip(),
-                                    'source_org': source_org.strip(),
-                                    'region': region.strip(),
-                                    'category': category.strip(),
-                                    'score': float(score),
-                                    'tool': tool_name,
-                                    'content': content[:200] + '...' if len(content) > 200 else content
-                                })
-                        else:
-                            # Format 2: SQL Tool
-                            # [N] Document ID: ...
-                            #     Filename: ...
-                            sql_pattern = r'Document ID: (.*?)\n\s+Filename: (.*?)\n\s+Source: (.*?)\n\s+Region: (.*?)\n\s+Category: (.*?)\n'
-                            matches_sql = re.findall(sql_pattern, content, re.DOTALL)
-
-                            if matches_sql:
-                                for match in matches_sql:
-                                    doc_id, filename, source_org, region, category = match
-                                    sources.append({
-                                        'filename': filename.strip(),
-                                        'source_org': source_org.strip(),
-                                        'region': region.strip(),
-                                        'category': category.strip(),
-                                        'score': 1.0,  # SQL search implies exact match relevance
-                                        'tool': tool_name,
-                                        'content': content[:200] + '...' if len(content) > 200 else content
-                                    })
-                            else:
-                                # Fallback: just include tool and content
-                                sources.append({
-                                    'tool': tool_name,
-                                    'filename': 'Unknown',
-                                    'source_org': 'Unknown',
-                                    'score': 0.0,
-                                    'content': content[:200] + '...' if len(content) > 200 else content
-                                })
-
-            # Parse structured output if available
+
+        # Extract sources from tool messages
+        if include_sources:
+            sources = self._extract_sources(messages)
+
+        # Parse structured output if available
+        try:
+            import json
+            # Try to parse response_text as JSON
+            structured_data = json.loads(response_text)
+
+            # If successful, use the 'answer' field as the main response
+            if isinstance(structured_data, dict) and 'answer' in structured_data:
+                response_text = structured_data['answer']
+                logger.info("Successfully parsed structured output from LLM")
+
+                # If sources are provided in the structured output, we can use them
+                # But often the LLM just cites filenames. We should verify against our retrieved sources.
+                if 'sources' in structured_data and structured_data['sources']:
+                    llm_sources = structured_data['sources']
+                    logger.info(f"LLM cited sources: {llm_sources}")
+                    # We could optionally filter 'sources' list to only include those cited by LLM
+                    # For now, we prefer the tool outputs as they contain metadata
+        except json.JSONDecodeError:
+            # Not JSON, treat as raw text
+            pass
+        except Exception as e:
+            logger.warning(f"Error parsing structured output: {e}")
+
+        if not response_text:
+            logger.warning(f"Could not extract response from {len(messages)} messages")
+            logger.debug(f"Message types: {[type(msg).__name__ for msg in messages]}")
+            response_text = "I'm sorry, I couldn't generate a response."
+        elif self.answer_cache is not None and sources and not response_text.startswith("I cannot provide"):
+            # Only grounded answers are cached (not failures or safety blocks)
             try:
-                import json
-                # Try to parse response_text as JSON
-                structured_data = json.loads(response_text)
-
-                # If successful, use the 'answer' field as the main response
-                if isinstance(structured_data, dict) and 'answer' in structured_data:
-                    response_text = structured_data['answer']
-                    logger.info("Successfully parsed structured output from LLM")
-
-                    # If sources are provided in the structured output, we can use them
-                    # But often the LLM just cites filenames. We should verify against our retrieved sources.
-                    if 'sources' in structured_data and structured_data['sources']:
-                        llm_sources = structured_data['sources']
-                        logger.info(f"LLM cited sources: {llm_sources}")
-                        # We could optionally filter 'sources' list to only include those cited by LLM
-                        # For now, we prefer the tool outputs as they contain metadata
-            except json.JSONDecodeError:
-                # Not JSON, treat as raw text
-                pass
+                self.answer_cache.store(
+                    query, response_text, sources, language=safety.language, filters=filter_dict,
+                    embedding=cache_lookup.embedding if cache_lookup is not None else None,
+                )
             except Exception as e:
-                logger.warning(f"Error parsing structured output: {e}")
+                logger.warning(f"Answer cache store failed: {e}")
 
-            if not response_text:
-                logger.warning(f"Could not extract response from {len(messages)} messages")
-                logger.debug(f"Message types: {[type(msg).__name__ for msg in messages]}")
-                response_text = "I'm sorry, I couldn't generate a response."
+        # Calculate total time
+        end_time = time.time()
+        total_time = end_time - start_time
 
-            # Calculate total time
-            end_time = time.time()
-            total_time = end_time - start_time
+        logger.info("=" * 80)
+        logger.info(f"✅ QUERY COMPLETED")
+        logger.info(f"📝 Original Query: {query}")
+        logger.info(f"📤 Response Length: {len(response_text)} characters")
+        logger.info(f"📚 Sources Used: {len(sources)}")
+        logger.info(f"⏱️  Total Round Trip Time: {total_time:.2f} seconds")
+        logger.info(f"⏰ End Time: {time.strftime('%H:%M:%S', time.localtime(end_time))}")
+        logger.info("=" * 80)
 
-            logger.info("=" * 80)
-            logger.info(f"✅ QUERY COMPLETED")
-            logger.info(f"📝 Original Query: {query}")
-            logger.info(f"📤 Response Length: {len(response_text)} characters")
-            logger.info(f"📚 Sources Used: {len(sources)}")
-            logger.info(f"⏱️  Total Round Trip Time: {total_time:.2f} seconds")
-            logger.info(f"⏰ End Time: {time.strftime('%H:%M:%S', time.localtime(end_time))}")
-            logger.info("=" * 80)
+        return {
+            'response': response_text,
+            'sources': sources,
+            'source_documents': sources,  # Alias for compatibility
+            'is_emergency': False,
+            'total_time': total_time,
+        }
+
+
+    def _failed_response(self, error: Exception, start_time: float) -> Dict[str, Any]:
+        """Apology response for a failed graph run."""
+        end_time = time.time()
+        total_time = end_time - start_time
+        logger.error(f"Error generating response: {error}")
+        logger.exception(error)
+        logger.info("=" * 80)
+        logger.info(f"❌ QUERY FAILED")
+        logger.info(f"⏱️  Time Before Error: {total_time:.2f} seconds")
+        logger.info("=" * 80)
+        return {
+            'response': "I'm sorry, I encountered an error while processing your question. Please try again or contact the IR nurse coordinator for assistance.",
+            'sources': [],
+            'is_emergency': False,
+            'total_time': total_time,
+            'error': str(error),
+        }
+
+    @staticmethod
+    def _log_start(query: str, start_time: float):
+        """Log the start of query processing."""
+        logger.info("=" * 80)
+        logger.info(f"🔄 STARTING QUERY PROCESSING")
+        logger.info(f"📝 Query: {query}")
+        logger.info(f"⏰ Start Time: {time.strftime('%H:%M:%S', time.localtime(start_time))}")
+        logger.info("=" * 80)
 
-            return {
-                'response': response_text,
-                'sources': sources,
-                'source_documents': sources,  # Alias for compatibility
-                'is_emergency': False,
-                'total_time': total_time,
-            }
+    @traceable(name="rag_generate_response", metadata={"component": "rag_pipeline"})
+    def generate_response(
+        self,
+        query: str,
+        k: int = None,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        temperature: float = 0.1,
+        include_sources: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        Generate a response using LangGraph Agentic RAG.
 
+        Args:
+            query: User query
+            k: Number of documents to retrieve (not used, kept for compatibility)
+            filter_dict: Optional metadata filter (not directly used, kept for compatibility)
+            temperature: LLM temperature (not directly used, kept for compatibility)
+            include_sources: Whether to include source documents in response
+
+        Returns:
+            Dict with 'response', 'sources', 'is_emergency', and 'total_time' keys
+        """
+        start_time = time.time()
+        self._log_start(query, start_time)
+
+        early, safety, cache_lookup = self._prepare(query, filter_dict, include_sources, start_time)
+        if early is not None:
+            return early
+
+        # Use LangGraph to generate response
+        try:
+            logger.info("Invoking LangGraph agentic RAG...")
+            result = self.graph.invoke({
+                "messages": [HumanMessage(content=query)],
+                "safety": safety,
+            })
+            return self._finalize(query, result, safety, cache_lookup, filter_dict, include_sources, start_time)
         except Exception as e:
-            end_time = time.time()
-            total_time = end_time - start_time if 'start_time' in locals() else 0
-            logger.error(f"Error generating response: {e}")
-            logger.exception(e)
-            logger.info("=" * 80)
-            logger.info(f"❌ QUERY FAILED")
-            logger.info(f"⏱️  Time Before Error: {total_time:.2f} seconds")
-            logger.info("=" * 80)
-            return {
-                'response': "I'm sorry, I encountered an error while processing your question. Please try again or contact the IR nurse coordinator for assistance.",
-                'sources': [],
-                'is_emergency': False,
-                'total_time': total_time,
-            }
+            return self._failed_response(e, start_time)
 
-    def stream_response(
+    @traceable(name="rag_agenerate_response", metadata={"component": "rag_pipeline"})
+    async def agenerate_response(
+        self,
+        query: str,
+        k: int = None,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        temperature: float = 0.1,
+        include_sources: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        Async generate_response() for the API server.
+
+        The graph runs with ``ainvoke`` (async LLM calls, tools in worker
+        threads); the embedding lookups before and after it run in a worker
+        thread, so the event loop keeps serving other requests meanwhile.
+
+        Args:
+            query: User query
+            k: Number of documents to retrieve (not used, kept for compatibility)
+            filter_dict: Optional metadata filter
+            temperature: LLM temperature (not directly used, kept for compatibility)
+            include_sources: Whether to include source documents in response
+
+        Returns:
+            Dict with 'response', 'sources', 'is_emergency', and 'total_time' keys
+            ('coalesced': True if shared from an identical in-flight request)
+        """
+        if self.coalescer is None:
+            return await self._agenerate_response(query, filter_dict, include_sources)
+        key = await asyncio.to_thread(self._coalescing_key, query, filter_dict, include_sources)
+        result, shared = await self.coalescer.do(
+            key, lambda: self._agenerate_response(query, filter_dict, include_sources))
+        if shared:
+            result['coalesced'] = True
+        return result
+
+    async def _agenerate_response(
+        self,
+        query: str,
+        filter_dict: Optional[Dict[str, Any]],
+        include_sources: bool,
+    ) -> Dict[str, Any]:
+        """One async pipeline run (see agenerate_response)."""
+        start_time = time.time()
+        self._log_start(query, start_time)
+
+        early, safety, cache_lookup = await asyncio.to_thread(
+            self._prepare, query, filter_dict, include_sources, start_time)
+        if early is not None:
+            return early
+
+        try:
+            logger.info("Invoking LangGraph agentic RAG (async)...")
+            result = await self.graph.ainvoke({
+                "messages": [HumanMessage(content=query)],
+                "safety": safety,
+            })
+            return await asyncio.to_thread(
+                self._finalize, query, result, safety, cache_lookup, filter_dict, include_sources, start_time)
+        except Exception as e:
+            return self._failed_response(e, start_time)
+
+    def _coalescing_key(self, query: str, filter_dict: Optional[Dict[str, Any]], include_sources: bool) -> str:
+        """Identity of a request for coalescing: normalized query, filters and KB version."""
+        from src.sql_tools import get_document_db
+        kb_version = settings.kb_version or get_document_db().get_kb_version()
+        return "\x1f".join([normalize_query(query), filter_key(filter_dict), kb_version,
+                             "sources" if include_sources else "no-sources"])
+
+    @staticmethod
+    def _message_text(message: Any) -> str:
+        """Text of a message or stream chunk (content may be a string or a list of parts)."""
+        content = getattr(message, 'content', message)
+        if isinstance(content, list):
+            return "".join(part.get('text', '') if isinstance(part, dict) else str(part) for part in content)
+        return content if isinstance(content, str) else str(content or "")
+
+    async def astream_response(
         self,
         query: str,
         k: int = None,
         filter_dict: Optional[Dict[str, Any]] = None,
         temperature: float = 0.1,
+        include_sources: bool = True,
     ):
         """
-        Generate a streaming response using LangGraph Agentic RAG.
+        Stream a response as events while the graph runs.
+
+        Built on LangGraph ``astream_events``: progress events as nodes start,
+        sources as soon as retrieval finishes, answer tokens as the answer model
+        generates them. Streamed text is checked with the local safety tiers at
+        each sentence end; an unsafe partial answer, or a final answer replaced
+        by the graph's post-answer check, produces a ``retraction`` event.
+        Identical concurrent requests share one stream: a late one first gets
+        the events produced so far.
 
         Args:
             query: User query
             k: Number of documents to retrieve (not used)
             filter_dict: Optional metadata filter
             temperature: LLM temperature (not directly used)
+            include_sources: Whether to emit source events
 
         Yields:
-            Response chunks and metadata
+            Event dicts with a 'type' of progress, sources, token, answer,
+            retraction, emergency, error or done (all JSON-serializable;
+            'done' has 'coalesced': True for a shared stream)
         """
+        if self.coalescer is None:
+            events, shared = self._astream_response(query, filter_dict, include_sources), False
+        else:
+            key = await asyncio.to_thread(self._coalescing_key, query, filter_dict, include_sources)
+            events, shared = self.coalescer.stream(
+                key, lambda: self._astream_response(query, filter_dict, include_sources))
+        try:
+            async for event in events:
+                if shared and event.get('type') == 'done':
+                    event = {**event, 'coalesced': True}
+                yield event
+        finally:
+            await events.aclose()
+
+    async def _astream_response(
+        self,
+        query: str,
+        filter_dict: Optional[Dict[str, Any]],
+        include_sources: bool,
+    ):
+        """One streaming pipeline run (see astream_response)."""
+        start_time = time.time()
         logger.info(f"Processing streaming query: {query[:100]}...")
 
-        # Check for emergency keywords
-        emergency_response = self._check_emergency(query)
-        if emergency_response:
-            yield {'type': 'emergency', 'content': emergency_response}
+        # Safety pre-screen (result is passed to the graph so it is not re-scanned)
+        safety = self.safety_prescreen.screen(query)
+        if safety.is_emergency:
+            yield {'type': 'emergency', 'content': safety.response}
+            yield {'type': 'done', 'total_time': time.time() - start_time, 'is_emergency': True}
             return
 
-        # Use LangGraph streaming
-        try:
-            logger.info("Streaming LangGraph response...")
-            for chunk in self.graph.stream({
-                "messages": [HumanMessage(content=query)]
-            }):
-                # LangGraph returns chunks per node
-                for node_name, node_output in chunk.items():
-                    if node_name == "generate_answer":
-                        # Final answer node
-                        messages = node_output.get("messages", [])
-                        for msg in messages:
-                            if hasattr(msg, 'content'):
-                                yield {'type': 'response', 'content': msg.content}
-                    elif node_name == "retrieve":
-                        # Retrieval node
-                        yield {'type': 'tool_execution', 'content': f"Retrieving documents from {node_name}..."}
-                    elif node_name == "generate_query_or_respond":
-                        # Query generation node
-                        yield {'type': 'agent_thinking', 'content': f"Thinking about query: {query[:50]}..."}
-                    elif node_name == "rewrite_question":
-                        # Question rewriting node
-                        yield {'type': 'agent_thinking', 'content': "Rewriting question for better retrieval..."}
+        shortcut, cache_lookup = await asyncio.to_thread(
+            self._answer_without_graph, query, safety.language, filter_dict, include_sources, start_time)
+        if shortcut is not None:
+            if shortcut['sources']:
+                yield {'type': 'sources', 'sources': shortcut['sources']}
+            yield {'type': 'answer', 'content': shortcut['response'],
+                   'curated': shortcut.get('curated', False), 'cached': shortcut.get('cached', False)}
+            yield {'type': 'done', 'total_time': time.time() - start_time, 'time_to_first_token': shortcut['total_time']}
+            return
 
+        answer_parts: List[str] = []
+        final_text = ""
+        sources: List[Dict[str, Any]] = []
+        first_token_time = None
+        retracted = False
+        try:
+            events = self.graph.astream_events(
+                {"messages": [HumanMessage(content=query)], "safety": safety},
+                config={"configurable": {"stream_answer": True}},
+                version="v2",
+            )
+            async for event in events:
+                kind = event["event"]
+                name = event.get("name")
+                node = event.get("metadata", {}).get("langgraph_node")
+
+                if kind == "on_chain_start" and name == node and name in STREAM_STAGES:
+                    yield {'type': 'progress', 'stage': name, 'content': STREAM_STAGES[name]}
+
+                elif kind == "on_chain_end" and name == node == "retrieve":
+                    output = event["data"].get("output") or {}
+                    messages = output.get("messages", []) if isinstance(output, dict) else []
+                    sources = self._extract_sources(messages) if include_sources else []
+                    yield {'type': 'sources', 'sources': sources}
+
+                elif kind == "on_chat_model_stream" and ANSWER_STREAM_TAG in event.get("tags", []):
+                    # Only the answer call is tagged: grader/safety LLM tokens in the same node are not answer text
+                    token = self._message_text(event["data"].get("chunk"))
+                    if not token:
+                        continue
+                    if first_token_time is None:
+                        first_token_time = time.time() - start_time
+                        logger.info(f"⚡ First answer token after {first_token_time:.2f}s")
+                    answer_parts.append(token)
+                    yield {'type': 'token', 'content': token}
+
+                    # On-the-fly safety check at sentence ends: only explicit unsafe patterns retract
+                    # mid-stream (the model tier is calibrated on full answers, checked when the node ends)
+                    if SENTENCE_END_RE.search(token):
+                        is_safe, tier, _ = await asyncio.to_thread(
+                            self.stream_safety.classify_locally, "".join(answer_parts))
+                        if is_safe is False and tier == 'rules':
+                            logger.warning(f"⚠️ Streaming safety check failed ({tier} tier), retracting answer")
+                            retracted = True
+                            yield {'type': 'retraction', 'content': SAFETY_BLOCK_MESSAGE, 'reason': f"{tier} tier"}
+                            break
+
+                elif kind == "on_chain_end" and name == node and name in ("generate_answer", "generate_query_or_respond", "handle_emergency"):
+                    output = event["data"].get("output") or {}
+                    for message in (output.get("messages", []) if isinstance(output, dict) else []):
+                        if isinstance(message, AIMessage) and not message.tool_calls:
+                            final_text = self._message_text(message)
+            await events.aclose()
         except Exception as e:
             logger.error(f"Error streaming response: {e}")
             yield {'type': 'error', 'content': f"Error: {str(e)}"}
+            return
+
+        streamed_text = "".join(answer_parts)
+        if not retracted:
+            if answer_parts and final_text and final_text.strip() != streamed_text.strip():
+                # The graph's post-answer safety check replaced the streamed answer
+                logger.warning("⚠️ Final answer differs from streamed text, retracting")
+                retracted = True
+                yield {'type': 'retraction', 'content': final_text, 'reason': "post-answer safety check"}
+            elif not answer_parts:
+                # Answered without the answer model (direct reply, emergency) or by a non-streaming model
+                final_text = final_text or "I'm sorry, I couldn't generate a response."
+                yield {'type': 'answer', 'content': final_text}
+            else:
+                final_text = streamed_text
+
+        total_time = time.time() - start_time
+        if (not retracted and self.answer_cache is not None and sources
+                and not final_text.startswith("I cannot provide")):
+            try:
+                await asyncio.to_thread(
+                    self.answer_cache.store, query, final_text, sources, language=safety.language,
+                    filters=filter_dict, embedding=cache_lookup.embedding if cache_lookup is not None else None,
+                )
+            except Exception as e:
+                logger.warning(f"Answer cache store failed: {e}")
+
+        logger.info(f"Streaming completed in {total_time:.2f}s (first token: {first_token_time})")
+        yield {'type': 'done', 'total_time': total_time, 'time_to_first_token': first_token_time, 'retracted': retracted}
+
+    def stream_response(
+        self,
+        query: str,
+        k: int = None,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        temperature: float = 0.1,
+    ):
+        """
+        Synchronous wrapper around astream_response() for non-async callers.
+
+        Runs on a fresh event loop per call, so it never joins the coalescer:
+        SingleFlight's in-flight streams belong to the loop that started them.
+
+        Args:
+            query: User query
+            k: Number of documents to retrieve (not used)
+            filter_dict: Optional metadata filter
+            temperature: LLM temperature (not directly used)
+
+        Yields:
+            Event dicts (see astream_response)
+        """
+        loop = asyncio.new_event_loop()
+        events = self._astream_response(query, filter_dict, True)
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(events.__anext__())
+                except StopAsyncIteration:
+                    break
+        finally:
+            loop.run_until_complete(events.aclose())
+            loop.close()
+
+    def prime_batch(self, queries: List[str]) -> int:
+        """
+        Embed a batch of queries in one call, so their per-query lookups reuse the vectors.
+
+        Args:
+            queries: Query texts
+
+        Returns:
+            Number of queries embedded (0 if priming failed; the queries then embed one by one)
+        """
+        try:
+            return self.vector_store.embedding_model.prime_query_embeddings(queries)
+        except Exception as e:
+            logger.warning(f"Batch query embedding failed, embedding per query: {e}")
+            return 0
+
+    async def agenerate_batch(
+        self,
+        queries: List[Union[str, Dict[str, Any]]],
+        concurrency: Optional[int] = None,
+        include_sources: bool = True,
+        admit: Optional[Callable[[], AsyncContextManager]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Answer many queries with bounded concurrency, yielding each result as it completes.
+
+        All query embeddings are computed in one batched call up front; each
+        query then runs agenerate_response() (identical queries in the batch
+        share one run). A failing query is reported in its own result and does
+        not stop the others.
+
+        Args:
+            queries: Query strings, or dicts with 'query' and optional 'filter' / 'include_sources'
+            concurrency: Queries running at once (default from settings)
+            include_sources: Default for items that don't set it
+            admit: Optional async context manager factory each query runs under
+                (the API server's admission control)
+
+        Yields:
+            Result dicts in completion order, with 'index' (position in ``queries``)
+            and 'query'; failed items have 'error' set
+        """
+        items = [q if isinstance(q, dict) else {'query': q} for q in queries]
+        if not items:
+            return
+        concurrency = max(1, min(concurrency or settings.batch_concurrency, len(items)))
+        logger.info(f"📦 Batch of {len(items)} queries, {concurrency} at a time")
+        await asyncio.to_thread(self.prime_batch, [item.get('query') or '' for item in items])
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+            query = item.get('query') or ''
+            async with semaphore:
+                try:
+                    if not query.strip():
+                        raise ValueError("Empty query")
+                    kwargs = dict(filter_dict=item.get('filter'),
+                                  include_sources=item.get('include_sources', include_sources))
+                    if admit is None:
+                        result = await self.agenerate_response(query, **kwargs)
+                    else:
+                        async with admit():
+                            result = await self.agenerate_response(query, **kwargs)
+                    return {'index': index, 'query': query, **result}
+                except Exception as e:
+                    logger.warning(f"Batch item {index} failed: {e}")
+                    return {'index': index, 'query': query, 'error': str(e)}
+
+        tasks = [asyncio.ensure_future(run(i, item)) for i, item in enumerate(items)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Consumer stopped early (client disconnected): drop the remaining queries
+            for task in tasks:
+                task.cancel()
+
+    def generate_batch(
+        self,
+        queries: List[Union[str, Dict[str, Any]]],
+        concurrency: Optional[int] = None,
+        include_sources: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """
+        Synchronous agenerate_batch() for scripts (evaluation, model comparison, FAQ refreshes).
+
+        Args:
+            queries: Query strings, or dicts with 'query' and optional 'filter' / 'include_sources'
+            concurrency: Queries running at once (default from settings)
+            include_sources: Default for items that don't set it
+
+        Returns:
+            Result dicts in the order of ``queries`` (see agenerate_batch)
+        """
+        async def collect():
+            return [result async for result in self.agenerate_batch(queries, concurrency, include_sources)]
 
-        logger.info("Streaming completed")
\ No newline at end of file
+        results = asyncio.run(collect())
+        return sorted(results, key=lambda r: r['index'])
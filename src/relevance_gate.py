@@ -0,0 +1,183 @@
+"""Score gate for document grading: decide clear cases from retrieval scores, LLM only in between."""
+import json
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+from config import settings
+
+
+@dataclass
+class GradeThresholds:
+    """Score bands: >= high is relevant, < low is not relevant, anything else goes to the grader LLM."""
+    score_high: float
+    score_low: float
+    rerank_high: Optional[float] = None  # None = rerank scores were not calibrated
+    rerank_low: Optional[float] = None
+    source: str = "calibration"  # The calibration file path once loaded
+
+    @classmethod
+    def load(cls, path: str) -> "GradeThresholds":
+        """
+        Load thresholds written by scripts/calibrate_grade_gate.py.
+
+        Args:
+            path: JSON path
+
+        Returns:
+            GradeThresholds (the rerank band only if the file was calibrated with --rerank)
+
+        Raises:
+            KeyError: If the file has no similarity thresholds
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(
+            score_high=data['score_high'],
+            score_low=data['score_low'],
+            rerank_high=data.get('rerank_high'),
+            rerank_low=data.get('rerank_low'),
+            source=path,
+        )
+
+    def save(self, path: str, **extra):
+        """
+        Save thresholds with calibration details.
+
+        Args:
+            path: JSON output path
+            **extra: Additional fields (sample counts, target precision, ...)
+        """
+        data = {k: v for k, v in asdict(self).items() if k != 'source' and v is not None}
+        data.update(extra)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        logger.info(f"💾 Saved grade thresholds to {path}")
+
+
+def top_scores(retrieval_scores: Sequence[Dict[str, Any]]) -> Tuple[Optional[float], Optional[float]]:
+    """
+    Best similarity and best rerank score of a retrieval round.
+
+    Args:
+        retrieval_scores: Dicts with 'score' and optional 'rerank_score'
+
+    Returns:
+        Tuple of (top similarity, top rerank score); None where absent
+    """
+    scores = [s['score'] for s in retrieval_scores if s.get('score') is not None]
+    reranks = [s['rerank_score'] for s in retrieval_scores if s.get('rerank_score') is not None]
+    return (max(scores) if scores else None), (max(reranks) if reranks else None)
+
+
+def calibrate(samples: List[Tuple[float, bool]], target_precision: float = 0.95,
+              min_support: int = 3) -> Tuple[float, float]:
+    """
+    Pick band edges so decisions outside the band agree with the labels.
+
+    ``high`` is the lowest observed score at which at least ``target_precision``
+    of samples scoring that much or more are relevant; ``low`` is the highest
+    observed score below which at least ``target_precision`` of samples are not
+    relevant. Each side needs ``min_support`` samples, otherwise it is disabled
+    (high above any score, low at zero).
+
+    Args:
+        samples: (top score, relevant) pairs
+        target_precision: Required agreement for auto-decisions
+        min_support: Minimum samples on a side of a threshold
+
+    Returns:
+        Tuple of (low, high)
+    """
+    ordered = sorted(samples)
+    high = float('inf')
+    for i in range(len(ordered)):
+        above = ordered[i:]
+        if len(above) >= min_support and sum(label for _, label in above) / len(above) >= target_precision:
+            high = ordered[i][0]
+            break
+    low = 0.0
+    for i in range(len(ordered), 0, -1):
+        below = ordered[:i]
+        threshold = ordered[i][0] if i < len(ordered) else ordered[-1][0] + 1e-9
+        if len(below) >= min_support and sum(not label for _, label in below) / len(below) >= target_precision:
+            low = threshold
+            break
+    if low > high:
+        low = high
+    return low, (high if high != float('inf') else 1.01)
+
+
+class RelevanceGate:
+    """
+    Decide document relevance from retrieval scores when they are clear-cut.
+
+    The bands come from scripts/calibrate_grade_gate.py; without a calibration
+    file the gate decides nothing and every grade goes to the grader LLM.
+    Calibrated rerank scores take precedence over embedding similarity when a
+    result carries one. In the chat graph that never happens: search_kb does
+    not rerank, so grade_documents is always gated on similarity, and rerank
+    scores only appear in /retrieve results. Returns None for the uncertain
+    middle band (and for results without scores, e.g. SQL lookups), which the
+    grader LLM decides.
+    """
+
+    def __init__(self, thresholds: Optional[GradeThresholds] = None):
+        """
+        Initialize the gate.
+
+        Args:
+            thresholds: Score bands (default: settings.grade_thresholds_path, if present)
+        """
+        if thresholds is None:
+            path = Path(settings.grade_thresholds_path)
+            if path.exists():
+                try:
+                    thresholds = GradeThresholds.load(str(path))
+                except Exception as e:
+                    logger.warning(f"Could not load grade thresholds from {path}: {e}")
+            else:
+                logger.warning(f"No calibrated grade thresholds at {path}; every grade goes to the grader LLM "
+                               f"(run scripts/calibrate_grade_gate.py)")
+        self.thresholds = thresholds
+        self.stats = {'relevant': 0, 'not_relevant': 0, 'uncertain': 0}
+        if thresholds is not None:
+            rerank = (f"[{thresholds.rerank_low}, {thresholds.rerank_high})" if thresholds.rerank_high is not None
+                      else "not calibrated")
+            logger.info(f"Relevance gate: similarity [{thresholds.score_low}, {thresholds.score_high}), "
+                        f"rerank {rerank} → grader LLM ({thresholds.source})")
+
+    def decide(self, retrieval_scores: Optional[Sequence[Dict[str, Any]]]) -> Tuple[Optional[bool], str]:
+        """
+        Decide relevance without the LLM if the scores are outside the uncertain band.
+
+        Args:
+            retrieval_scores: Scores of the latest retrieval round
+
+        Returns:
+            Tuple of (True / False / None for uncertain, reason)
+        """
+        t = self.thresholds
+        if t is None:
+            self.stats['uncertain'] += 1
+            return None, "no calibrated thresholds"
+        score, rerank = top_scores(retrieval_scores or [])
+        if rerank is not None and t.rerank_high is not None:
+            value, high, low, kind = rerank, t.rerank_high, t.rerank_low, "rerank"
+        elif score is not None:
+            value, high, low, kind = score, t.score_high, t.score_low, "similarity"
+        else:
+            self.stats['uncertain'] += 1
+            return None, "no scores"
+
+        if value >= high:
+            self.stats['relevant'] += 1
+            return True, f"top {kind} {value:.3f} >= {high}"
+        if value < low:
+            self.stats['not_relevant'] += 1
+            return False, f"top {kind} {value:.3f} < {low}"
+        self.stats['uncertain'] += 1
+        return None, f"top {kind} {value:.3f} in [{low}, {high})"
@@ -0,0 +1,178 @@
+"""Single-flight coalescing: identical concurrent requests share one in-flight computation."""
+import asyncio
+import copy
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+
+class _Flight:
+    """One in-flight computation and the callers waiting on it."""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class _SharedStream:
+    """
+    An event stream produced once and replayed to every subscriber.
+
+    Events are buffered, so a subscriber that attaches late first receives
+    everything produced so far, then follows live.
+    """
+
+    def __init__(self, events: AsyncIterator[Any], on_abandon: Callable[[], None]):
+        self.events: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self._signal = asyncio.Event()
+        self._on_abandon = on_abandon
+        self.task = asyncio.ensure_future(self._pump(events))
+
+    def _notify(self):
+        self._signal.set()
+        self._signal = asyncio.Event()
+
+    async def _pump(self, events: AsyncIterator[Any]):
+        try:
+            async for event in events:
+                self.events.append(event)
+                self._notify()
+        except asyncio.CancelledError:
+            self.error = asyncio.CancelledError()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+            if hasattr(events, 'aclose'):
+                await events.aclose()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        """Replay buffered events, then follow the stream until it ends."""
+        self.subscribers += 1
+        position = 0
+        try:
+            while True:
+                signal = self._signal
+                while position < len(self.events):
+                    yield self.events[position]
+                    position += 1
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                await signal.wait()
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done:
+                # Every subscriber left (clients disconnected): stop producing
+                self._on_abandon()
+                self.task.cancel()
+
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent requests.
+
+    The first request for a key (the leader) starts the computation; requests
+    with the same key that arrive while it runs attach to it and receive the
+    same result, or the same stream of events, without doing any work of
+    their own. Errors reach every attached caller and are not remembered: the
+    key is free again as soon as the computation ends, so the next request
+    retries. A caller that is cancelled only detaches; the computation is
+    cancelled when its last caller has gone.
+
+    Runs on the event loop: all methods must be called from the loop thread.
+    """
+
+    def __init__(self):
+        """Initialize with no requests in flight."""
+        self._calls: Dict[str, _Flight] = {}
+        self._streams: Dict[str, _SharedStream] = {}
+        self.stats = {'leaders': 0, 'coalesced': 0, 'abandoned': 0, 'errors': 0}
+
+    @property
+    def in_flight(self) -> int:
+        """Computations and streams currently running."""
+        return len(self._calls) + len(self._streams)
+
+    def _forget(self, key: str, flight: _Flight):
+        if self._calls.get(key) is flight:
+            del self._calls[key]
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run ``factory()`` once for all concurrent callers with the same key.
+
+        Args:
+            key: Request identity
+            factory: Starts the computation (only called by the leader)
+
+        Returns:
+            Tuple of (result, whether it was shared from another request's
+            computation); each caller gets its own shallow copy
+        """
+        flight = self._calls.get(key)
+        shared = flight is not None
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(factory()))
+            self._calls[key] = flight
+            flight.task.add_done_callback(lambda _, key=key, flight=flight: self._forget(key, flight))
+            self.stats['leaders'] += 1
+        else:
+            self.stats['coalesced'] += 1
+            logger.info(f"🔗 Coalesced with an identical in-flight request ({flight.waiters} already waiting)")
+
+        flight.waiters += 1
+        try:
+            result = await asyncio.shield(flight.task)
+        except Exception:
+            if not shared:
+                self.stats['errors'] += 1
+            raise
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Every caller gave up: stop the work, and don't let a new request attach to it
+                self._forget(key, flight)
+                flight.task.cancel()
+                self.stats['abandoned'] += 1
+        return copy.copy(result), shared
+
+    def stream(self, key: str, factory: Callable[[], AsyncIterator[Any]]) -> Tuple[AsyncIterator[Any], bool]:
+        """
+        Share one event stream among concurrent callers with the same key.
+
+        Args:
+            key: Request identity
+            factory: Creates the event stream (only called by the leader)
+
+        Returns:
+            Tuple of (event iterator for this caller, whether it attached to an existing stream)
+        """
+        stream = self._streams.get(key)
+        shared = stream is not None
+        if stream is None:
+            def forget(*_):
+                if self._streams.get(key) is stream:
+                    del self._streams[key]
+
+            def abandon():
+                forget()
+                self.stats['abandoned'] += 1
+
+            stream = _SharedStream(factory(), on_abandon=abandon)
+            self._streams[key] = stream
+            stream.task.add_done_callback(forget)
+            self.stats['leaders'] += 1
+        else:
+            self.stats['coalesced'] += 1
+            logger.info(f"🔗 Attached to an identical in-flight stream ({len(stream.events)} events so far)")
+        return stream.subscribe(), shared
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters and current in-flight count, for the metrics endpoint."""
+        return {'in_flight': self.in_flight, **self.stats}
@@ -1,6 +1,7 @@
 """LangChain-based retrieval system with BM25, SelfQueryRetriever and Reranker."""
 from typing import List, Dict, Any, Optional
 import functools
+import time
 from loguru import logger
 
 # LangChain imports
@@ -8,6 +9,7 @@ from langchain_core.documents import Document
 from langchain_core.language_models import BaseChatModel
 
 from src.vector_store import VectorStore
+from src.query_expansion import get_query_expander, reciprocal_rank_fusion
 from config import settings
 
 # BM25 for hybrid search
@@ -20,31 +22,62 @@ except ImportError:
     BM25_AVAILABLE = False
     logger.warning("rank_bm25 not available, BM25 hybrid search disabled")
 
-# SelfQueryRetriever imports - try multiple paths
-try:
-    from langchain_community.retrievers.self_query.base import SelfQueryRetriever
-except ImportError:
+
+def _split_rerank_score(doc: Document):
+    """Copy of a reranked document's metadata without the reranker's score, and the score."""
+    metadata = dict(doc.metadata)
+    return metadata, metadata.pop('rerank_score', None)
+
+
+def build_bm25_index(vector_store: VectorStore) -> Optional["BM25Retriever"]:
+    """
+    Build a BM25 index over every chunk of the vector store's collection.
+
+    Args:
+        vector_store: VectorStore whose chunks are indexed
+
+    Returns:
+        BM25Retriever, or None if the collection is empty
+    """
+    # Get all documents from vector store for BM25 indexing
+    collection = vector_store.vectorstore._collection
+    all_docs_data = collection.get()
+
+    if not (all_docs_data and all_docs_data.get('documents')):
+        logger.warning("No documents found for BM25 indexing")
+        return None
+
+    # Convert to LangChain Documents
+    docs = []
+    for i, content in enumerate(all_docs_data['documents']):
+        metadata = all_docs_data['metadatas'][i] if all_docs_data.get('metadatas') else {}
+        docs.append(Document(page_content=content, metadata=metadata))
+
+    logger.info(f"BM25 hybrid search enabled with {len(docs)} documents")
+    return BM25Retriever(docs)
+
+
+@functools.lru_cache(maxsize=1)
+def load_self_query_retriever():
+    """
+    Import SelfQueryRetriever on first use (langchain_community is slow to import).
+
+    Returns:
+        The SelfQueryRetriever class, or None if not installed
+    """
+    # Try multiple paths
     try:
-        from langchain_community.retrievers.self_query import SelfQueryRetriever
+        from langchain_community.retrievers.self_query.base import SelfQueryRetriever
     except ImportError:
         try:
-            from langchain.retrievers.self_query.base import SelfQueryRetriever
+            from langchain_community.retrievers.self_query import SelfQueryRetriever
         except ImportError:
-            logger.debug("SelfQueryRetriever not available. Using direct vector store search.")
-            SelfQueryRetriever = None
-
-# CrossEncoderReranker is deprecated in LangChain 1.0, we use Qwen3Reranker directly
-
-# Import custom Qwen3 reranker
-try:
-    from src.qwen3_reranker import Qwen3Reranker
-    QWEN3_RERANKER_AVAILABLE = True
-except ImportError as e:
-    QWEN3_RERANKER_AVAILABLE = False
-    logger.debug(f"Qwen3Reranker not available: {e}")
-except Exception as e:
-    QWEN3_RERANKER_AVAILABLE = False
-    logger.warning(f"Qwen3Reranker import error: {e}")
+            try:
+                from langchain.retrievers.self_query.base import SelfQueryRetriever
+            except ImportError:
+                logger.debug("SelfQueryRetriever not available. Using direct vector store search.")
+                SelfQueryRetriever = None
+    return SelfQueryRetriever
 
 
 class BM25Retriever:
@@ -86,13 +119,17 @@ class BM25Retriever:
         else:
             logger.warning("No documents to index for BM25")
     
-    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+    def search(self, query: str, k: int = 5, term_weights: Optional[Dict[str, float]] = None,
+               filter_dict: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """
         Search using BM25.
         
         Args:
             query: Query text
             k: Number of results to return
+            term_weights: Optional weighted expansion terms (e.g. from QueryExpander.expand_terms),
+                added to the query tokens (weight 1.0)
+            filter_dict: Optional metadata filter (field equality, as in VectorStore.similarity_search)
             
         Returns:
             List of results with content, metadata, and BM25 scores
@@ -100,11 +137,26 @@ class BM25Retriever:
         if not self.bm25 or not self.documents:
             return []
         
-        tokenized_query = self._tokenize(query)
-        scores = self.bm25.get_scores(tokenized_query)
+        # Query tokens weigh 1.0 (including short ones like "ct" and CJK runs that the expander
+        # skips); expansion terms only add tokens or raise a token's weight, each token counted once
+        weights: Dict[str, float] = {token: 1.0 for token in self._tokenize(query)}
+        for term, weight in (term_weights or {}).items():
+            for token in self._tokenize(term):
+                weights[token] = max(weights.get(token, 0.0), weight)
+        if not weights:
+            return []
+        # BM25 is a sum over query terms, so weighting each term's scores is exact
+        scores = None
+        for token, weight in weights.items():
+            term_scores = self.bm25.get_scores([token]) * weight
+            scores = term_scores if scores is None else scores + term_scores
         
         # Get top k indices
-        top_indices = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:k]
+        candidates = range(len(scores))
+        if filter_dict:
+            candidates = [i for i in candidates
+                          if all(self.documents[i].metadata.get(key) == value for key, value in filter_dict.items())]
+        top_indices = sorted(candidates, key=lambda i: scores[i], reverse=True)[:k]
         
         results = []
         for idx in top_indices:
@@ -147,26 +199,15 @@ class AdvancedRetriever:
         self.use_reranker = use_reranker if use_reranker is not None else settings.use_reranker
         self.reranker_model = reranker_model or settings.reranker_model
         self.use_hybrid_search = use_hybrid_search and BM25_AVAILABLE
+        self._self_query_retriever = None
         
-        # Initialize BM25 retriever for hybrid search
+        # Initialize BM25 retriever for hybrid search (one index per collection, shared by the process)
         self.bm25_retriever = None
         if self.use_hybrid_search:
+            from src.components import shared_bm25_index
             try:
-                # Get all documents from vector store for BM25 indexing
-                collection = vector_store.vectorstore._collection
-                all_docs_data = collection.get()
-                
-                if all_docs_data and all_docs_data.get('documents'):
-                    # Convert to LangChain Documents
-                    docs = []
-                    for i, content in enumerate(all_docs_data['documents']):
-                        metadata = all_docs_data['metadatas'][i] if all_docs_data.get('metadatas') else {}
-                        docs.append(Document(page_content=content, metadata=metadata))
-                    
-                    self.bm25_retriever = BM25Retriever(docs)
-                    logger.info(f"BM25 hybrid search enabled with {len(docs)} documents")
-                else:
-                    logger.warning("No documents found for BM25 indexing")
+                self.bm25_retriever = shared_bm25_index(vector_store)
+                if self.bm25_retriever is None:
                     self.use_hybrid_search = False
             except Exception as e:
                 logger.warning(f"Failed to initialize BM25: {e}")
@@ -230,6 +271,7 @@ class AdvancedRetriever:
 
             document_contents = "Information about pediatric interventional radiology procedures, including procedures, care instructions, complications, and patient education materials."
 
+            SelfQueryRetriever = load_self_query_retriever()
             if SelfQueryRetriever is None:
                 logger.debug("SelfQueryRetriever not available. Using base retriever (LangChain 1.0 pattern).")
                 self.retriever = base_retriever if base_retriever is not None else vector_store.vectorstore.as_retriever()
@@ -323,18 +365,13 @@ class AdvancedRetriever:
         # Setup reranker if enabled (apply directly, not via ContextualCompressionRetriever)
         self.reranker = None
         if self.use_reranker:
-            if QWEN3_RERANKER_AVAILABLE:
-                try:
-                    self.reranker = Qwen3Reranker(
-                        model_name="Qwen/Qwen3-Reranker-0.6B",
-                        top_n=settings.top_k_reranker,
-                    )
-                    logger.info(f"Qwen3 Reranker initialized (top_n: {settings.top_k_reranker})")
-                except Exception as e:
-                    logger.warning(f"Failed to initialize Qwen3 Reranker: {e}")
-                    self.use_reranker = False
-            else:
-                logger.warning("Qwen3Reranker not available, disabling reranking")
+            # One model per process, shared by every retriever; torch/transformers load on first build
+            from src.components import shared_reranker
+            try:
+                self.reranker = shared_reranker("Qwen/Qwen3-Reranker-0.6B", settings.top_k_reranker)
+                logger.info(f"Qwen3 Reranker initialized (top_n: {settings.top_k_reranker})")
+            except Exception as e:
+                logger.warning(f"Failed to initialize Qwen3 Reranker: {e}")
                 self.use_reranker = False
 
         logger.info(f"Initialized AdvancedRetriever (reranker: {self.use_reranker}, hybrid_bm25: {self.use_hybrid_search})")
@@ -344,6 +381,10 @@ class AdvancedRetriever:
                  query: str,
                  k: int = None,
         filter_dict: Optional[Dict[str, Any]] = None,
+        use_hybrid: Optional[bool] = None,
+        use_reranker: Optional[bool] = None,
+        use_self_query: bool = True,
+        timings: Optional[Dict[str, float]] = None,
     ) -> List[Dict[str, Any]]:
         """
         Perform retrieval with optional reranking.
@@ -352,29 +393,62 @@ class AdvancedRetriever:
             query: Query text
             k: Number of results to return (default from settings)
             filter_dict: Optional metadata filter (used if SelfQueryRetriever not available)
+            use_hybrid: BM25 + semantic hybrid search for this call (default: as configured)
+            use_reranker: Rerank for this call (default: as configured; only if the reranker is loaded)
+            use_self_query: Go through the LangChain retriever on the semantic-only path
+                (SelfQueryRetriever parses the query with an LLM call); False searches
+                the vector store directly, with similarity scores
+            timings: Optional dict that receives the milliseconds spent per stage
 
         Returns:
             List of results with content, metadata, and scores
         """
         k = k or settings.top_k_retrieval
+        hybrid = (self.use_hybrid_search if use_hybrid is None else use_hybrid) and self.bm25_retriever is not None
+        rerank = (self.use_reranker if use_reranker is None else use_reranker) and self.reranker is not None
+        timings = timings if timings is not None else {}
+        clock = time.perf_counter()
+
+        def lap(stage: str):
+            nonlocal clock
+            now = time.perf_counter()
+            timings[stage] = timings.get(stage, 0.0) + (now - clock) * 1000
+            clock = now
 
         logger.debug(f"Retrieving documents for query: {query[:50]}...")
 
         # Hybrid search: combine BM25 and semantic results
-        if self.use_hybrid_search and self.bm25_retriever:
+        if hybrid:
             logger.info("🔍 Using hybrid search (BM25 + semantic)")
             
+            # Local query expansion: weighted synonym/co-occurrence terms for BM25,
+            # a few rephrasings for the embedding search
+            term_weights = None
+            semantic_queries = [query]
+            if settings.query_expansion_mode == "local":
+                expander = get_query_expander()
+                term_weights = expander.expand_terms(query)
+                semantic_queries += expander.variants(query, max_variants=settings.query_expansion_variants)
+                logger.debug(f"Expanded query terms: {term_weights}; variants: {semantic_queries[1:]}")
+                lap('expansion')
+
             # Get BM25 results
-            bm25_results = self.bm25_retriever.search(query, k=k * 2)
+            bm25_results = self.bm25_retriever.search(query, k=k * 2, term_weights=term_weights,
+                                                      filter_dict=filter_dict)
             logger.debug(f"BM25 returned {len(bm25_results)} results")
+            lap('bm25')
             
-            # Get semantic results
-            semantic_results = self.vector_store.similarity_search(
-                query=query,
-                k=k * 2,
-                filter_dict=filter_dict
+            # Get semantic results (variants fused by reciprocal rank)
+            semantic_lists = [
+                self.vector_store.similarity_search(query=q, k=k * 2, filter_dict=filter_dict)
+                for q in semantic_queries
+            ]
+            semantic_results = (
+                semantic_lists[0] if len(semantic_lists) == 1
+                else reciprocal_rank_fusion(semantic_lists, limit=k * 2)
             )
             logger.debug(f"Semantic search returned {len(semantic_results)} results")
+            lap('semantic')
             
             # Reciprocal Rank Fusion (RRF) to combine results
             rrf_k = 60  # RRF constant
@@ -411,9 +485,10 @@ class AdvancedRetriever:
                 results.append(result)
             
             logger.info(f"Hybrid search combined into {len(results)} results")
+            lap('fusion')
             
             # Apply reranker if enabled
-            if self.use_reranker and self.reranker is not None:
+            if rerank:
                 docs = [Document(page_content=r['content'], metadata=r['metadata']) for r in results]
                 logger.info(f"Reranking {len(docs)} documents...")
                 reranked_docs = self.reranker.compress_documents(docs, query)
@@ -422,24 +497,45 @@ class AdvancedRetriever:
                 # Convert back to result format
                 results = []
                 for doc in reranked_docs[:k]:
+                    metadata, rerank_score = _split_rerank_score(doc)
                     results.append({
                         'content': doc.page_content,
-                        'metadata': doc.metadata,
+                        'metadata': metadata,
                         'score': 0.9,  # Reranked docs are high quality
-                        'id': doc.metadata.get('chunk_id', doc.metadata.get('id', '')),
+                        'id': metadata.get('chunk_id', metadata.get('id', '')),
+                        'rerank_score': rerank_score,
                         'retrieval_type': 'reranked'
                     })
+                lap('rerank')
             
             logger.info(f"Retrieved {len(results)} documents (hybrid search)")
             return results
 
         # Fallback: Use LangChain retriever (semantic only)
-        if filter_dict and (SelfQueryRetriever is None or not isinstance(self.retriever, SelfQueryRetriever)):
+        self_query = self._self_query_retriever is not None and self.retriever is self._self_query_retriever
+        if (filter_dict and not self_query) or not use_self_query:
             results = self.vector_store.similarity_search(
                 query=query,
                 k=k,
                 filter_dict=filter_dict
             )
+            lap('semantic')
+            if rerank:
+                docs = [Document(page_content=r['content'], metadata=r['metadata']) for r in results]
+                similarity = {r['content']: r['score'] for r in results}
+                logger.info(f"Reranking {len(docs)} documents...")
+                results = []
+                for doc in self.reranker.compress_documents(docs, query)[:k]:
+                    metadata, rerank_score = _split_rerank_score(doc)
+                    results.append({
+                        'content': doc.page_content,
+                        'metadata': metadata,
+                        'score': similarity.get(doc.page_content, 0.9),
+                        'id': metadata.get('chunk_id', metadata.get('id', '')),
+                        'rerank_score': rerank_score,
+                        'retrieval_type': 'reranked',
+                    })
+                lap('rerank')
         else:
             try:
                 if hasattr(self.retriever, 'get_relevant_documents'):
@@ -449,18 +545,22 @@ class AdvancedRetriever:
                 else:
                     logger.warning("Retriever doesn't have get_relevant_documents or invoke, using vector store directly")
                     results = self.vector_store.similarity_search(query=query, k=k, filter_dict=filter_dict)
+                    lap('semantic')
                     return results
             except Exception as e:
                 logger.warning(f"Error using retriever: {e}, falling back to direct vector store search")
                 logger.exception(e)
                 results = self.vector_store.similarity_search(query=query, k=k, filter_dict=filter_dict)
+                lap('semantic')
                 return results
+            lap('self_query' if self_query else 'semantic')
 
             # Apply reranker if enabled
-            if self.use_reranker and self.reranker is not None:
+            if rerank:
                 logger.info(f"Reranking {len(docs)} documents...")
                 docs = self.reranker.compress_documents(docs, query)
                 logger.info(f"After reranking: {len(docs)} documents")
+                lap('rerank')
 
             # Convert LangChain Documents to our format
             results = []
@@ -469,16 +569,27 @@ class AdvancedRetriever:
                 if score is None:
                     score = 0.8
 
+                metadata, rerank_score = _split_rerank_score(doc)
                 results.append({
                     'content': doc.page_content,
-                    'metadata': doc.metadata,
+                    'metadata': metadata,
                     'score': score,
-                    'id': doc.metadata.get('chunk_id', doc.metadata.get('id', ''))
+                    'id': metadata.get('chunk_id', metadata.get('id', '')),
+                    'rerank_score': rerank_score,
                 })
 
         logger.info(f"Retrieved {len(results)} documents")
         return results
 
+    def rebuild_bm25_index(self):
+        """Rebuild the shared BM25 index from the current collection (call after adding documents)."""
+        from src.components import get_registry, shared_bm25_index
+
+        logger.info("Rebuilding BM25 index...")
+        get_registry().discard('bm25', (self.vector_store.collection_name, self.vector_store.persist_directory))
+        self.bm25_retriever = shared_bm25_index(self.vector_store)
+        self.use_hybrid_search = BM25_AVAILABLE and self.bm25_retriever is not None
+
     def rebuild_index(self):
         """Rebuild the retriever index (placeholder for future implementation)."""
         logger.info("Rebuilding retriever index...")
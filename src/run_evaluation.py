@@ -11,8 +11,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.agentic_rag import create_agentic_rag_graph
 from src.evaluation import RAGEvaluator
-from src.vector_store import VectorStore
-from src.embeddings import get_embedding_model
+from src.components import shared_vector_store
 
 def load_test_questions(path: str):
     """Load test questions from JSON."""
@@ -25,8 +24,7 @@ def main():
     logger.info("Initializing RAG system for evaluation...")
 
     # Initialize components
-    embedding_model = get_embedding_model()
-    vector_store = VectorStore(embedding_model=embedding_model)
+    vector_store = shared_vector_store()
     rag_graph = create_agentic_rag_graph(vector_store=vector_store)
 
     # Initialize evaluator
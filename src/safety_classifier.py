@@ -0,0 +1,279 @@
+"""Tiered answer safety checking: local rules and a linear model first, LLM only when ambiguous."""
+import json
+import math
+import re
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+from loguru import logger
+
+from src.guardrails import SafetyCheckGuardrail
+from config import settings
+
+SAFETY_BLOCK_MESSAGE = "I cannot provide that response as it may violate safety guidelines. Please rephrase your question or consult with a medical professional."
+
+# Clear-cut UNSAFE answers (mirrors the UNSAFE criteria of the LLM safety prompt)
+UNSAFE_PATTERNS = [
+    # Specific dosage instructions
+    r"\b(take|give|administer)\b[^.\n]{0,40}\b\d+(\.\d+)?\s*(mg|mcg|µg|ml|g|units?|tablets?)\b",
+    # Diagnosing the user
+    r"\b(i diagnose|my diagnosis is|you (definitely|clearly) have|your (child|son|daughter) (definitely|clearly) has)\b",
+    # Advising against care
+    r"\b(no need to|don'?t|do not)\s+(see|call|contact|go to|visit)\s+(a |the |your )?(doctor|nurse|hospital|a&e|emergency|999)",
+    r"(不需要|不用)(看醫生|求醫|去急症室)",
+]
+
+# Phrases that make an answer worth a closer look (second-person clinical statements etc.)
+RISK_CUES = [
+    r"\byou have\b", r"\byou should take\b", r"\bprescribe\b", r"\btreatment plan\b",
+    r"\bi recommend\b", r"\bdosage\b", r"\bdose\b", r"\bstop taking\b", r"\binstead of\b",
+    r"你患有", r"劑量", r"停藥",
+]
+
+# Answers with these markers are refusals or canned emergency redirects. Not the educational
+# disclaimer: GENERATE_PROMPT ends every answer with it, so it says nothing about the content
+SAFE_MARKERS = [
+    "i don't have that information. please ask a nurse or doctor",
+    "call 999 or go to the nearest accident & emergency department immediately",
+    "call 999** or go to your nearest accident & emergency department immediately",
+    "請立即致電999或前往最近的急症室", "致電999** 或立即前往最近的急症室",
+]
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?|[一-鿿]")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Tokenize for the linear model: lowercase word unigrams/bigrams and CJK character bigrams.
+
+    Shared by scripts/train_safety_classifier.py so training and inference agree.
+    """
+    tokens = _TOKEN_RE.findall(text.lower())
+    features = list(tokens)
+    features.extend(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    return features
+
+
+class LocalSafetyClassifier:
+    """
+    TF-IDF + logistic regression safety model evaluated in pure Python.
+
+    The model file is a JSON export (vocabulary, idf, coefficients, intercept)
+    produced offline by scripts/train_safety_classifier.py from logged verdicts.
+    """
+
+    def __init__(self, model_path: str = None):
+        """
+        Load the model.
+
+        Args:
+            model_path: Path to the exported model JSON (default from settings)
+        """
+        model_path = Path(model_path or settings.safety_classifier_path)
+        with open(model_path, 'r', encoding='utf-8') as f:
+            model = json.load(f)
+        self.vocabulary: Dict[str, int] = model['vocabulary']
+        self.idf: List[float] = model['idf']
+        self.coef: List[float] = model['coef']
+        self.intercept: float = model['intercept']
+        self.version: str = model.get('version', 'unknown')
+        logger.info(f"Loaded local safety classifier {self.version} ({len(self.vocabulary)} features)")
+
+    def predict_unsafe_proba(self, text: str) -> float:
+        """
+        Probability that an answer is UNSAFE.
+
+        Args:
+            text: Answer text
+
+        Returns:
+            Probability in [0, 1]
+        """
+        counts = Counter(f for f in tokenize(text) if f in self.vocabulary)
+        if not counts:
+            return 1 / (1 + math.exp(-self.intercept))
+        weights = {self.vocabulary[f]: c * self.idf[self.vocabulary[f]] for f, c in counts.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        score = self.intercept + sum(self.coef[i] * w / norm for i, w in weights.items())
+        return 1 / (1 + math.exp(-score))
+
+
+class TieredSafetyChecker:
+    """
+    Post-answer safety check that only calls the LLM for ambiguous answers.
+
+    Tier 1 (rules): clear UNSAFE patterns block; refusals and emergency redirects
+    with no risk cues pass. Tier 2 (model): the local classifier passes answers with
+    P(unsafe) <= safe_threshold and blocks those >= unsafe_threshold. Tier 3:
+    everything in between goes to SafetyCheckGuardrail (LLM). Per-tier counts
+    are kept in ``stats`` (reported by /metrics for named checkers, see
+    safety_check_metrics()) and verdicts can be logged as training data.
+    """
+
+    def __init__(
+        self,
+        guardrail: Optional[SafetyCheckGuardrail] = None,
+        model_path: str = None,
+        mode: str = None,
+        safe_threshold: float = None,
+        unsafe_threshold: float = None,
+        verdict_log_path: str = None,
+        name: Optional[str] = None,
+    ):
+        """
+        Initialize the checker.
+
+        Args:
+            guardrail: LLM guardrail for escalations (default: new SafetyCheckGuardrail)
+            model_path: Local model JSON (default from settings; missing file = rules + LLM only)
+            mode: 'tiered', 'local' (never call the LLM) or 'llm' (always call it) (default from settings)
+            safe_threshold: Max P(unsafe) accepted locally (default from settings)
+            unsafe_threshold: Min P(unsafe) blocked locally (default from settings)
+            verdict_log_path: JSONL file to append verdicts to ('' disables, default from settings)
+            name: Report this checker's counters under this name in safety_check_metrics()
+        """
+        self.guardrail = guardrail or SafetyCheckGuardrail()
+        self.mode = mode or settings.safety_check_mode
+        self.safe_threshold = safe_threshold if safe_threshold is not None else settings.safety_local_safe_threshold
+        self.unsafe_threshold = unsafe_threshold if unsafe_threshold is not None else settings.safety_local_unsafe_threshold
+        self.verdict_log_path = settings.safety_verdict_log_path if verdict_log_path is None else verdict_log_path
+        self._unsafe_re = re.compile('|'.join(UNSAFE_PATTERNS), re.IGNORECASE)
+        self._risk_re = re.compile('|'.join(RISK_CUES), re.IGNORECASE)
+        self.stats = {'rules': 0, 'model': 0, 'llm': 0, 'blocked': 0, 'local_ms': 0.0}
+        self._stats_lock = threading.Lock()
+
+        self.classifier = None
+        model_path = model_path or settings.safety_classifier_path
+        if self.mode != "llm" and model_path and Path(model_path).exists():
+            try:
+                self.classifier = LocalSafetyClassifier(model_path)
+            except Exception as e:
+                logger.warning(f"Could not load local safety classifier from {model_path}: {e}")
+        elif self.mode != "llm":
+            logger.info(f"No local safety classifier at {model_path}; ambiguous answers go to the LLM")
+        if name:
+            _checkers[name] = self
+
+    def _count(self, tier: str, is_safe: bool, local_ms: float = 0.0):
+        """Record one verdict (checks run concurrently in the request threads)."""
+        with self._stats_lock:
+            self.stats[tier] += 1
+            self.stats['local_ms'] += local_ms
+            if not is_safe:
+                self.stats['blocked'] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Mode, per-tier counts and escalation rate, for the metrics endpoint."""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        checked = stats['rules'] + stats['model'] + stats['llm']
+        return {
+            'mode': self.mode,
+            'local_model': self.classifier is not None,
+            'checked': checked,
+            **{k: v for k, v in stats.items() if k != 'local_ms'},
+            'escalation_rate': round(stats['llm'] / checked, 4) if checked else 0.0,
+            'local_ms_avg': round(stats['local_ms'] / (stats['rules'] + stats['model']), 3)
+            if stats['rules'] + stats['model'] else 0.0,
+        }
+
+    @property
+    def escalation_rate(self) -> float:
+        """Fraction of checked answers that needed the LLM."""
+        total = self.stats['rules'] + self.stats['model'] + self.stats['llm']
+        return self.stats['llm'] / total if total else 0.0
+
+    def classify_locally(self, response: str) -> Tuple[Optional[bool], str, Optional[float]]:
+        """
+        Run the local tiers only.
+
+        Args:
+            response: Answer text
+
+        Returns:
+            Tuple of (is_safe or None if ambiguous, tier name, P(unsafe) or None)
+        """
+        if self._unsafe_re.search(response):
+            return False, 'rules', None
+        response_lower = response.lower()
+        has_risk_cue = bool(self._risk_re.search(response))
+        if not has_risk_cue and any(marker in response_lower for marker in SAFE_MARKERS):
+            return True, 'rules', None
+
+        if self.classifier is not None:
+            p_unsafe = self.classifier.predict_unsafe_proba(response)
+            if p_unsafe <= self.safe_threshold:
+                return True, 'model', p_unsafe
+            if p_unsafe >= self.unsafe_threshold:
+                return False, 'model', p_unsafe
+            return None, 'model', p_unsafe
+        return None, 'rules', None
+
+    def _log_verdict(self, response: str, is_safe: bool, tier: str, p_unsafe: Optional[float]):
+        """Append a verdict for offline training."""
+        if not self.verdict_log_path:
+            return
+        try:
+            Path(self.verdict_log_path).parent.mkdir(parents=True, exist_ok=True)
+            with open(self.verdict_log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({
+                    'text': response[:2000],
+                    'label': 'safe' if is_safe else 'unsafe',
+                    'tier': tier,
+                    'p_unsafe': p_unsafe,
+                    'timestamp': time.time(),
+                }, ensure_ascii=False) + '\n')
+        except Exception as e:
+            logger.debug(f"Could not log safety verdict: {e}")
+
+    def check_safety(self, response: str, llm=None) -> Tuple[bool, Optional[str]]:
+        """
+        Check if a response is safe, escalating to the LLM only when needed.
+
+        Args:
+            response: AI response to check
+            llm: LLM for escalations (uses the guardrail's LLM if not provided)
+
+        Returns:
+            Tuple of (is_safe: bool, error_message: Optional[str])
+        """
+        if self.mode == "llm":
+            is_safe, message = self.guardrail.check_safety(response, llm=llm)
+            self._count('llm', is_safe)
+            self._log_verdict(response, is_safe, 'llm', None)
+            return is_safe, message
+
+        start = time.perf_counter()
+        is_safe, tier, p_unsafe = self.classify_locally(response)
+        local_ms = (time.perf_counter() - start) * 1000
+
+        if is_safe is None:
+            if self.mode == "local":
+                # No LLM allowed: fall back to the deterministic phrase check
+                is_safe, message = self.guardrail._basic_safety_check(response)
+                tier = 'rules'
+            else:
+                logger.info(f"Safety check ambiguous locally (P(unsafe)={p_unsafe}), escalating to LLM")
+                is_safe, message = self.guardrail.check_safety(response, llm=llm)
+                tier = 'llm'
+                self._log_verdict(response, is_safe, tier, p_unsafe)
+        else:
+            message = None if is_safe else SAFETY_BLOCK_MESSAGE
+
+        self._count(tier, is_safe, local_ms)
+        if not is_safe:
+            logger.warning(f"⚠️ Safety check failed ({tier} tier)")
+        logger.debug(f"Safety check decided by {tier} tier (escalation rate: {self.escalation_rate:.1%})")
+        return is_safe, message
+
+
+# Checkers constructed with a name, reported by /metrics
+_checkers: Dict[str, TieredSafetyChecker] = {}
+
+
+def safety_check_metrics() -> Dict[str, Dict[str, Any]]:
+    """Snapshot of every named TieredSafetyChecker (the graph's answer check is 'answer')."""
+    return {name: checker.snapshot() for name, checker in _checkers.items()}
@@ -212,18 +212,19 @@ Please remember: This chatbot cannot assess emergencies. Always err on the side
 
         return None
 
-    def assess_query(self, query: str) -> SafetyAssessment:
+    def assess_query(self, query: str, check_patterns: bool = True) -> SafetyAssessment:
         """
         Assess a query for clinical safety concerns.
 
         Args:
             query: User query to assess
+            check_patterns: Treat EMERGENCY_PATTERNS matches as emergencies (False = LLM verdict only)
 
         Returns:
             SafetyAssessment with risk level and recommendations
         """
         # Fast path: Pattern matching
-        pattern_matches = self._check_patterns(query)
+        pattern_matches = self._check_patterns(query) if check_patterns else []
         
         if pattern_matches:
             logger.warning(f"Emergency patterns detected: {pattern_matches}")
@@ -0,0 +1,133 @@
+"""Single-pass emergency pre-screen shared by the RAG pipeline and the agent graph."""
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from loguru import logger
+
+from src.guardrails import EMERGENCY_KEYWORDS, EMERGENCY_RESPONSE, EMERGENCY_RESPONSE_ZH
+from src.safety_guard import SafetyGuard, RiskLevel
+
+
+@dataclass
+class SafetyScreenResult:
+    """Outcome of the emergency pre-screen, stored in graph state under 'safety'."""
+    is_emergency: bool
+    risk_level: RiskLevel
+    matched_keywords: List[str] = field(default_factory=list)
+    matched_patterns: List[str] = field(default_factory=list)
+    language: str = "en"
+    response: Optional[str] = None
+
+    @property
+    def concerns(self) -> List[str]:
+        """All matched keywords and patterns."""
+        return self.matched_keywords + self.matched_patterns
+
+
+class SafetyPreScreen:
+    """
+    Emergency detection in one pass over the query.
+
+    The guardrail keyword list and SafetyGuard.EMERGENCY_PATTERNS are merged
+    into a single compiled regex (one named alternative per rule), so each
+    request is scanned once and the typed result can be carried through the
+    graph instead of being re-derived by later nodes.
+    """
+
+    def __init__(self, keywords: List[str] = None, patterns: List[str] = None):
+        """
+        Initialize the pre-screen.
+
+        Args:
+            keywords: Literal emergency keywords (default: guardrails.EMERGENCY_KEYWORDS)
+            patterns: Emergency regex patterns (default: SafetyGuard.EMERGENCY_PATTERNS)
+        """
+        self.keywords = [kw.lower() for kw in (keywords if keywords is not None else EMERGENCY_KEYWORDS)]
+        self.patterns = list(patterns if patterns is not None else SafetyGuard.EMERGENCY_PATTERNS)
+
+        # One alternative per rule; the group name says which rule matched
+        self._rules = {}
+        alternatives = []
+        for i, keyword in enumerate(self.keywords):
+            name = f"k{i}"
+            self._rules[name] = ('keyword', keyword)
+            alternatives.append(f"(?P<{name}>{re.escape(keyword)})")
+        for i, pattern in enumerate(self.patterns):
+            name = f"p{i}"
+            self._rules[name] = ('pattern', pattern)
+            alternatives.append(f"(?P<{name}>{pattern})")
+        self._regex = re.compile('|'.join(alternatives), re.IGNORECASE)
+
+        logger.info(f"Initialized safety pre-screen ({len(self.keywords)} keywords + {len(self.patterns)} patterns)")
+
+    @staticmethod
+    def _is_chinese(text: str) -> bool:
+        """Check if text contains non-ASCII (likely Chinese) characters."""
+        return any(ord(char) > 127 for char in text)
+
+    def screen(self, query: str) -> SafetyScreenResult:
+        """
+        Screen a query for emergencies.
+
+        Args:
+            query: User query
+
+        Returns:
+            SafetyScreenResult; ``response`` holds the canned emergency reply when triggered
+        """
+        language = "zh" if self._is_chinese(query or "") else "en"
+        keywords: List[str] = []
+        patterns: List[str] = []
+        for match in self._regex.finditer(query or ""):
+            kind, rule = self._rules[match.lastgroup]
+            target = keywords if kind == 'keyword' else patterns
+            if rule not in target:
+                target.append(rule)
+
+        if not keywords and not patterns:
+            return SafetyScreenResult(is_emergency=False, risk_level=RiskLevel.NONE, language=language)
+
+        # Pattern hits use the detailed SafetyGuard reply, keyword-only hits the guardrail reply
+        if patterns:
+            response = SafetyGuard.EMERGENCY_RESPONSE_ZH if language == "zh" else SafetyGuard.EMERGENCY_RESPONSE_EN
+        else:
+            response = EMERGENCY_RESPONSE_ZH if language == "zh" else EMERGENCY_RESPONSE
+        logger.warning(f"🚨 Emergency pre-screen triggered: keywords={keywords} patterns={patterns}")
+        return SafetyScreenResult(
+            is_emergency=True,
+            risk_level=RiskLevel.CRITICAL,
+            matched_keywords=keywords,
+            matched_patterns=patterns,
+            language=language,
+            response=response,
+        )
+
+
+_prescreen: Optional[SafetyPreScreen] = None
+
+
+def get_safety_prescreen() -> SafetyPreScreen:
+    """Get the shared SafetyPreScreen instance."""
+    global _prescreen
+    if _prescreen is None:
+        _prescreen = SafetyPreScreen()
+    return _prescreen
+
+
+_trigger_prescreen: Optional[SafetyPreScreen] = None
+
+
+def get_emergency_trigger_prescreen() -> SafetyPreScreen:
+    """
+    Get the shared pre-screen on the dedicated emergency trigger list only.
+
+    Used by every emergency decision (RAGPipeline pre-screen, the agent
+    graph's emergency check and the API's admission bypass): the broad
+    SafetyGuard patterns (e.g. "fitting", "can't move") also match ordinary
+    procedure questions.
+    """
+    global _trigger_prescreen
+    if _trigger_prescreen is None:
+        _trigger_prescreen = SafetyPreScreen(patterns=[])
+    return _trigger_prescreen
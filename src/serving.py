@@ -0,0 +1,276 @@
+"""Multi-worker API serving: preload read-only components once, then fork workers that share them."""
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, Optional
+
+from loguru import logger
+
+from config import settings
+from src.components import get_registry
+
+# Components holding SQLite connections, sockets or background threads: never inherited
+# across fork, each worker builds its own
+FORK_UNSAFE_KINDS = ('vector_store', 'retriever', 'document_db', 'llm', 'llm_provider')
+LOCAL_EMBEDDING_PROVIDERS = ('sentence-transformer',)
+
+# torch intra-op thread count of the parent before preload() pinned it to 1 (restored in workers)
+_parent_torch_threads: Optional[int] = None
+
+
+def release_fork_unsafe():
+    """Drop shared components that must not cross a fork (Chroma client, SQLite, HTTP clients)."""
+    registry = get_registry()
+    for kind in FORK_UNSAFE_KINDS:
+        registry.clear(kind)
+    if settings.embedding_provider not in LOCAL_EMBEDDING_PROVIDERS:
+        # Remote embedding providers are thin HTTP clients: cheap to rebuild, unsafe to share
+        registry.clear('embeddings')
+    if 'chromadb' in sys.modules:
+        try:
+            from chromadb.api.client import SharedSystemClient
+            SharedSystemClient.clear_system_cache()
+        except Exception as e:
+            logger.debug(f"Could not clear the Chroma client cache: {e}")
+
+
+def _precompute_curated_embeddings() -> bool:
+    """
+    Embed the curated Q&A questions into their on-disk cache in a throwaway child process.
+
+    The parent must not run model inference before forking the workers: once
+    torch's OpenMP/intra-op thread pool has started, forked children can hang
+    on their first torch call. Forked here, before the parent has imported
+    torch, the child does the inference and exits; the parent then only reads
+    the cached vectors.
+
+    Returns:
+        True if the cache now holds the index's embeddings, so loading the index
+        in the parent runs no inference
+    """
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            from src.components import shared_embedding_model
+            from src.curated_qna import get_curated_index
+            index = get_curated_index(shared_embedding_model())
+            if index is None or index.is_cached():
+                code = 0
+            else:
+                logger.warning("Curated Q&A embeddings were not written to the cache")
+        except Exception as e:
+            logger.warning(f"Could not precompute curated Q&A embeddings: {e}")
+        finally:
+            os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    return os.waitstatus_to_exitcode(status) == 0
+
+
+def _pin_torch_threads():
+    """Keep torch single-threaded in the parent so no thread pool exists at fork time."""
+    global _parent_torch_threads
+    if 'torch' in sys.modules and _parent_torch_threads is None:
+        import torch
+        _parent_torch_threads = torch.get_num_threads()
+        torch.set_num_threads(1)
+
+
+def preload() -> Dict[str, float]:
+    """
+    Load the read-only artifacts every worker needs, before forking.
+
+    Loaded here: the local embedding model, the BM25 index with the chunk
+    texts, the reranker weights, the query expansion graph and the curated
+    Q&A index. Forked workers share these pages copy-on-write; gc.freeze()
+    keeps the garbage collector from touching (and so copying) them.
+
+    Only weights and indexes are loaded; no inference runs in the parent.
+    The curated Q&A embeddings are computed in a separate child process and
+    read back from their cache file (the curated step is skipped if the child
+    left no usable cache), and torch is pinned to one thread as a
+    guard (workers get their thread count back in after_fork()).
+
+    Returns:
+        Seconds spent per preload step
+    """
+    from src.components import shared_bm25_index, shared_embedding_model, shared_reranker, shared_vector_store
+
+    timings = {}
+    curated = settings.curated_qna_enabled and settings.embedding_provider in LOCAL_EMBEDDING_PROVIDERS
+
+    def step(name, func):
+        start = time.perf_counter()
+        try:
+            return func()
+        except Exception as e:
+            logger.warning(f"Preload step '{name}' failed (workers will build it themselves): {e}")
+        finally:
+            timings[name] = time.perf_counter() - start
+
+    logger.info("📦 Preloading shared read-only components...")
+    if curated and not step('curated_qna_embeddings', _precompute_curated_embeddings):
+        # Loading the index here would embed the questions in the parent; workers build it instead
+        logger.warning("Curated Q&A embeddings are not cached; skipping the curated Q&A preload")
+        curated = False
+    step('embeddings', shared_embedding_model)
+    _pin_torch_threads()
+    step('bm25', lambda: shared_bm25_index(shared_vector_store()))
+    if settings.use_reranker:
+        step('reranker', lambda: shared_reranker("Qwen/Qwen3-Reranker-0.6B", settings.top_k_reranker))
+    if settings.query_expansion_mode == "local":
+        from src.query_expansion import get_query_expander
+        step('query_expansion', get_query_expander)
+    if curated:
+        from src.curated_qna import get_curated_index
+        step('curated_qna', lambda: get_curated_index(shared_embedding_model()))
+
+    _pin_torch_threads()  # In case a step above imported torch
+    release_fork_unsafe()
+    gc.collect()
+    gc.freeze()  # Preloaded objects move to the permanent generation
+    logger.info("📦 Preload done: " + ", ".join(f"{name} {seconds:.1f}s" for name, seconds in timings.items()))
+    return timings
+
+
+def after_fork():
+    """Per-worker setup in a freshly forked worker."""
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    release_fork_unsafe()
+    threads = settings.api_worker_torch_threads or _parent_torch_threads
+    if threads and 'torch' in sys.modules:
+        # API_WORKER_TORCH_THREADS keeps workers from each running one thread per core;
+        # otherwise restore the default the parent had before preload() pinned it to 1
+        import torch
+        torch.set_num_threads(threads)
+
+
+def process_memory() -> Optional[Dict[str, int]]:
+    """
+    Memory of this process in kB: RSS, PSS (shared pages split between the
+    processes using them) and shared/private totals. Linux only.
+    """
+    try:
+        with open('/proc/self/smaps_rollup', 'r') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line and not line.startswith(' '))
+    except OSError:
+        return None
+
+    def kb(name: str) -> int:
+        value = fields.get(name, '0 kB').split()
+        return int(value[0]) if value else 0
+
+    return {
+        'pid': os.getpid(),
+        'rss_kb': kb('Rss'),
+        'pss_kb': kb('Pss'),
+        'shared_kb': kb('Shared_Clean') + kb('Shared_Dirty'),
+        'private_kb': kb('Private_Clean') + kb('Private_Dirty'),
+    }
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    """Listening socket created by the parent and inherited by every worker."""
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(sock: socket.socket, log_level: str):
+    """Worker process body: serve the app on the inherited socket, never return."""
+    import uvicorn
+
+    code = 0
+    try:
+        after_fork()
+        from src.api import app
+        server = uvicorn.Server(uvicorn.Config(app, log_level=log_level))
+        server.run(sockets=[sock])
+    except Exception as e:
+        logger.exception(f"Worker {os.getpid()} crashed: {e}")
+        code = 1
+    finally:
+        os._exit(code)
+
+
+def serve(host: str = "0.0.0.0", port: int = 8000, workers: int = None, preload_components: bool = None,
+          log_level: str = "info"):
+    """
+    Run the API with several worker processes sharing preloaded components.
+
+    The parent preloads, binds the socket and forks the workers; it restarts a
+    worker that dies and stops them all on SIGINT/SIGTERM. Each worker runs
+    the normal app lifespan, which finds the preloaded components in the
+    registry. Without os.fork (Windows) or with one worker, runs uvicorn directly.
+
+    Args:
+        host: Host to bind to
+        port: Port to bind to
+        workers: Worker processes (default from settings)
+        preload_components: Preload before forking (default from settings)
+        log_level: Uvicorn log level
+    """
+    import uvicorn
+
+    workers = workers or settings.api_workers
+    preload_components = settings.api_preload if preload_components is None else preload_components
+    if workers <= 1 or not hasattr(os, 'fork'):
+        if workers > 1:
+            logger.warning("Multi-worker serving needs os.fork; running a single worker")
+        uvicorn.run("src.api:app", host=host, port=port, log_level=log_level)
+        return
+
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")  # Tokenizer threads don't survive fork
+    if preload_components:
+        preload()
+    import src.api  # noqa: F401  (module code is shared too)
+
+    sock = _bind(host, port)
+    children: Dict[int, int] = {}  # pid -> worker slot
+    stopping = False
+
+    def spawn(slot: int):
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(sock, log_level)
+        children[pid] = slot
+        logger.info(f"Started worker {slot} (pid {pid})")
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    logger.info(f"Serving on {host}:{port} with {workers} workers (preload: {preload_components})")
+    for slot in range(workers):
+        spawn(slot)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        slot = children.pop(pid, None)
+        if slot is not None and not stopping:
+            logger.warning(f"Worker {slot} (pid {pid}) exited with status {status}; restarting")
+            time.sleep(1.0)
+            if not stopping:
+                spawn(slot)
+    sock.close()
+    logger.info("All workers stopped")
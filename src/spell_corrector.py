@@ -0,0 +1,344 @@
+"""Offline query spell correction (SymSpell-style deletion index) toward IR/clinical terms."""
+import json
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from loguru import logger
+
+from config import settings
+
+# Curated interventional radiology terms, always in the dictionary even if rare in the KB
+IR_LEXICON = [
+    'ablation', 'abscess', 'anaesthesia', 'anaesthetic', 'anesthesia', 'anesthetic', 'aneurysm',
+    'angiogram', 'angiography', 'angioplasty', 'arteriovenous', 'artery', 'aspiration',
+    'biliary', 'biopsy', 'broviac', 'cannula', 'catheter', 'catheterization', 'cholangiogram',
+    'cholangiography', 'coil', 'contrast', 'cystogram', 'drainage', 'embolic', 'embolisation',
+    'embolization', 'embolotherapy', 'endovascular', 'fasting', 'fistula', 'fistulogram',
+    'fluoroscopy', 'gastrostomy', 'gastrojejunostomy', 'guidewire', 'haemangioma', 'hemangioma',
+    'haematoma', 'hematoma', 'hickman', 'interventional', 'intravenous', 'jejunostomy', 'lidocaine',
+    'lymphatic', 'lymphangiogram', 'malformation', 'nephrostomy', 'oesophageal', 'esophageal',
+    'paracentesis', 'percutaneous', 'peripherally', 'picc', 'pleural', 'portacath', 'radiologist',
+    'radiology', 'sclerotherapy', 'sedation', 'stenosis', 'stent', 'thoracentesis', 'thrombolysis',
+    'thrombosis', 'tunneled', 'tunnelled', 'ultrasound', 'urethrogram', 'varicocele', 'vascular',
+    'venogram', 'venography', 'venous',
+    # Aftercare wording patients ask about
+    'antibiotic', 'antibiotics', 'bandage', 'dressing', 'flushing', 'incision', 'infection',
+    'insertion', 'puncture', 'suture', 'sutures',
+]
+LEXICON_COUNT = 1000  # Frequency given to lexicon terms so they win ties against rare KB words
+
+# KB words with these endings are clinical terms and become correction targets too
+CLINICAL_TERM_RE = re.compile(
+    r"(ostomy|otomy|ectomy|gram|graphy|plasty|scopy|centesis|therapy|itis|oma|a?emia|ology|ologist|i[sz]ation)$")
+
+_WORD_RE = re.compile(r"[A-Za-z][A-Za-z']*")
+
+
+def osa_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Optimal string alignment distance (Levenshtein plus adjacent transpositions).
+
+    Args:
+        a: First string
+        b: Second string
+        max_distance: Stop early and return max_distance + 1 beyond this
+
+    Returns:
+        Edit distance, or max_distance + 1 if it exceeds max_distance
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous_previous is not None and i > 1 and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                value = min(value, previous_previous[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return previous[-1] if previous[-1] <= max_distance else max_distance + 1
+
+
+class SpellCorrector:
+    """
+    Spell corrector that only corrects toward IR/clinical terms.
+
+    ``terms`` are the known words (KB vocabulary, optionally a general English
+    word list); a known word is never rewritten. Correction targets are the
+    IR_LEXICON plus KB terms that look clinical (CLINICAL_TERM_RE): ordinary
+    words missing from the KB are left alone instead of being pulled onto the
+    nearest KB word. A word is only corrected one edit away, and only when its
+    best target is ``frequency_margin`` times more frequent than the next
+    target at that distance. Targets are indexed under all strings reachable
+    by deleting up to ``max_edit_distance`` characters from their prefix, so a
+    lookup only generates the deletes of the query word and checks the few
+    targets sharing one. Only lowercase Latin-script words are touched; CJK
+    text, numbers, capitalized words (names, acronyms) and short words pass
+    through unchanged.
+
+    Without a general word list most English words are unknown and one edit
+    from some IR term ("sent" -> "stent", "coin" -> "coil"), so
+    load_spell_corrector() returns no corrector unless one is loaded.
+    """
+
+    def __init__(self, terms: Optional[Dict[str, int]] = None, max_edit_distance: int = 1,
+                 prefix_length: int = 7, min_word_length: int = 4, min_target_count: int = 2,
+                 frequency_margin: float = 2.0):
+        """
+        Initialize the corrector.
+
+        Args:
+            terms: Dict of known word -> frequency (IR_LEXICON is always added)
+            max_edit_distance: Maximum edits for a correction
+            prefix_length: Only this many leading characters are indexed
+            min_word_length: Shorter words are never corrected
+            min_target_count: KB clinical terms seen fewer times are not targets (keeps KB typos out)
+            frequency_margin: Required frequency ratio of the best target over the runner-up
+        """
+        self.max_edit_distance = max_edit_distance
+        self.frequency_margin = frequency_margin
+        self.prefix_length = prefix_length
+        self.min_word_length = min_word_length
+        self.min_target_count = min_target_count
+        self.terms: Dict[str, int] = {}
+        self.targets: Set[str] = set()
+        self._deletes: Dict[str, List[str]] = {}
+        self._cache: Dict[str, str] = {}
+
+        for term, count in (terms or {}).items():
+            self.add_term(term, count)
+        for term in IR_LEXICON:
+            self.add_term(term, LEXICON_COUNT, target=True)
+
+    def _delete_variants(self, word: str) -> Set[str]:
+        """All strings reachable by deleting up to max_edit_distance chars from the word prefix."""
+        prefix = word[:self.prefix_length]
+        variants = {prefix}
+        frontier = {prefix}
+        for _ in range(self.max_edit_distance):
+            next_frontier = set()
+            for item in frontier:
+                if len(item) <= 1:
+                    continue
+                for i in range(len(item)):
+                    deleted = item[:i] + item[i + 1:]
+                    if deleted not in variants:
+                        next_frontier.add(deleted)
+            variants |= next_frontier
+            frontier = next_frontier
+        return variants
+
+    def add_term(self, term: str, count: int = 1, target: bool = False):
+        """
+        Add a known word (counts accumulate); clinical-looking terms also become correction targets.
+
+        Args:
+            term: Lowercase word
+            count: Frequency to add
+            target: Always make it a correction target
+        """
+        term = term.lower()
+        self.terms[term] = self.terms.get(term, 0) + count
+        if term not in self.targets and (target or (
+                self.terms[term] >= self.min_target_count and CLINICAL_TERM_RE.search(term))):
+            self.targets.add(term)
+            for variant in self._delete_variants(term):
+                self._deletes.setdefault(variant, []).append(term)
+        self._cache.clear()
+
+    def add_known_words(self, words: Iterable[str]):
+        """
+        Mark words as valid without making them correction targets (e.g. a general English word list).
+
+        Args:
+            words: Words to accept as written
+        """
+        for word in words:
+            word = word.strip().lower()
+            if word and word not in self.terms:
+                self.terms[word] = 0
+        self._cache.clear()
+
+    @classmethod
+    def from_texts(cls, texts: Iterable[str], min_count: int = 1, **kwargs) -> "SpellCorrector":
+        """
+        Build a corrector from KB text term frequencies.
+
+        Args:
+            texts: Document texts
+            min_count: Ignore words seen fewer times
+            **kwargs: Passed to the constructor
+
+        Returns:
+            SpellCorrector instance
+        """
+        counts = Counter()
+        for text in texts:
+            counts.update(word.lower() for word in _WORD_RE.findall(text or "") if len(word) > 1)
+        return cls({term: count for term, count in counts.items() if count >= min_count}, **kwargs)
+
+    def save(self, path: str):
+        """
+        Save the term frequencies (the delete index is rebuilt on load).
+
+        Args:
+            path: JSON output path
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'max_edit_distance': self.max_edit_distance,
+                       'prefix_length': self.prefix_length, 'terms': self.terms}, f)
+        logger.info(f"💾 Saved spelling vocabulary ({len(self.terms)} terms) to {path}")
+
+    @classmethod
+    def load(cls, path: str) -> "SpellCorrector":
+        """
+        Load a vocabulary saved by save().
+
+        Args:
+            path: JSON vocabulary path
+
+        Returns:
+            SpellCorrector instance
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        terms = {term: count for term, count in data['terms'].items() if term not in IR_LEXICON and count > 0}
+        return cls(terms, prefix_length=data.get('prefix_length', 7))
+
+    def lookup(self, word: str) -> Tuple[str, int]:
+        """
+        Best correction target for a single lowercase word.
+
+        Closest edit distance wins; among targets at that distance the most
+        frequent one must lead the next by ``frequency_margin``.
+
+        Args:
+            word: Lowercase word
+
+        Returns:
+            Tuple of (suggestion, distance); the word itself with distance 0 if
+            known, or unchanged with distance -1 if no target is close enough
+            or the closest targets are too evenly matched
+        """
+        if word in self.terms:
+            return word, 0
+        max_distance = self.max_edit_distance
+
+        candidates: Dict[str, int] = {}
+        for variant in self._delete_variants(word):
+            for term in self._deletes.get(variant, ()):
+                if term not in candidates:
+                    candidates[term] = osa_distance(word, term, max_distance)
+        best_distance = min(candidates.values(), default=max_distance + 1)
+        if best_distance > max_distance:
+            return word, -1
+        ranked = sorted((self.terms[term] for term, distance in candidates.items() if distance == best_distance),
+                        reverse=True)
+        if len(ranked) > 1 and ranked[0] < ranked[1] * self.frequency_margin:
+            return word, -1
+        best = next(term for term, distance in candidates.items()
+                    if distance == best_distance and self.terms[term] == ranked[0])
+        return best, best_distance
+
+    def correct_word(self, word: str) -> str:
+        """
+        Correct one lowercase word.
+
+        Args:
+            word: Word as written
+
+        Returns:
+            Corrected word (or the input if it is known, too short or capitalized)
+        """
+        if len(word) < self.min_word_length or word[0].isupper():
+            # Capitalized words are names, acronyms or sentence starts: never guess at them
+            return word
+        lower = word.lower()
+        corrected = self._cache.get(lower)
+        if corrected is None:
+            corrected = self.lookup(lower)[0]
+            if len(self._cache) < 10000:
+                self._cache[lower] = corrected
+        return word if corrected == lower else corrected
+
+    def correct(self, text: str) -> str:
+        """
+        Correct every Latin-script word in a query; other text is left as is.
+
+        Args:
+            text: Query text
+
+        Returns:
+            Corrected query
+        """
+        return _WORD_RE.sub(lambda match: self.correct_word(match.group(0)), text or "")
+
+
+def load_spell_corrector(vocabulary_path: str, wordlist_path: Optional[str]) -> Optional[SpellCorrector]:
+    """
+    Load a KB spelling vocabulary together with a general English word list.
+
+    Args:
+        vocabulary_path: Vocabulary saved by SpellCorrector.save() at ingestion
+        wordlist_path: General word list, one word per line
+
+    Returns:
+        SpellCorrector, or None if either file is missing or unreadable
+        (without the word list ordinary words would be rewritten toward IR terms)
+    """
+    path = Path(vocabulary_path)
+    if not path.exists():
+        logger.info(f"No spelling vocabulary at {path}; run ingestion to build it")
+        return None
+    wordlist = Path(wordlist_path) if wordlist_path else None
+    if wordlist is None or not wordlist.exists():
+        logger.warning(f"No general word list at {wordlist_path or '(unset)'}; spell correction disabled "
+                       f"(set SPELL_WORDLIST_PATH to a words file such as /usr/share/dict/words)")
+        return None
+    try:
+        corrector = SpellCorrector.load(str(path))
+    except Exception as e:
+        logger.warning(f"Could not load spelling vocabulary from {path}: {e}")
+        return None
+    try:
+        with open(wordlist, 'r', encoding='utf-8', errors='ignore') as f:
+            corrector.add_known_words(f)
+    except Exception as e:
+        logger.warning(f"Could not load word list from {wordlist}; spell correction disabled: {e}")
+        return None
+    logger.info(f"Loaded spelling vocabulary from {path} and word list {wordlist} "
+                f"({len(corrector.terms)} known words, {len(corrector.targets)} correction targets)")
+    return corrector
+
+
+_spell_corrector: Optional[SpellCorrector] = None
+_spell_corrector_loaded = False
+
+
+def get_spell_corrector() -> Optional[SpellCorrector]:
+    """
+    Get the shared SpellCorrector built from the ingested KB vocabulary.
+
+    Words from settings.spell_wordlist_path (a general English word list, one
+    word per line) are added as known words; correction is disabled when
+    that file is missing.
+
+    Returns:
+        SpellCorrector, or None if the vocabulary or the word list is missing
+    """
+    global _spell_corrector, _spell_corrector_loaded
+    if not _spell_corrector_loaded:
+        _spell_corrector_loaded = True
+        _spell_corrector = load_spell_corrector(settings.spell_vocabulary_path, settings.spell_wordlist_path)
+    return _spell_corrector
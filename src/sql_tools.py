@@ -4,19 +4,13 @@ from langchain_core.tools import tool
 from loguru import logger
 
 from src.document_db import DocumentDatabase
+from src.components import shared_document_db
 from config import settings
 
 
-# Global document database instance (initialized on first use)
-_document_db: Optional[DocumentDatabase] = None
-
-
 def get_document_db() -> DocumentDatabase:
-    """Get or create document database instance."""
-    global _document_db
-    if _document_db is None:
-        _document_db = DocumentDatabase()
-    return _document_db
+    """Get or create the shared document database instance."""
+    return shared_document_db()
 
 
 @tool
@@ -1,5 +1,5 @@
 """LangChain tools for knowledge base querying."""
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 
 from langchain_core.tools import tool
 from langchain_core.documents import Document
@@ -7,6 +7,9 @@ from loguru import logger
 
 from src.vector_store import VectorStore
 from src.retriever import AdvancedRetriever
+from src.chunk_expansion import ChunkExpander
+from src.spell_corrector import get_spell_corrector
+from src.query_expansion import get_query_expander, reciprocal_rank_fusion
 from config import settings
 
 # Try to import create_retriever_tool from langchain_classic (LangChain 1.0 pattern)
@@ -175,8 +178,9 @@ def get_knowledge_base_tools(vector_store: VectorStore, retriever: Optional[Adva
 
     # Use custom search_kb tool with formatted output (includes metadata for source display)
     def make_search_tool(vs: VectorStore):
-        @tool
-        def search_kb(query: str, top_k: int = 5, source_org: Optional[str] = None, region: Optional[str] = None, procedure_category: Optional[str] = None) -> str:
+        # The artifact (retrieval scores) reaches graph state without being shown to the LLM
+        @tool(response_format="content_and_artifact")
+        def search_kb(query: str, top_k: int = 5, source_org: Optional[str] = None, region: Optional[str] = None, procedure_category: Optional[str] = None) -> Tuple[str, List[Dict[str, Any]]]:
             """[PREFERRED] Semantic search in the knowledge base for relevant information.
 
             **USE THIS TOOL FIRST**. It finds documents based on meaning suitable for natural language queries.
@@ -196,6 +200,15 @@ def get_knowledge_base_tools(vector_store: VectorStore, retriever: Optional[Adva
             """
             logger.info(f"🔍 Searching knowledge base with query: {query[:100]}...")
 
+            # Fix misspellings against the KB vocabulary (CJK text is left untouched)
+            if settings.spell_correction_enabled:
+                corrector = get_spell_corrector()
+                if corrector is not None:
+                    corrected = corrector.correct(query)
+                    if corrected != query:
+                        logger.info(f"🔄 Query spell-corrected: '{query}' → '{corrected}'")
+                        query = corrected
+
             # Build filter dict for metadata filtering
             filter_dict = {}
             if source_org:
@@ -212,18 +225,55 @@ def get_knowledge_base_tools(vector_store: VectorStore, retriever: Optional[Adva
             if filter_dict:
                 logger.info(f"📋 Active Filters: {filter_dict}")
 
+            # Local query expansion: also search synonym/abbreviation variants, fused by rank
+            queries = [query]
+            if settings.query_expansion_mode == "local" and settings.query_expansion_variants > 0:
+                try:
+                    queries += get_query_expander().variants(query, max_variants=settings.query_expansion_variants)
+                except Exception as e:
+                    logger.warning(f"Query expansion failed, searching the query only: {e}")
+
             # Use direct vector store search with filters
             try:
-                results = vs.similarity_search(query=query, k=top_k, filter_dict=filter_dict)
+                if len(queries) > 1:
+                    logger.info(f"🔀 Query variants: {queries[1:]}")
+                    vs.embedding_model.prime_query_embeddings(queries)  # One embedding call for all variants
+
+                def run_search(filters):
+                    if len(queries) > 1:
+                        return reciprocal_rank_fusion(
+                            [vs.similarity_search(query=q, k=top_k, filter_dict=filters) for q in queries],
+                            limit=top_k,
+                        )
+                    return vs.similarity_search(query=query, k=top_k, filter_dict=filters)
+
+                results = run_search(filter_dict)
+                if not results and procedure_category:
+                    # Categories are keyword-derived (often by the fast-path router) and can miss;
+                    # an empty category is no reason to answer "nothing found"
+                    filter_dict = {k: v for k, v in filter_dict.items() if k != 'procedure_category'} or None
+                    logger.info(f"🏷️  No results in category '{procedure_category}', retrying with filters: {filter_dict}")
+                    results = run_search(filter_dict)
             except Exception as e:
                 logger.error(f"Error in vector store search: {e}")
                 logger.exception(e)
-                return "Error searching the knowledge base. Please try again."
+                return "Error searching the knowledge base. Please try again.", []
 
             if not results:
-                return "No relevant information found in the knowledge base."
+                return "No relevant information found in the knowledge base.", []
+
+            # Widen hits to neighboring chunks / sections from the SQLite chunks table
+            expanded = False
+            if settings.context_expansion_mode != "off":
+                try:
+                    from src.sql_tools import get_document_db
+                    results = ChunkExpander(get_document_db()).expand(results)
+                    expanded = True
+                except Exception as e:
+                    logger.warning(f"Context expansion failed, using raw chunks: {e}")
 
             formatted = []
+            scores = []
             for i, r in enumerate(results, 1):
                 metadata = r.get('metadata', {})
                 org = metadata.get('source_org', 'Unknown')
@@ -244,10 +294,14 @@ def get_knowledge_base_tools(vector_store: VectorStore, retriever: Optional[Adva
                 if region_val == 'Not categorized' or procedure_category_val == 'Not categorized':
                     logger.warning(f"⚠️  Document {i} is missing categorization metadata")
 
+                content = r['content'] if expanded and 'chunk_indices' in r else f"{r['content'][:500]}..."
+                chunk_ref = f" [chunk: {r['id']}]" if r.get('id') else ""
+                scores.append({'id': r.get('id', ''), 'filename': filename, 'score': score,
+                               'rerank_score': r.get('rerank_score')})
                 formatted.append(
-                    f"[Document {i}] Source: {org} | Region: {region_val} | Category: {procedure_category_val} | {filename} (Relevance: {score:.3f})\n{r['content'][:500]}...\n"
+                    f"[Document {i}] Source: {org} | Region: {region_val} | Category: {procedure_category_val} | {filename} (Relevance: {score:.3f}){chunk_ref}\n{content}\n"
                 )
-            return "\n---\n".join(formatted)
+            return "\n---\n".join(formatted), scores
 
         return search_kb
 
@@ -1,5 +1,6 @@
 """Vector database management using LangChain ChromaDB integration."""
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable
+from itertools import islice
 import os
 import warnings
 import sys
@@ -50,12 +51,11 @@ def suppress_telemetry_errors():
         # Restore original stderr
         sys.stderr = original_stderr
 
-from langchain_chroma import Chroma
 from langchain_core.embeddings import Embeddings
 from langchain_core.documents import Document
 from loguru import logger
 
-from src.document_processor import DocumentChunk
+from src.data_models import DocumentChunk
 from src.embeddings import EmbeddingModel
 from config import settings
 
@@ -98,8 +98,9 @@ class VectorStore:
         # Wrap embedding model for LangChain compatibility
         langchain_embeddings = EmbeddingModelWrapper(embedding_model)
 
-        # Initialize LangChain Chroma vector store
+        # Initialize LangChain Chroma vector store (chromadb is imported here, not at module load)
         # Suppress telemetry errors during initialization
+        from langchain_chroma import Chroma
         import warnings
         with warnings.catch_warnings():
             warnings.filterwarnings("ignore", message=".*telemetry.*")
@@ -115,73 +116,78 @@ class VectorStore:
             f"Initialized vector store with collection: {self.collection_name}")
         logger.info(f"Current collection size: {self.vectorstore._collection.count()}")
 
-    def add_documents(self, chunks: List[DocumentChunk], batch_size: int = 100):
+    def add_documents(self, chunks: Iterable[DocumentChunk], batch_size: int = 100):
         """
         Add document chunks to the vector store.
 
+        Chunks are consumed lazily in batches, so a generator can be passed
+        without materializing the whole corpus in memory.
+
         Args:
-            chunks: List of DocumentChunk objects
+            chunks: Iterable of DocumentChunk objects
             batch_size: Number of documents to process at once
         """
-        logger.info(f"Adding {len(chunks)} documents to vector store...")
-
-        # Convert DocumentChunk to LangChain Document
-        langchain_docs = []
-        for chunk in chunks:
-            doc = Document(
-                page_content=chunk.content,
-                metadata=chunk.metadata
-            )
-            langchain_docs.append(doc)
-
-        # Add in batches
-        for i in range(0, len(langchain_docs), batch_size):
-            batch = langchain_docs[i:i + batch_size]
-            batch_chunks = chunks[i:i + batch_size]
-            logger.info(
-                f"Processing batch {i//batch_size + 1}/{(len(langchain_docs)-1)//batch_size + 1}")
-
-            # Use LangChain's add_documents method with IDs
-            ids = [chunk.chunk_id for chunk in batch_chunks]
-
-            # Check for duplicates in this batch
-            if len(ids) != len(set(ids)):
-                logger.warning(f"Found duplicate IDs in batch, making them unique...")
-                seen_ids = set()
-                unique_ids = []
-                for idx, chunk_id in enumerate(ids):
-                    if chunk_id in seen_ids:
-                        # Make it unique by appending batch index
-                        unique_id = f"{chunk_id}_batch{i}_{idx}"
-                        unique_ids.append(unique_id)
-                    else:
-                        unique_ids.append(chunk_id)
-                        seen_ids.add(chunk_id)
-                ids = unique_ids
-
-            # Use ChromaDB upsert directly to handle duplicates gracefully
-            # This will replace existing documents with same IDs
-            collection = self.vectorstore._collection
+        logger.info("Adding documents to vector store...")
+
+        chunk_iter = iter(chunks)
+        total = 0
+        batch_number = 0
+        while True:
+            batch_chunks = list(islice(chunk_iter, batch_size))
+            if not batch_chunks:
+                break
+            batch_number += 1
+            logger.info(f"Processing batch {batch_number} ({total + len(batch_chunks)} documents so far)")
 
             # Get embeddings for this batch
-            texts = [doc.page_content for doc in batch]
+            texts = [chunk.content for chunk in batch_chunks]
             embeddings = self.embedding_model.embed_documents(texts)
 
-            # Extract metadata
-            metadatas = [doc.metadata for doc in batch]
-
-            # Use upsert which handles duplicates (replaces existing)
-            collection.upsert(
-                ids=ids,
-                embeddings=embeddings,
-                documents=texts,
-                metadatas=metadatas
-            )
-            logger.debug(f"Upserted batch {i//batch_size + 1} ({len(batch)} documents)")
+            self.upsert_chunks(batch_chunks, embeddings)
+            total += len(batch_chunks)
 
         final_count = self.vectorstore._collection.count()
         logger.info(
-            f"Successfully added {len(chunks)} documents. Total count: {final_count}")
+            f"Successfully added {total} documents. Total count: {final_count}")
+
+    def upsert_chunks(self, chunks: List[DocumentChunk], embeddings: List[List[float]]):
+        """
+        Upsert one batch of already-embedded chunks.
+
+        Args:
+            chunks: DocumentChunk objects in the batch
+            embeddings: Embedding vectors aligned with chunks
+        """
+        # Chunk IDs become Chroma IDs
+        ids = [chunk.chunk_id for chunk in chunks]
+
+        # Check for duplicates in this batch
+        if len(ids) != len(set(ids)):
+            logger.warning(f"Found duplicate IDs in batch, making them unique...")
+            seen_ids = set()
+            unique_ids = []
+            for idx, chunk_id in enumerate(ids):
+                if chunk_id in seen_ids:
+                    # Make it unique by appending batch index
+                    unique_id = f"{chunk_id}_dup{idx}"
+                    unique_ids.append(unique_id)
+                else:
+                    unique_ids.append(chunk_id)
+                    seen_ids.add(chunk_id)
+            ids = unique_ids
+
+        # Use ChromaDB upsert directly to handle duplicates gracefully
+        # This will replace existing documents with same IDs
+        collection = self.vectorstore._collection
+
+        # Use upsert which handles duplicates (replaces existing)
+        collection.upsert(
+            ids=ids,
+            embeddings=embeddings,
+            documents=[chunk.content for chunk in chunks],
+            metadatas=[chunk.metadata for chunk in chunks]
+        )
+        logger.debug(f"Upserted batch ({len(chunks)} documents)")
 
     def similarity_search(self,
                           query: str,
@@ -300,6 +306,7 @@ class VectorStore:
 
             # Get the client and ensure collection is deleted
             import chromadb
+            from langchain_chroma import Chroma
             import warnings
             with warnings.catch_warnings():
                 warnings.filterwarnings("ignore", message=".*telemetry.*")
@@ -19,7 +19,7 @@ except ImportError as e:
     else:
         logger.warning(f"LEANN not installed. Install with: pip install leann\nError: {e}")
 
-from src.document_processor import DocumentChunk
+from src.data_models import DocumentChunk
 from src.embeddings import EmbeddingModel
 from config import settings
 
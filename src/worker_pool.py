@@ -0,0 +1,173 @@
+"""Process pool with per-task timeouts: a hung task's worker is terminated and replaced."""
+import multiprocessing
+import time
+from multiprocessing.connection import wait
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+
+def _worker_main(conn, initializer: Optional[Callable], initargs: tuple):
+    """Worker process body: run (func, arg) tasks from the pipe until told to stop."""
+    if initializer is not None:
+        initializer(*initargs)
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        func, arg = task
+        try:
+            conn.send((True, func(arg)))
+        except Exception as e:
+            conn.send((False, str(e) or type(e).__name__))
+
+
+class _Worker:
+    """One worker process and the task it is running."""
+
+    def __init__(self, context, initializer: Optional[Callable], initargs: tuple):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, initializer, initargs), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.index: Optional[int] = None
+        self.started = 0.0
+
+    def assign(self, func: Callable, index: int, arg: Any):
+        self.index = index
+        self.started = time.monotonic()
+        self.conn.send((func, arg))
+
+    def kill(self):
+        self.process.terminate()
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class TimedWorkerPool:
+    """
+    Process pool where every task has its own timeout.
+
+    Each worker runs one task at a time, so a task's clock starts when it
+    starts running, not when it was queued. A task that runs past the
+    timeout is reported as failed and its worker process is terminated and
+    replaced; the other workers keep going. ProcessPoolExecutor can do
+    neither: a submitted future cannot be stopped once it runs, and its pool
+    waits for the hung worker on shutdown.
+    """
+
+    def __init__(self, workers: int, initializer: Optional[Callable] = None, initargs: tuple = (),
+                 timeout: Optional[float] = None):
+        """
+        Initialize the pool (processes start on first use).
+
+        Args:
+            workers: Number of worker processes
+            initializer: Called with ``initargs`` once in each new worker
+            initargs: Arguments for the initializer
+            timeout: Seconds a task may run (None/0 = no limit)
+        """
+        self.workers = max(1, workers)
+        self.initializer = initializer
+        self.initargs = initargs
+        self.timeout = timeout or None
+        self._context = multiprocessing.get_context()
+        self._pool: List[_Worker] = []
+        self.stats = {'completed': 0, 'failed': 0, 'timed_out': 0, 'replaced': 0}
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self._context, self.initializer, self.initargs)
+
+    def imap_unordered(self, func: Callable, items: Sequence[Any]) -> Iterator[Tuple[int, Any, Optional[str]]]:
+        """
+        Run ``func(item)`` for every item in the worker processes.
+
+        Args:
+            func: Picklable module-level function
+            items: Task arguments
+
+        Yields:
+            Tuples of (item index, result or None, error message or None) in completion order
+        """
+        if not items:
+            return
+        if not self._pool:
+            self._pool = [self._spawn() for _ in range(min(self.workers, len(items)) or 1)]
+        next_index = 0
+        idle = list(self._pool)
+        busy: Dict[Any, _Worker] = {}
+
+        def replace(worker: _Worker):
+            worker.kill()
+            self._pool.remove(worker)
+            replacement = self._spawn()
+            self._pool.append(replacement)
+            self.stats['replaced'] += 1
+            return replacement
+
+        while next_index < len(items) or busy:
+            while idle and next_index < len(items):
+                worker = idle.pop()
+                worker.assign(func, next_index, items[next_index])
+                busy[worker.conn] = worker
+                next_index += 1
+
+            wait_for = 1.0
+            if self.timeout:
+                oldest = min(worker.started for worker in busy.values())
+                wait_for = max(0.0, min(wait_for, oldest + self.timeout - time.monotonic()))
+            for conn in wait(list(busy), timeout=wait_for):
+                worker = busy.pop(conn)
+                index, worker.index = worker.index, None
+                try:
+                    ok, value = conn.recv()
+                except (EOFError, OSError):
+                    # The worker process died (e.g. a converter crashed the interpreter)
+                    self.stats['failed'] += 1
+                    idle.append(replace(worker))
+                    yield index, None, "worker process died"
+                    continue
+                self.stats['completed' if ok else 'failed'] += 1
+                idle.append(worker)
+                yield index, (value if ok else None), (None if ok else value)
+
+            if self.timeout:
+                now = time.monotonic()
+                for conn, worker in list(busy.items()):
+                    if now - worker.started > self.timeout:
+                        del busy[conn]
+                        self.stats['timed_out'] += 1
+                        logger.warning(f"Task {worker.index} timed out after {self.timeout}s; "
+                                       f"replacing worker process {worker.process.pid}")
+                        index = worker.index
+                        idle.append(replace(worker))
+                        yield index, None, f"timed out after {self.timeout}s"
+
+    def close(self):
+        """Stop every worker; busy ones (abandoned iteration) are terminated instead of awaited."""
+        for worker in self._pool:
+            if worker.index is not None:
+                worker.kill()
+                continue
+            try:
+                worker.conn.send(None)
+            except (OSError, ValueError):
+                pass
+            worker.process.join(5)
+            if worker.process.is_alive():
+                worker.kill()
+            else:
+                worker.conn.close()
+        self._pool = []
+
+    def __enter__(self) -> "TimedWorkerPool":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -17,10 +17,7 @@ import time
 sys.path.insert(0, str(Path(__file__).parent))
 
 from src.rag_pipeline import RAGPipeline
-from src.llm import get_llm_provider, get_langchain_llm
-from src.retriever import AdvancedRetriever
-from src.vector_store import VectorStore
-from src.embeddings import get_embedding_model
+from src.components import shared_retriever, shared_vector_store
 from src.conversation_memory import ConversationMemory
 from config import settings
 
@@ -121,10 +118,8 @@ PROCESSING_STEPS = [
 @st.cache_resource
 def init_rag_system():
     """Initialize RAG system (cached)."""
-    embedding_model = get_embedding_model()
-    vector_store = VectorStore(embedding_model)
-    llm = get_langchain_llm()
-    retriever = AdvancedRetriever(vector_store, llm=llm)
+    vector_store = shared_vector_store()
+    retriever = shared_retriever()
     rag_pipeline = RAGPipeline(vector_store, retriever=retriever)
     stats = vector_store.get_stats()
     return rag_pipeline, stats
@@ -0,0 +1,38 @@
+"""Shared pytest fixtures for the unit tests."""
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+# Make `config` and `src` importable when pytest runs from the project root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+class BagOfWordsEmbeddings:
+    """Deterministic embedding model: one dimension per known word."""
+
+    model_name = "bag-of-words-test"
+
+    def __init__(self):
+        self.vocabulary = {}
+
+    def _dimension(self, word):
+        return self.vocabulary.setdefault(word, len(self.vocabulary))
+
+    def _embed(self, text):
+        vector = [0.0] * 256
+        for word in re.findall(r"\w+", text.lower()):
+            vector[self._dimension(word) % 256] += 1.0
+        return vector
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+@pytest.fixture
+def embeddings():
+    return BagOfWordsEmbeddings()
@@ -0,0 +1,110 @@
+"""Tests for request admission control and the stage limiters."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from src.admission import AdmissionController, AdmissionRejected, StageLimiter  # noqa: E402
+
+
+def test_admits_up_to_limit_then_queues_in_order():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=2, queue_timeout=5)
+        order = []
+
+        async def query(name, hold):
+            async with controller.admit():
+                order.append(name)
+                await asyncio.sleep(hold)
+
+        await asyncio.gather(query("a", 0.05), query("b", 0), query("c", 0))
+        return controller, order
+
+    controller, order = asyncio.run(scenario())
+    assert order == ["a", "b", "c"]
+    snapshot = controller.snapshot()
+    assert snapshot['active'] == 0 and snapshot['queue_depth'] == 0
+    assert snapshot['admitted'] == 3 and snapshot['queued'] == 2 and snapshot['max_queue_depth'] == 2
+
+
+def test_full_queue_rejects_with_429():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=5)
+        await controller.acquire()
+        waiter = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire()
+        controller.release()
+        await waiter
+        controller.release()
+        return controller, rejected.value
+
+    controller, rejected = asyncio.run(scenario())
+    assert rejected.status_code == 429 and rejected.retry_after >= 1
+    assert controller.stats['rejected_queue_full'] == 1
+    assert controller.active == 0
+
+
+def test_queue_timeout_rejects_with_503():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=5, queue_timeout=0.05)
+        await controller.acquire()
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire()
+        return controller, rejected.value
+
+    controller, rejected = asyncio.run(scenario())
+    assert rejected.status_code == 503
+    assert controller.stats['rejected_timeout'] == 1 and controller.queue_depth == 0
+
+
+def test_emergency_bypasses_full_queue():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=5)
+        await controller.acquire()
+        waited = await controller.acquire(emergency=True)
+        return controller, waited
+
+    controller, waited = asyncio.run(scenario())
+    assert waited == 0.0 and controller.active == 2
+    assert controller.stats['emergency_admitted'] == 1
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=2, queue_timeout=5)
+        await controller.acquire()
+        waiter = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        controller.release()
+        return controller
+
+    controller = asyncio.run(scenario())
+    assert controller.queue_depth == 0 and controller.active == 0
+
+
+def test_stage_limiter_bounds_concurrency():
+    limiter = StageLimiter("test", limit=2)
+    peak = []
+
+    def work():
+        with limiter:
+            peak.append(limiter.active)
+            time.sleep(0.02)
+
+    threads = [threading.Thread(target=work) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    snapshot = limiter.snapshot()
+    assert max(peak) <= 2 and snapshot['max_active'] == 2
+    assert snapshot['calls'] == 6 and snapshot['waited'] >= 1 and snapshot['active'] == 0
@@ -0,0 +1,78 @@
+"""Tests for the semantic answer cache."""
+import pytest
+
+from src.answer_cache import AnswerCache, filter_key, normalize_query
+
+SOURCES = [{'filename': 'picc.md'}]
+
+
+class CountingEmbeddings:
+    """Wraps the bag-of-words model and counts embed_query calls."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return self.inner.embed_query(text)
+
+
+@pytest.fixture
+def kb_version():
+    return {'value': 'v1'}
+
+
+@pytest.fixture
+def cache(tmp_path, embeddings, kb_version):
+    return AnswerCache(CountingEmbeddings(embeddings), db_path=str(tmp_path / "answers.db"),
+                       similarity_threshold=0.9, ttl_seconds=0, max_entries=100,
+                       kb_version_fn=lambda: kb_version['value'])
+
+
+def test_normalize_query_and_filter_key():
+    assert normalize_query("  How long   is the FAST?? ") == "how long is the fast"
+    assert normalize_query("要禁食多久？") == "要禁食多久"
+    assert filter_key({'b': 1, 'a': 2}) == filter_key({'a': 2, 'b': 1})
+    assert filter_key(None) == filter_key({})
+
+
+def test_exact_repeat_hits_without_embedding(cache):
+    cache.store("How long should my child fast?", "Six hours.", SOURCES)
+    calls = cache.embedding_model.calls
+
+    lookup = cache.lookup("how long should my child fast")
+    assert lookup.hit and lookup.reason == "exact"
+    assert lookup.entry['response'] == "Six hours." and lookup.entry['sources'] == SOURCES
+    assert cache.embedding_model.calls == calls
+
+
+def test_similar_query_hits_and_dissimilar_misses(cache):
+    cache.store("how long should my child fast before sedation", "Six hours.", SOURCES)
+    assert cache.lookup("how long should my child fast before the sedation").reason == "similar"
+
+    miss = cache.lookup("where do we park at the hospital")
+    assert not miss.hit and miss.embedding is not None
+    assert cache.stats == {'hits': 1, 'exact_hits': 0, 'misses': 1, 'stored': 1}
+
+
+def test_partitioned_by_language_and_filters(cache):
+    cache.store("How long should my child fast?", "Six hours.", SOURCES, filters={'region': 'HK'})
+    assert not cache.lookup("How long should my child fast?").hit
+    assert not cache.lookup("How long should my child fast?", language="zh", filters={'region': 'HK'}).hit
+    assert cache.lookup("How long should my child fast?", filters={'region': 'HK'}).hit
+
+
+def test_new_kb_version_drops_entries(cache, kb_version):
+    cache.store("How long should my child fast?", "Six hours.", SOURCES)
+    kb_version['value'] = 'v2'
+    assert not cache.lookup("How long should my child fast?").hit
+
+
+def test_max_entries_evicts_oldest(tmp_path, embeddings):
+    cache = AnswerCache(embeddings, db_path=str(tmp_path / "answers.db"), similarity_threshold=0.99,
+                        ttl_seconds=0, max_entries=2, kb_version_fn=lambda: 'v1')
+    for question in ("first question here", "second question here", "third question here"):
+        cache.store(question, question.upper(), SOURCES)
+    assert not cache.lookup("first question here").hit
+    assert cache.lookup("third question here").hit
@@ -0,0 +1,43 @@
+"""Tests for BM25 scoring with expansion term weights."""
+import pytest
+
+pytest.importorskip("rank_bm25")
+retriever = pytest.importorskip("src.retriever")
+from langchain_core.documents import Document
+
+from src.query_expansion import QueryExpander
+
+DOCS = [
+    Document(page_content="A CT scan shows the venous malformation before sclerotherapy.", metadata={"chunk_id": "ct"}),
+    Document(page_content="Computed tomography uses X-rays to make pictures.", metadata={"chunk_id": "computed"}),
+    Document(page_content="Fasting: no food for 6 hours before IR procedures. 禁食", metadata={"chunk_id": "fasting"}),
+    Document(page_content="Your child can go home the same day after a PICC insertion.", metadata={"chunk_id": "home"}),
+    Document(page_content="Parking is available at the hospital entrance.", metadata={"chunk_id": "parking"}),
+]
+
+
+@pytest.fixture
+def bm25():
+    return retriever.BM25Retriever(DOCS)
+
+
+def test_expansion_terms_add_to_query_tokens(bm25):
+    query = "CT scan for VM"
+    weights = QueryExpander().expand_terms(query)
+    assert "ct" not in weights  # Too short for the expander; the query tokens must still count
+
+    results = bm25.search(query, k=3, term_weights=weights)
+    assert results[0]["id"] == "ct"
+    assert "computed" in [result["id"] for result in results]
+
+
+def test_cjk_query_keeps_its_tokens(bm25):
+    query = "IR 禁食 幾耐"
+    results = bm25.search(query, k=2, term_weights=QueryExpander().expand_terms(query))
+    assert results[0]["id"] == "fasting"
+
+
+def test_repeated_expansion_tokens_count_once(bm25):
+    once = bm25.search("picc", k=1, term_weights={"catheter": 0.7})
+    twice = bm25.search("picc", k=1, term_weights={"catheter": 0.7, "central catheter": 0.7})
+    assert once[0]["score"] == pytest.approx(twice[0]["score"])
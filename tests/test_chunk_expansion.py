@@ -0,0 +1,63 @@
+"""Tests for expanding hits into budgeted context windows."""
+from src.chunk_expansion import ChunkExpander
+
+
+class FakeDocumentDB:
+    """Chunks table of one document, 'doc-1', with ten 20-character chunks."""
+
+    def __init__(self):
+        self.chunks = [{'document_id': 'doc-1', 'chunk_index': i, 'section_title': None,
+                        'content': f"chunk {i:02d} " + "x" * 11} for i in range(10)]
+
+    def resolve_document_ids(self, paths):
+        return {}
+
+    def get_chunk_windows(self, requests):
+        return [c for c in self.chunks
+                if any(r['document_id'] == c['document_id'] and r['start'] <= c['chunk_index'] <= r['end']
+                       for r in requests)]
+
+
+def hit(index, score):
+    return {'id': f"c{index}", 'content': f"chunk {index:02d}", 'score': score,
+            'metadata': {'document_id': 'doc-1', 'chunk_index': index}}
+
+
+def unknown_hit(score, content="y" * 100):
+    # No chunk_index: cannot be located in the chunks table
+    return {'id': 'web', 'content': content, 'score': score, 'metadata': {'source': 'elsewhere'}}
+
+
+def test_neighbors_are_merged_into_one_window():
+    expander = ChunkExpander(FakeDocumentDB(), mode="neighbors", window=1, max_chars=0, max_tokens=0)
+    windows = expander.expand([hit(3, 0.9), hit(4, 0.8)])
+    assert len(windows) == 1
+    assert windows[0]['chunk_indices'] == [2, 3, 4, 5]
+    assert windows[0]['hit_ids'] == ['c3', 'c4']
+
+
+def test_passthrough_hits_count_against_the_budget():
+    expander = ChunkExpander(FakeDocumentDB(), mode="neighbors", window=1, max_chars=130, max_tokens=0)
+    windows = expander.expand([unknown_hit(0.95), hit(5, 0.9)])
+
+    # The passthrough hit ranks first and uses 100 chars; the window shrinks to its hit and is cut
+    assert windows[0]['id'] == 'web' and len(windows[0]['content']) == 100
+    assert windows[1]['chunk_indices'] == [5]
+    assert sum(len(w['content']) for w in windows) <= 130
+
+
+def test_passthrough_hit_truncated_or_dropped_when_budget_is_spent():
+    expander = ChunkExpander(FakeDocumentDB(), mode="neighbors", window=0, max_chars=50, max_tokens=0)
+    windows = expander.expand([hit(1, 0.9), unknown_hit(0.5), unknown_hit(0.4)])
+    assert [w['id'] for w in windows] == ['c1', 'web']
+    assert len(windows[1]['content']) == 30
+
+    original = unknown_hit(0.5)
+    ChunkExpander(FakeDocumentDB(), mode="neighbors", window=0, max_chars=10, max_tokens=0).expand([original])
+    assert len(original['content']) == 100  # the caller's hit is not modified
+
+
+def test_token_budget_applies_to_passthrough_hits():
+    expander = ChunkExpander(FakeDocumentDB(), mode="neighbors", window=0, max_chars=0, max_tokens=10)
+    windows = expander.expand([unknown_hit(0.9, content="z" * 40), unknown_hit(0.8, content="w" * 40)])
+    assert [w['content'] for w in windows] == ["z" * 40]
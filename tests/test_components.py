@@ -0,0 +1,45 @@
+"""Tests for the shared component registry."""
+import threading
+
+from src.components import ComponentRegistry
+
+
+def test_concurrent_first_requests_build_once():
+    registry = ComponentRegistry()
+    builds = []
+    start = threading.Barrier(8)
+
+    def factory():
+        builds.append(1)
+        return object()
+
+    results = []
+
+    def worker():
+        start.wait()
+        results.append(registry.get('llm', 'model-a', factory))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(builds) == 1
+    assert len({id(r) for r in results}) == 1
+    assert registry.snapshot() == {'components': {'llm': 1}, 'built': 1, 'reused': 7}
+
+
+def test_clear_drops_instances_and_build_locks():
+    registry = ComponentRegistry()
+    registry.get('llm', 'a', object)
+    registry.get('bm25', 'b', object)
+    registry.clear('llm')
+    assert registry.snapshot()['components'] == {'bm25': 1}
+    assert list(registry._build_locks) == [('bm25', 'b')]
+
+    registry.discard('bm25', 'b')
+    registry.clear()
+    assert registry._build_locks == {}
+    registry.get('llm', 'a', object)
+    assert registry.stats['built'] == 3
@@ -0,0 +1,69 @@
+"""Tests for parsing, deduplicating and packing the answer context."""
+from src.chunk_expansion import approx_token_count
+from src.context_packer import ContextPacker, model_token_counter, parse_tool_output
+
+PICC = ("A PICC line is a thin tube placed in a vein in the arm. It is used for long courses of medicine. "
+        "Keep the dressing clean and dry. Call the ward if the arm swells or the line leaks.")
+FASTING = ("Your child must not eat for six hours before sedation. Clear fluids are allowed until two hours "
+           "before. Breast milk is allowed until four hours before the procedure.")
+
+
+def kb_result(*chunks):
+    """search_kb output for (filename, score, chunk id, text) tuples."""
+    return "\n---\n".join(
+        f"[Document {i}] Source: HKCH | Region: Hong Kong | Category: Venous Access | {filename} "
+        f"(Relevance: {score:.3f}) [chunk: {chunk_id}]\n{text}"
+        for i, (filename, score, chunk_id, text) in enumerate(chunks, 1)
+    )
+
+
+def test_parse_search_kb_output():
+    chunks = parse_tool_output(kb_result(("picc.md", 0.82, "c1", PICC), ("fasting.md", 0.61, "c2", FASTING)),
+                               "search_kb")
+    assert [c.chunk_id for c in chunks] == ["c1", "c2"]
+    assert chunks[0].filename == "picc.md" and chunks[0].source_org == "HKCH"
+    assert chunks[0].score == 0.82 and chunks[0].text == PICC
+
+
+def test_parse_other_output():
+    assert parse_tool_output("No relevant information found.") == []
+    chunks = parse_tool_output("Some free text answer", "calculator")
+    assert len(chunks) == 1 and chunks[0].tool == "calculator"
+
+
+def test_collect_fuses_and_dedupes():
+    packer = ContextPacker(max_tokens=1000, duplicate_threshold=0.8)
+    outputs = [
+        ("search_kb", kb_result(("fasting.md", 0.9, "c2", FASTING), ("picc.md", 0.7, "c1", PICC))),
+        ("search_kb", kb_result(("picc.md", 0.8, "c1", PICC))),
+        # Truncated preview of the same passage under another chunk id
+        ("search_kb", kb_result(("picc_copy.md", 0.5, "c9", PICC[:120]))),
+    ]
+    chunks = packer.collect(outputs)
+    assert [c.chunk_id for c in chunks] == ["c1", "c2"]  # found twice, so it ranks first
+    assert chunks[0].score == 0.8
+    assert chunks[0].text == PICC  # the fuller text is kept
+
+
+def test_pack_respects_budget_and_cuts_at_sentences():
+    budget = 130
+    packer = ContextPacker(max_tokens=budget, min_chunk_tokens=10, duplicate_threshold=0.8)
+    context = packer.pack([("search_kb", kb_result(("picc.md", 0.9, "c1", PICC), ("fasting.md", 0.8, "c2", FASTING)))])
+
+    assert approx_token_count(context) <= budget + 5  # separators are not budgeted
+    assert context.startswith("[Document 1] Source: HKCH")
+    assert "[Document 2]" in context
+    second = context.split("\n---\n")[1].split("\n", 1)[1]
+    assert second != FASTING and FASTING.startswith(second) and second.endswith(".")
+
+
+def test_pack_empty():
+    assert ContextPacker(max_tokens=100).pack([("search_kb", "No relevant information found.")]) == ""
+
+
+def test_model_token_counter_defaults_to_approximation():
+    class FakeLLM:
+        def get_num_tokens(self, text):
+            raise AssertionError("tokenizer must not be used by default")
+
+    assert model_token_counter(FakeLLM()) is approx_token_count
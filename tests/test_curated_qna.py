@@ -0,0 +1,119 @@
+"""Tests for the curated Q&A index."""
+import pytest
+
+from src.curated_qna import (
+    CuratedAnswerIndex,
+    CuratedQA,
+    is_placeholder_answer,
+    is_truncated_answer,
+    load_qna_xml,
+)
+
+PLACEHOLDER = ("Please consult with your pediatric interventional radiologist for specific details about "
+               "Angioplasty And Stent Eng.")
+
+
+def make_index(embeddings, pairs, threshold=0.9):
+    return CuratedAnswerIndex(embeddings, pairs, similarity_threshold=threshold, margin=0.0, cache_path="")
+
+
+@pytest.mark.parametrize("answer", [
+    PLACEHOLDER,
+    "please consult with your interventional radiologist for specific details about the procedure.",
+])
+def test_placeholder_answers_detected(answer):
+    assert is_placeholder_answer(answer)
+
+
+@pytest.mark.parametrize("answer", [
+    "Let me explain in plain language",
+    "Most children go home the same day. They can usually return to",
+    "- **Less recovery time**: Children usually return to",
+    "| Step | What happens |\n|------|--------------|\n| **Fasting** | 6 hours before",
+    "| Step | What happens |\n|------|--------------|",
+    "**Why the procedure is done**\n\n1.",
+    "The **stent keeps the vessel open",
+    "The puncture site is small...",
+])
+def test_truncated_answers_detected(answer):
+    assert is_truncated_answer(answer)
+
+
+@pytest.mark.parametrize("answer", [
+    "Your child can go home the same day.",
+    "- Follow the specific instructions on your appointment sheet 請遵循預約信上的具體指示",
+    "| Item | Note |\n|------|------|\n| Medications | Include dosages 包括劑量 |",
+    "**Action: Contact your doctor immediately or go to A&E**\n**行動：立即聯繫醫生或到急症室**",
+    "如對禁食指示有疑問，請致電香港兒童醫院總線：**3513 5000**",
+])
+def test_complete_answers_kept(answer):
+    assert not is_truncated_answer(answer)
+
+
+def test_placeholder_and_truncated_answers_never_returned(embeddings):
+    pairs = [
+        CuratedQA(question="What is angioplasty?", answer=PLACEHOLDER),
+        CuratedQA(question="Why is the treatment being recommended?", answer="Let me explain in plain language"),
+        CuratedQA(question="How long should my child fast?", answer="Stop solid food 6 hours before."),
+    ]
+    index = make_index(embeddings, pairs)
+
+    assert [qa.question for qa in index.pairs] == ["How long should my child fast?"]
+    assert index.match("What is angioplasty?") is None
+    assert index.match("Why is the treatment being recommended?") is None
+    match = index.match("How long should my child fast?")
+    assert match is not None and match.reason == "exact"
+
+
+def test_similar_match_requires_threshold(embeddings):
+    index = make_index(embeddings, [CuratedQA(question="How long should my child fast before sedation?",
+                                              answer="Stop solid food 6 hours before.")])
+
+    assert index.match("how long should my child fast before the sedation") is not None
+    assert index.match("Where do we park at the hospital?") is None
+
+
+def test_embedding_cache_reused_only_for_same_pairs(tmp_path, embeddings):
+    cache = str(tmp_path / "curated.bin")
+    pairs = [CuratedQA(question="How long should my child fast?", answer="Stop solid food 6 hours before.")]
+    uncached = CuratedAnswerIndex(embeddings, pairs, cache_path=cache)
+    assert uncached.is_cached()
+
+    changed = pairs + [CuratedQA(question="When can we go home?", answer="Usually the same day.")]
+    assert not CuratedAnswerIndex(embeddings, pairs, cache_path="").is_cached()
+    stale = CuratedAnswerIndex(embeddings, changed, cache_path=str(tmp_path / "other.bin"))
+    stale.cache_path = cache
+    assert not stale.is_cached()
+
+
+def test_xml_pairs_are_unreviewed_unless_marked(tmp_path):
+    (tmp_path / "generated.xml").write_text(
+        '<procedure name="Angioplasty Eng" curation_method="medgemma"><qna_set>'
+        '<qna id="q1"><question>What is it?</question><answer>A balloon widens the vessel.</answer></qna>'
+        '<qna id="q2" reviewed="true"><question>Is it safe?</question><answer>Serious problems are rare.</answer></qna>'
+        '</qna_set></procedure>', encoding="utf-8")
+
+    pairs = load_qna_xml(str(tmp_path))
+
+    assert {qa.qna_id: qa.metadata["reviewed"] for qa in pairs} == {"q1": False, "q2": True}
+    assert pairs[0].topic == "Angioplasty"
+
+
+def test_get_curated_index_skips_xml_by_default(tmp_path, monkeypatch, embeddings):
+    import src.curated_qna as curated_qna
+    from config import settings
+
+    (tmp_path / "qna_xml").mkdir()
+    (tmp_path / "qna_xml" / "generated.xml").write_text(
+        '<procedure name="Angioplasty Eng"><qna_set><qna id="q1" reviewed="true"><question>What is it?</question>'
+        '<answer>A balloon widens the vessel.</answer></qna></qna_set></procedure>', encoding="utf-8")
+    monkeypatch.setattr(settings, "curated_qna_kb_dir", str(tmp_path / "KB"))
+    monkeypatch.setattr(settings, "qna_xml_dir", str(tmp_path / "qna_xml"))
+    monkeypatch.setattr(settings, "curated_qna_index_path", "")
+
+    for include_xml, expected in ((False, 0), (True, 1)):
+        monkeypatch.setattr(settings, "curated_qna_include_xml", include_xml)
+        monkeypatch.setattr(curated_qna, "_curated_index", None)
+        monkeypatch.setattr(curated_qna, "_curated_index_loaded", False)
+        index = curated_qna.get_curated_index(embeddings)
+        assert (len(index.pairs) if index else 0) == expected
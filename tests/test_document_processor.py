@@ -0,0 +1,40 @@
+"""Tests for document loading through the conversion cache."""
+import pytest
+
+pytest.importorskip("bs4")
+pytest.importorskip("markdown")
+
+from src.conversion_cache import ConversionCache  # noqa: E402
+from src.document_processor import DocumentProcessor  # noqa: E402
+
+HTML = """<html><body><h1 id="article_title">PICC line care</h1>
+<main><p>Keep the dressing dry.</p></main><div id="review-date">2024-05-01</div></body></html>"""
+
+
+def test_cache_hit_keeps_conversion_metadata_and_path_fields(tmp_path):
+    first = tmp_path / "a" / "picc.html"
+    copy = tmp_path / "b" / "picc_copy.html"
+    for path in (first, copy):
+        path.parent.mkdir()
+        path.write_text(HTML, encoding="utf-8")
+
+    processor = DocumentProcessor(markdown_only=True, use_conversion_cache=False)
+    processor.conversion_cache = ConversionCache(str(tmp_path / "cache"))
+
+    text, fresh = processor.load_document(str(first))
+    cached_text, hit = processor.load_document(str(copy))
+
+    assert cached_text == text and "# PICC line care" in text
+    assert fresh["document_title"] == hit["document_title"] == "PICC line care"
+    assert hit["last_reviewed"] == "2024-05-01"
+    # Path-derived fields come from the file being loaded, not from the cached copy
+    assert hit["source"] == str(copy) and hit["filename"] == "picc_copy.html"
+
+
+def test_uncached_load_has_the_same_metadata(tmp_path):
+    path = tmp_path / "picc.html"
+    path.write_text(HTML, encoding="utf-8")
+    processor = DocumentProcessor(markdown_only=True, use_conversion_cache=False)
+    _, metadata = processor.load_document(str(path))
+    assert metadata["document_title"] == "PICC line care"
+    assert metadata["file_type"] == ".html"
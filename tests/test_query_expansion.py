@@ -0,0 +1,82 @@
+"""Tests for local query expansion."""
+import pytest
+
+from src.query_expansion import (
+    QueryExpander,
+    build_cooccurrence_graph,
+    discover_abbreviations,
+    reciprocal_rank_fusion,
+)
+
+
+@pytest.fixture
+def expander():
+    return QueryExpander()
+
+
+def test_discover_abbreviations():
+    text = "Your child may need a peripherally inserted central catheter (PICC) or a Hickman line (HL)."
+    assert discover_abbreviations(text) == {"picc": "peripherally inserted central catheter", "hl": "hickman line"}
+
+
+def test_expand_terms_weights(expander):
+    weights = expander.expand_terms("embolization for arteriovenous malformation")
+    assert weights["embolization"] == 1.0
+    assert weights["embolisation"] == expander.synonym_weight
+    assert weights["avm"] == expander.synonym_weight
+
+
+def test_variants_expand_abbreviations_without_repeated_words(expander):
+    variants = expander.variants("PICC line care at home")
+    assert variants[0] == "peripherally inserted central catheter care at home"
+    for variant in variants:
+        words = variant.lower().split()
+        assert "catheter catheter" not in variant.lower()
+        assert words.count("catheter") == 1
+
+
+def test_variants_of_short_abbreviation_query(expander):
+    variants = expander.variants("CT scan for VM")
+    assert "computed tomography scan for venous malformation" in variants
+
+
+def test_rewrite_keeps_question_when_keywords_drop_most_words(expander):
+    question = "Can my child go home the same day?"
+    assert expander.rewrite(question) == question
+
+
+def test_rewrite_keeps_chinese_words(expander):
+    rewritten = expander.rewrite("IR 禁食 幾耐")
+    assert rewritten.startswith("IR 禁食 幾耐")
+    assert "fasting" in rewritten and "interventional radiology" in rewritten
+
+
+def test_rewrite_keyword_form(expander):
+    assert expander.rewrite("embolization recovery time for arteriovenous malformation") == (
+        "embolization recovery time arteriovenous malformation embolisation avm")
+
+
+def test_cooccurrence_graph_links_related_terms():
+    texts = ["Sclerotherapy treats a venous malformation. Sclerotherapy uses a venous injection."] * 4 + [
+        f"Unrelated sentence number {i} about parking and visiting hours." for i in range(20)]
+    graph, _, sentences = build_cooccurrence_graph(texts, min_df=2, min_pair_count=2, max_df_ratio=0.5)
+    assert sentences == 4 * 2 + 20
+    assert "venous" in dict(graph["sclerotherapy"])
+
+
+def test_save_load_round_trip(tmp_path):
+    expander = QueryExpander.build(["Nephrostomy tube (NT) care. Nephrostomy drainage bag emptying."] * 5,
+                                   min_df=2, min_pair_count=2, max_df_ratio=1.0)
+    path = tmp_path / "expansion.json"
+    expander.save(str(path))
+    loaded = QueryExpander.load(str(path))
+    assert loaded.neighbors == expander.neighbors
+    assert "nephrostomy tube" in loaded.alternatives["nt"]
+
+
+def test_reciprocal_rank_fusion_prefers_consensus():
+    a = [{"id": "1"}, {"id": "2"}, {"id": "3"}]
+    b = [{"id": "2"}, {"id": "4"}]
+    fused = reciprocal_rank_fusion([a, b], limit=3)
+    assert [result["id"] for result in fused] == ["2", "1", "4"]
+    assert fused[0]["rrf_score"] > fused[1]["rrf_score"]
@@ -0,0 +1,26 @@
+"""Tests for the rule-based search_kb planner."""
+import pytest
+
+query_router = pytest.importorskip("src.query_router")
+
+
+@pytest.fixture
+def router():
+    return query_router.FastPathRouter(max_words=30, category_filter=True)
+
+
+@pytest.mark.parametrize("query", ["Sir, how long does a PICC line last?", "Thank you sir, what is sclerotherapy?"])
+def test_salutation_is_not_an_organization(router, query):
+    plan = router.plan(query)
+    assert plan.confident
+    assert "source_org" not in plan.args
+
+
+@pytest.mark.parametrize("query", ["What does SIR say about sclerotherapy?",
+                                   "Society of Interventional Radiology advice on embolization"])
+def test_sir_mentions(router, query):
+    assert router.plan(query).args["source_org"] == "SIR"
+
+
+def test_hksir_is_not_sir(router):
+    assert router.extract_filters("HKSIR guidance")["source_org"] == ["HKSIR"]
@@ -0,0 +1,60 @@
+"""Tests for the score gate in front of the grader LLM."""
+import json
+
+from src.relevance_gate import GradeThresholds, RelevanceGate, calibrate, top_scores
+
+
+def test_top_scores():
+    assert top_scores([{'score': 0.4}, {'score': 0.7, 'rerank_score': 0.2}, {'score': None}]) == (0.7, 0.2)
+    assert top_scores([]) == (None, None)
+
+
+def test_calibrate_separates_labels():
+    samples = [(0.1, False), (0.15, False), (0.2, False), (0.4, True), (0.45, False),
+               (0.5, True), (0.8, True), (0.85, True), (0.9, True)]
+    low, high = calibrate(samples, target_precision=0.95, min_support=3)
+    assert (low, high) == (0.4, 0.5)
+
+
+def test_calibrate_without_support_disables_bands():
+    low, high = calibrate([(0.9, True), (0.1, False)], min_support=3)
+    assert (low, high) == (0.0, 1.01)
+
+
+def test_gate_decides_outside_band():
+    gate = RelevanceGate(GradeThresholds(score_high=0.8, score_low=0.3))
+    assert gate.decide([{'score': 0.85}])[0] is True
+    assert gate.decide([{'score': 0.2}])[0] is False
+    assert gate.decide([{'score': 0.5}])[0] is None
+    assert gate.decide([{'score': None}])[0] is None
+    assert gate.stats == {'relevant': 1, 'not_relevant': 1, 'uncertain': 2}
+
+
+def test_uncalibrated_rerank_scores_fall_back_to_similarity():
+    gate = RelevanceGate(GradeThresholds(score_high=0.8, score_low=0.3))
+    assert gate.decide([{'score': 0.9, 'rerank_score': 0.01}])[0] is True
+
+    calibrated = RelevanceGate(GradeThresholds(score_high=0.8, score_low=0.3, rerank_high=0.7, rerank_low=0.1))
+    assert calibrated.decide([{'score': 0.9, 'rerank_score': 0.01}])[0] is False
+
+
+def test_no_calibration_file_defers_to_llm(tmp_path, monkeypatch):
+    from config import settings
+
+    monkeypatch.setattr(settings, "grade_thresholds_path", str(tmp_path / "missing.json"))
+    gate = RelevanceGate()
+    assert gate.thresholds is None
+    assert gate.decide([{'score': 0.99}]) == (None, "no calibrated thresholds")
+
+
+def test_thresholds_round_trip(tmp_path, monkeypatch):
+    from config import settings
+
+    path = tmp_path / "grade_thresholds.json"
+    GradeThresholds(score_high=0.75, score_low=0.25).save(str(path), samples=20)
+    assert "rerank_high" not in json.loads(path.read_text())
+
+    monkeypatch.setattr(settings, "grade_thresholds_path", str(path))
+    thresholds = RelevanceGate().thresholds
+    assert (thresholds.score_high, thresholds.score_low, thresholds.rerank_high) == (0.75, 0.25, None)
+    assert thresholds.source == str(path)
@@ -0,0 +1,108 @@
+"""Tests for single-flight request coalescing."""
+import asyncio
+
+import pytest
+
+from src.request_coalescing import SingleFlight
+
+
+def test_concurrent_identical_calls_share_one_computation():
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.02)
+            return {'response': "answer"}
+
+        results = await asyncio.gather(*(flight.do("q", compute) for _ in range(3)))
+        return flight, calls, results
+
+    flight, calls, results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert [shared for _, shared in results] == [False, True, True]
+    assert all(result == {'response': "answer"} for result, _ in results)
+    # Each caller gets its own copy
+    assert len({id(result) for result, _ in results}) == 3
+    assert flight.snapshot() == {'in_flight': 0, 'leaders': 1, 'coalesced': 2, 'abandoned': 0, 'errors': 0}
+
+
+def test_errors_reach_every_caller_and_are_not_remembered():
+    async def scenario():
+        flight = SingleFlight()
+        attempts = []
+
+        async def failing():
+            attempts.append(1)
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        outcomes = await asyncio.gather(flight.do("q", failing), flight.do("q", failing), return_exceptions=True)
+        retried, shared = await flight.do("q", lambda: asyncio.sleep(0, result="ok"))
+        return flight, attempts, outcomes, retried, shared
+
+    flight, attempts, outcomes, retried, shared = asyncio.run(scenario())
+    assert len(attempts) == 1
+    assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+    assert (retried, shared) == ("ok", False)
+    assert flight.stats['errors'] == 1
+
+
+def test_computation_cancelled_when_every_caller_leaves():
+    async def scenario():
+        flight = SingleFlight()
+        started = asyncio.Event()
+        cancelled = []
+
+        async def slow():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+
+        caller = asyncio.ensure_future(flight.do("q", slow))
+        await started.wait()
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0)
+        return flight, cancelled
+
+    flight, cancelled = asyncio.run(scenario())
+    assert cancelled == [1]
+    assert flight.in_flight == 0 and flight.stats['abandoned'] == 1
+
+
+def test_late_stream_subscriber_replays_earlier_events():
+    async def scenario():
+        flight = SingleFlight()
+        produced = []
+        second_ready = asyncio.Event()
+
+        async def events():
+            for i in range(4):
+                produced.append(i)
+                yield i
+                if i == 1:
+                    await second_ready.wait()
+
+        first, first_shared = flight.stream("q", events)
+        received_first = []
+        async for event in first:
+            received_first.append(event)
+            if event == 1:
+                second, second_shared = flight.stream("q", events)
+                second_ready.set()
+                break
+        received_first += [event async for event in first]
+        received_second = [event async for event in second]
+        return produced, received_first, received_second, first_shared, second_shared, flight
+
+    produced, first, second, first_shared, second_shared, flight = asyncio.run(scenario())
+    assert produced == [0, 1, 2, 3]
+    assert first == second == [0, 1, 2, 3]
+    assert (first_shared, second_shared) == (False, True)
+    assert flight.in_flight == 0
@@ -0,0 +1,109 @@
+"""Tests for the local tiers of the answer safety check and their metrics."""
+import json
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from src.safety_classifier import (  # noqa: E402
+    SAFETY_BLOCK_MESSAGE,
+    TieredSafetyChecker,
+    safety_check_metrics,
+)
+
+AMBIGUOUS = "The drain usually stays in for a few days after the procedure."
+
+
+class FakeGuardrail:
+    """Stands in for SafetyCheckGuardrail; records escalations instead of calling an LLM."""
+
+    def __init__(self, verdict=True):
+        self.verdict = verdict
+        self.calls = []
+
+    def check_safety(self, response, llm=None):
+        self.calls.append(response)
+        return self.verdict, None if self.verdict else "unsafe (llm)"
+
+    def _basic_safety_check(self, response):
+        return True, None
+
+
+def make_checker(tmp_path, model=None, **kwargs):
+    model_path = tmp_path / "safety_model.json"
+    if model is not None:
+        model_path.write_text(json.dumps(model), encoding="utf-8")
+    kwargs.setdefault("guardrail", FakeGuardrail())
+    return TieredSafetyChecker(model_path=str(model_path), mode=kwargs.pop("mode", "tiered"),
+                               safe_threshold=0.2, unsafe_threshold=0.8, verdict_log_path="", **kwargs)
+
+
+def tiny_model():
+    # 'drain' pushes towards safe, 'ignore' towards unsafe; anything else stays near 0.5
+    return {
+        "vocabulary": {"drain": 0, "ignore": 1},
+        "idf": [1.0, 1.0],
+        "coef": [-5.0, 5.0],
+        "intercept": 0.0,
+        "version": "test",
+    }
+
+
+def test_rules_block_dosage_instruction(tmp_path):
+    checker = make_checker(tmp_path)
+    is_safe, message = checker.check_safety("Give your child 5 mg of morphine every hour.")
+    assert is_safe is False
+    assert message == SAFETY_BLOCK_MESSAGE
+    assert checker.stats["rules"] == 1 and checker.stats["blocked"] == 1
+    assert checker.guardrail.calls == []
+
+
+def test_rules_pass_refusal(tmp_path):
+    checker = make_checker(tmp_path)
+    is_safe, message = checker.check_safety("I don't have that information. Please ask a nurse or doctor.")
+    assert (is_safe, message) == (True, None)
+    assert checker.stats["rules"] == 1 and checker.stats["blocked"] == 0
+
+
+def test_refusal_with_risk_cue_is_not_passed_by_rules(tmp_path):
+    checker = make_checker(tmp_path)
+    checker.check_safety("I don't have that information. Please ask a nurse or doctor. You have an infection.")
+    assert checker.stats["llm"] == 1
+
+
+def test_model_tier_passes_and_blocks(tmp_path):
+    checker = make_checker(tmp_path, model=tiny_model())
+    assert checker.check_safety("Keep the drain dry.") == (True, None)
+    assert checker.check_safety("Ignore the fever.") == (False, SAFETY_BLOCK_MESSAGE)
+    assert checker.stats["model"] == 2 and checker.stats["blocked"] == 1
+    assert checker.guardrail.calls == []
+
+
+def test_ambiguous_answer_escalates_to_llm(tmp_path):
+    guardrail = FakeGuardrail(verdict=False)
+    checker = make_checker(tmp_path, model=tiny_model(), guardrail=guardrail)
+    is_safe, message = checker.check_safety("Keep it clean and dry.")
+    assert (is_safe, message) == (False, "unsafe (llm)")
+    assert guardrail.calls == ["Keep it clean and dry."]
+    assert checker.stats["llm"] == 1 and checker.stats["blocked"] == 1
+    assert checker.escalation_rate == 1.0
+
+
+def test_local_mode_never_escalates(tmp_path):
+    checker = make_checker(tmp_path, mode="local")
+    assert checker.check_safety(AMBIGUOUS) == (True, None)
+    assert checker.guardrail.calls == []
+    assert checker.stats["llm"] == 0
+
+
+def test_snapshot_and_metrics(tmp_path):
+    checker = make_checker(tmp_path, name="test-answer")
+    checker.check_safety("Give 2 tablets now.")
+    checker.check_safety(AMBIGUOUS)
+    snapshot = checker.snapshot()
+    assert snapshot["checked"] == 2
+    assert snapshot["rules"] == 1 and snapshot["llm"] == 1 and snapshot["blocked"] == 1
+    assert snapshot["escalation_rate"] == 0.5
+    assert snapshot["local_model"] is False
+    assert "local_ms" not in snapshot
+    assert safety_check_metrics()["test-answer"] == snapshot
@@ -0,0 +1,98 @@
+"""Tests for the offline query spell corrector."""
+import json
+
+import pytest
+
+import src.spell_corrector as spell_corrector
+from src.spell_corrector import SpellCorrector, load_spell_corrector, osa_distance
+
+KB_TEXT = (
+    "The catheter is placed under sedation. After the nephrostomy the drainage bag is emptied. "
+    "A gastrostomy tube feeds your child. Sclerotherapy treats a vascular malformation. "
+) * 3
+# Stand-in for /usr/share/dict/words
+GENERAL_WORDS = ["sent", "contract", "future", "relation", "picture", "muscular", "affection", "coin", "venus",
+                 "how", "do", "care", "for", "the", "at", "home", "recovery", "time", "tube", "change", "what", "is"]
+
+
+@pytest.fixture
+def corrector():
+    corrector = SpellCorrector.from_texts([KB_TEXT])
+    corrector.add_known_words(GENERAL_WORDS)
+    return corrector
+
+
+def test_osa_distance():
+    assert osa_distance("angiogarm", "angiogram", 2) == 1
+    assert osa_distance("cather", "catheter", 2) == 2
+    assert osa_distance("abc", "xyzabc", 2) == 3
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("emoblization recovery time", "embolization recovery time"),
+    ("how do I care for the cathter at home", "how do I care for the catheter at home"),
+    ("nephrostmy tube change", "nephrostomy tube change"),
+    ("what is scleratherapy", "what is sclerotherapy"),
+])
+def test_corrects_one_edit_misspellings(corrector, query, expected):
+    assert corrector.correct(query) == expected
+
+
+@pytest.mark.parametrize("word", ["sent", "contract", "future", "relation", "picture", "muscular", "affection",
+                                  "coin", "venus"])
+def test_general_words_never_rewritten(corrector, word):
+    assert corrector.correct(f"{word} question") == f"{word} question"
+
+
+@pytest.mark.parametrize("word", ["relation", "picture", "muscular", "affection"])
+def test_two_edits_are_not_corrected(word):
+    # Two edits from sedation / puncture / vascular / infection: left alone even without a word list
+    assert SpellCorrector().correct(word) == word
+
+
+def test_leaves_cjk_and_capitalized_words():
+    corrector = SpellCorrector()
+    assert corrector.correct("PICC 拔除後要注意什麼？") == "PICC 拔除後要注意什麼？"
+    assert corrector.correct("Stant") == "Stant"
+
+
+def test_ambiguous_targets_need_frequency_margin():
+    corrector = SpellCorrector({"aortogram": 5, "aortagram": 4}, min_target_count=1)
+    # One edit from both; neither is twice as frequent as the other
+    assert corrector.lookup("aortigram") == ("aortigram", -1)
+    corrector.add_term("aortogram", 10)
+    assert corrector.lookup("aortigram") == ("aortogram", 1)
+
+
+def test_save_load_round_trip(tmp_path, corrector):
+    path = tmp_path / "vocabulary.json"
+    corrector.save(str(path))
+    loaded = SpellCorrector.load(str(path))
+    assert "nephrostomy" in loaded.targets
+    assert "sent" not in loaded.terms  # General words are not saved with the KB vocabulary
+
+
+def test_load_requires_word_list(tmp_path, corrector):
+    vocabulary = tmp_path / "vocabulary.json"
+    corrector.save(str(vocabulary))
+    wordlist = tmp_path / "words"
+    wordlist.write_text("\n".join(GENERAL_WORDS), encoding="utf-8")
+
+    assert load_spell_corrector(str(tmp_path / "missing.json"), str(wordlist)) is None
+    assert load_spell_corrector(str(vocabulary), str(tmp_path / "missing_words")) is None
+    assert load_spell_corrector(str(vocabulary), "") is None
+    loaded = load_spell_corrector(str(vocabulary), str(wordlist))
+    assert loaded.correct("sent to the nephrostmy clinic") == "sent to the nephrostomy clinic"
+
+
+def test_get_spell_corrector_without_word_list(tmp_path, monkeypatch, corrector):
+    from config import settings
+
+    vocabulary = tmp_path / "vocabulary.json"
+    corrector.save(str(vocabulary))
+    monkeypatch.setattr(settings, "spell_vocabulary_path", str(vocabulary))
+    monkeypatch.setattr(settings, "spell_wordlist_path", str(tmp_path / "missing_words"))
+    monkeypatch.setattr(spell_corrector, "_spell_corrector", None)
+    monkeypatch.setattr(spell_corrector, "_spell_corrector_loaded", False)
+
+    assert spell_corrector.get_spell_corrector() is None